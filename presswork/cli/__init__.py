@@ -1,23 +1,39 @@
 # -*- coding: utf-8 -*-
 """ Command-line interface for presswork. Piping is encouraged. """
 import codecs
+import logging
 import sys
 
 import click
 
+from presswork import client
 from presswork import constants
+from presswork import server
 from presswork.log import setup_logging
 from presswork.text import clean
+from presswork.text import corpus_directory
+from presswork.text import dedup as deduplication
+from presswork.text import input_streams
+from presswork.text import model_files
+from presswork.text import pipeline_cache
+from presswork.text import profiling
+from presswork.text import synthetic
 from presswork.text import text_makers
 from presswork.text.grammar import joiners
 from presswork.text.grammar import tokenizers
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option('-i', '--input-filename',
               help="what to read to train the markov chain. default expectation: you will pipe things in on stdin. "
-                   "if you do not use stdin, give this param with a filename to read from.",
+                   "if you do not use stdin, give this param with a filename to read from. "
+                   "gzip, bz2 & xz files are decompressed as they're read.",
               default='-')
+@click.option('-d', '--input-dir',
+              type=click.Path(exists=True, file_okay=False),
+              help="read a directory of text files (& its subdirectories), instead of one file or stdin. each file is "
+                   "tokenized separately, and (with the cache) only files that are new or modified since the last "
+                   "run are tokenized again.")
 @click.option('-c', '--count',
               type=int,
               help="count of sentences to generate.",
@@ -49,40 +65,127 @@ from presswork.text.grammar import tokenizers
                    "'nltk' uses NLTK's recommended de-tokenizer, MosesDetokenizer. "
                    "'random_indent' is like 'nltk' but randomly indents lines. "
                    "'random_enjamb' is like 'random_indent' but also randomly breaks sentences over lines. "
-                   "'just_whitespace' just uses newlines and spaces. ",
-              default='nltk')
+                   "'just_whitespace' just uses newlines and spaces. "
+                   "[default: nltk; or with --load-model, the saved model's joiner]")
 @click.option('-e', '--input-encoding',
               help="encoding of the input text. uses Python's encoding names. one special case - "
                    "if you change to 'raw', it'll try to use Python/shell defaults.",
               default='utf-8',
               show_default=True)
 @click.option('-E', '--output-encoding', help="encoding of the output text.", default='utf-8', show_default=True)
-def main(ngram_size, strategy, tokenize, join, input_filename, input_encoding, output_encoding, count, ):
+@click.option('--socket', 'socket_path',
+              help="send the request to a running `presswork serve` on this socket, rather than training here. "
+                   "(for the fastest startup, use the `presswork-client` command instead; same options.)")
+@click.option('--save-model', type=click.Path(dir_okay=False, writable=True),
+              help="after training, save the text maker (model, tokenizer, joiner & n-gram size) to this file.")
+@click.option('--load-model', type=click.Path(exists=True, dir_okay=False), multiple=True,
+              help="load a text maker saved with --save-model, instead of reading input & training. "
+                   "(then --strategy, --tokenize and --ngram-size don't apply; they were saved with the model.) "
+                   "only load model files you trust! give it more than once to blend several models.")
+@click.option('--mix-weights',
+              help="when blending models (--load-model more than once), their weights, in the same order, "
+                   "comma-separated. for example 70,30. [default: equal weights]")
+@click.option('--no-cache', is_flag=True,
+              help="don't use (or fill) the cache. by default, cleaned input, tokenized input & trained models are "
+                   "cached in $XDG_CACHE_HOME/presswork (or ~/.cache/presswork), so reruns over the same input skip "
+                   "work they've done before.")
+@click.option('--cache-size', default='512M', show_default=True,
+              help="cap on the cache's size on disk; least recently used entries are evicted beyond it. "
+                   "accepts suffixes, for example 500k, 10M, 1G.")
+@click.option('--prune-min-count', type=click.IntRange(min=1),
+              help="after training, prune the model: drop transitions seen fewer times than this. "
+                   "(pruning never leaves dead ends; what it removed & saved is reported on stderr.)")
+@click.option('--prune-top-k', type=click.IntRange(min=1),
+              help="after training, prune the model: keep only the K most common next words after each n-gram.")
+@click.option('--dedup', type=click.Choice(deduplication.DEDUP_MODES),
+              help="only tokenize each sentence once: drop repeats ('exact'), or also sentences that are nearly the "
+                   "same as one seen before ('near', by MinHash). (how many were dropped is reported on stderr.)")
+@click.option('--dedup-keep-weights', is_flag=True,
+              help="with --dedup, keep counting the repeats (tokenized once): the model is the same as without dedup "
+                   "(for exact repeats), only the tokenizing is skipped.")
+@click.pass_context
+def main(ctx, ngram_size, strategy, tokenize, join, input_filename, input_dir, input_encoding, output_encoding, count,
+         socket_path, save_model, load_model, mix_weights, no_cache, cache_size, prune_min_count, prune_top_k, dedup,
+         dedup_keep_weights):
+    """ generate text from a markov chain model of the input text. (or, see the subcommands.)
+    """
+    if ctx.invoked_subcommand is not None:
+        return
+
+    if input_dir and input_filename != '-':
+        raise click.UsageError("give --input-filename or --input-dir, not both")
+
+    prune_kwargs = {name: value for name, value in [('prune_min_count', prune_min_count), ('prune_top_k', prune_top_k)]
+                    if value is not None}
+    unprunable = (text_makers.TextMakerSuffixArray.NICKNAME, text_makers.TextMakerNgramTrie.NICKNAME)
+    if prune_kwargs and strategy in unprunable:
+        raise click.UsageError("--strategy {} models can't be pruned".format(strategy))
+    if dedup_keep_weights and not dedup:
+        raise click.UsageError("--dedup-keep-weights is for --dedup")
+    dedup_kwargs = dict(dedup=dedup, dedup_keep_weights=dedup_keep_weights) if dedup else {}
+    if dedup and (input_dir or input_filename != '-' and input_streams.detect_compression(input_filename)):
+        raise click.UsageError("--dedup can't be used with --input-dir or compressed input (they're tokenized as they "
+                               "are read)")
+
+    if socket_path:
+        if input_dir:
+            raise click.UsageError("--input-dir can't be used with --socket")
+        if prune_kwargs or dedup_kwargs:
+            raise click.UsageError("--prune-min-count, --prune-top-k & --dedup can't be used with --socket")
+        if load_model or save_model or mix_weights or no_cache:
+            raise click.UsageError("--load-model, --save-model, --mix-weights & --no-cache can't be used with --socket "
+                                   "(the server trains & keeps its own models)")
+        return ctx.invoke(client.main, socket_path=socket_path, input_filename=input_filename,
+                          input_encoding=input_encoding, output_encoding=output_encoding, count=count,
+                          ngram_size=ngram_size, strategy=strategy, tokenize=tokenize, join=join or 'nltk')
+
     logger = setup_logging()
     logger.debug("CLI invocation variable dump: {}".format(locals()))
 
-    if input_filename == '-':
-        if input_encoding == "raw":
-            input_text = sys.stdin.read()
-        else:
-            UTF8Reader = codecs.getreader(input_encoding)
-            sys.stdin = UTF8Reader(sys.stdin)
-            input_text = sys.stdin.read()
+    if mix_weights and len(load_model) < 2:
+        raise click.UsageError("--mix-weights is for blending models: give --load-model more than once")
+
+    if load_model:
+        try:
+            if len(load_model) == 1:
+                text_maker = model_files.load_text_maker(load_model[0])
+            else:
+                weights = [float(weight) for weight in mix_weights.split(',')] if mix_weights else None
+                text_maker = text_makers.TextMakerMixture(load_model, weights=weights)
+        except model_files.ModelFileError as e:
+            raise click.BadParameter(str(e), param_hint='--load-model')
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--mix-weights')
+        if join:
+            text_maker.joiner = joiners.create_joiner(join)
     else:
-        if input_encoding == "raw":
-            with open(input_filename, 'r') as f:
-                input_text = f.read()
+        if no_cache:
+            cache = None
         else:
-            with codecs.open(input_filename, 'r', encoding=input_encoding) as f:
-                input_text = f.read()
+            try:
+                cache = pipeline_cache.PipelineCache(max_bytes=synthetic.parse_size(cache_size))
+            except ValueError as e:
+                raise click.BadParameter(str(e), param_hint='--cache-size')
+        text_maker_kwargs = dict(strategy=strategy, sentence_tokenizer=tokenize, joiner=join or 'nltk',
+                                 ngram_size=ngram_size, **dict(prune_kwargs, **dedup_kwargs))
+        if input_dir:
+            text_maker = _train_text_maker_from_directory(input_dir, input_encoding, cache=cache, **text_maker_kwargs)
+        else:
+            text_maker = _train_text_maker(input_filename, input_encoding, cache=cache, **text_maker_kwargs)
+        if text_maker.prune_report:
+            report = text_maker.prune_report
+            click.echo(u"pruned {} of {} states ({} of {} transitions), saving {:,} bytes".format(
+                    report.states_removed, report.states_before, report.transitions_removed,
+                    report.transitions_before, report.bytes_saved), err=True)
+        if text_maker.dedup_report:
+            report = text_maker.dedup_report
+            click.echo(u"dedup: {} of {} sentences were duplicates ({} exact, {} near): {:.1%} fewer to "
+                       u"tokenize".format(report.exact_duplicates + report.near_duplicates, report.sentences,
+                                          report.exact_duplicates, report.near_duplicates, report.reduction_ratio),
+                       err=True)
 
-    logger.debug("CLI invocation variable dump again: {}".format(locals()))
-    text_maker = text_makers.create_text_maker(
-            strategy=strategy,
-            sentence_tokenizer=tokenize,
-            joiner=join,
-            input_text=clean.CleanInputString(input_text),
-            ngram_size=ngram_size)
+    if save_model:
+        model_files.save_text_maker(text_maker, save_model)
 
     output_sentences = text_maker.make_sentences(count)
     output_text = text_maker.join(output_sentences)
@@ -95,5 +198,154 @@ def main(ngram_size, strategy, tokenize, join, input_filename, input_encoding, o
     sys.stdout.write("\n")
 
 
+def _train_text_maker(input_filename, input_encoding, cache=None, **text_maker_kwargs):
+    """ read the input (from a file, or stdin if input_filename is '-') & train a text maker on it
+
+    :param cache: (optional) a `pipeline_cache.PipelineCache`, to reuse (& keep) the cleaned & tokenized input and the
+        trained model
+    """
+    logger = logging.getLogger('presswork')
+
+    if input_filename != '-' and input_streams.detect_compression(input_filename):
+        # streamed: decompressed, decoded & tokenized a block at a time
+        if cache is not None:
+            return cache.text_maker_for_compressed_file(input_filename, input_encoding, **text_maker_kwargs)
+        text_maker = text_makers.create_text_maker(**text_maker_kwargs)
+        text_maker.input_sentences(input_streams.tokenize_file(
+                input_filename, input_encoding, text_maker.sentence_tokenizer))
+        return text_maker
+
+    # read bytes, decode after: the cache is keyed by a hash of the bytes
+    if input_filename == '-':
+        input_bytes = click.get_binary_stream('stdin').read()
+    else:
+        with open(input_filename, 'rb') as f:
+            input_bytes = f.read()
+
+    logger.debug("CLI invocation variable dump again: {}".format(locals()))
+    if cache is not None:
+        text_maker = cache.text_maker_for(input_bytes, input_encoding, **text_maker_kwargs)
+        logger.debug(u"cache hits: {}, misses: {}".format(dict(cache.hits), dict(cache.misses)))
+        return text_maker
+
+    input_text = input_bytes if input_encoding == "raw" else codecs.decode(input_bytes, input_encoding)
+    return text_makers.create_text_maker(input_text=clean.CleanInputString(input_text), **text_maker_kwargs)
+
+
+def _train_text_maker_from_directory(input_dir, input_encoding, cache=None, **text_maker_kwargs):
+    """ read a directory of files (see `corpus_directory`) & train a text maker on them
+
+    :param cache: (optional) a `pipeline_cache.PipelineCache`; then only new or modified files are tokenized
+    """
+    if cache is not None:
+        return cache.text_maker_for_directory(input_dir, input_encoding, **text_maker_kwargs)
+
+    text_maker = text_makers.create_text_maker(**text_maker_kwargs)
+    text_maker.input_sentences(corpus_directory.tokenize_directory(
+            input_dir, input_encoding, text_maker.sentence_tokenizer))
+    return text_maker
+
+
+@main.command('synthetic-corpus')
+@click.option('--size',
+              help="how much text to emit, in bytes. accepts suffixes, for example 500k, 10M, 1G.",
+              default='10M',
+              show_default=True)
+@click.option('--vocabulary-size', type=int, default=10000, show_default=True,
+              help="how many distinct words to draw from.")
+@click.option('--zipf-exponent', type=float, default=1.07, show_default=True,
+              help="skew of the Zipf distribution of words. higher means the most common words are more common.")
+@click.option('--mean-sentence-length', type=float, default=18, show_default=True,
+              help="mean count of words per sentence.")
+@click.option('--sentence-length-stddev', type=float, default=8, show_default=True,
+              help="standard deviation of words per sentence.")
+@click.option('--punctuation-rate', type=float, default=0.06, show_default=True,
+              help="chance (0-1.0) of mid-sentence punctuation after each word.")
+@click.option('--non-ascii-rate', type=float, default=0.0, show_default=True,
+              help="chance (0-1.0) per word of a non-ASCII character.")
+@click.option('--control-character-rate', type=float, default=0.0, show_default=True,
+              help="chance (0-1.0) per word of a control character (null bytes etc.)")
+@click.option('--sentences-per-line', type=int, default=1, show_default=True,
+              help="1 means line-separated sentences (suits every tokenizer). higher values make paragraphs.")
+@click.option('--seed', type=int, default=None, help="seed, for reproducible output.")
+@click.option('-E', '--output-encoding', help="encoding of the output text.", default='utf-8', show_default=True)
+def synthetic_corpus(size, output_encoding, **generator_kwargs):
+    """ emit a synthetic (Zipfian) corpus of any size to stdout; for stress-testing the rest of the pipeline.
+    """
+    try:
+        size = synthetic.parse_size(size)
+        generator = synthetic.ZipfianCorpusGenerator(**generator_kwargs)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    output_stream = click.get_binary_stream('stdout')
+    for chunk in generator.iter_chunks(size_in_bytes=size, encoding=output_encoding):
+        output_stream.write(chunk)
+
+
+@main.command('memory-benchmark')
+@click.option('--sizes',
+              help="comma-separated sizes of synthetic corpora to profile (see `synthetic-corpus`).",
+              default='256k,1M,4M',
+              show_default=True)
+@click.option('-s', '--strategy',
+              type=click.Choice(text_makers.TEXT_MAKER_NICKNAMES),
+              multiple=True,
+              help="strategy to profile. repeat to profile several. default: all of them.")
+@click.option('-t', '--tokenize', type=click.Choice(tokenizers.TOKENIZER_NICKNAMES), default='just_whitespace',
+              show_default=True)
+@click.option('-n', '--ngram-size', type=int, default=constants.DEFAULT_NGRAM_SIZE, show_default=True)
+@click.option('-c', '--count', type=int, default=100, show_default=True, help="count of sentences to generate.")
+@click.option('--target-corpus-size', default='1G', show_default=True,
+              help="corpus size to project RAM needs for, in the capacity planning table.")
+@click.option('--ram-budget', default='8G', show_default=True,
+              help="RAM budget to project max corpus size for, in the capacity planning table.")
+@click.option('--seed', type=int, default=0, help="seed for the synthetic corpora.")
+def memory_benchmark(sizes, strategy, tokenize, ngram_size, count, target_corpus_size, ram_budget, seed):
+    """ profile memory per strategy & pipeline stage, on synthetic corpora; print a capacity planning table.
+    """
+    setup_logging()
+    try:
+        sizes = [synthetic.parse_size(size) for size in sizes.split(',') if size.strip()]
+        target_corpus_size = synthetic.parse_size(target_corpus_size)
+        ram_budget = synthetic.parse_size(ram_budget)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    rows = profiling.profile_corpus_sizes(
+            sizes, strategies=list(strategy), seed=seed,
+            sentence_tokenizer=tokenize, ngram_size=ngram_size, count=count)
+
+    click.echo(profiling.format_stage_table(rows))
+    click.echo()
+    click.echo(u"capacity planning (target corpus = {}, RAM budget = {}):".format(
+            profiling.format_bytes(target_corpus_size), profiling.format_bytes(ram_budget)))
+    click.echo(profiling.format_capacity_table(
+            profiling.capacity_plan(rows, target_corpus_bytes=target_corpus_size, ram_budget_bytes=ram_budget)))
+
+
+@main.command('serve')
+@click.option('--socket', 'socket_path', required=True, help="path of the Unix domain socket to listen on.")
+@click.option('--max-models', type=int, default=server.DEFAULT_MAX_MODELS, show_default=True,
+              help="how many trained models to keep in memory. beyond that, the least recently used is dropped.")
+@click.option('--ttl-seconds', type=int, default=server.DEFAULT_TTL_SECONDS, show_default=True,
+              help="trained models are dropped after this long without use.")
+def serve(socket_path, max_models, ttl_seconds):
+    """ keep trained models in memory & serve generate requests on a Unix socket. (see `presswork-client`.)
+    """
+    logger = setup_logging()
+    try:
+        text_maker_server = server.TextMakerServer(socket_path, max_models=max_models, ttl_seconds=ttl_seconds)
+    except server.SocketInUseError as e:
+        raise click.BadParameter(unicode(e), param_hint='--socket')
+    logger.info(u'serving on {}'.format(socket_path))
+    try:
+        text_maker_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        text_maker_server.server_close()
+
+
 if __name__ == "__main__":  # pragma: no cover
     main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+""" thin client for `presswork serve` (see `presswork.server`): sends generate requests over a Unix domain socket.
+
+this module imports nothing heavy (no nltk, markovify, etc.), so the `presswork-client` command starts fast - the
+server has already paid for all that, and has the trained model in memory.
+
+    $ presswork serve --socket /tmp/presswork.sock &
+    $ presswork-client --socket /tmp/presswork.sock -i corpus.txt -c 5
+"""
+import codecs
+import json
+import os
+import socket
+import sys
+
+import click
+
+from presswork import constants
+
+
+class ServerError(Exception):
+    """ the server could not handle the request (i.e. bad parameters, or unreadable input file)
+    """
+
+
+def send_request(socket_path, request, timeout=None):
+    """ send one request to the server & return its response (dict)
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+    try:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(request) + '\n')
+        response_line = connection.makefile('rb').readline()
+    finally:
+        connection.close()
+    if not response_line:
+        raise ServerError("server closed the connection without responding")
+    return json.loads(response_line)
+
+
+def generate(socket_path, timeout=None, **request):
+    """ :param request: parameters for the server (see `presswork.server` module docstring)
+    :return: the generated text
+    :raises ServerError: if the server responded with an error
+    """
+    response = send_request(socket_path, request, timeout=timeout)
+    if 'error' in response:
+        raise ServerError(response['error'])
+    return response['text']
+
+
+def generate_for_cli(socket_path, input_filename, input_encoding, **request):
+    """ like generate(), but takes the CLI's input options: a filename is sent as an absolute path (so the server
+    reads it & can tell when it changes); '-' means read stdin here, and send the text.
+    """
+    if input_filename == '-':
+        input_text = sys.stdin.read()
+        if not isinstance(input_text, unicode):
+            input_text = codecs.decode(input_text, 'utf-8' if input_encoding == 'raw' else input_encoding, 'replace')
+        request['input_text'] = input_text
+    else:
+        request['input_filename'] = os.path.abspath(input_filename)
+        request['input_encoding'] = input_encoding
+    return generate(socket_path, **request)
+
+
+@click.command()
+@click.option('--socket', 'socket_path', envvar='PRESSWORK_SOCKET', required=True,
+              help="the socket of a running `presswork serve`. (or set PRESSWORK_SOCKET)")
+@click.option('-i', '--input-filename', default='-', help="same as for `presswork`.")
+@click.option('-c', '--count', type=int, default=100, show_default=True)
+@click.option('-n', '--ngram-size', type=int, default=constants.DEFAULT_NGRAM_SIZE, show_default=True)
+@click.option('-s', '--strategy', default='markovify', show_default=True)
+@click.option('-t', '--tokenize', default='nltk', show_default=True)
+@click.option('-j', '--join', default='nltk', show_default=True)
+@click.option('-e', '--input-encoding', default='utf-8', show_default=True)
+@click.option('-E', '--output-encoding', default='utf-8', show_default=True)
+def main(socket_path, input_filename, input_encoding, output_encoding, **request):
+    """ generate text via a running `presswork serve`. same options as `presswork`; the server validates them.
+    """
+    try:
+        text = generate_for_cli(socket_path, input_filename, input_encoding, **request)
+    except (ServerError, socket.error) as e:
+        raise click.ClickException(u'{}'.format(e))
+
+    output_stream = click.get_binary_stream('stdout')
+    output_stream.write(text.encode(output_encoding))
+    output_stream.write("\n")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -1,44 +1,120 @@
 # -*- coding: utf-8 -*-
 """ Little Flask app FOR LOCAL USE ONLY, for rapidly playing around with text generation.
 """
+import hashlib
+import json
 import logging
+import random
+import time
 import uuid
 
-from flask import Flask, render_template
+from flask import Flask, Response, g, jsonify, render_template, request
 from flask_wtf import FlaskForm
 from flask_wtf.csrf import CSRFProtect
 from wtforms import validators, StringField, IntegerField, ValidationError, TextAreaField
 
 from presswork import constants
+from presswork.flask_app import jobs
+from presswork.flask_app import metrics
+from presswork.flask_app import training
+from presswork.flask_app.model_store import ModelStore
 from presswork.text import clean
+from presswork.text import profiling
 from presswork.text import text_makers
 from presswork.text.grammar import joiners
 from presswork.text.grammar import tokenizers
+from presswork.text.progress import Progress
+from presswork.utils import seeded_random
 
 app = Flask(__name__)
 csrf = CSRFProtect(app=app)
 app.config['SECRET_KEY'] = str(uuid.uuid4())
 
+# trained models for the JSON API, by handle. see model_store module for the expiry rules
+model_store = ModelStore()
+
+# training & generating for the HTML form (& /api/jobs) run here, in worker processes. see jobs module
+job_executor = jobs.JobExecutor()
+# big corpora can instead be trained in the background (& polled for progress); the model lands in model_store
+background_trainer = training.BackgroundTrainer()
+
+# how long the HTML form waits for its job. (a job can wait in the queue, and then run for up to its own timeout)
+JOB_WAIT_SECONDS = 2 * job_executor.timeout_seconds
+
+# streamed responses are made this many sentences at a time - so memory use & time-to-first-byte don't depend on count
+STREAM_BATCH_SIZE = 100
+STREAM_MAX_COUNT = 1000000
+
+MAX_NGRAM_SIZE = 6
+# strategies whose ngram_size can be chosen after training (see `TextMaker.view`): the JSON API trains them once, for
+# every size up to MAX_NGRAM_SIZE, and the size is picked when generating
+ANY_NGRAM_SIZE_STRATEGIES = ('suffix', 'trie')
+
 logger = logging.getLogger('presswork')
 
+# served at /metrics, in the Prometheus text format
+metrics_registry = metrics.Registry()
+_PIPELINE_LABELS = ['text_maker_strategy', 'tokenizer_strategy', 'joiner_strategy']
+request_count = metrics_registry.counter(
+        'presswork_requests_total', 'HTTP requests, by endpoint, status & the strategies used.',
+        ['endpoint', 'status'] + _PIPELINE_LABELS)
+request_seconds = metrics_registry.histogram(
+        'presswork_request_seconds', 'HTTP request latency (until the response starts), by endpoint & strategies used.',
+        ['endpoint'] + _PIPELINE_LABELS)
+stage_seconds = metrics_registry.histogram(
+        'presswork_stage_seconds',
+        'Time spent in each pipeline stage (clean, tokenize, train, generate, join, proofread).',
+        ['stage', 'text_maker_strategy'])
+generated_tokens = metrics_registry.counter(
+        'presswork_generated_tokens_total', 'Tokens (words) generated.', ['text_maker_strategy'])
+generation_seconds = metrics_registry.counter(
+        'presswork_generation_seconds_total', 'Time spent generating sentences.', ['text_maker_strategy'])
+metrics_registry.function(
+        'presswork_generation_tokens_per_second', 'Tokens generated per second spent generating, since startup.',
+        lambda: {key: generated_tokens.values().get(key, 0) / seconds
+                 for key, seconds in generation_seconds.values().iteritems() if seconds},
+        ['text_maker_strategy'])
+metrics_registry.function(
+        'presswork_model_store_lookups_total', 'Lookups of trained models by handle.',
+        lambda: {('hit',): model_store.stats['hits'], ('miss',): model_store.stats['misses']},
+        ['result'], metric_type='counter')
+metrics_registry.function(
+        'presswork_model_store_dropped_total', 'Trained models dropped from the store (expired, or evicted for room).',
+        lambda: {('expired',): model_store.stats['expired'], ('evicted',): model_store.stats['evicted']},
+        ['reason'], metric_type='counter')
+metrics_registry.function(
+        'presswork_model_store_models', 'Trained models held in memory.', lambda: model_store.stats['models'])
+metrics_registry.function(
+        'presswork_model_store_resident_bytes', 'Approximate memory taken up by the trained models held.',
+        lambda: model_store.stats['resident_bytes'])
+metrics_registry.function(
+        'presswork_jobs_total', 'Jobs for the worker processes, by outcome.',
+        lambda: {(outcome,): job_executor.stats[outcome]
+                 for outcome in ('submitted', 'rejected', 'completed', 'failed', 'timed_out')},
+        ['outcome'], metric_type='counter')
+metrics_registry.function(
+        'presswork_jobs_running', 'Jobs running in the worker processes.', lambda: job_executor.stats['running'])
+metrics_registry.function(
+        'presswork_jobs_queue_depth', 'Jobs waiting for a worker process.', lambda: job_executor.stats['queue_depth'])
+metrics_registry.function(
+        'presswork_training_jobs', 'Background training jobs (not yet forgotten), by state.',
+        lambda: {(state,): count for state, count in background_trainer.stats.iteritems()}, ['state'])
+
 
 def lower_or_empty(s):
     return (s or u"").lower()
 
 
-class MarkovChainTextMakerForm(FlaskForm):
-    """ a form for the parameters to `text_makers.create_text_maker` (or most of them)
+class TextMakerParametersForm(FlaskForm):
+    """ a form for the parameters needed to train a text maker (input text & strategies)
     """
     input_text = TextAreaField('Input text', validators=[validators.InputRequired()])
 
     ngram_size = IntegerField(
             "N-gram size AKA state size AKA window size (increase for more 'rigid' modeling of input text)",
-            validators=[validators.NumberRange(min=1, max=6)],
+            validators=[validators.NumberRange(min=1, max=MAX_NGRAM_SIZE)],
             default=constants.DEFAULT_NGRAM_SIZE, )
 
-    count_of_sentences_to_make = IntegerField(
-            "Number of sentences to generate", [validators.NumberRange(min=1, max=3000)], default=50, )
-
     # NOTE: really this should be a SelectField but WTForms was being difficult and I want to handle other things first.
     text_maker_strategy = StringField(
             "Markov Chain Strategy | choices: {} | markovify is first preference, pymc second. ".format(
@@ -55,12 +131,6 @@ class MarkovChainTextMakerForm(FlaskForm):
             filters=[lower_or_empty],
             default='nltk')
 
-    joiner_strategy = StringField(
-            "Joiner Strategy | choices: {}".format(", ".join(joiners.JOINER_NICKNAMES)),
-            validators=[validators.InputRequired(), validators.Length(max=20), ],
-            filters=[lower_or_empty],
-            default='nltk')
-
     def validate_text_maker_strategy(form, field):
         if field.data not in text_makers.TEXT_MAKER_NICKNAMES:
             raise ValidationError(
@@ -71,18 +141,206 @@ class MarkovChainTextMakerForm(FlaskForm):
             raise ValidationError(
                     'tokenizer_strategy must be one of: {}'.format(", ".join(tokenizers.TOKENIZER_NICKNAMES)))
 
-    def validate_joiner_strategy(form, field):
-        if field.data not in joiners.JOINER_NICKNAMES:
-            raise ValidationError(
-                    'joiner_strategy must be one of: {}'.format(", ".join(
-                            joiners.JOINER_NICKNAMES)))
-
     def debug_log(self):
         if logger.isEnabledFor(logging.DEBUG):
             for field in self:
                 logger.debug(u'[flask] form.{} :\n{}\n'.format(field.name, field.data))
 
 
+def _validate_joiner_strategy(form, field):
+    if field.data not in joiners.JOINER_NICKNAMES:
+        raise ValidationError(
+                'joiner_strategy must be one of: {}'.format(", ".join(
+                        joiners.JOINER_NICKNAMES)))
+
+
+class MarkovChainTextMakerForm(TextMakerParametersForm):
+    """ a form for the parameters to `text_makers.create_text_maker` (or most of them), plus how much text to make
+    """
+    count_of_sentences_to_make = IntegerField(
+            "Number of sentences to generate", [validators.NumberRange(min=1, max=3000)], default=50, )
+
+    joiner_strategy = StringField(
+            "Joiner Strategy | choices: {}".format(", ".join(joiners.JOINER_NICKNAMES)),
+            validators=[validators.InputRequired(), validators.Length(max=20), ],
+            filters=[lower_or_empty],
+            default='nltk')
+
+    def validate_joiner_strategy(form, field):
+        _validate_joiner_strategy(form, field)
+
+
+class ApiJobForm(MarkovChainTextMakerForm):
+    """ JSON API: same parameters as the HTML form, for the same pipeline - but submitted as a job, to poll for
+    """
+
+    class Meta:
+        csrf = False
+
+
+class ApiModelForm(TextMakerParametersForm):
+    """ JSON API: parameters to train a model. (same as the HTML form, minus what's only needed for generating)
+    """
+
+    class Meta:
+        # CSRF protection is for browser sessions; API callers don't have one
+        csrf = False
+
+
+class ApiSentencesForm(FlaskForm):
+    """ JSON API: parameters to generate sentences from a trained model. all optional
+    """
+
+    class Meta:
+        csrf = False
+
+    count_of_sentences_to_make = IntegerField(
+            validators=[validators.Optional(), validators.NumberRange(min=1, max=3000)], default=50, )
+
+    joiner_strategy = StringField(
+            validators=[validators.Optional(), validators.Length(max=20), ],
+            filters=[lower_or_empty],
+            default='nltk')
+
+    seed = IntegerField(validators=[validators.Optional()])
+
+    # (if not given, the size the model was trained with. other sizes only for ANY_NGRAM_SIZE_STRATEGIES)
+    ngram_size = IntegerField(validators=[validators.Optional(), validators.NumberRange(min=1, max=MAX_NGRAM_SIZE)])
+
+    def validate_joiner_strategy(form, field):
+        _validate_joiner_strategy(form, field)
+
+
+class ApiStreamSentencesForm(ApiSentencesForm):
+    """ JSON API: same as ApiSentencesForm, but streamed responses can be much longer
+    """
+    count_of_sentences_to_make = IntegerField(
+            validators=[validators.Optional(), validators.NumberRange(min=1, max=STREAM_MAX_COUNT)], default=50, )
+
+
+def make_text(data):
+    """ the whole pipeline for the HTML form: train a text maker, then make a title & body. (runs in a job worker.)
+
+    metrics recorded in a worker would only go to its own copy of the registry, so how long each stage took (& how
+    many tokens were made) is returned along with the text, for the app to record (see _record_job_metrics).
+
+    :param data: the form's data, as a dict by field name
+    :return: dict with the generated `title` & `text`, the `text_maker_strategy` (nickname), and `progress`: a snapshot
+        of the Progress of the whole pipeline, with a 'generated_tokens' count
+    """
+    data = {name: (clean.CleanInputString(value) if isinstance(value, basestring) else value)
+            for name, value in data.iteritems()}
+
+    progress = Progress()
+    text_maker = text_makers.create_text_maker(
+            input_text=data['input_text'],
+            strategy=data['text_maker_strategy'],
+            sentence_tokenizer=data['tokenizer_strategy'],
+            joiner=data['joiner_strategy'],
+            ngram_size=data['ngram_size'],
+            progress=progress,
+    )
+
+    progress.start_stage('generate')
+    title_sentences = text_maker.make_sentences(count=1)
+    body_sentences = text_maker.make_sentences(count=data['count_of_sentences_to_make'])
+    progress.increment('generated_tokens', _count_tokens(title_sentences) + _count_tokens(body_sentences))
+    progress.start_stage('join')
+    title, text = text_maker.join(title_sentences), text_maker.join(body_sentences)
+    progress.start_stage('proofread')
+    title, text = text_maker.proofread(title), text_maker.proofread(text)
+    progress.finish()
+
+    return dict(title=title, text=text, text_maker_strategy=text_maker.NICKNAME, progress=progress.snapshot())
+
+
+def _form_data(form):
+    return {field.name: field.data for field in iter(form) if not field.name.lower().startswith('csrf')}
+
+
+@app.before_request
+def _start_request_metrics():
+    g.request_started_at = time.time()
+    # views fill these in (i.e. with _label_request()) once they know which strategies are used
+    g.metric_labels = {}
+
+
+@app.after_request
+def _record_request_metrics(response):
+    # (by URL rule, not the URL itself - so model & job ids don't each get their own series)
+    endpoint = request.url_rule.rule if request.url_rule else u'unmatched'
+    labels = {name: getattr(g, 'metric_labels', {}).get(name) or u'' for name in _PIPELINE_LABELS}
+    request_count.inc(endpoint=endpoint, status=response.status_code, **labels)
+    if getattr(g, 'request_started_at', None) is not None:
+        request_seconds.observe(time.time() - g.request_started_at, endpoint=endpoint, **labels)
+    return response
+
+
+def _label_request(text_maker_strategy=None, tokenizer_strategy=None, joiner_strategy=None):
+    g.metric_labels = dict(text_maker_strategy=text_maker_strategy, tokenizer_strategy=tokenizer_strategy,
+                           joiner_strategy=joiner_strategy)
+
+
+def _record_stages(snapshot, text_maker_strategy):
+    """ :param snapshot: a `Progress.snapshot()`
+    """
+    for stage, seconds in snapshot['stage_seconds']:
+        stage_seconds.observe(seconds, stage=stage, text_maker_strategy=text_maker_strategy)
+
+
+def _record_generation(seconds, tokens, text_maker_strategy):
+    generation_seconds.inc(seconds, text_maker_strategy=text_maker_strategy)
+    generated_tokens.inc(tokens, text_maker_strategy=text_maker_strategy)
+
+
+def _record_job_metrics(result):
+    """ record the metrics of a make_text() job (which ran in a worker process), from its result
+    """
+    snapshot, strategy = result['progress'], result['text_maker_strategy']
+    _record_stages(snapshot, strategy)
+    _record_generation(sum(seconds for stage, seconds in snapshot['stage_seconds'] if stage == 'generate'),
+                       snapshot['counts'].get('generated_tokens', 0), strategy)
+
+
+def _count_tokens(sentences):
+    return sum(len(sentence or ()) for sentence in sentences)
+
+
+def _train_and_store(model_id, data, progress):
+    """ train a text maker per the (API form) data & add it to the model store, recording how long each stage took
+    """
+    text_maker_kwargs = {}
+    if data['text_maker_strategy'] == 'trie':
+        text_maker_kwargs['max_ngram_size'] = MAX_NGRAM_SIZE
+    text_maker = text_makers.create_text_maker(
+            input_text=clean.CleanInputString(data['input_text']),
+            strategy=data['text_maker_strategy'],
+            sentence_tokenizer=data['tokenizer_strategy'],
+            ngram_size=data['ngram_size'],
+            progress=progress,
+            **text_maker_kwargs
+    )
+    _record_stages(progress.snapshot(), data['text_maker_strategy'])
+    # (walking the model to size it takes time too, but once per model - and makes resident memory visible)
+    model_store.add(model_id, text_maker, size_bytes=profiling.deep_sizeof(text_maker.model))
+
+
+def _generate_text(text_maker, joiner, count):
+    """ make, join & proofread `count` sentences; recording how long each stage took & how many tokens were made
+    """
+    strategy = text_maker.NICKNAME
+    started_at = time.time()
+    sentences = text_maker.make_sentences(count=count)
+    seconds = time.time() - started_at
+    stage_seconds.observe(seconds, stage='generate', text_maker_strategy=strategy)
+    _record_generation(seconds, _count_tokens(sentences), strategy)
+
+    with stage_seconds.time(stage='join', text_maker_strategy=strategy):
+        text = joiner.join(sentences)
+    with stage_seconds.time(stage='proofread', text_maker_strategy=strategy):
+        return text_maker.proofread(text)
+
+
 @app.route("/", methods=['GET', 'POST', ])
 def markov():
     form = MarkovChainTextMakerForm()
@@ -90,37 +348,291 @@ def markov():
 
     if form.validate_on_submit():
         logger.info(u'[flask] received valid form submission')
-
-        data = {
-            field.name: (clean.CleanInputString(field.data) if isinstance(field.data, basestring) else field.data)
-            for field in iter(form)
-            }
-
-        text_maker = text_makers.create_text_maker(
-                input_text=data['input_text'],
-                strategy=data['text_maker_strategy'],
-                sentence_tokenizer=data['tokenizer_strategy'],
-                joiner=data['joiner_strategy'],
-                ngram_size=data['ngram_size'],
-        )
-
-        generated_text_title = text_maker.join(text_maker.make_sentences(count=1))
-        generated_text_body = text_maker.join(text_maker.make_sentences(count=data['count_of_sentences_to_make']))
-
-        generated_text_body = text_maker.proofread(generated_text_body)
-        generated_text_title = text_maker.proofread(generated_text_title)
+        _label_request(form.text_maker_strategy.data, form.tokenizer_strategy.data, form.joiner_strategy.data)
 
         for field in iter(form):
             # make the fields 'sticky' by keeping values from last submission
             if not field.name.lower().startswith('csrf'):
                 field.default = field.data
 
+        # the work runs in the job executor's worker processes, so that it doesn't hold up other requests
+        try:
+            job = job_executor.submit(make_text, _form_data(form))
+        except jobs.QueueFullError as e:
+            logger.warning(u'[flask] rejected form submission, {}'.format(e))
+            return render_template('index.html', form=form, error_message=(
+                u'Too busy right now ({}). Please try again in a bit.'.format(e))), 503
+
+        try:
+            result = job.get(timeout=JOB_WAIT_SECONDS)
+        except jobs.JobTimeoutError as e:
+            return render_template('index.html', form=form, error_message=(
+                u'Took too long ({}). Try a smaller input, or check on it at /api/jobs/{}'.format(e, job.job_id))), 504
+        except jobs.WorkerLostError as e:
+            logger.error(u'[flask] {}'.format(e))
+            return render_template('index.html', form=form, error_message=(
+                u'The worker process died ({}). Maybe the input was too big for memory - try a smaller one.'.format(
+                        e))), 500
+
+        _record_job_metrics(result)
         return render_template(
-                'index.html', form=form, generated_text=generated_text_body, generated_text_title=generated_text_title)
+                'index.html', form=form, generated_text=result['text'], generated_text_title=result['title'])
 
     return render_template('index.html', form=form)
 
 
+def _api_errors(errors, status_code):
+    response = jsonify(errors=errors)
+    response.status_code = status_code
+    return response
+
+
+def _model_handle(data):
+    """ handles are derived from the corpus & parameters, so uploading the same again re-uses the trained model
+
+    (for ANY_NGRAM_SIZE_STRATEGIES, ngram_size isn't part of it: one model serves every size.)
+    """
+    parameters = [data['text_maker_strategy'], data['tokenizer_strategy']]
+    if data['text_maker_strategy'] not in ANY_NGRAM_SIZE_STRATEGIES:
+        parameters.append(data['ngram_size'])
+    digest = hashlib.sha1(json.dumps(parameters).encode('utf-8'))
+    digest.update(data['input_text'].encode('utf-8'))
+    return digest.hexdigest()
+
+
+@app.route("/api/models", methods=['POST', ])
+@csrf.exempt
+def api_create_model():
+    """ train a model once, get a handle back; then generate from the handle (see api_make_sentences) many times.
+
+    expects JSON with `input_text` & the same strategy parameters as the HTML form. responds with
+    `{"model_id": ..., "expires_in_seconds": ...}`. (the model expires if unused for that long.)
+    """
+    form = ApiModelForm()
+    if not form.validate():
+        return _api_errors(form.errors, 400)
+
+    data = {field.name: field.data for field in iter(form)}
+    _label_request(data['text_maker_strategy'], data['tokenizer_strategy'])
+    model_id = _model_handle(data)
+
+    status_code = 200
+    if model_id not in model_store:
+        logger.info(u'[flask] training model {} (strategy={})'.format(model_id, data['text_maker_strategy']))
+        _train_and_store(model_id, data, Progress())
+        status_code = 201
+
+    response = jsonify(model_id=model_id, expires_in_seconds=model_store.expires_in(model_id))
+    response.status_code = status_code
+    return response
+
+
+@app.route("/api/training-jobs", methods=['POST', ])
+@csrf.exempt
+def api_submit_training_job():
+    """ like api_create_model, but responds right away (202) with `job_id` & `model_id`; training runs in the
+    background.
+
+    poll api_get_training_job for progress. once it's 'done', the `model_id` works like one from api_create_model.
+    responds 503 if the background trainer is saturated.
+    """
+    form = ApiModelForm()
+    if not form.validate():
+        return _api_errors(form.errors, 400)
+
+    data = {field.name: field.data for field in iter(form)}
+    _label_request(data['text_maker_strategy'], data['tokenizer_strategy'])
+    model_id = _model_handle(data)
+
+    try:
+        job = background_trainer.submit(model_id, lambda progress: _train_and_store(model_id, data, progress))
+    except jobs.QueueFullError as e:
+        logger.warning(u'[flask] rejected training job, {}'.format(e))
+        return _api_errors({'job': [unicode(e)]}, 503)
+
+    logger.info(u'[flask] training model {} in the background (job {})'.format(model_id, job.job_id))
+    response = jsonify(job_id=job.job_id, model_id=model_id, state=job.state)
+    response.status_code = 202
+    return response
+
+
+@app.route("/api/training-jobs/<job_id>", methods=['GET', ])
+def api_get_training_job(job_id):
+    """ state of a training job ('queued', 'running', 'done', or 'failed' with `error`), and its `progress`:
+    the current `stage`, `counts` of sentences tokenized & n-grams counted so far, and `stage_seconds`.
+    """
+    try:
+        job = background_trainer.get_job(job_id)
+    except KeyError:
+        return _api_errors({'job_id': [u'no such job (finished jobs are forgotten after a while)']}, 404)
+
+    body = dict(job_id=job_id, model_id=job.model_id, state=job.state, progress=job.progress.snapshot())
+    if job.error is not None:
+        body['error'] = unicode(job.error)
+    return jsonify(body)
+
+
+def _at_ngram_size(text_maker, ngram_size):
+    """ :return: (text maker for the requested ngram_size - or the same one, if not given; errors or None)
+    """
+    if ngram_size is None or ngram_size == text_maker.ngram_size:
+        return text_maker, None
+    if text_maker.NICKNAME not in ANY_NGRAM_SIZE_STRATEGIES:
+        return None, {'ngram_size': [u'this model was trained for ngram_size={}; only the {} strategies can change it '
+                                     u'without training another model'.format(
+                text_maker.ngram_size, u" & ".join(ANY_NGRAM_SIZE_STRATEGIES))]}
+    # (a view shares the stored model; the stored text maker itself isn't changed, as other requests use it too)
+    return text_maker.view(ngram_size), None
+
+
+@app.route("/api/models/<model_id>/sentences", methods=['POST', ])
+@csrf.exempt
+def api_make_sentences(model_id):
+    """ generate sentences from a model trained by api_create_model. optional JSON body with
+    `count_of_sentences_to_make`, `joiner_strategy`, `seed` (for reproducible output), and `ngram_size` (for the
+    ANY_NGRAM_SIZE_STRATEGIES: any size, from the one model).
+    """
+    try:
+        text_maker = model_store.get(model_id)
+    except KeyError:
+        return _api_errors({'model_id': [u'no such model (it may have expired)']}, 404)
+
+    form = ApiSentencesForm()
+    if not form.validate():
+        return _api_errors(form.errors, 400)
+    text_maker, errors = _at_ngram_size(text_maker, form.ngram_size.data)
+    if errors:
+        return _api_errors(errors, 400)
+
+    count = form.count_of_sentences_to_make.data or form.count_of_sentences_to_make.default
+    joiner_strategy = form.joiner_strategy.data or form.joiner_strategy.default
+    _label_request(text_maker.NICKNAME, tokenizers.nickname_of(text_maker.sentence_tokenizer), joiner_strategy)
+    joiner = joiners.create_joiner(joiner_strategy)
+    if form.seed.data is not None and isinstance(getattr(joiner, 'random', None), random.Random):
+        # (joiners with randomness have their own instance of Random, rather than using the module-level functions)
+        joiner.random.seed(form.seed.data)
+
+    with seeded_random(form.seed.data):
+        generated_text = _generate_text(text_maker, joiner, count)
+
+    return jsonify(model_id=model_id, text=generated_text, expires_in_seconds=model_store.expires_in(model_id))
+
+
+@app.route("/api/models/<model_id>/sentences/stream", methods=['POST', ])
+@csrf.exempt
+def api_stream_sentences(model_id):
+    """ like api_make_sentences, but responds with plain text, streamed (chunked) as it is generated.
+
+    sentences are made, joined & proofread in batches of STREAM_BATCH_SIZE, so counts can go far higher than
+    the HTML form allows, while the server only ever holds one batch.
+    """
+    try:
+        text_maker = model_store.get(model_id)
+    except KeyError:
+        return _api_errors({'model_id': [u'no such model (it may have expired)']}, 404)
+
+    form = ApiStreamSentencesForm()
+    if not form.validate():
+        return _api_errors(form.errors, 400)
+    text_maker, errors = _at_ngram_size(text_maker, form.ngram_size.data)
+    if errors:
+        return _api_errors(errors, 400)
+
+    count = form.count_of_sentences_to_make.data or form.count_of_sentences_to_make.default
+    joiner_strategy = form.joiner_strategy.data or form.joiner_strategy.default
+    _label_request(text_maker.NICKNAME, tokenizers.nickname_of(text_maker.sentence_tokenizer), joiner_strategy)
+    joiner = joiners.create_joiner(joiner_strategy)
+
+    return Response(_iter_generated_text(text_maker, joiner, count, seed=form.seed.data),
+                    mimetype='text/plain; charset=utf-8')
+
+
+def _iter_generated_text(text_maker, joiner, count, seed=None, batch_size=None):
+    """ generate, join & proofread `count` sentences, yielding the text one batch at a time (as utf-8)
+
+    with a seed, each batch is seeded from a Random(seed): output is reproducible, yet the lock in seeded_random()
+    is only held for one batch at a time (and not while the response is being sent).
+    """
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    seeds = random.Random(seed) if seed is not None else None
+    if seeds and isinstance(getattr(joiner, 'random', None), random.Random):
+        joiner.random.seed(seed)
+
+    made = 0
+    while made < count:
+        batch_count = min(batch_size, count - made)
+        with seeded_random(seeds.random() if seeds else None):
+            text = _generate_text(text_maker, joiner, batch_count)
+        if made:
+            text = (joiner.between_sentences() or u"") + text
+        made += batch_count
+        yield text.encode('utf-8')
+
+
+@app.route("/api/jobs", methods=['POST', ])
+@csrf.exempt
+def api_submit_job():
+    """ run the HTML form's pipeline as a job; responds right away (202) with `job_id`, to poll with api_get_job.
+
+    responds 503 with the executor stats, if the pool is saturated.
+    """
+    form = ApiJobForm()
+    if not form.validate():
+        return _api_errors(form.errors, 400)
+    _label_request(form.text_maker_strategy.data, form.tokenizer_strategy.data, form.joiner_strategy.data)
+
+    try:
+        job = job_executor.submit(make_text, _form_data(form))
+    except jobs.QueueFullError as e:
+        logger.warning(u'[flask] rejected job, {}'.format(e))
+        response = jsonify(errors={'job': [unicode(e)]}, stats=job_executor.stats)
+        response.status_code = 503
+        return response
+
+    response = jsonify(job_id=job.job_id, state=job.state)
+    response.status_code = 202
+    return response
+
+
+@app.route("/api/jobs", methods=['GET', ])
+def api_job_stats():
+    return jsonify(job_executor.stats)
+
+
+@app.route("/api/jobs/<job_id>", methods=['GET', ])
+def api_get_job(job_id):
+    """ state of a job: 'pending', 'done' (with `title` & `text`), 'failed' or 'timed out' (with `error`)
+    """
+    try:
+        job = job_executor.get_job(job_id)
+    except KeyError:
+        return _api_errors({'job_id': [u'no such job (finished jobs are forgotten after a while)']}, 404)
+
+    body = dict(job_id=job_id, state=job.state)
+    if job.ready():
+        try:
+            result = job.get()
+            body['title'], body['text'] = result['title'], result['text']
+        except Exception as e:
+            body['error'] = unicode(e)
+    return jsonify(body)
+
+
+@app.route("/metrics", methods=['GET', ])
+def metrics_endpoint():
+    """ request counts & latencies, pipeline stage timings, model store & job stats - in the Prometheus text format
+    """
+    return Response(metrics_registry.render(), content_type=metrics.Registry.CONTENT_TYPE)
+
+
+@app.route("/api/models/<model_id>", methods=['DELETE', ])
+@csrf.exempt
+def api_delete_model(model_id):
+    if not model_store.discard(model_id):
+        return _api_errors({'model_id': [u'no such model (it may have expired)']}, 404)
+    return u'', 204
+
+
 if __name__ == "__main__":  # pragma: no cover
     """ development-only server. will run in Flask's wonderful, wonderful debug mode if you set "DEBUG" var beforehand
 
@@ -143,6 +655,12 @@ if __name__ == "__main__":  # pragma: no cover
     except IndexError:
         port = 5000
 
+    # the workers are started here, before the server's threads are: forking from the threaded server could copy locks
+    # its threads hold. (when imported some other way, the first job starts them - see JobExecutor.) with the
+    # reloader, in debug mode, this process only watches for changes; the server & its workers run in a child process
+    if not debug_mode or os.environ.get('WERKZEUG_RUN_MAIN'):
+        job_executor.start()
+
     msg = u'[flask] started on {} at {}'.format(port, datetime.datetime.now())
     logger.info(msg)
     print msg
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+""" a local job executor - so training & generating run in worker processes, rather than in the request thread.
+
+training and generating are CPU-bound & hold the GIL. in the request thread, one big corpus stalls every other request
+in the process. so the app submits that work to a process pool instead, then waits for it - or for long jobs, polls.
+
+    * the queue is bounded: when the pool is saturated, submit() rejects the job (QueueFullError) rather than queueing
+    without end. (callers can report that, i.e. with HTTP 503, and retry later.)
+    * each job has a timeout, enforced inside the worker (with SIGALRM), so a runaway job frees its worker process.
+    * if a worker process dies instead (i.e. killed for using too much memory), multiprocessing never finishes its
+    job. so each job also has a deadline - as if every job ahead of it ran for the whole timeout, plus some grace. a job
+    past its deadline is marked 'failed' (WorkerLostError), and the pool is replaced: a worker killed mid-task can
+    leave the pool's queues locked, so its other unfinished jobs fail too.
+    * pools are only ever created (& replaced) by the executor's supervisor thread, never in the thread that submits or
+    checks on a job - i.e. a web server's request thread, which may be forked in the middle of handling a request.
+    * stats: queue depth, running jobs, and counts of submitted/rejected/completed/failed/timed out jobs.
+
+    >>> executor = JobExecutor(processes=1, max_queue=1, timeout_seconds=10)
+    >>> executor.start()
+    >>> job = executor.submit(sum, [1, 2, 3])
+    >>> job.get(timeout=10)
+    6
+    >>> executor.get_job(job.job_id).state
+    'done'
+    >>> executor.shutdown()
+"""
+import collections
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+import uuid
+
+logger = logging.getLogger("presswork")
+
+DEFAULT_PROCESSES = 2
+DEFAULT_MAX_QUEUE = 8
+DEFAULT_TIMEOUT_SECONDS = 120
+# finished jobs are kept around this long, so that pollers can pick up the results
+DEFAULT_RESULT_TTL_SECONDS = 10 * 60
+# (how much later than its timeout allows a job may still finish, before it's taken to be lost)
+DEADLINE_GRACE_SECONDS = 30
+# (how often a submit() waiting for the supervisor to start a pool checks that the supervisor is still running)
+POOL_WAIT_SECONDS = 1
+
+
+class QueueFullError(Exception):
+    """ raised by submit() when the pool is busy and the queue is full
+    """
+
+
+class JobTimeoutError(Exception):
+    """ raised when a job ran longer than its timeout (or when waiting for a job took longer than the caller allowed)
+    """
+
+
+class WorkerLostError(Exception):
+    """ raised for a job that was past its deadline: its worker process died (or hung) before it finished
+    """
+
+
+def _run_job(timeout_seconds, function, args, kwargs):
+    """ (runs in a worker process.) run the function, but interrupt it if it runs too long.
+
+    :return: ('done', result) or ('failed', exception) or ('timed out', JobTimeoutError). exceptions are returned rather
+        than raised, so the completion callback gets called for every outcome.
+    """
+
+    def on_alarm(signum, frame):
+        raise JobTimeoutError("job ran longer than its timeout ({}s)".format(timeout_seconds))
+
+    previous_handler = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout_seconds)
+    try:
+        return 'done', function(*args, **kwargs)
+    except JobTimeoutError as e:
+        return 'timed out', e
+    except Exception as e:
+        logger.exception(u'[jobs] job failed')
+        return 'failed', e
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+def _ignore_sigint():
+    # (pool workers shouldn't react to ctrl-c themselves; the parent process shuts them down)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class Job(object):
+    """ handle to a submitted job. `state` is one of 'pending', 'done', 'failed', 'timed out'
+    """
+
+    def __init__(self, job_id, async_result, submitted_at, deadline, executor):
+        self.job_id = job_id
+        self.submitted_at = submitted_at
+        self.deadline = deadline
+        self.finished_at = None
+        # (set by the executor, once the job is past its deadline)
+        self.lost = False
+        self._async_result = async_result
+        self._executor = executor
+
+    def ready(self):
+        return self.lost or self._async_result.ready()
+
+    @property
+    def state(self):
+        if self.lost:
+            return 'failed'
+        if not self.ready():
+            return 'pending'
+        state, _ = self._async_result.get()
+        return state
+
+    def get(self, timeout=None):
+        """ wait for the job & return its result. re-raises the job's exception if it failed.
+
+        :param timeout: seconds to wait (None waits as long as it takes - at most until the job's deadline)
+        :raises JobTimeoutError: if the job timed out in its worker, or was not finished within `timeout`
+        :raises WorkerLostError: if the job is past its deadline
+        """
+        until_deadline = max(0, self.deadline - self._executor.clock())
+        self._async_result.wait(until_deadline if timeout is None else min(timeout, until_deadline))
+        if not self.ready():
+            self._executor.check_deadlines()
+        if self.lost:
+            raise WorkerLostError("job {} was not finished by its deadline: its worker process died (or hung)".format(
+                    self.job_id))
+        if not self.ready():
+            raise JobTimeoutError("job {} not finished within {}s (it may still finish; poll for it)".format(
+                    self.job_id, timeout))
+        state, result = self._async_result.get()
+        if state != 'done':
+            raise result
+        return result
+
+
+class JobExecutor(object):
+    """ process pool with a bounded queue & per-job timeouts (see module docstring).
+
+    call start() at start-up, before starting any other threads (i.e. before the web server starts): forking a process
+    that has other threads can copy locks that they hold, into the workers. (otherwise, the first submit() starts the
+    supervisor, which starts the pool - at least not from within that thread, which may be holding locks of its own.)
+    python 2 has no forkserver, so a pool replaced later is still forked from a threaded process, but from the
+    supervisor thread, which holds no locks besides the executor's.
+    """
+
+    def __init__(self, processes=DEFAULT_PROCESSES, max_queue=DEFAULT_MAX_QUEUE,
+                 timeout_seconds=DEFAULT_TIMEOUT_SECONDS, result_ttl_seconds=DEFAULT_RESULT_TTL_SECONDS,
+                 clock=time.time):
+        """
+        :param processes: how many worker processes (how many jobs can run at once)
+        :param max_queue: how many more jobs can wait for a free worker. beyond that, jobs are rejected
+        :param timeout_seconds: each job is interrupted after running this long
+        :param result_ttl_seconds: finished jobs (& their results) are forgotten after this long
+        """
+        if processes < 1:
+            raise ValueError("processes must be 1 or more")
+        self.processes = processes
+        self.max_queue = max_queue
+        self.timeout_seconds = timeout_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.clock = clock
+
+        self._pool = None
+        self._lock = threading.Lock()
+        # (notified when a pool is wanted - there's none - or has been started, or when shutting down)
+        self._pool_changed = threading.Condition(self._lock)
+        # (pools that lost a worker, for the supervisor to terminate)
+        self._lost_pools = []
+        self._supervisor = None
+        self._stopping = False
+        self._jobs = collections.OrderedDict()
+        self._counts = collections.Counter()
+
+    def submit(self, function, *args, **kwargs):
+        """ submit a job. the function & its arguments must be picklable (i.e. function must be module-level).
+
+        :rtype: Job
+        :raises QueueFullError: when all workers are busy and the queue is full
+        """
+        self.check_deadlines()
+        with self._lock:
+            self._forget_old_jobs()
+            pending = self._count_pending()
+            if pending >= self.processes + self.max_queue:
+                self._counts['rejected'] += 1
+                raise QueueFullError("all {} workers are busy and the queue is full ({} waiting)".format(
+                        self.processes, self.max_queue))
+
+            self._wait_for_pool()
+
+            job_id = uuid.uuid4().hex
+            async_result = self._pool.apply_async(
+                    _run_job, (self.timeout_seconds, function, args, kwargs),
+                    callback=lambda outcome: self._on_finished(job_id, outcome))
+            # (at worst, every job ahead of this one runs for the whole timeout, `processes` at a time)
+            submitted_at = self.clock()
+            deadline = submitted_at + (pending // self.processes + 1) * self.timeout_seconds + DEADLINE_GRACE_SECONDS
+            job = self._jobs[job_id] = Job(job_id, async_result, submitted_at, deadline, executor=self)
+            self._counts['submitted'] += 1
+            return job
+
+    def start(self):
+        """ start the supervisor thread & the worker processes, if they aren't running yet (& wait for them)
+        """
+        with self._lock:
+            self._wait_for_pool()
+
+    def _wait_for_pool(self):
+        # (with the lock held - waiting releases it)
+        while self._pool is None:
+            if self._supervisor is None:
+                self._supervisor = threading.Thread(target=self._supervise, name="presswork-job-supervisor")
+                self._supervisor.daemon = True
+                self._supervisor.start()
+            self._pool_changed.wait(POOL_WAIT_SECONDS)
+
+    def _supervise(self):
+        """ (runs in the supervisor thread.) start a pool whenever there's none: at first, & after one lost a worker
+        """
+        while True:
+            with self._lock:
+                while self._pool is not None and not self._stopping:
+                    self._pool_changed.wait()
+                if self._stopping:
+                    return
+                lost_pools, self._lost_pools = self._lost_pools, []
+            # (outside the lock: terminating waits for the pool's result-handler thread, which may be waiting for it)
+            for pool in lost_pools:
+                pool.terminate()
+                pool.join()
+            pool = multiprocessing.Pool(processes=self.processes, initializer=_ignore_sigint)
+            with self._lock:
+                self._pool = pool
+                self._pool_changed.notify_all()
+
+    def _on_finished(self, job_id, outcome):
+        # (called from the pool's result-handler thread)
+        state, _ = outcome
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.lost:
+                # (it finished after all, but it was already counted as failed)
+                return
+            self._counts[state] += 1
+            if job is not None:
+                job.finished_at = self.clock()
+
+    def check_deadlines(self):
+        """ mark unfinished jobs past their deadline as failed, and if there are any, have the supervisor replace the
+        pool (see module docstring). submit(), get_job() & stats check first, so callers don't usually need to.
+        """
+        with self._lock:
+            now = self.clock()
+            if not any(not job.ready() and job.deadline < now for job in self._jobs.itervalues()):
+                return
+            lost_jobs = [job for job in self._jobs.itervalues() if not job.ready()]
+            for job in lost_jobs:
+                job.lost = True
+                job.finished_at = now
+                self._counts['failed'] += 1
+            if self._pool is not None:
+                self._lost_pools.append(self._pool)
+                self._pool = None
+                self._pool_changed.notify_all()
+        logger.error(u'[jobs] a job is past its deadline, so a worker process must have died; replacing the pool, '
+                     u'and failed its {} unfinished job(s)'.format(len(lost_jobs)))
+
+    def get_job(self, job_id):
+        """ :raises KeyError: if there's no such job (or it finished long enough ago to be forgotten)
+        """
+        self.check_deadlines()
+        with self._lock:
+            self._forget_old_jobs()
+            return self._jobs[job_id]
+
+    def _count_pending(self):
+        return sum(1 for job in self._jobs.itervalues() if not job.ready())
+
+    def _forget_old_jobs(self):
+        now = self.clock()
+        for job_id, job in self._jobs.items():
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl_seconds:
+                del self._jobs[job_id]
+
+    @property
+    def stats(self):
+        """ :return: dict with `queue_depth` (jobs waiting for a worker), `running`, and counts of jobs by outcome
+        """
+        self.check_deadlines()
+        with self._lock:
+            pending = self._count_pending()
+            return {
+                'processes': self.processes,
+                'max_queue': self.max_queue,
+                'running': min(pending, self.processes),
+                'queue_depth': max(0, pending - self.processes),
+                'submitted': self._counts['submitted'],
+                'rejected': self._counts['rejected'],
+                'completed': self._counts['done'],
+                'failed': self._counts['failed'],
+                'timed_out': self._counts['timed out'],
+            }
+
+    def shutdown(self):
+        """ stop the supervisor thread & the worker processes. (a later submit() or start() starts them again)
+        """
+        with self._lock:
+            self._stopping = True
+            self._pool_changed.notify_all()
+            supervisor = self._supervisor
+        if supervisor is not None:
+            supervisor.join()
+        with self._lock:
+            pools = self._lost_pools + ([self._pool] if self._pool is not None else [])
+            self._pool, self._lost_pools, self._supervisor, self._stopping = None, [], None, False
+        # (outside the lock, as in _supervise)
+        for pool in pools:
+            pool.terminate()
+            pool.join()
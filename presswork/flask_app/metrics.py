@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+""" minimal metrics registry, rendered in the Prometheus text exposition format (so the app can serve `/metrics`).
+
+just enough of the format for what the app measures: counters, histograms, and gauges whose value is read when
+rendered (from a function - i.e. the size of the model store). no client library needed.
+
+    >>> registry = Registry()
+    >>> requests = registry.counter('requests_total', 'Requests handled.', ['endpoint'])
+    >>> requests.inc(endpoint='/api/models')
+    >>> print registry.render().strip()
+    # HELP requests_total Requests handled.
+    # TYPE requests_total counter
+    requests_total{endpoint="/api/models"} 1
+"""
+import bisect
+import collections
+import contextlib
+import threading
+import time
+
+# (seconds) - from quick requests, to training big corpora
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return repr(int(value))
+    return repr(value)
+
+
+def _escape(label_value):
+    return unicode(label_value).replace(u'\\', u'\\\\').replace(u'"', u'\\"').replace(u'\n', u'\\n')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return u''
+    return u'{' + u','.join(u'{}="{}"'.format(name, _escape(value)) for name, value in pairs) + u'}'
+
+
+class _Metric(object):
+    TYPE = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError("{} expects labels {}, got {}".format(self.name, self.labelnames, sorted(labels)))
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self):
+        lines = [u'# HELP {} {}'.format(self.name, self.help_text), u'# TYPE {} {}'.format(self.name, self.TYPE)]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self):
+        raise NotImplementedError()
+
+
+class Counter(_Metric):
+    """ a count that only goes up, per combination of label values
+    """
+    TYPE = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super(Counter, self).__init__(*args, **kwargs)
+        self._values = collections.defaultdict(float)
+
+    def inc(self, amount=1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0)
+
+    def values(self):
+        """ :return: dict of {label values tuple: count}
+        """
+        with self._lock:
+            return dict(self._values)
+
+    def _render_samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [u'{}{} {}'.format(self.name, _format_labels(zip(self.labelnames, key)), _format_value(value))
+                for key, value in items]
+
+
+class Histogram(_Metric):
+    """ counts of observations in cumulative buckets (plus their sum & count), per combination of label values
+    """
+    TYPE = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # label values => [per-bucket counts (not cumulative), sum]
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            counts_and_sum = self._values.setdefault(key, [[0] * len(self.buckets), 0.0])
+            counts_and_sum[0][bisect.bisect_left(self.buckets, value)] += 1
+            counts_and_sum[1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """ observe how long the block takes, in seconds
+        """
+        started_at = time.time()
+        try:
+            yield
+        finally:
+            self.observe(time.time() - started_at, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            counts_and_sum = self._values.get(self._label_values(labels))
+            return sum(counts_and_sum[0]) if counts_and_sum else 0
+
+    def _render_samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            pairs = zip(self.labelnames, key)
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(u'{}_bucket{} {}'.format(
+                        self.name, _format_labels(pairs + [('le', _format_value(upper_bound))]), cumulative))
+            lines.append(u'{}_sum{} {}'.format(self.name, _format_labels(pairs), _format_value(total)))
+            lines.append(u'{}_count{} {}'.format(self.name, _format_labels(pairs), cumulative))
+        return lines
+
+
+class FunctionMetric(_Metric):
+    """ values read from a function when rendered: it returns a number, or a dict of {label values tuple: number}.
+
+    type is 'gauge' by default; use 'counter' for counts kept elsewhere (i.e. in ModelStore.stats)
+    """
+
+    def __init__(self, name, help_text, function, labelnames=(), metric_type='gauge'):
+        super(FunctionMetric, self).__init__(name, help_text, labelnames)
+        self.function = function
+        self.TYPE = metric_type
+
+    def _render_samples(self):
+        values = self.function()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [u'{}{} {}'.format(self.name, _format_labels(zip(self.labelnames, key)), _format_value(value))
+                for key, value in sorted(values.items())]
+
+
+class Registry(object):
+    """ the metrics to render, in the order they were registered
+    """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics = collections.OrderedDict()
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError("metric {!r} is already registered".format(metric.name))
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets=buckets))
+
+    def function(self, name, help_text, function, labelnames=(), metric_type='gauge'):
+        return self._register(FunctionMetric(name, help_text, function, labelnames, metric_type=metric_type))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.itervalues():
+            lines.extend(metric.render())
+        return u'\n'.join(lines) + u'\n'
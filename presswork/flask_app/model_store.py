@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+""" in-memory store of trained TextMakers, so the JSON API can train once & generate many times from a handle.
+
+handles expire after `ttl_seconds` without use (each use pushes the expiry back), and the store holds at most
+`max_models`; beyond that, the least recently used is dropped. (models can be big! this is a cache, not a database.)
+
+    >>> now = [0]
+    >>> store = ModelStore(ttl_seconds=60, clock=lambda: now[0])
+    >>> store.add("handle", "a trained text maker")
+    >>> store.get("handle")
+    'a trained text maker'
+    >>> now[0] += 61
+    >>> import pytest
+    >>> with pytest.raises(KeyError): store.get("handle")
+    >>> sorted(store.stats.items())
+    [('evicted', 0), ('expired', 1), ('hits', 1), ('misses', 1), ('models', 0), ('resident_bytes', 0)]
+"""
+import collections
+import threading
+import time
+
+DEFAULT_TTL_SECONDS = 30 * 60
+DEFAULT_MAX_MODELS = 32
+
+
+class ModelStore(object):
+    """ thread-safe mapping of handle (string) => trained TextMaker, with expiry. see module docstring.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_models=DEFAULT_MAX_MODELS, clock=time.time):
+        self.ttl_seconds = ttl_seconds
+        self.max_models = max_models
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        # handle => (text_maker, expires_at, size_bytes), least recently used first
+        self._entries = collections.OrderedDict()
+        self._counts = collections.Counter()
+
+    def add(self, handle, text_maker, size_bytes=0):
+        """ :param size_bytes: (optional) how much memory the model takes up - just for reporting, in `stats`
+        """
+        with self._lock:
+            self._purge_expired()
+            self._entries.pop(handle, None)
+            self._entries[handle] = (text_maker, self.clock() + self.ttl_seconds, size_bytes)
+            while len(self._entries) > self.max_models:
+                self._entries.popitem(last=False)
+                self._counts['evicted'] += 1
+
+    def get(self, handle):
+        """ :return: the TextMaker for the handle (and pushes back its expiry)
+        :raises KeyError: if no such handle, or if it expired
+        """
+        with self._lock:
+            self._purge_expired()
+            try:
+                text_maker, _, size_bytes = self._entries.pop(handle)
+            except KeyError:
+                self._counts['misses'] += 1
+                raise
+            self._counts['hits'] += 1
+            self._entries[handle] = (text_maker, self.clock() + self.ttl_seconds, size_bytes)
+            return text_maker
+
+    def expires_in(self, handle):
+        """ :return: seconds until the handle expires (unless used again before then)
+        """
+        with self._lock:
+            _, expires_at, _ = self._entries[handle]
+            return max(0, expires_at - self.clock())
+
+    def discard(self, handle):
+        """ :return: True if the handle was in the store
+        """
+        with self._lock:
+            return self._entries.pop(handle, None) is not None
+
+    def _purge_expired(self):
+        # (least recently used come first, so they also expire first)
+        now = self.clock()
+        for handle, (_, expires_at, _) in self._entries.items():
+            if expires_at > now:
+                break
+            del self._entries[handle]
+            self._counts['expired'] += 1
+
+    def __contains__(self, handle):
+        """ (counts as a lookup in `stats`, like get() - but doesn't push back the expiry)
+        """
+        with self._lock:
+            self._purge_expired()
+            found = handle in self._entries
+            self._counts['hits' if found else 'misses'] += 1
+            return found
+
+    def __len__(self):
+        with self._lock:
+            self._purge_expired()
+            return len(self._entries)
+
+    @property
+    def stats(self):
+        """ :return: dict with counts of lookups (`hits`, `misses`), of models dropped (`expired`, or `evicted` to make
+            room), and the `models` held now & their `resident_bytes` (as given to add())
+        """
+        with self._lock:
+            self._purge_expired()
+            return {
+                'hits': self._counts['hits'],
+                'misses': self._counts['misses'],
+                'expired': self._counts['expired'],
+                'evicted': self._counts['evicted'],
+                'models': len(self._entries),
+                'resident_bytes': sum(size_bytes for _, _, size_bytes in self._entries.itervalues()),
+            }
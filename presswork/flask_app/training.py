@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+""" background training, with progress - so a big corpus can be submitted without holding a request open.
+
+unlike the `jobs` module's process pool, training runs on threads in the app's own process: the trained TextMaker has
+to end up in the app's model store, and its Progress has to be readable by the status endpoint while it trains.
+(a training thread holds the GIL much of the time, so other requests slow down while it runs - but they are served.)
+
+    * at most `threads` jobs train at once; up to `max_queue` more wait. beyond that, submit() raises QueueFullError.
+    * each job has a `presswork.text.progress.Progress`, for the work to report to as it goes.
+    * finished jobs are forgotten after `result_ttl_seconds`.
+
+    >>> trainer = BackgroundTrainer(threads=1)
+    >>> job = trainer.submit("model-handle", lambda progress: progress.increment('sentences_tokenized', 3))
+    >>> job.wait(timeout=10)
+    True
+    >>> job.state, job.progress.snapshot()['counts']
+    ('done', {'sentences_tokenized': 3})
+"""
+import Queue
+import collections
+import logging
+import threading
+import time
+import uuid
+
+from presswork.flask_app.jobs import QueueFullError
+from presswork.text.progress import Progress
+
+logger = logging.getLogger("presswork")
+
+DEFAULT_THREADS = 2
+DEFAULT_MAX_QUEUE = 8
+DEFAULT_RESULT_TTL_SECONDS = 10 * 60
+
+
+class TrainingJob(object):
+    """ handle to a submitted training job. `state` is one of 'queued', 'running', 'done', 'failed'
+    """
+
+    def __init__(self, job_id, model_id, function, submitted_at):
+        self.job_id = job_id
+        self.model_id = model_id
+        self.function = function
+        self.submitted_at = submitted_at
+        self.finished_at = None
+        self.state = 'queued'
+        self.error = None
+        self.progress = Progress()
+        self._finished = threading.Event()
+
+    def run(self, clock):
+        self.state = 'running'
+        try:
+            self.function(self.progress)
+        except Exception as e:
+            logger.exception(u'[training] job {} failed'.format(self.job_id))
+            self.error = e
+            self.state = 'failed'
+        else:
+            self.state = 'done'
+        finally:
+            self.progress.finish()
+            self.finished_at = clock()
+            self._finished.set()
+
+    def wait(self, timeout=None):
+        """ :return: True if the job finished (either way) within the timeout
+        """
+        return self._finished.wait(timeout)
+
+
+class BackgroundTrainer(object):
+    """ a few worker threads & a bounded queue of training jobs (see module docstring).
+
+    the threads are started lazily, on the first submit().
+    """
+
+    def __init__(self, threads=DEFAULT_THREADS, max_queue=DEFAULT_MAX_QUEUE,
+                 result_ttl_seconds=DEFAULT_RESULT_TTL_SECONDS, clock=time.time):
+        if threads < 1:
+            raise ValueError("threads must be 1 or more")
+        self.threads = threads
+        self.max_queue = max_queue
+        self.result_ttl_seconds = result_ttl_seconds
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._queue = Queue.Queue()
+        self._workers = []
+        self._jobs = collections.OrderedDict()
+
+    def submit(self, model_id, function):
+        """ :param model_id: the handle that the trained model will be stored under (kept with the job, for pollers)
+        :param function: does the work; called with the job's Progress as its only argument
+        :rtype: TrainingJob
+        :raises QueueFullError: when all threads are busy and the queue is full
+        """
+        with self._lock:
+            self._forget_old_jobs()
+            unfinished = sum(1 for job in self._jobs.itervalues() if job.finished_at is None)
+            if unfinished >= self.threads + self.max_queue:
+                raise QueueFullError("all {} training threads are busy and the queue is full ({} waiting)".format(
+                        self.threads, self.max_queue))
+
+            while len(self._workers) < self.threads:
+                worker = threading.Thread(target=self._work, name='presswork-training-{}'.format(len(self._workers)))
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+
+            job_id = uuid.uuid4().hex
+            job = self._jobs[job_id] = TrainingJob(job_id, model_id, function, submitted_at=self.clock())
+            self._queue.put(job)
+            return job
+
+    def _work(self):
+        while True:
+            self._queue.get().run(self.clock)
+
+    def get_job(self, job_id):
+        """ :raises KeyError: if there's no such job (or it finished long enough ago to be forgotten)
+        """
+        with self._lock:
+            self._forget_old_jobs()
+            return self._jobs[job_id]
+
+    def _forget_old_jobs(self):
+        now = self.clock()
+        for job_id, job in self._jobs.items():
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl_seconds:
+                del self._jobs[job_id]
+
+    @property
+    def stats(self):
+        """ :return: dict with counts of the jobs (not yet forgotten) by state: `queued`, `running`, `done`, `failed`
+        """
+        with self._lock:
+            self._forget_old_jobs()
+            counts = collections.Counter(job.state for job in self._jobs.itervalues())
+            return {state: counts[state] for state in ('queued', 'running', 'done', 'failed')}
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+""" a long-running server that keeps trained text makers in memory, for shell pipelines that generate again & again.
+
+each `presswork` invocation pays for Python startup, importing nltk/markovify/bs4, loading Punkt, then cleaning,
+tokenizing & training - all before it makes a single sentence. `presswork serve --socket PATH` pays that once; then
+clients (see `presswork.client`) send generate requests over the Unix domain socket, and warm requests skip straight
+to making sentences.
+
+protocol: one JSON object per line, each way. requests have the same parameters as the CLI:
+
+    {"input_filename": "/abs/path.txt", "strategy": "markovify", "tokenize": "nltk", "join": "nltk", "count": 10}
+
+(or "input_text" instead of "input_filename".) the response is `{"text": ...}` or `{"error": ...}`.
+a connection can send any number of requests.
+
+trained text makers are kept by a key of their parameters and their input - for files, the path, size & modification
+time; so when a file changes, the next request retrains.
+"""
+import codecs
+import errno
+import hashlib
+import json
+import logging
+import os
+import socket
+import SocketServer
+import stat
+import threading
+
+from presswork import constants
+from presswork.flask_app.model_store import ModelStore
+from presswork.text import clean
+from presswork.text import text_makers
+from presswork.text.grammar import joiners
+
+logger = logging.getLogger("presswork")
+
+DEFAULT_MAX_MODELS = 8
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+
+def _read_input_file(input_filename, input_encoding):
+    if input_encoding == "raw":
+        with open(input_filename, 'r') as f:
+            return f.read()
+    with codecs.open(input_filename, 'r', encoding=input_encoding) as f:
+        return f.read()
+
+
+class SocketInUseError(Exception):
+    """ raised when another server is already listening on the socket path
+    """
+
+
+def _remove_stale_socket(socket_path):
+    """ remove a socket file an earlier server left behind. (if a server still answers on it, it's not stale.)
+    """
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except socket.error as e:
+        if e.errno != errno.ECONNREFUSED:
+            raise
+        os.unlink(socket_path)
+    else:
+        raise SocketInUseError(u"a server is already listening on {}".format(socket_path))
+    finally:
+        probe.close()
+
+
+class _RequestHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        for line in iter(self.rfile.readline, ''):
+            try:
+                response = {'text': self.server.generate(json.loads(line))}
+            except Exception as e:
+                logger.exception(u'[server] request failed')
+                response = {'error': u'{}: {}'.format(type(e).__name__, e)}
+            self.wfile.write(json.dumps(response) + '\n')
+            self.wfile.flush()
+
+
+class TextMakerServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    """ serves generate requests on a Unix domain socket, keeping trained text makers resident (see module docstring)
+
+    each connection gets a thread. training is done one model at a time (so that concurrent requests for the same
+    input don't train it twice); generating from trained models isn't serialized.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, max_models=DEFAULT_MAX_MODELS, ttl_seconds=DEFAULT_TTL_SECONDS):
+        """
+        :param socket_path: where to create the socket. (a stale socket file from an earlier server is replaced; if
+            a server is still listening on it, raises SocketInUseError.)
+        :param max_models: how many trained text makers to keep; beyond that, the least recently used is dropped
+        :param ttl_seconds: trained text makers are dropped after this long without use
+        """
+        if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            _remove_stale_socket(socket_path)
+        self.socket_path = socket_path
+        self.models = ModelStore(ttl_seconds=ttl_seconds, max_models=max_models)
+        self._training_lock = threading.Lock()
+        SocketServer.UnixStreamServer.__init__(self, socket_path, _RequestHandler)
+
+    def generate(self, request):
+        """ :param request: dict of parameters (see module docstring)
+        :return: the generated text
+        """
+        count = int(request.get('count', 100))
+        text_maker = self.text_maker_for(request)
+        joiner = joiners.create_joiner(request.get('join', 'nltk'))
+        return text_maker.proofread(joiner.join(text_maker.make_sentences(count)))
+
+    def text_maker_for(self, request):
+        """ the trained text maker for the request's input & parameters - from memory, or trained now
+        """
+        strategy = request.get('strategy', text_makers.DEFAULT_TEXT_MAKER_NICKNAME)
+        tokenize = request.get('tokenize', 'nltk')
+        ngram_size = int(request.get('ngram_size', constants.DEFAULT_NGRAM_SIZE))
+        input_encoding = request.get('input_encoding', 'utf-8')
+
+        key = hashlib.sha1(json.dumps([strategy, tokenize, ngram_size]))
+        if request.get('input_filename'):
+            input_filename = os.path.abspath(request['input_filename'])
+            stat = os.stat(input_filename)
+            key.update(json.dumps([input_filename, stat.st_size, stat.st_mtime, input_encoding]))
+            load_input_text = lambda: _read_input_file(input_filename, input_encoding)
+        else:
+            input_text = request['input_text']
+            key.update(input_text.encode('utf-8'))
+            load_input_text = lambda: input_text
+        key = key.hexdigest()
+
+        try:
+            return self.models.get(key)
+        except KeyError:
+            pass
+
+        with self._training_lock:
+            if key in self.models:
+                return self.models.get(key)
+            logger.info(u'[server] training {} model (tokenize={}, ngram_size={})'.format(
+                    strategy, tokenize, ngram_size))
+            text_maker = text_makers.create_text_maker(
+                    strategy=strategy,
+                    sentence_tokenizer=tokenize,
+                    input_text=clean.CleanInputString(load_input_text()),
+                    ngram_size=ngram_size)
+            self.models.add(key, text_maker)
+            return text_maker
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
@@ -85,6 +85,15 @@ class CleanInputString(UserString):
             s = self._clean(s)
             self.data = s
 
+    @classmethod
+    def from_cleaned(cls, text):
+        """ wrap text that is already known to be clean (i.e. it was cleaned earlier & cached), skipping the cleaners
+
+            >>> CleanInputString.from_cleaned(u"hi").data
+            u'hi'
+        """
+        return cls(text, cleaner_functions=(lambda s: s,))
+
     def _clean(self, text):
         for clean in self.cleaner_functions:
             text = clean(text)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+""" read a corpus that is a directory of text files (i.e. thousands of them) - rather than one big file or stdin.
+
+each file is cleaned & tokenized on its own, and the sentences of all the files are merged for training. that way,
+with a cache (see `pipeline_cache.PipelineCache.text_maker_for_directory()`), a rerun only tokenizes the files that
+are new or modified since the last run.
+
+files are read in parallel, by a few threads (reading is mostly waiting on disk; tokenizing is not, so it stays on
+the calling thread, overlapping the reads.)
+
+    >>> import os, tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> for name, text in [('a.txt', u"Simple is better than complex."), ('b.txt', u"Flat is better than nested.")]:
+    ...     with open(os.path.join(directory, name), 'w') as f:
+    ...         f.write(text)
+    >>> tokenize_directory(directory, 'utf-8', 'just_whitespace')
+    [[u'Simple', u'is', u'better', u'than', u'complex.'], [u'Flat', u'is', u'better', u'than', u'nested.']]
+"""
+import os
+from multiprocessing.pool import ThreadPool
+
+from presswork.text import clean
+from presswork.text.grammar import tokenizers
+
+DEFAULT_READ_THREADS = 4
+
+
+def list_files(directory):
+    """ :return: sorted absolute paths of the files in the directory & its subdirectories, skipping hidden ones
+    """
+    paths = []
+    for dir_path, dir_names, file_names in os.walk(os.path.abspath(directory)):
+        dir_names[:] = [name for name in dir_names if not name.startswith('.')]
+        paths.extend(os.path.join(dir_path, name) for name in file_names if not name.startswith('.'))
+    return sorted(paths)
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return path, f.read()
+
+
+def read_files(paths, threads=DEFAULT_READ_THREADS):
+    """ read files in parallel.
+
+    :return: iterator of (path, bytes), in the order of `paths`. only a few files ahead of the caller are read
+    """
+    pool = ThreadPool(threads)
+    try:
+        for path_and_bytes in pool.imap(_read_file, paths):
+            yield path_and_bytes
+    finally:
+        pool.terminate()
+
+
+def tokenize_bytes(input_bytes, input_encoding, sentence_tokenizer):
+    """ clean & tokenize one file's contents
+
+    :param sentence_tokenizer: a sentence tokenizer, or its nickname
+    :return: the sentences, as plain lists of lists (which pickle & merge cheaply)
+    """
+    if isinstance(sentence_tokenizer, basestring):
+        sentence_tokenizer = tokenizers.create_sentence_tokenizer(sentence_tokenizer)
+    input_text = input_bytes if input_encoding == "raw" else input_bytes.decode(input_encoding)
+    return sentence_tokenizer.tokenize(clean.CleanInputString(input_text)).unwrap()
+
+
+def tokenize_directory(directory, input_encoding, sentence_tokenizer, threads=DEFAULT_READ_THREADS):
+    """ :return: sentences of all the files in the directory (tokenized one file at a time), as plain lists of lists
+    """
+    if isinstance(sentence_tokenizer, basestring):
+        sentence_tokenizer = tokenizers.create_sentence_tokenizer(sentence_tokenizer)
+    sentences_as_word_lists = []
+    for _, input_bytes in read_files(list_files(directory), threads=threads):
+        sentences_as_word_lists.extend(tokenize_bytes(input_bytes, input_encoding, sentence_tokenizer))
+    return sentences_as_word_lists
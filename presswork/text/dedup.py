@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+""" drop repeated sentences before they're word-tokenized: exact duplicates, or near duplicates (by MinHash)
+
+Found text repeats itself - boilerplate, headers, the same line in every post of a feed. Each repeat gets tokenized &
+counted again, for nothing new. A deduplicator sits between splitting text into sentence strings and tokenizing each
+one into words (see `BaseSentenceTokenizer.tokenize`), and only tokenizes sentences it hasn't seen yet.
+
+    >>> from presswork.text.grammar.tokenizers import WordTokenizerWhitespace
+    >>> deduplicator = ExactDeduplicator()
+    >>> deduplicator.tokenize([u"Hi there.", u"Hi  there. ", u"Bye."], WordTokenizerWhitespace())
+    [[u'Hi', u'there.'], [u'Bye.']]
+    >>> deduplicator.report
+    DedupReport(sentences=3, unique_sentences=2, exact_duplicates=1, near_duplicates=0)
+    >>> round(deduplicator.report.reduction_ratio, 2)
+    0.33
+
+with keep_weights=True, each duplicate is kept - as the same tokenized sentence as the first one, tokenized once. so
+the model trained on them is the same (for exact duplicates), but the tokenizing is only done once per sentence:
+
+    >>> deduplicator = ExactDeduplicator(keep_weights=True)
+    >>> deduplicator.tokenize([u"Hi there.", u"Hi  there. ", u"Bye."], WordTokenizerWhitespace())
+    [[u'Hi', u'there.'], [u'Hi', u'there.'], [u'Bye.']]
+
+'exact' compares sentences with their whitespace normalized. 'near' also drops sentences that are only *mostly* the same
+as one seen before (a date or a name changed...): it estimates the Jaccard similarity of their word pairs with MinHash
+signatures, and looks for candidates with locality-sensitive hashing, so each sentence is only compared with a few.
+(see MinHashDeduplicator.) near duplicates are replaced by the first one, so that does change the model.
+"""
+import collections
+import hashlib
+import random
+from array import array
+from itertools import izip
+
+from presswork.text.progress import NO_PROGRESS
+
+DEDUP_MODES = ('exact', 'near')
+
+# bytes of a normalized sentence's SHA-1 that identify it (a collision, dropping a sentence, is vanishingly unlikely)
+DIGEST_BYTES = 16
+
+
+class DedupReport(collections.namedtuple('DedupReport', [
+    'sentences',
+    'unique_sentences',
+    'exact_duplicates',
+    'near_duplicates',
+])):
+    __slots__ = ()
+
+    @property
+    def reduction_ratio(self):
+        """ the share of sentences that didn't have to be tokenized
+        """
+        if not self.sentences:
+            return 0.0
+        return (self.exact_duplicates + self.near_duplicates) / float(self.sentences)
+
+
+class ExactDeduplicator(object):
+    """ tokenizes each distinct sentence once; sentences that only differ by whitespace are the same
+    """
+
+    def __init__(self, keep_weights=False):
+        """
+        :param keep_weights: keep each duplicate (as the first one's tokenized sentence) rather than dropping it: so
+            the sentences still count as many times, but are only tokenized once
+        """
+        self.keep_weights = keep_weights
+        # {digest of normalized sentence: its tokenized sentence}. kept across calls, so a stream can be deduplicated in
+        # blocks. (by digest, not the sentence itself: a long stream's distinct sentences would add up)
+        self._tokenized = {}
+        self._counts = collections.Counter()
+
+    def tokenize(self, sentence_strings, word_tokenizer, progress=NO_PROGRESS):
+        """ :return: list of the tokenized sentences, without duplicates (or with, see keep_weights)
+        """
+        sentences = []
+        for sentence in sentence_strings:
+            self._counts['sentences'] += 1
+            normalized = u" ".join(sentence.split())
+            digest = hashlib.sha1(normalized.encode('utf-8')).digest()[:DIGEST_BYTES]
+            tokenized = self._tokenized.get(digest)
+            if tokenized is None:
+                tokenized = self._find_near_duplicate(normalized)
+                if tokenized is None:
+                    tokenized = word_tokenizer.tokenize(sentence)
+                    self._add(digest, tokenized)
+                    progress.increment('sentences_tokenized')
+                    sentences.append(tokenized)
+                    continue
+                self._counts['near_duplicates'] += 1
+            else:
+                self._counts['exact_duplicates'] += 1
+
+            if self.keep_weights:
+                sentences.append(tokenized)
+        return sentences
+
+    def _find_near_duplicate(self, normalized):
+        """ :return: the tokenized sentence this one is a near duplicate of; or None
+        """
+        return None
+
+    def _add(self, digest, tokenized):
+        self._tokenized[digest] = tokenized
+
+    @property
+    def report(self):
+        return DedupReport(
+                sentences=self._counts['sentences'],
+                unique_sentences=self._counts['sentences'] - self._counts['exact_duplicates'] -
+                self._counts['near_duplicates'],
+                exact_duplicates=self._counts['exact_duplicates'],
+                near_duplicates=self._counts['near_duplicates'])
+
+
+class MinHashDeduplicator(ExactDeduplicator):
+    """ like ExactDeduplicator, plus near duplicates: sentences whose word pairs are mostly the same as a sentence's
+    seen before (estimated Jaccard similarity >= threshold).
+
+        >>> from presswork.text.grammar.tokenizers import WordTokenizerWhitespace
+        >>> deduplicator = MinHashDeduplicator(threshold=0.6)
+        >>> notice = u"the weekly meeting of the board is on {} at the old town hall, and all residents are welcome"
+        >>> deduplicator.tokenize([notice.format(u"monday"), notice.format(u"friday"), u"something else entirely"],
+        ...                       WordTokenizerWhitespace())[1]
+        [u'something', u'else', u'entirely']
+        >>> deduplicator.report.near_duplicates
+        1
+
+    each sentence's signature is, for each of `num_perm` random 64-bit masks, the least (hash of a word pair XOR mask).
+    two sentences agree at any one position with probability ~ their Jaccard similarity. the signature is cut into
+    `bands` bands; sentences that agree on a whole band are candidates, and only those are compared in full.
+    (with the defaults, 16 bands of 4: sentences ~50% similar are already likely to be compared.)
+
+    case is ignored. single-word sentences are only ever exact duplicates.
+    """
+
+    def __init__(self, keep_weights=False, threshold=0.8, num_perm=64, bands=16, seed=0):
+        """
+        :param threshold: estimated Jaccard similarity (of the sentences' word pairs) from which sentences are near
+            duplicates
+        :param num_perm: size of the MinHash signatures: more is more accurate, & slower
+        :param bands: locality-sensitive hashing bands (num_perm must be a multiple). more bands finds less similar
+            candidates - more comparisons, fewer near duplicates missed
+        """
+        super(MinHashDeduplicator, self).__init__(keep_weights=keep_weights)
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.rows_per_band = num_perm // bands
+        rng = random.Random(seed)
+        # (signed, like the hashes: so hash ^ mask is a 64-bit C long, and signatures fit in an array)
+        self._masks = [rng.getrandbits(64) - 2 ** 63 for _ in xrange(num_perm)]
+        # {(band #, hash of the band): # of the first signature with that band}
+        self._buckets = {}
+        self._signatures = []
+        self._tokenized_by_signature = []
+        # (the signature of the sentence last looked up: if it's new, it's added with that signature)
+        self._last_signature = None
+
+    def _find_near_duplicate(self, normalized):
+        words = normalized.lower().split()
+        if len(words) < 2:
+            self._last_signature = None
+            return None
+        hashes = {hash(pair) for pair in izip(words, words[1:])}
+        signature = self._last_signature = array('l', [min([h ^ mask for h in hashes]) for mask in self._masks])
+
+        rows = self.rows_per_band
+        compared = set()
+        for band in xrange(len(signature) // rows):
+            candidate = self._buckets.get((band, hash(tuple(signature[band * rows:(band + 1) * rows]))))
+            if candidate is None or candidate in compared:
+                continue
+            compared.add(candidate)
+            agreement = sum(1 for a, b in izip(signature, self._signatures[candidate]) if a == b)
+            if agreement >= self.threshold * len(signature):
+                return self._tokenized_by_signature[candidate]
+        return None
+
+    def _add(self, digest, tokenized):
+        super(MinHashDeduplicator, self)._add(digest, tokenized)
+        signature = self._last_signature
+        if signature is None:
+            return
+        number = len(self._signatures)
+        self._signatures.append(signature)
+        self._tokenized_by_signature.append(tokenized)
+        rows = self.rows_per_band
+        for band in xrange(len(signature) // rows):
+            self._buckets.setdefault((band, hash(tuple(signature[band * rows:(band + 1) * rows]))), number)
+
+
+def create_deduplicator(mode, keep_weights=False):
+    """ :param mode: 'exact' or 'near' (see DEDUP_MODES)
+    """
+    if mode == 'exact':
+        return ExactDeduplicator(keep_weights=keep_weights)
+    elif mode == 'near':
+        return MinHashDeduplicator(keep_weights=keep_weights)
+    raise ValueError("dedup mode must be one of {}, not {!r}".format(DEDUP_MODES, mode))
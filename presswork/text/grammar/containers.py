@@ -32,10 +32,13 @@ class SentencesAsWordLists(UserList):
         [['ok', 'here', 'are'], ['lists', 'of', 'words']]
         >>> C = SentencesAsWordLists
         >>> assert C.ensure(C.ensure(C.ensure(C.ensure((list_of_lists_of_strings))))) == list_of_lists_of_strings
+
+    from a sentence tokenizer, it references the tokenizer's `Vocabulary` (see `vocabulary` module), if it has one.
     """
 
-    def __init__(self, seq):
+    def __init__(self, seq, vocabulary=None):
         super(SentencesAsWordLists, self).__init__(seq)
+        self.vocabulary = vocabulary
         self.sanity_check()
 
     @classmethod
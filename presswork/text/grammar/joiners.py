@@ -273,3 +273,12 @@ JOINER_NICKNAMES = joiner_classes_by_nickname.keys()
 
 def create_joiner(nickname):
     return joiner_classes_by_nickname[nickname]()
+
+
+def nickname_of(joiner):
+    """ reverse of create_joiner(): the nickname of this joiner's class, or None if it has none
+    """
+    for nickname, klass in joiner_classes_by_nickname.iteritems():
+        if type(joiner) is klass:
+            return nickname
+    return None
@@ -13,6 +13,11 @@ design notes -- SentenceTokenizers, WordTokenizers
         here I want to keep sentence and word tokenizations separate. defer flattening until last step when
         you are de-tokenizing/rejoining. then one can still iterate and filter over the list structures
         in various different ways, before re-joining to text (which is really a 'display' or 'frontend' concern).
+    * Found text repeats itself (boilerplate, short common lines...), so each SentenceTokenizer keeps a bounded memo of
+        the word tokenizations it did - see WordTokenizationMemo.
+    * each SentenceTokenizer also has a Vocabulary, which interns every token it makes (so equal tokens are one string
+        object, from the tokenizer through to the model), and gives each a stable integer ID - see `vocabulary` module.
+        once trained, only a model that stores word IDs needs it; text makers drop it otherwise (see `_lock`).
 
 """
 import logging
@@ -23,9 +28,88 @@ from nltk.tokenize.casual import TweetTokenizer
 
 from presswork.text import clean
 from presswork.text.grammar.containers import SentencesAsWordLists, WordList
+from presswork.text.grammar.vocabulary import Vocabulary
+from presswork.text.progress import NO_PROGRESS
 
 logger = logging.getLogger('presswork')
 
+# how many sentence strings' word tokenizations a sentence tokenizer remembers (at most)
+DEFAULT_MEMO_SIZE = 2 ** 16
+
+
+class WordTokenizationMemo(object):
+    """ bounded memo of word tokenizations, `{sentence string: tokenized sentence}`, with the tokens interned (in its
+    `vocabulary`, usually the sentence tokenizer's, if it has one)
+
+        >>> memo = WordTokenizationMemo(max_size=4, vocabulary=Vocabulary())
+        >>> first = memo.tokenize(u"foo bar foo", WordTokenizerWhitespace())
+        >>> first
+        [u'foo', u'bar', u'foo']
+        >>> first[0] is first[2]
+        True
+        >>> memo.tokenize(u"foo bar foo", WordTokenizerWhitespace()) is first
+        True
+        >>> memo.hits, memo.misses, memo.hit_rate
+        (1, 1, 0.5)
+
+    a repeated sentence costs one lookup instead of a word tokenizing (with WordTokenizerNLTK, that's cleaning & regexes
+    each time), and all its repeats share one tokenized sentence.
+
+    it's bounded by keeping two generations: sentences go in the newer one; when that's full (max_size / 2), it
+    becomes the older one, and the last older one is dropped. sentences found in the older one move up to the newer.
+    (so it's close to least-recently-used, with just dict lookups.)
+
+    tokenized sentences are shared, so they must not be modified. (nothing here does.)
+    """
+
+    def __init__(self, max_size=DEFAULT_MEMO_SIZE, vocabulary=None):
+        """
+        :param vocabulary: (optional) the `Vocabulary` to intern tokens in. (by default, tokens aren't interned)
+        """
+        self.max_size = max_size
+        self.vocabulary = vocabulary
+        self._newer = {}
+        self._older = {}
+        self.hits = 0
+        self.misses = 0
+
+    def tokenize(self, sentence, word_tokenizer):
+        """ :return: the word tokenization of this sentence string - remembered, or from word_tokenizer.tokenize()
+        """
+        tokenized = self._newer.get(sentence)
+        if tokenized is not None:
+            self.hits += 1
+            return tokenized
+
+        tokenized = self._older.get(sentence)
+        if tokenized is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            tokenized = word_tokenizer.tokenize(sentence)
+            if self.vocabulary is not None:
+                self.vocabulary.intern_words(tokenized)
+
+        if len(self._newer) >= self.max_size // 2:
+            self._older = self._newer
+            self._newer = {}
+        self._newer[sentence] = tokenized
+        return tokenized
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / float(lookups) if lookups else 0.0
+
+    def clear(self):
+        """ forget the tokenizations (the hit & miss counts are kept; and the vocabulary, whose IDs may be in use)
+        """
+        self._newer = {}
+        self._older = {}
+
+    def __len__(self):
+        return len(self._newer) + len(self._older)
+
 
 class BaseWordTokenizer(object):
     """ base class for word tokenizer(s). (basic word-tokenizing ~= "splitting", but nuanced strategies exist too)
@@ -51,15 +135,43 @@ class BaseSentenceTokenizer(object):
 
     def __init__(self, word_tokenizer):
         self._word_tokenizer = None
+        # (set this to None to turn memoizing off, or to a WordTokenizationMemo of another size)
+        self.memo = WordTokenizationMemo()
+        self._vocabulary = None
+        self.vocabulary = Vocabulary()
         self.word_tokenizer = word_tokenizer
         self.strategy = None
 
-    def tokenize(self, text):
+    def tokenize(self, text, progress=NO_PROGRESS, deduplicator=None):
         """ take string/unicode, tokenize into list-of-lists: [ [word, word, ...], [word, word, ...], ... ]
-        :rtype: presswork.text.grammar.containers.SentencesAsWordLists
+
+        :param progress: (optional) a `presswork.text.progress.Progress`, to count 'sentences_tokenized' as it goes
+        :param deduplicator: (optional) a deduplicator from the `dedup` module: then only sentences it hasn't seen yet
+            are word-tokenized (its `report` says how many)
+        :rtype: presswork.text.grammar.containers.SentencesAsWordLists (referencing this tokenizer's vocabulary)
         """
-        sentences = [self.word_tokenizer.tokenize(sentence) for sentence in self._tokenize_to_sentence_strings(text)]
-        return SentencesAsWordLists(sentences)
+        vocabulary = self.vocabulary
+        if deduplicator is not None:
+            sentences = deduplicator.tokenize(
+                    self._tokenize_to_sentence_strings(text), self.word_tokenizer, progress=progress)
+            if vocabulary is not None:
+                # (kept duplicates are the same list as the first one: each list only has to be interned once)
+                for sentence in {id(sentence): sentence for sentence in sentences}.itervalues():
+                    vocabulary.intern_words(sentence)
+            return SentencesAsWordLists(sentences, vocabulary=vocabulary)
+
+        sentences = []
+        memo = self.memo
+        for sentence in self._tokenize_to_sentence_strings(text):
+            if memo is None:
+                tokenized = self.word_tokenizer.tokenize(sentence)
+                if vocabulary is not None:
+                    vocabulary.intern_words(tokenized)
+                sentences.append(tokenized)
+            else:
+                sentences.append(memo.tokenize(sentence, self.word_tokenizer))
+            progress.increment('sentences_tokenized')
+        return SentencesAsWordLists(sentences, vocabulary=vocabulary)
 
     def _tokenize_to_sentence_strings(self, text):
         """ take string/unicode, tokenize into sentence-strings, return list of strings where each is a 'sentence'
@@ -69,6 +181,19 @@ class BaseSentenceTokenizer(object):
         """
         raise NotImplementedError()
 
+    @property
+    def vocabulary(self):
+        """ the `Vocabulary` every token this tokenizer makes is interned in (see `vocabulary` module); shared with its
+        memo. set it to None to stop interning.
+        """
+        return self._vocabulary
+
+    @vocabulary.setter
+    def vocabulary(self, vocabulary):
+        self._vocabulary = vocabulary
+        if self.memo is not None:
+            self.memo.vocabulary = vocabulary
+
     @property
     def word_tokenizer(self):
         """
@@ -82,6 +207,24 @@ class BaseSentenceTokenizer(object):
     @word_tokenizer.setter
     def word_tokenizer(self, word_tokenizer):
         self._word_tokenizer = word_tokenizer
+        # (what's remembered was tokenized by the last word tokenizer)
+        if self.memo is not None:
+            self.memo.clear()
+
+    def __getstate__(self):
+        """ for pickling (i.e. with a text maker, see `model_files`): the memo is only for tokenizing, so its contents
+        aren't kept
+        """
+        state = self.__dict__.copy()
+        if self.memo is not None:
+            state['memo'] = WordTokenizationMemo(max_size=self.memo.max_size, vocabulary=self.memo.vocabulary)
+        return state
+
+    def __setstate__(self, state):
+        # (tokenizers pickled before the memo & vocabulary existed don't have them)
+        state.setdefault('_vocabulary', state.pop('vocabulary', Vocabulary()))
+        state.setdefault('memo', WordTokenizationMemo(vocabulary=state['_vocabulary']))
+        self.__dict__.update(state)
 
     def __repr__(self):
         return "{}(word_tokenizer={!r})".format(self.__class__.__name__, self.word_tokenizer)
@@ -211,3 +354,12 @@ TOKENIZER_NICKNAMES = tokenizer_classes_by_nickname.keys()
 
 def create_sentence_tokenizer(nickname):
     return tokenizer_classes_by_nickname[nickname]()
+
+
+def nickname_of(sentence_tokenizer):
+    """ reverse of create_sentence_tokenizer(): the nickname of this tokenizer's class, or None if it has none
+    """
+    for nickname, klass in tokenizer_classes_by_nickname.iteritems():
+        if type(sentence_tokenizer) is klass:
+            return nickname
+    return None
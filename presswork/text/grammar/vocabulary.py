@@ -0,0 +1,113 @@
+""" Vocabulary - every distinct token once, with a stable integer ID
+
+    >>> vocabulary = Vocabulary()
+    >>> vocabulary.encode([u"the", u"cat", u"the"])
+    array('i', [0, 1, 0])
+    >>> vocabulary.decode([1, 0])
+    [u'cat', u'the']
+    >>> vocabulary.id(u"dog"), vocabulary.get_id(u"never seen"), len(vocabulary)
+    (2, None, 3)
+
+-------------------------------------------------------------------------------
+design notes -- Vocabulary
+===============================================================================
+
+    * tokens pass from the tokenizer, to the model (keys, successors), to generated sentences. without interning,
+        each stage can hold its own copy of the same string. a sentence tokenizer has one Vocabulary, and interns
+        every token it makes through it; SentencesAsWordLists from that tokenizer reference it (`.vocabulary`).
+    * interned, equal tokens are one string object: a list of words is then just pointers to the shared strings.
+    * where a model stores words as IDs instead (i.e. _crude_markov.HashedKeysModel, in arrays of C ints), a word costs
+        only the size of an integer. it resolves IDs back to strings when it yields a sentence.
+    * the `{token: ID}` table costs about as much as the tokens themselves, and only models of IDs need it once they're
+        trained: other text makers drop the tokenizer's vocabulary when they're locked (their words stay interned).
+    * IDs are never reassigned, so a vocabulary is only ever added to (and is pickled along with what uses it).
+"""
+from array import array
+
+
+class Vocabulary(object):
+    """ interns tokens, and assigns each distinct token an integer ID (0, 1, 2... in order of first appearance)
+    """
+
+    def __init__(self, tokens=()):
+        """
+        :param tokens: (optional) tokens to add up front, in ID order
+        """
+        # {token: ID}, and the tokens by ID. the tokens in the list are the interned ones
+        self._ids = {}
+        self._tokens = []
+        for token in tokens:
+            self.id(token)
+
+    def id(self, token):
+        """ :return: the token's ID (a new token gets the next one)
+        """
+        token_id = self._ids.get(token)
+        if token_id is None:
+            token_id = self._ids[token] = len(self._tokens)
+            self._tokens.append(token)
+        return token_id
+
+    def get_id(self, token):
+        """ :return: the token's ID, or None if it's not in the vocabulary
+        """
+        return self._ids.get(token)
+
+    def token(self, token_id):
+        """ :return: the (interned) token with this ID
+        """
+        return self._tokens[token_id]
+
+    def intern(self, token):
+        """ :return: the interned token equal to this one (adding it if it's new)
+        """
+        return self._tokens[self.id(token)]
+
+    def intern_words(self, words):
+        """ replace each word in this list (or WordList) with the interned one, in place. (adds the new words.)
+
+            >>> vocabulary = Vocabulary()
+            >>> first, second = [u"a", u"cat"], [u"a", u"dog"]
+            >>> vocabulary.intern_words(first); vocabulary.intern_words(second)
+            >>> first[0] is second[0]
+            True
+        """
+        # (a WordList's own list is used directly: iterating the UserList itself is much slower)
+        words = getattr(words, 'data', words)
+        words[:] = map(self._tokens.__getitem__, self._token_ids(words))
+
+    def encode(self, words):
+        """ :return: the words' IDs, as an array of C ints (adds the new words)
+        """
+        return array('i', self._token_ids(getattr(words, 'data', words)))
+
+    def decode(self, token_ids):
+        """ :return: list of the tokens with these IDs
+        """
+        return map(self._tokens.__getitem__, token_ids)
+
+    def _token_ids(self, words):
+        token_ids = map(self._ids.get, words)
+        if None in token_ids:
+            token_ids = map(self.id, words)
+        return token_ids
+
+    def __getstate__(self):
+        # (the IDs are just the tokens' positions, so only the tokens are pickled)
+        return {'tokens': self._tokens}
+
+    def __setstate__(self, state):
+        self._tokens = state['tokens']
+        self._ids = {token: token_id for token_id, token in enumerate(self._tokens)}
+
+    def __contains__(self, token):
+        return token in self._ids
+
+    def __iter__(self):
+        return iter(self._tokens)
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def __repr__(self):
+        return "Vocabulary(<{} tokens>)".format(len(self._tokens))
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+""" stream compressed input files (gzip, bz2, xz): decompress, decode & tokenize a block at a time.
+
+archived corpora are often compressed. rather than `zcat corpus.txt.gz | presswork`, the CLI can read them directly.
+the uncompressed text is never held in memory all at once - only a block (~1MB) of it at a time, plus the tokenized
+sentences (which training needs anyway).
+
+blocks end at a paragraph break (blank line) where possible, so that sentence tokenizers see whole sentences;
+if there's no paragraph break for a while, at a line break. (a sentence that spans lines, with no blank lines anywhere
+near it, could be split in two there; the input would have to be unusual for it to matter.)
+
+    >>> import gzip, os, tempfile
+    >>> file_path = os.path.join(tempfile.mkdtemp(), "zen.txt.gz")
+    >>> with gzip.open(file_path, 'wb') as f:
+    ...     _ = f.write(u"Simple is better than c\\xf8mplex.\\n\\nFlat is better than nested.\\n".encode('utf-8'))
+    >>> detect_compression(file_path)
+    'gzip'
+    >>> for block in iter_text_blocks(open_decompressed(file_path), 'utf-8', block_size=16):
+    ...     print repr(block)
+    u'Simple is better than c\\xf8mplex.\\n\\n'
+    u'Flat is better than nested.\\n'
+    >>> tokenize_file(file_path, 'utf-8', 'just_whitespace')
+    [[u'Simple', u'is', u'better', u'than', u'c\\xf8mplex.'], [], [u'Flat', u'is', u'better', u'than', u'nested.']]
+
+.xz needs the `backports.lzma` package (Python 2 has no lzma module): `pip install presswork[xz]`.
+"""
+import bz2
+import codecs
+import gzip
+import hashlib
+import re
+
+from presswork.text import clean
+from presswork.text.grammar import tokenizers
+
+try:
+    from backports import lzma
+except ImportError:  # pragma: no cover
+    lzma = None
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+# without a paragraph break in this many blocks, break at a line instead
+MAX_BLOCKS_WITHOUT_PARAGRAPH_BREAK = 4
+
+# (compression, magic bytes at the start of the file)
+_MAGIC_NUMBERS = (
+    ('gzip', b'\x1f\x8b'),
+    ('bz2', b'BZh'),
+    ('xz', b'\xfd7zXZ\x00'),
+)
+
+_re_paragraph_break = re.compile(r'\n[ \t\r]*\n')
+
+
+def detect_compression(file_path):
+    """ :return: 'gzip', 'bz2' or 'xz' - by the file's magic number, not its name - or None if it's not compressed
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(max(len(magic) for _, magic in _MAGIC_NUMBERS))
+    for compression, magic in _MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_decompressed(file_path, compression=None):
+    """ :return: file-like object that reads the decompressed bytes, as they are needed
+    :param compression: (optional) if not given, it's detected
+    """
+    compression = compression or detect_compression(file_path)
+    if compression == 'gzip':
+        return gzip.GzipFile(file_path, 'rb')
+    elif compression == 'bz2':
+        return bz2.BZ2File(file_path, 'rb')
+    elif compression == 'xz':
+        if lzma is None:
+            raise ValueError("reading .xz files needs the backports.lzma package (pip install presswork[xz])")
+        return lzma.LZMAFile(file_path, 'rb')
+    elif compression is None:
+        return open(file_path, 'rb')
+    raise ValueError("unknown compression {!r}".format(compression))
+
+
+def hash_file(file_path, block_size=DEFAULT_BLOCK_SIZE):
+    """ :return: sha1 hex digest of the file's (compressed) bytes, read a block at a time
+    """
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for data in iter(lambda: f.read(block_size), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def _last_break(text, paragraphs_only):
+    """ :return: index just after the last paragraph break (or line break) in the text, or -1 if none
+    """
+    last_match = None
+    for last_match in _re_paragraph_break.finditer(text):
+        pass
+    if last_match:
+        return last_match.end()
+    if not paragraphs_only:
+        return text.rfind(u'\n' if isinstance(text, unicode) else b'\n') + 1 or -1
+    return -1
+
+
+def iter_text_blocks(binary_file, input_encoding, block_size=DEFAULT_BLOCK_SIZE):
+    """ read & decode the file a block at a time, yielding text that ends at paragraph (or line) breaks
+
+    :param input_encoding: decoded incrementally, so multi-byte characters can span reads. or 'raw': yield bytes
+        (the cleaners will decode them, like they do for raw input that isn't compressed)
+    """
+    decoder = None if input_encoding == "raw" else codecs.getincrementaldecoder(input_encoding)()
+    pending = b'' if decoder is None else u''
+    blocks_without_paragraph_break = 0
+    while True:
+        data = binary_file.read(block_size)
+        pending += data if decoder is None else decoder.decode(data, final=not data)
+        if not data:
+            break
+
+        cut = _last_break(pending, paragraphs_only=blocks_without_paragraph_break < MAX_BLOCKS_WITHOUT_PARAGRAPH_BREAK)
+        if cut == -1:
+            blocks_without_paragraph_break += 1
+            continue
+        blocks_without_paragraph_break = 0
+        yield pending[:cut]
+        pending = pending[cut:]
+
+    if pending:
+        yield pending
+
+
+def tokenize_file(file_path, input_encoding, sentence_tokenizer, block_size=DEFAULT_BLOCK_SIZE):
+    """ decompress (if need be), decode, clean & tokenize the file - a block at a time
+
+    :param sentence_tokenizer: a sentence tokenizer, or its nickname
+    :return: the sentences, as plain lists of lists
+    """
+    if isinstance(sentence_tokenizer, basestring):
+        sentence_tokenizer = tokenizers.create_sentence_tokenizer(sentence_tokenizer)
+    sentences_as_word_lists = []
+    binary_file = open_decompressed(file_path)
+    try:
+        for block in iter_text_blocks(binary_file, input_encoding, block_size=block_size):
+            sentences_as_word_lists.extend(sentence_tokenizer.tokenize(clean.CleanInputString(block)).unwrap())
+    finally:
+        binary_file.close()
+    return sentences_as_word_lists
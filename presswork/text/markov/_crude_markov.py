@@ -22,12 +22,20 @@ Why it's kept around:
     'Markov Chain Text Generator' impl. It is defiinitely narrowed to the domain.
     * this whole repository is just for fun, this file included :)
 
+Optionally (hashed_keys=True), the model is keyed by 64-bit rolling hashes of n-grams instead of n-gram tuples: see
+`HashedKeysModel`. Same generated text, smaller model (int keys rather than a tuple per n-gram, and word IDs rather
+than words).
 """
+import collections
 import logging
 import pprint
 import random
+from array import array
 
 from presswork import constants
+from presswork.text.grammar.vocabulary import Vocabulary
+from presswork.text.markov import pruning
+from presswork.text.progress import NO_PROGRESS
 
 logger = logging.getLogger("presswork")
 
@@ -35,17 +43,152 @@ logger = logging.getLogger("presswork")
 START_SYMBOL = u""
 END_SYMBOL = u""
 
+# for hashed keys: the polynomial hash's base (the 64-bit FNV prime), & 64 bits
+HASH_BASE = 0x100000001b3
+HASH_MODULUS = 1 << 64
+HASH_MASK = HASH_MODULUS - 1
+MAX_SIGNED_KEY = (1 << 63) - 1
+# for hashed keys: the word ID of START_SYMBOL & END_SYMBOL. (they're the model's own, so not in the vocabulary)
+PADDING_ID = -1
 
-def crude_markov_chain(sentences_as_word_lists, ngram_size=constants.DEFAULT_NGRAM_SIZE, ):
+
+class NgramKeyCollision(ValueError):
+    """ raised if two different n-grams get the same hashed key while training. (with 64 bits, practically never.)
+    """
+
+
+class HashedKeysModel(dict):
+    """ a crude model keyed by 64-bit rolling hashes of n-grams, not n-gram tuples: `{key: array of possibilities' IDs}`
+
+        >>> model = crude_markov_chain([["A", "tokenized", "sentence."]], hashed_keys=True)
+        >>> model.decode(model.successor_ids(model.key(("A", "tokenized"))))
+        ['sentence.']
+        >>> word_id = model.word_id
+        >>> model.key(("A", "tokenized")) == model.roll(model.key(("", "A")), word_id(""), word_id("tokenized"))
+        True
+        >>> model.key(("never", "seen")) is None
+        True
+
+    each word has an integer ID in the model's `vocabulary` (the sentence tokenizer's, when it's trained on a
+    tokenizer's output - see `presswork.text.grammar.vocabulary`), except the start & end padding, PADDING_ID, which
+    is only the model's. an n-gram's key is the polynomial hash of its word IDs, mod 2**64 (as a signed 64-bit int, so
+    it's a small int and not a long). so the key of the next n-gram - drop the first word, add the next word - is
+    computed from the last key in O(1), instead of building a tuple. successors are word IDs too, in arrays of C ints;
+    generation works with IDs, and only resolves a sentence's words as it yields it. frozen (see freeze_model), all the
+    successors are in one array, `successors`, and each key's value is just its offset there - so a successor takes
+    the size of a C int, and a state one int object, not a container each.
+
+    while training, collisions are detected (see NgramKeyCollision) - a collision would silently merge two n-grams'
+    successors. for that, the training sentences' word IDs are kept, one after the other, in `training_word_ids`, and
+    each key's array starts with the offset there of its n-gram's first occurrence, before the successors: an n-gram
+    seen again is compared with it there. (so no tuple is built per position, nor anything else per key but that C
+    int. freeze_model() - or forget_ngrams() - drops `training_word_ids`.)
+    """
+
+    def __init__(self, ngram_size=constants.DEFAULT_NGRAM_SIZE, vocabulary=None):
+        """
+        :param vocabulary: (optional) the `Vocabulary` of word IDs to use. (by default, a new one)
+        """
+        super(HashedKeysModel, self).__init__()
+        self.ngram_size = ngram_size
+        self.vocabulary = Vocabulary() if vocabulary is None else vocabulary
+        # (the weight of an n-gram's first word in its key; rolling subtracts it)
+        self.first_word_weight = pow(HASH_BASE, ngram_size - 1, HASH_MODULUS)
+        # (while training: the padded word IDs of the training sentences, one after the other)
+        self.training_word_ids = array('i')
+        self.start_key = self.key(ngram_for_sentence_start(ngram_size))
+        # (until frozen, each key's value is [offset in training_word_ids, word ID, word ID, ...]. once frozen: each
+        # key's successors, as [count, word ID, word ID, ...], one after the other)
+        self.successors = None
+
+    def key(self, ngram):
+        """ :return: the key of an n-gram, computed from scratch; None if it has any word the model hasn't seen
+        """
+        key = 0
+        for word in ngram:
+            word_id = self.word_id(word)
+            if word_id is None:
+                return None
+            key = (key * HASH_BASE + word_id) & HASH_MASK
+        return _signed(key)
+
+    def word_id(self, word):
+        """ :return: the word's ID (PADDING_ID for the start & end padding); None if the model hasn't seen the word
+        """
+        return PADDING_ID if word == START_SYMBOL else self.vocabulary.get_id(word)
+
+    def decode(self, word_ids):
+        """ :return: list of the words with these IDs
+        """
+        token = self.vocabulary.token
+        return [START_SYMBOL if word_id == PADDING_ID else token(word_id) for word_id in word_ids]
+
+    def ngram(self, key):
+        """ :return: the n-gram (tuple of words) of a key, while training (see training_word_ids)
+        """
+        offset = self[key][0]
+        return tuple(self.decode(self.training_word_ids[offset:offset + self.ngram_size]))
+
+    def add(self, ngram, successors):
+        """ add an n-gram of known words, & its successors (words), as training would (i.e. when pruning, for the
+            n-grams kept)
+        """
+        offset = len(self.training_word_ids)
+        self.training_word_ids.extend(array('i', map(self.word_id, ngram)))
+        self[self.key(ngram)] = array('i', [offset] + map(self.word_id, successors))
+
+    def forget_ngrams(self):
+        """ drop what's only needed while training (to detect collisions, & to prune): the keys' n-grams
+        """
+        self.training_word_ids = None
+
+    def roll(self, key, first_word_id, next_word_id):
+        """ :return: the key of the n-gram after this one: without its first word, plus the next word (by their IDs)
+        """
+        return _signed(((key - first_word_id * self.first_word_weight) * HASH_BASE + next_word_id) & HASH_MASK)
+
+    def successor_ids(self, key):
+        """ :return: the word IDs of the key's successors (raises KeyError if the key isn't in the model)
+        """
+        if self.successors is None:
+            return self[key][1:]
+        offset = self[key]
+        return self.successors[offset + 1:offset + 1 + self.successors[offset]]
+
+    def random_successor_id(self, key):
+        """ :return: the ID of a random successor of the key, as random.choice() would pick from successor_ids(key)
+            (raises KeyError if the key isn't in the model)
+        """
+        if self.successors is None:
+            successors = self[key]
+            return successors[1 + int(random.random() * (len(successors) - 1))]
+        offset = self[key]
+        successors = self.successors
+        return successors[offset + 1 + int(random.random() * successors[offset])]
+
+
+def _signed(key):
+    # (the masked key is a long, as the mask is; int() makes it a plain int again, which is smaller)
+    return int(key - HASH_MODULUS if key > MAX_SIGNED_KEY else key)
+
+
+def crude_markov_chain(sentences_as_word_lists, ngram_size=constants.DEFAULT_NGRAM_SIZE, progress=NO_PROGRESS,
+                       hashed_keys=False):
     """ Build a Markov Chain model of sentences, words. Bare-essentials/crude implementation
 
     :param sentences_as_word_lists: list of lists of words/tokens. i.e. expects already-tokenized text.
         like [ [word, word, ...], [word, word, ...], ... ]
     :param ngram_size: the N in N-gram, AKA state size or window size. same as in general markov chains.
         2 or 3 are commonly used for text generation. higher than that can
+    :param progress: (optional) a `presswork.text.progress.Progress`, to count 'ngrams_counted' as it goes
+    :param hashed_keys: (optional) key the model by rolling hashes of the n-grams, rather than by n-gram tuples
+        (see HashedKeysModel. its word IDs are in the sentences' `vocabulary`, if they have one)
     :return: a dict: { n-gram : [ possibility, possibility ...], ... }. Feed this to iter_make_sentences
         can be serialized to JSON, if you want to save a model for re-use.
     """
+    if hashed_keys:
+        return _crude_markov_chain_hashed_keys(sentences_as_word_lists, ngram_size, progress)
+
     model = {}
 
     if not sentences_as_word_lists:
@@ -69,6 +212,8 @@ def crude_markov_chain(sentences_as_word_lists, ngram_size=constants.DEFAULT_NGR
                 # Re: memory usage -- see note in module docstring. (left unoptimized)
                 model[ngram].append(next_word)
 
+        progress.increment('ngrams_counted', len(word_sequence) + 1)
+
     if logger.level == logging.DEBUG:
         try:
             logger.debug(u'model=\n{}'.format(pprint.pformat(model, width=2)))
@@ -78,6 +223,43 @@ def crude_markov_chain(sentences_as_word_lists, ngram_size=constants.DEFAULT_NGR
     return model
 
 
+def _crude_markov_chain_hashed_keys(sentences_as_word_lists, ngram_size, progress):
+    """ same as crude_markov_chain(), but keyed by rolling hashes: each n-gram's key is rolled from the one before it.
+    """
+    model = HashedKeysModel(ngram_size, vocabulary=getattr(sentences_as_word_lists, 'vocabulary', None))
+    vocabulary = model.vocabulary
+    word_ids = model.training_word_ids
+    start_ids = array('i', (PADDING_ID,) * ngram_size)
+    first_word_weight = model.first_word_weight
+
+    for word_sequence in sentences_as_word_lists:
+        # (the sentence's IDs, padded, go on the end of all the training sentences' IDs; n-grams are compared there)
+        start = len(word_ids)
+        word_ids.extend(start_ids)
+        word_ids.extend(vocabulary.encode(word_sequence))
+        word_ids.append(PADDING_ID)
+
+        key = model.start_key
+        for i in xrange(start, start + len(word_sequence) + 1):
+            if i != start:
+                key = _signed(((key - word_ids[i - 1] * first_word_weight) * HASH_BASE
+                               + word_ids[i + ngram_size - 1]) & HASH_MASK)
+
+            successors = model.get(key)
+            if successors is None:
+                model[key] = array('i', (i, word_ids[i + ngram_size]))
+                continue
+            first = successors[0]
+            if word_ids[first:first + ngram_size] != word_ids[i:i + ngram_size]:
+                raise NgramKeyCollision(u"n-grams {!r} and {!r} have the same key; use hashed_keys=False".format(
+                        model.ngram(key), tuple(model.decode(word_ids[i:i + ngram_size]))))
+            successors.append(word_ids[i + ngram_size])
+
+        progress.increment('ngrams_counted', len(word_sequence) + 1)
+
+    return model
+
+
 def iter_make_sentences(
         crude_markov_model, ngram_size=constants.DEFAULT_NGRAM_SIZE, count=100, max_loops_per_sentence=25):
     """ The fun part! Generate probable sentences based on a model. Bare-essentials/crude implementation.
@@ -91,7 +273,13 @@ def iter_make_sentences(
         yield []
         raise StopIteration()
 
-    _model_ngram_size = len(crude_markov_model.keys()[0])
+    hashed_keys = isinstance(crude_markov_model, HashedKeysModel)
+    if hashed_keys:
+        _model_ngram_size = crude_markov_model.ngram_size
+        # (sentences are of word IDs until they're yielded)
+        decode = crude_markov_model.decode
+    else:
+        _model_ngram_size = len(crude_markov_model.keys()[0])
     if _model_ngram_size != ngram_size:
         logger.error(u"make_sentences ngram_size={}, but model ngram_size={!r}".format(ngram_size, _model_ngram_size))
         raise ValueError(u"ngram_size must match ngram_size of model.")
@@ -107,14 +295,21 @@ def iter_make_sentences(
         logger.debug(u'current sentence = {}, i (sentence#) = {}, per_sentence_loop_counter={}'.format(
                 sentence, _sentences_counter, _per_sentence_loop_counter))
 
-        if not current_ngram:
-            current_ngram = ngram_for_sentence_start(ngram_size)
+        if current_ngram is None:
+            current_ngram = crude_markov_model.start_key if hashed_keys else ngram_for_sentence_start(ngram_size)
 
         try:
-            next_word_options = crude_markov_model[current_ngram]
-            next_word = random.choice(next_word_options)
+            if hashed_keys:
+                next_word = crude_markov_model.random_successor_id(current_ngram)
+            else:
+                next_word = random.choice(crude_markov_model[current_ngram])
             sentence.append(next_word)
-            current_ngram = current_ngram[1:] + (next_word,)
+            if hashed_keys:
+                # (the n-gram's first word is the one `ngram_size` back from the next word, or the start padding)
+                first_word = sentence[-ngram_size - 1] if len(sentence) > ngram_size else PADDING_ID
+                current_ngram = crude_markov_model.roll(current_ngram, first_word, next_word)
+            else:
+                current_ngram = current_ngram[1:] + (next_word,)
         except (KeyError, IndexError):
             # when we hit a 'dead end' that's alright, we just consider that the end of the 'sentence'
             end_sentence = True
@@ -128,7 +323,7 @@ def iter_make_sentences(
             current_ngram = None
             end_sentence = False
 
-            yield sentence
+            yield decode(sentence) if hashed_keys else sentence
             sentence = []
         else:
             _per_sentence_loop_counter += 1
@@ -136,6 +331,81 @@ def iter_make_sentences(
     raise StopIteration()
 
 
+def next_word(crude_markov_model, ngram):
+    """ one step of generation: a random successor of the n-gram (END_SYMBOL if the sentence ends there)
+
+    :return: the next word; or None if the n-gram is not in the model
+    """
+    if isinstance(crude_markov_model, HashedKeysModel):
+        key = crude_markov_model.key(ngram)
+        if key not in crude_markov_model:
+            return None
+        return crude_markov_model.decode([crude_markov_model.random_successor_id(key)])[0]
+    next_word_options = crude_markov_model.get(ngram)
+    if not next_word_options:
+        return None
+    return random.choice(next_word_options)
+
+
+def freeze_model(model):
+    """ compact a trained model for generation-only use: successor lists become tuples. (converts in-place & returns)
+
+    tuples are immutable & smaller than lists (lists over-allocate to make appending cheap, but we're done appending).
+    (a HashedKeysModel's successor arrays are concatenated into one; see HashedKeysModel.)
+    `iter_make_sentences` works the same with either.
+
+        >>> model = crude_markov_chain([["A", "tokenized", "sentence."]])
+        >>> frozen = freeze_model(model)
+        >>> frozen[("", "")]
+        ('A',)
+        >>> [word_sequence for word_sequence in iter_make_sentences(frozen, count=1)]
+        [['A', 'tokenized', 'sentence.', u'']]
+    """
+    if isinstance(model, HashedKeysModel):
+        if model.successors is not None:
+            return model
+        successors = array('i')
+        for key, successor_ids in model.iteritems():
+            model[key] = len(successors)
+            # (less the training offset, at [0])
+            successors.append(len(successor_ids) - 1)
+            successors.extend(successor_ids[1:])
+        model.successors = successors
+        model.forget_ngrams()
+        return model
+    for ngram in model:
+        model[ngram] = tuple(model[ngram])
+    return model
+
+
+def prune_model(model, ngram_size=constants.DEFAULT_NGRAM_SIZE, min_count=1, top_k=None):
+    """ drop rare transitions from a model, without leaving dead ends. (see `pruning` module.)
+
+        >>> model = crude_markov_chain([["A", "cat."], ["A", "cat."], ["A", "dog."]])
+        >>> pruned, report = prune_model(model, min_count=2)
+        >>> pruned[("", "A")], report.states_removed
+        (['cat.', 'cat.'], 1)
+
+    :return: (pruned model, `pruning.PruneReport`)
+    """
+    if isinstance(model, HashedKeysModel):
+        # (pruning follows transitions from n-gram to n-gram, so it works on the n-grams themselves, then re-keys)
+        pruned, report = prune_model(
+                {model.ngram(key): model.decode(model.successor_ids(key)) for key in model},
+                ngram_size=ngram_size, min_count=min_count, top_k=top_k)
+        pruned_model = HashedKeysModel(ngram_size, vocabulary=model.vocabulary)
+        for ngram, successors in pruned.iteritems():
+            pruned_model.add(ngram, successors)
+        return pruned_model, report
+
+    counts = {ngram: collections.Counter(successors) for ngram, successors in model.iteritems()}
+    pruned, report = pruning.prune_counts(
+            counts, ngram_for_sentence_start(ngram_size), END_SYMBOL, min_count=min_count, top_k=top_k)
+    # (back to lists of successors, repeated per count - the model's usual shape)
+    return {ngram: [word for word, count in successors.iteritems() for _ in xrange(count)]
+            for ngram, successors in pruned.iteritems()}, report
+
+
 def is_empty_model(model):
     """ Returns True if model is 'empty'
     """
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+""" Markov Chain models of every order from 1 to N, counted in one pass and stored in one trie of contexts.
+
+If you're looking to generate text, don't *start* here. Start with the `text_makers` module!
+
+    >>> trie = NgramTrie(max_ngram_size=3)
+    >>> trie.train([["A", "tokenized", "sentence."], ["A", "tokenized", "sentence."]])
+    >>> for word_sequence in trie.iter_make_sentences(count=2, ngram_size=1):
+    ...     print " ".join(word_sequence)
+    A tokenized sentence.
+    A tokenized sentence.
+    >>> [trie.count_states(ngram_size) for ngram_size in (1, 2, 3)]
+    [4, 4, 4]
+
+Trying several n-gram sizes on one corpus means training a model per size, each counting the corpus again. This
+counts them all at once: for each word of the corpus, the contexts before it - its last 1, 2, ... N words - are one
+path in a trie, read backwards from the word. (the node for "c" holds what follows "c"; its child for "b" holds what
+follows "b c"; and so on.) So the order-k model is the trie's nodes at depth k, and each order shares its nodes with
+the next one: every context is stored once, as one step from the shorter context it ends with.
+
+While training, each node is a list: [children, successors] - `{previous word: node}` and `{next word: count}`.
+Frozen, each node becomes one flat tuple: (children, word, cumulative count, word, cumulative count, ...). most nodes
+are rare contexts, with one or two next words and at most one child; so children are None if there are none (as for
+all of the depth N nodes), a flat tuple (word, node, word, node, ...) if there are only a few, and only a dict beyond
+that. small tuples rather than lists & dicts are most of the memory that freezing saves.
+"""
+import logging
+import random
+
+from presswork import constants
+from presswork.text.progress import NO_PROGRESS
+from presswork.utils import gc_paused
+
+logger = logging.getLogger("presswork")
+
+START_SYMBOL = u""
+END_SYMBOL = u""
+
+MAX_WORDS_PER_SENTENCE = 100
+
+# indexes into a node (frozen nodes have their successors flattened from SUCCESSORS onwards)
+CHILDREN = 0
+SUCCESSORS = 1
+
+# frozen nodes with more children than this keep them in a dict; fewer are in a tuple, scanned
+MAX_CHILDREN_IN_TUPLE = 8
+
+
+class NgramTrie(object):
+    """ Markov Chain models of orders 1 to `max_ngram_size`, sharing one trie of contexts (see module docstring)
+    """
+
+    def __init__(self, max_ngram_size=constants.DEFAULT_NGRAM_SIZE):
+        """
+        :param max_ngram_size: the largest N in N-gram to count. every order from 1 up to this one is counted.
+        """
+        self.max_ngram_size = max_ngram_size
+        # the root is the empty context; it has no successors of its own (there's no order 0 model)
+        self.root = [{}, {}]
+        self.frozen = False
+
+    def train(self, sentences_as_word_lists, progress=NO_PROGRESS):
+        """ count the transitions of every order in these sentences, in one pass over them
+
+        :param sentences_as_word_lists: list of lists of words/tokens (or any iterable of those - it is streamed)
+        :param progress: (optional) a `presswork.text.progress.Progress`, to count 'ngrams_counted' as it goes
+        """
+        if self.frozen:
+            raise ValueError("trie has been frozen (for generation only), it cannot be trained further")
+
+        with gc_paused():
+            self._train(sentences_as_word_lists, progress)
+
+    def _train(self, sentences_as_word_lists, progress):
+        max_ngram_size = self.max_ngram_size
+        start = (START_SYMBOL,) * max_ngram_size
+        for word_sequence in sentences_as_word_lists:
+            words_with_padding = start + tuple(word_sequence) + (END_SYMBOL,)
+            for i in xrange(max_ngram_size, len(words_with_padding)):
+                next_word = words_with_padding[i]
+                node = self.root
+                # one step deeper per order: the order-k context is the order-(k-1) one, plus the word before it
+                for k in xrange(1, max_ngram_size + 1):
+                    children = node[CHILDREN]
+                    child = children.get(words_with_padding[i - k])
+                    if child is None:
+                        child = children[words_with_padding[i - k]] = [{}, {}]
+                    node = child
+                    successors = node[SUCCESSORS]
+                    successors[next_word] = successors.get(next_word, 0) + 1
+            progress.increment('ngrams_counted', (len(word_sequence) + 1) * max_ngram_size)
+
+    def freeze(self):
+        """ after training, compact the trie for generation only (see module docstring). can't be trained after this.
+        """
+        if self.frozen:
+            return
+        with gc_paused():
+            self.root = _freeze_node(self.root)
+        self.frozen = True
+
+    def context(self, previous_words, ngram_size):
+        """ :return: the node of the trie for the last `ngram_size` words (padded at the sentence start), or None if
+            that context was never seen
+        """
+        node = self.root
+        for i in xrange(1, ngram_size + 1):
+            previous_word = previous_words[-i] if i <= len(previous_words) else START_SYMBOL
+            node = child(node[CHILDREN], previous_word)
+            if node is None:
+                return None
+        return node
+
+    def successors(self, previous_words, ngram_size):
+        """ :return: {next word: count} after the last `ngram_size` words; empty if that context was never seen
+        """
+        node = self.context(previous_words, ngram_size)
+        if node is None:
+            return {}
+        if self.frozen:
+            cumulative_counts = node[SUCCESSORS + 1::2]
+            return dict(zip(node[SUCCESSORS::2], (count - previous for count, previous in zip(
+                    cumulative_counts, (0,) + cumulative_counts[:-1]))))
+        return dict(node[SUCCESSORS])
+
+    def next_word(self, previous_words, ngram_size):
+        """ :return: a random next word after the last `ngram_size` words, weighted by count (END_SYMBOL if the sentence
+            ends there); or None if that context was never seen
+        """
+        if not 1 <= ngram_size <= self.max_ngram_size:
+            raise ValueError("ngram_size must be from 1 to {}".format(self.max_ngram_size))
+        node = self.context(previous_words, ngram_size)
+        if node is None:
+            return None
+
+        if self.frozen:
+            # binary search over the (word, cumulative count) pairs
+            sample = random.random() * node[-1]
+            low, high = 0, (len(node) - SUCCESSORS) // 2 - 1
+            while low < high:
+                middle = (low + high) // 2
+                if node[SUCCESSORS + 1 + 2 * middle] <= sample:
+                    low = middle + 1
+                else:
+                    high = middle
+            return node[SUCCESSORS + 2 * low]
+
+        successors = node[SUCCESSORS]
+        sample = random.random() * sum(successors.itervalues())
+        for word, count in successors.iteritems():
+            sample -= count
+            if sample < 0:
+                return word
+        return word
+
+    def iter_make_sentences(self, count, ngram_size):
+        """ The fun part! Generate probable sentences from the model of this order.
+
+        :param ngram_size: which order's model to use (1 to max_ngram_size)
+        :return: (generator) yields lists-of-words.
+        """
+        for _ in xrange(count):
+            sentence = []
+            next_word = self.next_word(sentence, ngram_size)
+            while next_word is not None and next_word != END_SYMBOL and len(sentence) < MAX_WORDS_PER_SENTENCE:
+                sentence.append(next_word)
+                next_word = self.next_word(sentence, ngram_size)
+            yield sentence
+
+    def count_states(self, ngram_size):
+        """ count of states (n-grams that have successors) in the model of this order: the trie's nodes at that depth
+        """
+        nodes = [self.root]
+        for _ in xrange(ngram_size):
+            nodes = [child for node in nodes for child in child_nodes(node[CHILDREN])]
+        return len(nodes)
+
+    def __len__(self):
+        """ count of nodes in the trie: all the orders' states together
+        """
+        return sum(self.count_states(ngram_size) for ngram_size in xrange(1, self.max_ngram_size + 1))
+
+
+def _freeze_node(node):
+    """ :return: the frozen (flat tuple) version of a training node & everything below it (see module docstring)
+    """
+    children, successors = node
+    frozen_children = freeze_children(children, _freeze_node)
+    if len(successors) == 1:
+        # (the most common case by far: a rare context, with one next word)
+        return (frozen_children,) + successors.items()[0]
+    flattened = [frozen_children]
+    total = 0
+    for word, count in successors.iteritems():
+        total += count
+        flattened.append(word)
+        flattened.append(total)
+    return tuple(flattened)
+
+
+def freeze_children(children, freeze_node):
+    """ :param children: a training node's children, `{word: node}`
+    :param freeze_node: function to freeze each child node
+    :return: the children in their frozen form: None, a flat tuple, or a dict (see module docstring)
+    """
+    if not children:
+        return None
+    if len(children) > MAX_CHILDREN_IN_TUPLE:
+        return {word: freeze_node(node) for word, node in children.iteritems()}
+    frozen_children = []
+    for word, node in children.iteritems():
+        frozen_children.append(word)
+        frozen_children.append(freeze_node(node))
+    return tuple(frozen_children)
+
+
+def child(children, word):
+    """ :return: the child node for this word, or None. (children in any of their forms: see module docstring)
+    """
+    if children is None:
+        return None
+    if isinstance(children, dict):
+        return children.get(word)
+    for i in xrange(0, len(children), 2):
+        if children[i] == word:
+            return children[i + 1]
+    return None
+
+
+def child_nodes(children):
+    """ :return: list of the child nodes. (children in any of their forms: see module docstring)
+    """
+    if children is None:
+        return []
+    if isinstance(children, dict):
+        return children.values()
+    return list(children[1::2])
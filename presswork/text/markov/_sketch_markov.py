@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+""" approximate Markov Chain model in fixed memory - a count-min sketch plus a bounded table of heavy hitters.
+
+If you're looking to generate text, don't *start* here. Start with the `text_makers` module!
+
+    >>> chain = SketchMarkovChain(ngram_size=2, width=1024)
+    >>> chain.train([["A", "tokenized", "sentence."], ["A", "tokenized", "sentence."]])
+    >>> for word_sequence in chain.iter_make_sentences(count=2):
+    ...     print " ".join(word_sequence)
+    A tokenized sentence.
+    A tokenized sentence.
+    >>> len(chain)
+    4
+
+The exact strategies keep every (n-gram, next word) pair they have seen, so their memory grows with vocabulary x
+context - without bound, for a model that keeps training on a stream. This one has two structures, both capped:
+
+    * a count-min sketch of transition counts: `depth` rows of `width` counters. each (n-gram, next word) pair
+    increments one counter per row (picked by hashing); its estimated count is the minimum of those counters. hash
+    collisions can only make estimates too high, never too low. memory: width x depth counters, however many pairs.
+    * the heavy hitters: for up to `max_contexts` n-grams, their top `successors_per_context` next words & estimated
+    counts. generation picks from these (weighted by count). a next word that isn't in its n-gram's list yet replaces
+    the least frequent one, if its estimate from the sketch is higher. when the table is full, the less frequent half
+    of the n-grams are dropped. (they can come back: the sketch still remembers their counts.)
+
+How it degrades, as memory shrinks relative to the corpus: rare next words drop out first, then rare n-grams (which
+become dead ends: the sentence ends there). common phrasings - most of what gets generated - survive the longest.
+Every generated transition was seen in the input; only the weights are approximate.
+
+Training can go on after generating: `train()` adds to the counts, so a model can follow a stream of text.
+
+(hashing uses the builtin `hash()` - stable between runs on Python 2, unless hash randomization (`-R`) is turned on;
+a pickled model has to be loaded with the same setting.)
+"""
+import logging
+import random
+from array import array
+
+from presswork import constants
+from presswork.text.markov import pruning
+from presswork.text.progress import NO_PROGRESS
+
+logger = logging.getLogger("presswork")
+
+START_SYMBOL = u""
+END_SYMBOL = u""
+
+DEFAULT_WIDTH = 2 ** 16
+DEFAULT_DEPTH = 4
+DEFAULT_MAX_CONTEXTS = 100000
+DEFAULT_SUCCESSORS_PER_CONTEXT = 8
+
+MAX_WORDS_PER_SENTENCE = 100
+
+
+class CountMinSketch(object):
+    """ approximate counts of hashable keys, in fixed memory (see module docstring)
+
+        >>> sketch = CountMinSketch(width=64, depth=4)
+        >>> sketch.add(("foo", "bar"))
+        1
+        >>> sketch.add(("foo", "bar"))
+        2
+        >>> sketch.estimate(("foo", "bar")), sketch.estimate(("never", "added"))
+        (2, 0)
+    """
+
+    def __init__(self, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.counts = array('l', [0]) * (width * depth)
+
+    def _indexes(self, key):
+        # one hash, split into two, gives each row its own index (double hashing: h1 + row * h2)
+        h = hash(key)
+        h1, h2 = h & 0xffffffff, ((h >> 32) & 0xffffffff) | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in xrange(self.depth)]
+
+    def add(self, key, count=1):
+        """ :return: the key's new estimated count
+
+        conservative update: only the counters that are below the new estimate are raised, which keeps collisions
+        from inflating the other keys' estimates as much.
+        """
+        counts = self.counts
+        indexes = self._indexes(key)
+        estimate = min(counts[i] for i in indexes) + count
+        for i in indexes:
+            if counts[i] < estimate:
+                counts[i] = estimate
+        return estimate
+
+    def estimate(self, key):
+        counts = self.counts
+        return min(counts[i] for i in self._indexes(key))
+
+    @property
+    def size_bytes(self):
+        return self.counts.itemsize * len(self.counts)
+
+
+class SketchMarkovChain(object):
+    """ A Markov Chain text model in fixed memory, with approximate counts (see module docstring).
+    """
+
+    def __init__(self, ngram_size=constants.DEFAULT_NGRAM_SIZE, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH,
+                 max_contexts=DEFAULT_MAX_CONTEXTS, successors_per_context=DEFAULT_SUCCESSORS_PER_CONTEXT):
+        """
+        :param ngram_size: N in N-gram, AKA state size or window size. same as elsewhere.
+        :param width: counters per row of the sketch. more = fewer collisions, so better estimates
+        :param depth: rows of the sketch
+        :param max_contexts: most n-grams to keep next words for
+        :param successors_per_context: most next words to keep per n-gram
+        """
+        self.ngram_size = ngram_size
+        self.max_contexts = max_contexts
+        self.successors_per_context = successors_per_context
+        self.sketch = CountMinSketch(width=width, depth=depth)
+        # {n-gram: [word, count, word, count, ...]} - a flat list is much smaller than a dict per n-gram
+        self.table = {}
+
+    def train(self, sentences_as_word_lists, progress=NO_PROGRESS):
+        """ count transitions in these sentences, adding to the counts so far
+
+        :param sentences_as_word_lists: list of lists of words/tokens (or any iterable of those - it is streamed)
+        :param progress: (optional) a `presswork.text.progress.Progress`, to count 'ngrams_counted' as it goes
+        """
+        start = (START_SYMBOL,) * self.ngram_size
+        for word_sequence in sentences_as_word_lists:
+            words_with_padding = start + tuple(word_sequence) + (END_SYMBOL,)
+            for i in xrange(0, len(word_sequence) + 1):
+                self._observe(words_with_padding[i:i + self.ngram_size], words_with_padding[i + self.ngram_size])
+            progress.increment('ngrams_counted', len(word_sequence) + 1)
+
+    def _observe(self, ngram, next_word):
+        estimate = self.sketch.add((ngram, next_word))
+
+        successors = self.table.get(ngram)
+        if successors is None:
+            if len(self.table) >= self.max_contexts:
+                self._evict_contexts()
+            successors = self.table[ngram] = []
+
+        for i in xrange(0, len(successors), 2):
+            if successors[i] == next_word:
+                successors[i + 1] = estimate
+                return
+
+        if len(successors) < 2 * self.successors_per_context:
+            successors.extend((next_word, estimate))
+            return
+
+        least = min(xrange(1, len(successors), 2), key=successors.__getitem__)
+        if estimate > successors[least]:
+            successors[least - 1:least + 1] = [next_word, estimate]
+
+    def _evict_contexts(self):
+        """ drop the less frequent half of the n-grams (by the total count of their next words)
+        """
+        by_count = sorted(self.table, key=lambda ngram: sum(self.table[ngram][1::2]))
+        evicted = by_count[:(len(by_count) + 1) // 2]
+        for ngram in evicted:
+            del self.table[ngram]
+        logger.debug(u'sketch model table is full, evicted {} n-grams'.format(len(evicted)))
+
+    def prune(self, min_count=1, top_k=None):
+        """ drop rare transitions from the heavy hitters table, without leaving dead ends. (see `pruning` module.)
+
+        :return: `pruning.PruneReport`
+        """
+        counts = {ngram: dict(zip(successors[::2], successors[1::2])) for ngram, successors in self.table.iteritems()}
+        pruned, report = pruning.prune_counts(
+                counts, (START_SYMBOL,) * self.ngram_size, END_SYMBOL, min_count=min_count, top_k=top_k)
+        self.table = {ngram: [item for word_and_count in successors.iteritems() for item in word_and_count]
+                      for ngram, successors in pruned.iteritems()}
+        return report
+
+    def next_word(self, ngram):
+        """ :return: a random successor of the n-gram, weighted by count; or None if the n-gram is a dead end
+        """
+        successors = self.table.get(ngram)
+        if not successors:
+            return None
+        sample = random.random() * sum(successors[1::2])
+        for i in xrange(1, len(successors), 2):
+            sample -= successors[i]
+            if sample < 0:
+                return successors[i - 1]
+        return successors[-2]
+
+    def iter_make_sentences(self, count=100):
+        """ The fun part! Generate probable sentences based on the model.
+
+        :return: (generator) yields lists-of-words.
+        """
+        start = (START_SYMBOL,) * self.ngram_size
+        for _ in xrange(count):
+            sentence = []
+            current_ngram = start
+            next_word = self.next_word(current_ngram)
+            while next_word is not None and next_word != END_SYMBOL and len(sentence) < MAX_WORDS_PER_SENTENCE:
+                sentence.append(next_word)
+                current_ngram = current_ngram[1:] + (next_word,)
+                next_word = self.next_word(current_ngram)
+            yield sentence
+
+    def __len__(self):
+        """ count of states (n-grams that have successors) in the model
+        """
+        return len(self.table)
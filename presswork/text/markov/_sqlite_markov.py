@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+""" Markov Chain model with its transition counts in a local SQLite database - for corpora larger than RAM.
+
+If you're looking to generate text, don't *start* here. Start with the `text_makers` module!
+
+    >>> chain = SQLiteMarkovChain(ngram_size=2)
+    >>> chain.train([["A", "tokenized", "sentence."], ["A", "tokenized", "sentence."]])
+    >>> for word_sequence in chain.iter_make_sentences(count=2):
+    ...     print " ".join(word_sequence)
+    A tokenized sentence.
+    A tokenized sentence.
+    >>> len(chain)
+    4
+
+Same essential algorithm as the 'crude' implementation (see `_crude_markov`), but where crude holds a dict of lists,
+this holds a table of (state, next word, count) rows, on disk. How it scales:
+
+    * training streams the tokenized sentences through a bulk `executemany()` into a staging table (no indexes, so
+    inserts are cheap), then one `GROUP BY` aggregates the staging rows into the transitions table. memory use while
+    training doesn't grow with the corpus; SQLite spills its sorting to disk.
+    * the transitions table's primary key is (state, next word) so looking up a state's successors is an indexed
+    range scan.
+    * generation goes through an LRU cache of "hot" states in front of the database. (natural language is Zipfian, so
+    a small cache catches most lookups - sentence starts above all.)
+
+By default the database is a private temporary file, deleted when the connection is closed. Pass `db_file_path` to
+keep the model around: an existing database at that path is re-used (and can be trained further).
+"""
+import bisect
+import logging
+import random
+import sqlite3
+import threading
+
+from presswork import constants
+from presswork.text.markov import pruning
+from presswork.text.progress import NO_PROGRESS
+from presswork.utils import LRUCache
+
+logger = logging.getLogger("presswork")
+
+START_SYMBOL = u""
+END_SYMBOL = u""
+
+# n-gram states are stored as one string - the words joined with a control character, which `clean` strips from input
+STATE_SEPARATOR = u"\x1f"
+
+DEFAULT_CACHE_SIZE = 10000
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS transitions (
+        state TEXT NOT NULL,
+        next_word TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (state, next_word)
+    ) WITHOUT ROWID;
+"""
+
+
+class SQLiteMarkovChain(object):
+    """ A Markov Chain text model whose transition counts live in SQLite (see module docstring).
+    """
+
+    def __init__(self, db_file_path=None, ngram_size=constants.DEFAULT_NGRAM_SIZE, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        :param db_file_path: (optional) where to keep the database. if not given, a private temporary database is used,
+            which SQLite deletes once closed. if given and it already has a model, that model is re-used.
+        :param ngram_size: N in N-gram, AKA state size or window size. same as elsewhere. must match the ngram_size
+            of an existing database.
+        :param cache_size: how many states' successors to keep in memory, in front of the database
+        """
+        self.ngram_size = ngram_size
+        self.db_file_path = db_file_path
+
+        # the lock serializes use of the connection, so instances can be shared between threads (i.e. by a web app)
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(db_file_path or "", check_same_thread=False)
+        # the model can always be rebuilt from its corpus, so trade durability for speed
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.executescript(_SCHEMA)
+        self._check_ngram_size()
+
+        self._cache = LRUCache(maxsize=cache_size)
+
+    def _check_ngram_size(self):
+        with self._lock, self.connection:
+            row = self.connection.execute("SELECT value FROM metadata WHERE key = 'ngram_size'").fetchone()
+            if row is None:
+                self.connection.execute("INSERT INTO metadata (key, value) VALUES ('ngram_size', ?)",
+                                        (unicode(self.ngram_size),))
+            elif int(row[0]) != self.ngram_size:
+                raise ValueError(u"ngram_size must match ngram_size of model. (database at {!r} has ngram_size={})"
+                                 .format(self.db_file_path, row[0]))
+
+    def train(self, sentences_as_word_lists, progress=NO_PROGRESS):
+        """ count transitions in these sentences, adding to counts already in the database (if any)
+
+        :param sentences_as_word_lists: list of lists of words/tokens (or any iterable of those - it is streamed)
+        :param progress: (optional) a `presswork.text.progress.Progress`, to count 'ngrams_counted' as it goes
+        """
+        with self._lock, self.connection:
+            # (python 2's sqlite3 runs CREATE outside of the transaction: so if an earlier train() failed part way,
+            # the rollback left its staging table behind. re-use it, emptied.)
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS staging (state TEXT, next_word TEXT)")
+            self.connection.execute("DELETE FROM staging")
+            self.connection.executemany("INSERT INTO staging (state, next_word) VALUES (?, ?)",
+                                        self._iter_transitions(sentences_as_word_lists, progress))
+            self.connection.execute("""
+                INSERT OR REPLACE INTO transitions (state, next_word, count)
+                SELECT staged.state, staged.next_word, staged.count + COALESCE(transitions.count, 0)
+                FROM (SELECT state, next_word, COUNT(*) AS count FROM staging GROUP BY state, next_word) AS staged
+                LEFT JOIN transitions
+                    ON transitions.state = staged.state AND transitions.next_word = staged.next_word
+            """)
+            self.connection.execute("DROP TABLE staging")
+        self._cache.clear()
+
+    def _iter_transitions(self, sentences_as_word_lists, progress=NO_PROGRESS):
+        start = (START_SYMBOL,) * self.ngram_size
+        for word_sequence in sentences_as_word_lists:
+            words_with_padding = start + tuple(word_sequence) + (END_SYMBOL,)
+            for i in xrange(0, len(word_sequence) + 1):
+                yield (STATE_SEPARATOR.join(words_with_padding[i:i + self.ngram_size]),
+                       words_with_padding[i + self.ngram_size])
+            progress.increment('ngrams_counted', len(word_sequence) + 1)
+
+    def successors(self, ngram):
+        """ the words that can follow this n-gram, and their cumulative counts (for weighted random choice)
+
+        :return: (words, cumulative_counts), both tuples. empty tuples if the n-gram is not in the model
+        """
+        state = STATE_SEPARATOR.join(ngram)
+        try:
+            return self._cache[state]
+        except KeyError:
+            pass
+
+        with self._lock:
+            rows = self.connection.execute(
+                    "SELECT next_word, count FROM transitions WHERE state = ?", (state,)).fetchall()
+        words, cumulative_counts = [], []
+        total = 0
+        for next_word, count in rows:
+            total += count
+            words.append(next_word)
+            cumulative_counts.append(total)
+
+        entry = self._cache[state] = (tuple(words), tuple(cumulative_counts))
+        return entry
+
+    def next_word(self, ngram):
+        """ :return: a random successor of the n-gram, weighted by count; or None if the n-gram is a dead end
+        """
+        words, cumulative_counts = self.successors(ngram)
+        if not words:
+            return None
+        sample = random.random() * cumulative_counts[-1]
+        return words[bisect.bisect_right(cumulative_counts, sample)]
+
+    def iter_make_sentences(self, count=100):
+        """ The fun part! Generate probable sentences based on the model.
+
+        :return: (generator) yields lists-of-words.
+        """
+        start = (START_SYMBOL,) * self.ngram_size
+        for _ in xrange(count):
+            sentence = []
+            current_ngram = start
+            next_word = self.next_word(current_ngram)
+            while next_word is not None and next_word != END_SYMBOL:
+                sentence.append(next_word)
+                current_ngram = current_ngram[1:] + (next_word,)
+                next_word = self.next_word(current_ngram)
+            yield sentence
+
+    def prune(self, min_count=1, top_k=None):
+        """ drop rare transitions from the database, without leaving dead ends. (see `pruning` module.)
+
+        (the transitions are read into memory to be pruned; for a model too big for that, prune a smaller one.)
+
+        :return: `pruning.PruneReport` - with bytes_saved on disk, since that's where the model is
+        """
+        with self._lock, self.connection:
+            bytes_before = self._database_bytes()
+            counts = {}
+            for state, next_word, count in self.connection.execute("SELECT state, next_word, count FROM transitions"):
+                counts.setdefault(tuple(state.split(STATE_SEPARATOR)), {})[next_word] = count
+            pruned, report = pruning.prune_counts(
+                    counts, (START_SYMBOL,) * self.ngram_size, END_SYMBOL, min_count=min_count, top_k=top_k)
+            del counts
+            self.connection.execute("DELETE FROM transitions")
+            self.connection.executemany(
+                    "INSERT INTO transitions (state, next_word, count) VALUES (?, ?, ?)",
+                    ((STATE_SEPARATOR.join(ngram), next_word, count)
+                     for ngram, successors in pruned.iteritems() for next_word, count in successors.iteritems()))
+        with self._lock:
+            # (deleted rows only leave free pages behind; this hands them back)
+            self.connection.execute("VACUUM")
+            report = report._replace(bytes_saved=bytes_before - self._database_bytes())
+        self._cache.clear()
+        return report
+
+    def _database_bytes(self):
+        return (self.connection.execute("PRAGMA page_count").fetchone()[0] *
+                self.connection.execute("PRAGMA page_size").fetchone()[0])
+
+    @property
+    def cache_stats(self):
+        return self._cache.stats
+
+    def __len__(self):
+        """ count of states (n-grams that have successors) in the model
+        """
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(DISTINCT state) FROM transitions").fetchone()[0]
+
+    def __getstate__(self):
+        """ for pickling: a private temporary database goes away when closed, so its transition counts are copied.
+        a database at `db_file_path` is just referred to by path (it has to still be there when unpickling).
+        """
+        state = {'db_file_path': self.db_file_path, 'ngram_size': self.ngram_size, 'cache_size': self._cache.maxsize}
+        if self.db_file_path is None:
+            with self._lock:
+                state['transitions'] = self.connection.execute(
+                        "SELECT state, next_word, count FROM transitions").fetchall()
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(db_file_path=state['db_file_path'], ngram_size=state['ngram_size'],
+                      cache_size=state['cache_size'])
+        if state.get('transitions'):
+            with self._lock, self.connection:
+                self.connection.executemany(
+                        "INSERT INTO transitions (state, next_word, count) VALUES (?, ?, ?)", state['transitions'])
+
+    def close(self):
+        """ close the database connection. (if it was a temporary database, SQLite deletes it now.)
+        """
+        with self._lock:
+            self.connection.close()
+        self._cache.clear()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+""" 'any order' Markov text generation from a suffix array - trained once, usable at any n-gram size.
+
+If you're looking to generate text, don't *start* here. Start with the `text_makers` module!
+
+    >>> model = SuffixArrayModel([["A", "tokenized", "sentence."], ["A", "tokenized", "sentence."]])
+    >>> for word_sequence in model.iter_make_sentences(count=2, ngram_size=2):
+    ...     print " ".join(word_sequence)
+    A tokenized sentence.
+    A tokenized sentence.
+    >>> [" ".join(word_sequence) for word_sequence in model.iter_make_sentences(count=1, ngram_size=5)]
+    ['A tokenized sentence.']
+
+The other strategies count the successors of each n-gram, so they are trained for one n-gram size. This one keeps
+the corpus itself - as a stream of integer token ids, sentences separated by a boundary token - plus a suffix array:
+every position in the stream, sorted by the tokens that follow it. All the occurrences of any context (sequence of
+tokens) are then one contiguous range of the suffix array, found by binary search. To pick the next word, pick a
+random occurrence of the current context from its range, and take the token after it. (that's the same distribution
+as counting successors - common successors have more occurrences - without counting anything up front.)
+
+So the n-gram size is just how much context to look up, chosen when generating. Memory is linear in the corpus:
+two integer arrays the length of the token stream, plus the vocabulary.
+
+Suffixes are sorted by their first `max_context_size` tokens (prefix doubling: a few sorts, rather than comparing whole
+suffixes). so contexts up to that length work, which is far beyond useful n-gram sizes for text.
+"""
+import logging
+import random
+from array import array
+
+from presswork.text.progress import NO_PROGRESS
+
+logger = logging.getLogger("presswork")
+
+# marks sentence boundaries in the token stream: before the first sentence, and after each one
+BOUNDARY = 0
+
+# what next_word() returns at a sentence end (same as the other strategies' end symbol)
+END_SYMBOL = u""
+
+DEFAULT_MAX_CONTEXT_SIZE = 32
+
+MAX_WORDS_PER_SENTENCE = 100
+
+
+class SuffixArrayModel(object):
+    """ the token stream of a corpus & its suffix array (see module docstring)
+    """
+
+    def __init__(self, sentences_as_word_lists, max_context_size=DEFAULT_MAX_CONTEXT_SIZE, progress=NO_PROGRESS):
+        """
+        :param sentences_as_word_lists: list of lists of words/tokens. i.e. expects already-tokenized text.
+        :param max_context_size: longest context (n-gram size) that generation can look up
+        :param progress: (optional) a `presswork.text.progress.Progress`, to count 'ngrams_counted' (tokens, here)
+        """
+        self.max_context_size = max_context_size
+        # (only next_word() needs to look up words' ids; built on first use)
+        self._ids_by_word = None
+
+        # id 0 is the boundary; words are numbered from 1, in order of first appearance
+        self.words = [None]
+        ids_by_word = {}
+        stream = array('l', [BOUNDARY])
+        for word_sequence in sentences_as_word_lists:
+            for word in word_sequence:
+                word_id = ids_by_word.get(word)
+                if word_id is None:
+                    word_id = ids_by_word[word] = len(self.words)
+                    self.words.append(word)
+                stream.append(word_id)
+            stream.append(BOUNDARY)
+            progress.increment('ngrams_counted', len(word_sequence) + 1)
+
+        self.stream = stream
+        self.suffix_array = _build_suffix_array(stream, alphabet_size=len(self.words), max_length=max_context_size)
+        # the last boundary is followed by nothing: it's no sentence start. (every other occurrence of every context
+        # generation looks up is followed by a token)
+        self.suffix_array.remove(len(stream) - 1)
+
+    def __len__(self):
+        """ tokens in the stream (including sentence boundaries)
+        """
+        return len(self.stream)
+
+    def find(self, context):
+        """ :param context: sequence of token ids
+        :return: (start, end) range of the suffix array whose suffixes begin with the context. empty if it never occurs
+        """
+        stream, suffix_array, length = self.stream, self.suffix_array, len(context)
+        context = array('l', context)
+
+        low, high = 0, len(suffix_array)
+        while low < high:
+            middle = (low + high) // 2
+            position = suffix_array[middle]
+            if stream[position:position + length] < context:
+                low = middle + 1
+            else:
+                high = middle
+        start = low
+
+        high = len(suffix_array)
+        while low < high:
+            middle = (low + high) // 2
+            position = suffix_array[middle]
+            if stream[position:position + length] <= context:
+                low = middle + 1
+            else:
+                high = middle
+        return start, low
+
+    def next_token(self, context, rng=random):
+        """ :return: the id of a random successor of the context (by frequency), or None if the context never occurs
+        """
+        start, end = self.find(context)
+        if start == end:
+            return None
+        return self.stream[self.suffix_array[rng.randrange(start, end)] + len(context)]
+
+    def next_word(self, previous_words, ngram_size, rng=random):
+        """ one step of generation, by words rather than token ids: a random next word after the sentence so far
+
+        :return: the next word (END_SYMBOL if the sentence ends there); or None if the context never occurs
+        """
+        if self._ids_by_word is None:
+            self._ids_by_word = {word: word_id for word_id, word in enumerate(self.words) if word_id != BOUNDARY}
+        context = [BOUNDARY] + [self._ids_by_word.get(word, -1) for word in previous_words]
+        token = self.next_token(context[-ngram_size:], rng=rng)
+        if token is None:
+            return None
+        return END_SYMBOL if token == BOUNDARY else self.words[token]
+
+    def iter_make_sentences(self, count, ngram_size, rng=random):
+        """ :param ngram_size: how many of the previous tokens to look up (1 to max_context_size)
+        :return: (generator) yields lists-of-words
+        """
+        if not 1 <= ngram_size <= self.max_context_size:
+            raise ValueError("ngram_size must be from 1 to {}".format(self.max_context_size))
+
+        for _ in xrange(count):
+            # like the other strategies' start-of-sentence padding: a context that starts with the boundary token
+            context = [BOUNDARY]
+            sentence = []
+            while len(sentence) < MAX_WORDS_PER_SENTENCE:
+                token = self.next_token(context, rng=rng)
+                if token is None or token == BOUNDARY:
+                    break
+                sentence.append(self.words[token])
+                context.append(token)
+                if len(context) > ngram_size:
+                    del context[0]
+            yield sentence
+
+
+def _build_suffix_array(stream, alphabet_size, max_length):
+    """ positions of the stream, sorted by the (first max_length tokens of the) suffix starting at each one.
+
+    prefix doubling: each pass sorts by (rank of the first h tokens, rank of the h tokens after that), which is the
+    order of the first 2h tokens; stops once ranks are all distinct or h reaches max_length. (each pair of ranks is
+    packed into one integer, since ints sort much faster than tuples.)
+
+        >>> list(_build_suffix_array(array('l', [2, 1, 2, 1]), alphabet_size=3, max_length=8))
+        [3, 1, 2, 0]
+    """
+    size = len(stream)
+    rank = list(stream)
+    suffix_array = range(size)
+    # ranks are < radix; +1 so that "past the end" (-1) sorts before everything
+    radix = max(alphabet_size, size) + 1
+
+    h = 1
+    while True:
+        keys = [rank[i] * radix + (rank[i + h] + 1 if i + h < size else 0) for i in xrange(size)]
+        suffix_array.sort(key=keys.__getitem__)
+
+        distinct = 0
+        previous_key = None
+        for i in suffix_array:
+            if keys[i] != previous_key:
+                distinct += 1
+                previous_key = keys[i]
+            rank[i] = distinct - 1
+        del keys
+
+        h *= 2
+        if distinct == size or h >= max_length:
+            break
+
+    return array('l', suffix_array)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+""" prune a trained model: drop rare transitions (& the states only they led to), without leaving dead ends.
+
+Most states of a trained model are rare n-grams, seen once or twice - and generation hardly ever visits them. Pruning
+keeps, per state, only the next words seen at least `min_count` times, and/or only its `top_k` most common ones.
+
+Dropping transitions can strand generation: a state whose next words were all dropped, or that only leads into such
+states (or around in a loop) can no longer reach the end of a sentence. (for markovify, that's a crash or a hang; for
+the others, sentences that stop mid-way.) So pruning repairs what it breaks - any state that generation can still
+reach, but that can't reach a sentence end anymore, gets back its original transition with the shortest way to a
+sentence end. Then states that generation can't reach anymore are dropped.
+
+Works on a common structure, `{state: {next word: count}}` (each strategy converts its model to & from this):
+
+    >>> counts = {
+    ...     ("", ""): {"A": 3, "The": 1},
+    ...     ("", "A"): {"cat.": 2, "dog.": 1},
+    ...     ("A", "cat."): {"": 2},
+    ...     ("A", "dog."): {"": 1},
+    ...     ("", "The"): {"end.": 1},
+    ...     ("The", "end."): {"": 1},
+    ... }
+    >>> pruned, report = prune_counts(counts, start_state=("", ""), end_symbol="", min_count=2)
+    >>> sorted(pruned.items())
+    [(('', ''), {'A': 3}), (('', 'A'), {'cat.': 2}), (('A', 'cat.'), {'': 2})]
+    >>> report
+    PruneReport(states_before=6, states_removed=3, transitions_before=8, transitions_removed=5, bytes_saved=None)
+
+no transition after "A" was seen 3 times; but rather than a dead end there, the most common way on to an end is kept:
+
+    >>> pruned, report = prune_counts(counts, start_state=("", ""), end_symbol="", min_count=3)
+    >>> sorted(pruned.items())
+    [(('', ''), {'A': 3}), (('', 'A'), {'cat.': 2}), (('A', 'cat.'), {'': 2})]
+
+(bytes saved depend on how each strategy stores its model; text makers fill that in - see `BaseTextMaker`.)
+"""
+import collections
+import logging
+from operator import itemgetter
+
+logger = logging.getLogger("presswork")
+
+PruneReport = collections.namedtuple('PruneReport', [
+    'states_before',
+    'states_removed',
+    'transitions_before',
+    'transitions_removed',
+    'bytes_saved',
+])
+
+
+def next_ngram(state, word):
+    """ the usual state transition: slide the n-gram window along by one word
+    """
+    return state[1:] + (word,)
+
+
+def prune_counts(counts, start_state, end_symbol, next_state=next_ngram, min_count=1, top_k=None):
+    """ :param counts: the model, as `{state: {next word: count}}`. (not modified)
+    :param start_state: the state every sentence starts from
+    :param end_symbol: the 'next word' that ends a sentence
+    :param next_state: function of (state, next word) -> the state after that word
+    :param min_count: drop transitions seen fewer times than this
+    :param top_k: (optional) keep at most this many next words per state (the most common ones)
+    :return: (pruned counts, PruneReport)
+    """
+    steps_to_end = None
+    pruned = {}
+    repaired = set()
+
+    to_visit = [start_state] if start_state in counts else []
+    while to_visit:
+        # add every state generation can reach (through the transitions that are kept)
+        while to_visit:
+            state = to_visit.pop()
+            if state in pruned:
+                continue
+            pruned[state] = _most_common(counts[state], min_count, top_k)
+            to_visit.extend(_next_states(state, pruned[state], end_symbol, next_state, counts, pruned))
+
+        # repair the states that can't reach an end anymore
+        can_reach_end = _can_reach_end(pruned, end_symbol, next_state)
+        stranded = [state for state in pruned if state not in can_reach_end and state not in repaired]
+        if stranded and steps_to_end is None:
+            steps_to_end = _steps_to_end(counts, end_symbol, next_state)
+        for state in stranded:
+            # (a state that couldn't reach an end before pruning either, can't be repaired; it's only tried once)
+            repaired.add(state)
+            _restore_way_to_end(
+                    state, counts, pruned, steps_to_end, end_symbol, next_state, min_count, top_k, to_visit)
+
+    transitions_before = sum(len(successors) for successors in counts.itervalues())
+    report = PruneReport(
+            states_before=len(counts),
+            states_removed=len(counts) - len(pruned),
+            transitions_before=transitions_before,
+            transitions_removed=transitions_before - sum(len(successors) for successors in pruned.itervalues()),
+            bytes_saved=None)
+    logger.debug(u'pruned (min_count={}, top_k={}): {}'.format(min_count, top_k, report))
+    return pruned, report
+
+
+def _most_common(successors, min_count, top_k):
+    kept = [(word, count) for word, count in successors.iteritems() if count >= min_count]
+    if top_k is not None and len(kept) > top_k:
+        kept = sorted(kept, key=itemgetter(1), reverse=True)[:top_k]
+    return dict(kept)
+
+
+def _next_states(state, successors, end_symbol, next_state, counts, pruned):
+    """ states that the kept transitions lead to, and that aren't in `pruned` yet. (or in the model at all - a next
+    state that was never in the model is a dead end that was there before pruning, not one pruning made.)
+    """
+    next_states = []
+    for word in successors:
+        if word != end_symbol:
+            following = next_state(state, word)
+            if following in counts and following not in pruned:
+                next_states.append(following)
+    return next_states
+
+
+def _can_reach_end(pruned, end_symbol, next_state):
+    """ :return: set of the states that can reach a sentence end, through the pruned model's transitions
+    """
+    predecessors = collections.defaultdict(list)
+    reach_end = []
+    for state, successors in pruned.iteritems():
+        for word in successors:
+            if word == end_symbol:
+                reach_end.append(state)
+            else:
+                predecessors[next_state(state, word)].append(state)
+
+    can_reach = set(reach_end)
+    while reach_end:
+        for predecessor in predecessors.pop(reach_end.pop(), ()):
+            if predecessor not in can_reach:
+                can_reach.add(predecessor)
+                reach_end.append(predecessor)
+    return can_reach
+
+
+def _steps_to_end(counts, end_symbol, next_state):
+    """ :return: {state: fewest transitions from it to a sentence end}, in the original model
+    """
+    predecessors = collections.defaultdict(list)
+    steps = {}
+    for state, successors in counts.iteritems():
+        for word in successors:
+            if word == end_symbol:
+                steps[state] = 1
+            else:
+                predecessors[next_state(state, word)].append(state)
+
+    frontier = collections.deque(steps)
+    while frontier:
+        state = frontier.popleft()
+        for predecessor in predecessors.pop(state, ()):
+            if predecessor not in steps:
+                steps[predecessor] = steps[state] + 1
+                frontier.append(predecessor)
+    return steps
+
+
+def _restore_way_to_end(state, counts, pruned, steps_to_end, end_symbol, next_state, min_count, top_k, to_visit):
+    """ from this state, follow (& restore) the original transitions that reach a sentence end soonest. states along
+    the way that weren't in the pruned model are added; where their kept transitions lead is queued in `to_visit`
+    """
+    while state in steps_to_end:
+        best_word = None
+        for word, count in counts[state].iteritems():
+            steps = 0 if word == end_symbol else steps_to_end.get(next_state(state, word))
+            if steps == steps_to_end[state] - 1 and (best_word is None or count > counts[state][best_word]):
+                best_word = word
+        pruned[state][best_word] = counts[state][best_word]
+        if best_word == end_symbol:
+            return
+
+        state = next_state(state, best_word)
+        if state not in pruned:
+            pruned[state] = _most_common(counts[state], min_count, top_k)
+            to_visit.extend(_next_states(state, pruned[state], end_symbol, next_state, counts, pruned))
@@ -1,8 +1,11 @@
 """ adapters for the Markovify lib. consider this class private, and instead use TextMaker interface!
 """
 import markovify
+from markovify.chain import BEGIN, END
 
 from presswork import constants
+from presswork.text.markov import pruning
+from presswork.text.progress import NO_PROGRESS
 
 
 class Disabled(ValueError):
@@ -15,6 +18,41 @@ class NotYetImplementedInAdapter(NotImplementedError):
     """
 
 
+class ChainWithProgress(markovify.Chain):
+    """ markovify.Chain that counts 'ngrams_counted' on a `presswork.text.progress.Progress` while it builds.
+
+    markovify builds its model in one loop with no hooks, so build() is a copy of that loop (as of markovify 0.6.0)
+    with the counting added. the model it builds is identical.
+    """
+
+    def __init__(self, corpus, state_size, model=None, progress=NO_PROGRESS):
+        self.progress = progress
+        super(ChainWithProgress, self).__init__(corpus, state_size, model=model)
+        # (only needed while building; and this way the chain can be pickled)
+        self.progress = NO_PROGRESS
+
+    def build(self, corpus, state_size):
+        if (type(corpus) != list) or (type(corpus[0]) != list):
+            raise Exception("`corpus` must be list of lists")
+
+        model = {}
+
+        for run in corpus:
+            items = ([BEGIN] * state_size) + run + [END]
+            for i in range(len(run) + 1):
+                state = tuple(items[i:i + state_size])
+                follow = items[i + state_size]
+                if state not in model:
+                    model[state] = {}
+
+                if follow not in model[state]:
+                    model[state][follow] = 0
+
+                model[state][follow] += 1
+            self.progress.increment('ngrams_counted', len(run) + 1)
+        return model
+
+
 class MarkovifyLite(markovify.Text):
     """ modifies markovify.Text behavior (using public API). mainly disabling some 'eager' behaviors.
 
@@ -23,7 +61,8 @@ class MarkovifyLite(markovify.Text):
     """
 
     # noinspection PyMissingConstructor
-    def __init__(self, input_text=None, state_size=constants.DEFAULT_NGRAM_SIZE, chain=None, parsed_sentences=None):
+    def __init__(self, input_text=None, state_size=constants.DEFAULT_NGRAM_SIZE, chain=None, parsed_sentences=None,
+                 progress=NO_PROGRESS):
         """
         :param input_text: DISABLED, do not pass this. instead, pass parsed_sentences.
         :param ngram_size: the N in N-gram, AKA state size or window size, same as elsewhere
@@ -31,6 +70,7 @@ class MarkovifyLite(markovify.Text):
         :param parsed_sentences:  A list of lists i.e. [ [word, word, ...], [word, word, ...], ... ]
             Assumption - these should be sentence-tokenized & word-tokenized before passing to here.
             in text_makers module there will be a wrapper that does just that.
+        :param progress: (optional) a `presswork.text.progress.Progress`, to count 'ngrams_counted' while building
         """
         # NOTE: not calling super(); markovify.Text constructor does some things we don't want to do.
         # Overriding, satisfying same needs, but adapting to our purposes
@@ -42,13 +82,34 @@ class MarkovifyLite(markovify.Text):
         self.state_size = state_size
         self.parsed_sentences = parsed_sentences
 
-        self.chain = chain or markovify.Chain(self.parsed_sentences, state_size)
+        self.chain = chain or ChainWithProgress(self.parsed_sentences, state_size, progress=progress)
 
         # The "rejoined_text" variable is checked in make_sentences -> test_sentence_output, which
         # "assesses the novelty of sentences". This is a very cool feature, but so far it depends on the
         # 'eager' stringification that we are trying to get away from. For now, we'll disable it.
         self.rejoined_text = u'<DISABLED>'
 
+    def prune(self, min_count=1, top_k=None):
+        """ drop rare transitions from the chain, without leaving dead ends (which would crash markovify's generation)
+
+        :return: `pruning.PruneReport`
+        """
+        self.chain.model, report = pruning.prune_counts(
+                self.chain.model, (BEGIN,) * self.state_size, END, min_count=min_count, top_k=top_k)
+        self.chain.precompute_begin_state()
+        return report
+
+    def next_word(self, previous_words):
+        """ one step of generation: a random next word after the sentence so far (END if the sentence ends there)
+
+        :return: the next word; or None if the chain has no state for the last words
+        """
+        state = tuple(([BEGIN] * self.state_size + list(previous_words))[-self.state_size:])
+        try:
+            return self.chain.move(state)
+        except KeyError:
+            return None
+
     def sentence_join(self, sentences):
         """ Disable markovify's eager re-joining: make this method a no-op. (sentence_join *is* part of its public API)
 
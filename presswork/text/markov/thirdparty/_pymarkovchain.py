@@ -13,11 +13,26 @@ I originally forked it to bring NLTK into the mix for tokenizing (Original class
 ... but now, have hollowed it out further. (NLTK can be used at level above; tokenizing is decoupled now.)
 
 Markovify implementation is preferable for most uses but this implementation is kept here as a contrast or fallback.
+
+------------------------------------------------------------------------------------------------------------
+NOTES RE: THE DB
+============================================================================================================
+
+The original db was a flat dict, `{word_sequence: {next_word: probability}}`, holding every order from 1 to `window`:
+so ("a",), ("b", "a"), ("c", "b", "a") were each a key, each a tuple, and each word sequence's probabilities were a
+defaultdict. Now the db is a `TrieDB` - still dict-like, same keys & values, but stored as a trie of the word sequences
+read backwards (see `presswork.text.markov._ngram_trie`): ("c", "b", "a") is one step on from ("b", "a"), which is one
+step on from ("a",). So backoff - finding the longest state that the last words end with - is one walk down the trie,
+and frozen, each state is one flat tuple with its (cumulative) probabilities ready for sampling.
 """
 
 from __future__ import division
 
 from presswork import constants
+from presswork.text.markov import _ngram_trie
+from presswork.text.markov import pruning
+from presswork.text.progress import NO_PROGRESS
+from presswork.utils import gc_paused
 
 try:
     # try to use cPickle for better performance (python2)
@@ -26,6 +41,7 @@ except ImportError:  # pragma: no cover
     import pickle
 
 from collections import defaultdict
+import bisect
 import logging
 import os
 import random
@@ -35,28 +51,242 @@ import warnings
 SPECIAL_TOKEN = u''
 
 
+# (each weight starts at 1.0, before counting; see _increment)
+DEFAULT_WEIGHT = 1.0
+
+# indexes into a TrieDB node. (a node that isn't a state has only children.)
+CHILDREN = _ngram_trie.CHILDREN
+SUCCESSORS = 1
+# frozen states: (children, candidate with highest probability, candidate, cumulative probability, candidate, ...)
+MAX_PROBABILITY_WORD = 1
+CANDIDATES = 2
+
+
 def _db_factory():
     """ DB data structure: dict like  {word_sequence: {next_word: probability}}
     """
-    return defaultdict(_default_word_probability_dict)
+    return TrieDB()
 
 
 def _default_word_probability_dict():
-    """ defaultdict where each key has a value of 1.0 to start with (default probability)
-
-    data structure for PyMarkovChain model: dictionaries nested 1 deep: `{ngram: {next_word: probability, ...}, ...}`
+    """ (legacy: the flat db's defaultdicts. kept so that pickles of flat dbs still load; see __setstate__)
     """
     return defaultdict(_one)
 
 
 def _one():
-    return 1.0
+    return DEFAULT_WEIGHT
+
+
+def _increment(successors, word):
+    successors[word] = successors.get(word, DEFAULT_WEIGHT) + 1
+
+
+class TrieDB(object):
+    """ the db: dict-like, `{word_sequence: {next_word: probability}}` - stored as a trie (see module docstring).
+
+        >>> db = TrieDB()
+        >>> db.successors(("a",))["x"] = 0.5
+        >>> db.successors(("b", "a"))["y"] = 1.0
+        >>> len(db), ("b", "a") in db, ("b",) in db
+        (2, True, False)
+        >>> db.longest_state(("c", "b", "a"))[0], db.longest_state(("c", "a"))[0], db.longest_state(("c",))[0]
+        (('b', 'a'), ('a',), ())
+        >>> db.freeze()
+        >>> db[("b", "a")]
+        {'y': 1.0}
+
+    while training, nodes are lists: [{previous word: node}] or, for states, [{previous word: node}, {next word:
+    weight}]. frozen, nodes are flat tuples (see CANDIDATES), and children are compacted as in `_ngram_trie`.
+    """
+
+    def __init__(self):
+        self.root = [{}]
+        self.frozen = False
+        self._count_of_states = 0
+
+    def successors(self, word_sequence):
+        """ (for training) :return: the word sequence's {next word: weight} dict - added to the db if it wasn't a state
+        """
+        if self.frozen:
+            raise FrozenChainException("db has been frozen (for generation only), it cannot be trained further")
+        node = self.root
+        for word in reversed(word_sequence):
+            children = node[CHILDREN]
+            child = children.get(word)
+            if child is None:
+                child = children[word] = [{}]
+            node = child
+        if len(node) == 1:
+            node.append({})
+            self._count_of_states += 1
+        return node[SUCCESSORS]
+
+    def successors_of_suffixes(self, words, end, max_length):
+        """ (for training) like `successors`, for each of the word sequences that end at `end` in `words` and are up
+        to `max_length` long - shortest first - in one walk down the trie.
+        """
+        if self.frozen:
+            raise FrozenChainException("db has been frozen (for generation only), it cannot be trained further")
+        all_successors = []
+        node = self.root
+        for i in xrange(end - 1, max(end - max_length, 0) - 1, -1):
+            children = node[CHILDREN]
+            child = children.get(words[i])
+            if child is None:
+                child = children[words[i]] = [{}]
+            node = child
+            if len(node) == 1:
+                node.append({})
+                self._count_of_states += 1
+            all_successors.append(node[SUCCESSORS])
+        return all_successors
+
+    def state_node(self, word_sequence):
+        """ :return: the node of this state; None if it isn't a state
+        """
+        node = self.root
+        for word in reversed(word_sequence):
+            node = _ngram_trie.child(node[CHILDREN], word)
+            if node is None:
+                return None
+        return node if len(node) > 1 else None
+
+    def longest_state(self, last_words):
+        """ backoff: the longest state that the last words end with - one walk down the trie.
+
+        :return: (state, its node); or ((), None) if not even the last word is a state
+        """
+        node = self.root
+        state_length, state_node = 0, None
+        for length, word in enumerate(reversed(last_words), 1):
+            node = _ngram_trie.child(node[CHILDREN], word)
+            if node is None:
+                break
+            if len(node) > 1:
+                state_length, state_node = length, node
+        return tuple(last_words[len(last_words) - state_length:]), state_node
+
+    def freeze(self):
+        """ compact the trie for generation only: each state's probabilities become ready for sampling (see `sample`)
+        """
+        if not self.frozen:
+            self.root = _freeze_node(self.root)
+            self.frozen = True
+
+    @staticmethod
+    def sample(node, sample):
+        """ :param node: a frozen state's node
+        :param sample: a random number in [0, 1)
+        :return: the candidate whose cumulative probability is the first to reach the sample. (same as the original
+            loop that subtracted each probability from the sample; if rounding errors leave none, the most probable.)
+        """
+        if len(node) > CANDIDATES and sample <= node[-1]:
+            low, high = 0, (len(node) - CANDIDATES) // 2 - 1
+            while low < high:
+                middle = (low + high) // 2
+                if node[CANDIDATES + 1 + 2 * middle] < sample:
+                    low = middle + 1
+                else:
+                    high = middle
+            return node[CANDIDATES + 2 * low]
+        return node[MAX_PROBABILITY_WORD]
+
+    def _probabilities(self, node):
+        if not self.frozen:
+            return node[SUCCESSORS]
+        cumulative_probabilities = node[CANDIDATES + 1::2]
+        return dict(zip(node[CANDIDATES::2], (probability - previous for probability, previous in zip(
+                cumulative_probabilities, (0.0,) + cumulative_probabilities[:-1]))))
+
+    def __getitem__(self, word_sequence):
+        """ :return: the state's {next word: probability}. (while training, the db's own dict; frozen, a new one)
+        """
+        node = self.state_node(word_sequence)
+        if node is None:
+            raise KeyError(word_sequence)
+        return self._probabilities(node)
+
+    def get(self, word_sequence, default=None):
+        try:
+            return self[word_sequence]
+        except KeyError:
+            return default
+
+    def __contains__(self, word_sequence):
+        return self.state_node(word_sequence) is not None
+
+    def __len__(self):
+        return self._count_of_states
+
+    def iteritems(self):
+        """ yields (state, {next word: probability}), for every state. (depth first; the order is arbitrary)
+        """
+        to_visit = [(self.root, ())]
+        while to_visit:
+            node, word_sequence = to_visit.pop()
+            if len(node) > 1:
+                yield word_sequence, self._probabilities(node)
+            children = node[CHILDREN]
+            if isinstance(children, dict):
+                to_visit.extend((child, (word,) + word_sequence) for word, child in children.iteritems())
+            elif children:
+                to_visit.extend((children[i + 1], (children[i],) + word_sequence) for i in xrange(0, len(children), 2))
+
+    def __iter__(self):
+        return (word_sequence for word_sequence, _ in self.iteritems())
+
+    def keys(self):
+        return list(self)
+
+    @classmethod
+    def from_items(cls, items):
+        """ :param items: (state, {next word: probability}) pairs, i.e. from a flat dict db's iteritems()
+        """
+        db = cls()
+        for word_sequence, probabilities in items:
+            db.successors(word_sequence).update(probabilities)
+        return db
+
+
+def _freeze_node(node):
+    frozen_children = _ngram_trie.freeze_children(node[CHILDREN], _freeze_node)
+    if len(node) == 1:
+        return (frozen_children,)
+
+    flattened = [frozen_children, SPECIAL_TOKEN]
+    # (Comment from original:) since rounding errors might make us miss out on some words
+    maxprob = 0.0
+    total = 0.0
+    for candidate, probability in node[SUCCESSORS].iteritems():
+        # (Comment from original:) remember which word had the highest probability
+        # (Comment from original:) this is the word we'll default to if we can't find anything else
+        if probability > maxprob:
+            maxprob = probability
+            flattened[MAX_PROBABILITY_WORD] = candidate
+        total += probability
+        flattened.append(candidate)
+        flattened.append(total)
+    return tuple(flattened)
+
+
+def _as_trie_db(db):
+    """ :return: the db as a `TrieDB` (dbs pickled before it was one are flat dicts, `{word_sequence: {...}}`)
+    """
+    if isinstance(db, TrieDB):
+        return db
+    return TrieDB.from_items((word_sequence, dict(probabilities)) for word_sequence, probabilities in db.iteritems())
 
 
 class EndOfChainException(Exception):
     pass
 
 
+class FrozenChainException(ValueError):
+    """ raised if trying to train (or re-train) a chain after freeze() has been called
+    """
+
+
 class PyMarkovChainForked(object):
     """ A text model and text maker in a single class, with options for local filesystem persistence.
 
@@ -73,6 +303,11 @@ class PyMarkovChainForked(object):
         self.window = window
 
         self.db = None
+        self.frozen = False
+        # {state: sum of its next words' weights, before normalizing} - so pruning can get back to counts. (only kept
+        # when training with keep_state_totals=True: it's a dict as big as the db)
+        self.state_totals = {}
+        self._reset_indexes()
         self.db_file_path = db_file_path
         if self.db_file_path is not None:
             self.db_load()
@@ -85,10 +320,32 @@ class PyMarkovChainForked(object):
         if self.db_file_path:
             try:
                 with open(self.db_file_path, 'rb') as dbfile:
-                    self.db = pickle.load(dbfile)
+                    self.db = _as_trie_db(pickle.load(dbfile))
+                self._reset_indexes()
             except (IOError, ValueError):
                 logging.debug('db_file_path given, but unreadable (not found, or corrupt), using empty database')
 
+    def _reset_indexes(self):
+        """ drop the (lazily built) generation indexes. must be called whenever the db changes.
+
+        - sampling index: {state: (candidates, cumulative probabilities, candidate with highest probability)}
+
+        (backoff needs no index: it's one walk down the db's trie. and once frozen, the db's states are already compiled
+        for sampling, so this index is only used until then.)
+        """
+        self._sampling_index = {}
+
+    def __setstate__(self, state):
+        """ models pickled before the db was a trie have a flat dict db (& a backoff index); convert them when loaded
+        """
+        state.pop('_backoff_index', None)
+        self.__dict__.update(state)
+        if not isinstance(self.db, TrieDB):
+            self.db = _as_trie_db(self.db)
+            if self.frozen:
+                self.db.freeze()
+            self._reset_indexes()
+
     @property
     def _special_ngram(self):
         # The original PyMarkovChain implementation used this as a beginning (regardless of ngram size)
@@ -97,39 +354,106 @@ class PyMarkovChainForked(object):
         return (SPECIAL_TOKEN,)
 
     def increment_words(self, words):
-        self.db[self._special_ngram][words[0]] += 1
+        _increment(self.db.successors(self._special_ngram), words[0])
+
+    def markov_chain(self, sentences_as_word_lists, progress=NO_PROGRESS, keep_state_totals=False):
+        """ Generate word probability database from raw content string
 
-    def markov_chain(self, sentences_as_word_lists):
-        """ Generate word probability database from raw content string """
+        (progress: optional `presswork.text.progress.Progress`, to count 'ngrams_counted' as it goes)
+        (keep_state_totals: keep `state_totals`, which prune() needs. only worth it when the model will be pruned)
+        """
+        if self.frozen:
+            raise FrozenChainException("chain has been frozen (for generation only), it cannot be trained further")
 
         # (Comment from original:) using the database to temporarily store word counts
         # (Comment from original:) We need a special symbol for the beginning of a sentence.
-        self.db[self._special_ngram][SPECIAL_TOKEN] = 0.0
+        self._reset_indexes()
+        self.db.successors(self._special_ngram)[SPECIAL_TOKEN] = 0.0
+        with gc_paused():
+            self._count(sentences_as_word_lists, progress)
+
+        # (Comment from original:) We've now got the db filled with parametrized word counts
+        # (Comment from original:) We still need to normalize this to represent probabilities
+        for word, probabilities in self.db.iteritems():
+            wordsum = 0
+            for nextword in probabilities:
+                wordsum += probabilities[nextword]
+            if keep_state_totals:
+                self.state_totals[word] = wordsum
+            if wordsum != 0:
+                for nextword in probabilities:
+                    probabilities[nextword] /= wordsum
+
+    def _count(self, sentences_as_word_lists, progress):
         for word_seq in sentences_as_word_lists:
             if len(word_seq) == 0:
                 continue
             # (Comment from original:) first word follows a sentence end
             self.increment_words(word_seq)
 
-            for order in range(1, self.window + 1):
-                for i in range(len(word_seq) - 1):
-                    if i + order >= len(word_seq):
-                        continue
-                    word = tuple(word_seq[i:i + order])
-                    self.db[word][word_seq[i + order]] += 1
+            # (the original counted each order in turn, looking up each n-gram from scratch. the states of every order
+            # that end at the same word are one path in the trie, so they're counted together, in one walk per word)
+            for i in range(len(word_seq) - 1):
+                for successors in self.db.successors_of_suffixes(word_seq, i + 1, self.window):
+                    _increment(successors, word_seq[i + 1])
 
+            for order in range(1, self.window + 1):
                 # (Comment from original:) last word precedes a sentence end
-                self.db[tuple(word_seq[len(word_seq) - order:len(word_seq)])][SPECIAL_TOKEN] += 1
-
-        # (Comment from original:) We've now got the db filled with parametrized word counts
-        # (Comment from original:) We still need to normalize this to represent probabilities
-        for word in self.db:
-            wordsum = 0
-            for nextword in self.db[word]:
-                wordsum += self.db[word][nextword]
-            if wordsum != 0:
-                for nextword in self.db[word]:
-                    self.db[word][nextword] /= wordsum
+                _increment(self.db.successors(tuple(word_seq[len(word_seq) - order:len(word_seq)])), SPECIAL_TOKEN)
+
+            # (the sentence start, plus for each order: its n-grams in the sentence & the sentence end)
+            progress.increment('ngrams_counted', 1 + sum(max(0, len(word_seq) - order) + 1
+                                                         for order in range(1, self.window + 1)))
+
+    def freeze(self):
+        """ after training, compact the db for generation-only use. further calls to markov_chain() will be refused.
+
+        each state's dict of probabilities becomes a flat tuple, with its cumulative probabilities precomputed for
+        sampling (see `TrieDB`).
+        """
+        with gc_paused():
+            self.db.freeze()
+        self.frozen = True
+        self.state_totals = {}
+        self._reset_indexes()
+
+    def prune(self, min_count=1, top_k=None):
+        """ drop rare transitions, without leaving dead ends. (see `pruning` module.) must be done before freeze().
+
+        generation starts from the special n-gram, then uses the longest state that matches the last `window` words;
+        in a trained db (pruned or not), that's always the last `window` words themselves. so states that generation
+        never reaches - shorter ones, that are only there to back off to - are dropped as well.
+
+        :return: `pruning.PruneReport`
+        """
+        if self.frozen:
+            raise FrozenChainException("chain has been frozen; its counts are gone, so it can't be pruned")
+        if len(self.db) and not self.state_totals:
+            raise ValueError("to prune, train with markov_chain(..., keep_state_totals=True): the counts are gone")
+
+        # (each weight is its count + 1: weights start at 1.0 - see _increment)
+        counts = {}
+        for state, probabilities in self.db.iteritems():
+            total = self.state_totals.get(state, 0)
+            counts[state] = {word: int(round(probability * total)) - 1
+                             for word, probability in probabilities.iteritems() if probability * total > 1}
+
+        def next_state(state, word):
+            if state == self._special_ngram:
+                return (word,)
+            return (state + (word,))[-self.window:]
+
+        pruned, report = pruning.prune_counts(
+                counts, self._special_ngram, SPECIAL_TOKEN, next_state=next_state, min_count=min_count, top_k=top_k)
+        del counts
+
+        self.db = _db_factory()
+        self.state_totals = {}
+        for state, successors in pruned.iteritems():
+            total = self.state_totals[state] = float(sum(count + 1 for count in successors.itervalues()))
+            self.db.successors(state).update((word, (count + 1) / total) for word, count in successors.iteritems())
+        self._reset_indexes()
+        return report
 
     def db_dump(self):
         warnings.warn("Features of PyMarkovChainFork managing its own persistence are deprecated.")
@@ -150,36 +474,75 @@ class PyMarkovChainForked(object):
 
         return sentences
 
+    def next_word(self, previous_words):
+        """ one step of generation: a random next word after the sentence so far (same as make_sentences_list does)
+
+        :param previous_words: the words of the sentence so far (without the seed)
+        :return: the next word (SPECIAL_TOKEN if the sentence ends there); or None if no state matches the last words,
+            not even after backing off
+        """
+        if not previous_words:
+            return self._next_word(self._special_ngram)
+        last_words = tuple(previous_words[-self.window:])
+        if self.db.longest_state(last_words)[1] is None:
+            return None
+        return self._next_word(last_words)
+
     def _generate_sentence_as_list(self, seed):
-        """ (Comment from original:) Accumulate the generated sentence with a given single word as a seed """
+        """ (Comment from original:) Accumulate the generated sentence with a given single word as a seed
+
+        only the last `window` words can matter for the next word (no longer state is ever stored), so only those
+        are passed along - a sliding window - rather than the whole sentence so far.
+        """
         next_word = self._next_word(seed)
         sentence = list(seed) if seed else []
         while next_word:
             sentence.append(next_word)
-            next_word = self._next_word(sentence)
+            next_word = self._next_word(sentence[-self.window:])
         return sentence
 
     def _next_word(self, last_words):
         last_words = tuple(last_words)
-        if last_words != self._special_ngram:
-            while last_words not in self.db:
-                last_words = last_words[1:]
-                if not last_words:
-                    return SPECIAL_TOKEN
-        probmap = self.db[last_words]
+        if last_words == self._special_ngram:
+            node = self.db.state_node(last_words)
+        else:
+            # (backoff: the longest suffix of the last words that is a state. same as the original, which trimmed one
+            # word at a time from the front & looked each one up)
+            last_words, node = self.db.longest_state(last_words[-self.window:])
+        if node is None:
+            return SPECIAL_TOKEN
+
+        if self.db.frozen:
+            return TrieDB.sample(node, random.random())
+
+        try:
+            candidates, cumulative_probabilities, maxprobword = self._sampling_index[last_words]
+        except KeyError:
+            candidates, cumulative_probabilities, maxprobword = self._sampling_index[last_words] = \
+                self._compile_sampling_entry(last_words)
+
+        # (the cumulative probabilities are the same running sum the original loop did, precomputed once per state)
         sample = random.random()
+        if candidates and sample <= cumulative_probabilities[-1]:
+            return candidates[bisect.bisect_left(cumulative_probabilities, sample)]
+        # (Comment from original:) getting here means we haven't found a matching word. :(
+        return maxprobword
+
+    def _compile_sampling_entry(self, state):
+        probmap = self.db.get(state, {})
+        candidates = []
+        cumulative_probabilities = []
+        total = 0.0
         # (Comment from original:) since rounding errors might make us miss out on some words
         maxprob = 0.0
         maxprobword = SPECIAL_TOKEN
-        for candidate in probmap:
+        for candidate, probability in probmap.iteritems():
             # (Comment from original:) remember which word had the highest probability
             # (Comment from original:) this is the word we'll default to if we can't find anything else
-            if probmap[candidate] > maxprob:
-                maxprob = probmap[candidate]
+            if probability > maxprob:
+                maxprob = probability
                 maxprobword = candidate
-            if sample > probmap[candidate]:
-                sample -= probmap[candidate]
-            else:
-                return candidate
-        # (Comment from original:) getting here means we haven't found a matching word. :(
-        return maxprobword
+            total += probability
+            candidates.append(candidate)
+            cumulative_probabilities.append(total)
+        return candidates, cumulative_probabilities, maxprobword
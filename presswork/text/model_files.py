@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+""" save a trained TextMaker to a file, and load it back - so generating later skips reading, cleaning, tokenizing and
+training altogether.
+
+    >>> import os, tempfile
+    >>> from presswork.text import text_makers
+    >>> text_maker = text_makers.create_text_maker(
+    ...         strategy='crude', input_text=u"Simple is better than complex.", joiner='just_whitespace')
+    >>> model_file_path = os.path.join(tempfile.mkdtemp(), "zen.pwm")
+    >>> save_text_maker(text_maker, model_file_path)
+    >>> loaded = load_text_maker(model_file_path)
+    >>> print loaded.join(loaded.make_sentences(1)).strip()
+    Simple is better than complex.
+    >>> info = read_model_info(model_file_path)
+    >>> info['strategy'], info['tokenizer'], info['joiner'], info['ngram_size']
+    ('crude', 'just_whitespace', 'just_whitespace', 2)
+
+the file is a pickle of the TextMaker - its model, tokenizer & joiner included - plus a small header that describes
+its configuration. like any pickle, loading one can run code from the file: only load model files that you trust.
+"""
+import cPickle as pickle
+import os
+import tempfile
+
+from presswork.text.grammar import joiners
+from presswork.text.grammar import tokenizers
+
+FORMAT = 'presswork-model'
+FORMAT_VERSION = 1
+
+
+class ModelFileError(ValueError):
+    """ the file isn't a presswork model file (or is from an incompatible version)
+    """
+
+
+def save_text_maker(text_maker, file_path):
+    """ save a trained TextMaker (with its tokenizer, joiner & ngram_size) to a file. overwrites any existing file.
+
+    the file is written to a temporary name first, then renamed, so a failed save leaves no partial model file.
+    """
+    if not text_maker.is_locked:
+        raise ValueError("nothing to save: call input_text() on the text maker first")
+
+    header = {
+        'format': FORMAT,
+        'format_version': FORMAT_VERSION,
+        'strategy': text_maker.NICKNAME,
+        'tokenizer': tokenizers.nickname_of(text_maker.sentence_tokenizer),
+        'joiner': joiners.nickname_of(text_maker.joiner),
+        'ngram_size': text_maker.ngram_size,
+    }
+
+    directory = os.path.dirname(os.path.abspath(file_path))
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix='.presswork-model-')
+    try:
+        with os.fdopen(file_descriptor, 'wb') as f:
+            # the header is pickled on its own, first - so read_model_info() doesn't have to load the model
+            pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(text_maker, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(temporary_path, file_path)
+    except:
+        os.unlink(temporary_path)
+        raise
+
+
+def _read_header(f, file_path):
+    try:
+        header = pickle.load(f)
+    except Exception as e:
+        raise ModelFileError("{!r} is not a presswork model file ({})".format(file_path, e))
+    if not isinstance(header, dict) or header.get('format') != FORMAT:
+        raise ModelFileError("{!r} is not a presswork model file".format(file_path))
+    if header.get('format_version') != FORMAT_VERSION:
+        raise ModelFileError("{!r} is model file format version {}; this version of presswork reads version {}".format(
+                file_path, header.get('format_version'), FORMAT_VERSION))
+    return header
+
+
+def read_model_info(file_path):
+    """ :return: dict describing the saved text maker: `strategy`, `tokenizer`, `joiner` (nicknames) & `ngram_size`
+    :raises ModelFileError: if it's not a model file
+    """
+    with open(file_path, 'rb') as f:
+        return _read_header(f, file_path)
+
+
+def load_text_maker(file_path):
+    """ :return: the saved TextMaker, ready to make_sentences()
+    :raises ModelFileError: if it's not a model file
+    """
+    with open(file_path, 'rb') as f:
+        _read_header(f, file_path)
+        return pickle.load(f)
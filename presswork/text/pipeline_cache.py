@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+""" automatic on-disk cache for the CLI's pipeline, so a rerun over the same input skips the work it has done before.
+
+separate from explicit model files (`model_files`, `--save-model`) - this one needs no flags, and cleans up after
+itself. entries are content-addressed: keyed by a hash of the input bytes & encoding, plus the parameters each stage
+depends on. three tiers, each reused by reruns that only change what comes after it:
+
+    * 'cleaned' - the cleaned input text. key: input bytes + encoding
+    * 'tokenized' - the tokenized corpus. key: ... + tokenizer. (a rerun that changes only --strategy reuses this)
+    * 'model' - the trained text maker. key: ... + strategy + ngram_size (+ pruning, if any). (a rerun that changes
+      only --count or --join reuses this; the joiner is swapped in on the way out)
+
+for a directory of files (see `corpus_directory`), each file is a separate input for the 'tokenized' tier; so a rerun
+only tokenizes the new or modified files. (an 'index' entry per directory keeps each file's size, modification time &
+hash; a file whose size & modification time haven't changed isn't even read.) the model's key is made from all the
+files' keys.
+
+the cache is capped at `max_bytes` in total; beyond that, the least recently used entries are evicted. (an entry's
+modification time is its last use.) a corrupt or unreadable entry counts as a miss; a failure to write one is logged
+and otherwise ignored - the cache can only save work, never cause a run to fail.
+
+    >>> import tempfile
+    >>> cache = PipelineCache(directory=tempfile.mkdtemp())
+    >>> text_maker = cache.text_maker_for(b"Simple is better than complex.", 'utf-8', strategy='crude',
+    ...         sentence_tokenizer='just_whitespace', joiner='just_whitespace')
+    >>> sorted(cache.misses.items()), sorted(cache.hits.items())
+    ([('cleaned', 1), ('model', 1), ('tokenized', 1)], [])
+    >>> text_maker = cache.text_maker_for(b"Simple is better than complex.", 'utf-8', strategy='pymc',
+    ...         sentence_tokenizer='just_whitespace', joiner='just_whitespace')
+    >>> sorted(cache.hits.items())
+    [('tokenized', 1)]
+    >>> print text_maker.join(text_maker.make_sentences(1)).strip()
+    Simple is better than complex.
+"""
+import cPickle as pickle
+import collections
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from presswork import constants
+from presswork.text import clean
+from presswork.text import corpus_directory
+from presswork.text import input_streams
+from presswork.text import model_files
+from presswork.text import text_makers
+from presswork.text.grammar import joiners
+from presswork.text.grammar import tokenizers
+
+logger = logging.getLogger("presswork")
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# bump when what's stored in a tier changes shape, so old entries just stop matching
+CACHE_VERSION = 2
+
+TIERS = ('cleaned', 'tokenized', 'model', 'index')
+
+
+def default_cache_directory():
+    """ $XDG_CACHE_HOME/presswork, or ~/.cache/presswork
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'presswork')
+
+
+def _key(*parts):
+    return hashlib.sha1(json.dumps([CACHE_VERSION] + list(parts))).hexdigest()
+
+
+def input_key(input_bytes, input_encoding):
+    """ content address of an input: a hash of its bytes & encoding
+    """
+    digest = hashlib.sha1(input_bytes)
+    return _key(digest.hexdigest(), input_encoding)
+
+
+def _decode(input_bytes, input_encoding):
+    if input_encoding == "raw" or isinstance(input_bytes, unicode):
+        return input_bytes
+    return input_bytes.decode(input_encoding)
+
+
+class PipelineCache(object):
+    """ cleaned text, tokenized corpora & trained text makers, on disk (see module docstring)
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        :param directory: where to keep the cache. default: see default_cache_directory()
+        :param max_bytes: cap on the total size of the entries; least recently used entries are evicted beyond it
+        """
+        self.directory = directory or default_cache_directory()
+        self.max_bytes = max_bytes
+        # per tier, for logging & tests
+        self.hits = collections.Counter()
+        self.misses = collections.Counter()
+
+    def text_maker_for(self, input_bytes, input_encoding, strategy=text_makers.DEFAULT_TEXT_MAKER_NICKNAME,
+                       sentence_tokenizer='nltk', joiner='nltk', ngram_size=constants.DEFAULT_NGRAM_SIZE,
+                       **text_maker_kwargs):
+        """ a trained text maker for this input & these parameters - reusing whatever tiers of the cache it can.
+
+        :param input_bytes: the input, as read (not decoded yet: the hash is of the bytes)
+        :param input_encoding: its encoding; or 'raw', to leave the decoding to the cleaners
+        :param strategy, sentence_tokenizer, joiner: nicknames (as for create_text_maker())
+        :param text_maker_kwargs: (optional) other arguments for create_text_maker(), such as prune_min_count. (they're
+            part of the model's key)
+        """
+        cleaned_key = input_key(input_bytes, input_encoding)
+
+        def tokenize(text_maker):
+            cleaned_text = self._get('cleaned', cleaned_key)
+            if cleaned_text is not None:
+                input_text = clean.CleanInputString.from_cleaned(cleaned_text)
+            else:
+                input_text = clean.CleanInputString(_decode(input_bytes, input_encoding))
+                self._put('cleaned', cleaned_key, input_text.data)
+            return text_maker.input_text(input_text)
+
+        return self._text_maker(
+                cleaned_key, tokenize, strategy, sentence_tokenizer, joiner, ngram_size, text_maker_kwargs)
+
+    def text_maker_for_compressed_file(self, input_filename, input_encoding,
+                                       strategy=text_makers.DEFAULT_TEXT_MAKER_NICKNAME, sentence_tokenizer='nltk',
+                                       joiner='nltk', ngram_size=constants.DEFAULT_NGRAM_SIZE, **text_maker_kwargs):
+        """ like text_maker_for(), for a compressed file (see `input_streams`). it's streamed, never read whole - so
+        it's keyed by a hash of its compressed bytes, and there's no 'cleaned' tier for it.
+        """
+        compression = input_streams.detect_compression(input_filename)
+        content_key = _key(input_streams.hash_file(input_filename), input_encoding, compression)
+
+        def tokenize(text_maker):
+            sentences_as_word_lists = input_streams.tokenize_file(
+                    input_filename, input_encoding, text_maker.sentence_tokenizer)
+            text_maker.input_sentences(sentences_as_word_lists)
+            return sentences_as_word_lists
+
+        return self._text_maker(
+                content_key, tokenize, strategy, sentence_tokenizer, joiner, ngram_size, text_maker_kwargs)
+
+    def _text_maker(self, content_key, tokenize, strategy, sentence_tokenizer, joiner, ngram_size, text_maker_kwargs):
+        """ the model from the cache; or train one, from the tokenized input in the cache, or tokenize(text_maker)
+        (which trains text_maker & returns the tokenized input). caches what it had to make.
+        """
+        ngram_size = int(ngram_size)
+        # (deduplicating happens while tokenizing, so it changes what's tokenized)
+        dedup_kwargs = sorted((name, value) for name, value in text_maker_kwargs.items() if name.startswith('dedup'))
+        tokenized_key = _key(content_key, sentence_tokenizer, *dedup_kwargs)
+        model_key = _key(tokenized_key, strategy, ngram_size, *sorted(text_maker_kwargs.items()))
+
+        text_maker = self._get('model', model_key, load=model_files.load_text_maker)
+        if text_maker is not None:
+            text_maker.joiner = joiners.create_joiner(joiner)
+            return text_maker
+
+        text_maker = text_makers.create_text_maker(strategy=strategy, sentence_tokenizer=sentence_tokenizer,
+                                                   joiner=joiner, ngram_size=ngram_size, **text_maker_kwargs)
+
+        sentences_as_word_lists = self._get('tokenized', tokenized_key)
+        if sentences_as_word_lists is not None:
+            text_maker.input_sentences(sentences_as_word_lists)
+        else:
+            sentences_as_word_lists = tokenize(text_maker)
+            if hasattr(sentences_as_word_lists, 'unwrap'):
+                # plain lists pickle several times faster than the UserList containers
+                sentences_as_word_lists = sentences_as_word_lists.unwrap()
+            self._put('tokenized', tokenized_key, sentences_as_word_lists)
+
+        if text_maker.is_locked:
+            self._put('model', model_key, text_maker, dump=model_files.save_text_maker)
+        return text_maker
+
+    def text_maker_for_directory(self, directory, input_encoding, strategy=text_makers.DEFAULT_TEXT_MAKER_NICKNAME,
+                                 sentence_tokenizer='nltk', joiner='nltk', ngram_size=constants.DEFAULT_NGRAM_SIZE,
+                                 threads=corpus_directory.DEFAULT_READ_THREADS, **text_maker_kwargs):
+        """ like text_maker_for(), for a directory of files: only new or modified files are read & tokenized.
+
+        :param threads: how many files to read at once
+        """
+        ngram_size = int(ngram_size)
+        index_key = _key('directory', os.path.abspath(directory), input_encoding)
+        index = self._get('index', index_key) or {}
+
+        # size & modification time are checked first, so unchanged files don't even have to be read to be hashed
+        updated_index = {}
+        changed_paths = []
+        for path in corpus_directory.list_files(directory):
+            stat = os.stat(path)
+            size_and_mtime = [stat.st_size, stat.st_mtime]
+            if path in index and index[path][:2] == size_and_mtime and index[path][2]:
+                updated_index[path] = index[path]
+            else:
+                updated_index[path] = size_and_mtime + [None]
+                changed_paths.append(path)
+        logger.info(u'[cache] {} of {} files in {} are new or modified'.format(
+                len(changed_paths), len(updated_index), directory))
+
+        tokenizer = tokenizers.create_sentence_tokenizer(sentence_tokenizer)
+        sentences_by_path = {}
+        for path, input_bytes in corpus_directory.read_files(changed_paths, threads=threads):
+            content_key = input_key(input_bytes, input_encoding)
+            updated_index[path][2] = content_key
+            tokenized_key = _key(content_key, sentence_tokenizer)
+            if not os.path.exists(self._path('tokenized', tokenized_key)):
+                self.misses['tokenized'] += 1
+                sentences_by_path[path] = corpus_directory.tokenize_bytes(input_bytes, input_encoding, tokenizer)
+                self._put('tokenized', tokenized_key, sentences_by_path[path], evict=False)
+        self._put('index', index_key, updated_index, evict=False)
+
+        paths = sorted(updated_index)
+        tokenized_keys = [_key(updated_index[path][2], sentence_tokenizer) for path in paths]
+        model_key = _key('directory', tokenized_keys, strategy, ngram_size, *sorted(text_maker_kwargs.items()))
+
+        text_maker = self._get('model', model_key, load=model_files.load_text_maker)
+        if text_maker is not None:
+            text_maker.joiner = joiners.create_joiner(joiner)
+            self.evict()
+            return text_maker
+
+        sentences_as_word_lists = []
+        for path, tokenized_key in zip(paths, tokenized_keys):
+            sentences = sentences_by_path.pop(path, None)
+            if sentences is None:
+                sentences = self._get('tokenized', tokenized_key)
+            if sentences is None:
+                # (its entry was evicted, or is corrupt)
+                _, input_bytes = corpus_directory.read_files([path], threads=1).next()
+                sentences = corpus_directory.tokenize_bytes(input_bytes, input_encoding, tokenizer)
+                self._put('tokenized', tokenized_key, sentences, evict=False)
+            sentences_as_word_lists.extend(sentences)
+
+        text_maker = text_makers.create_text_maker(strategy=strategy, sentence_tokenizer=tokenizer, joiner=joiner,
+                                                   ngram_size=ngram_size, **text_maker_kwargs)
+        text_maker.input_sentences(sentences_as_word_lists)
+        self._put('model', model_key, text_maker, dump=model_files.save_text_maker, evict=False)
+        self.evict()
+        return text_maker
+
+    def _path(self, tier, key):
+        return os.path.join(self.directory, tier, key)
+
+    def _get(self, tier, key, load=None):
+        """ :return: the cached value, or None on a miss (including when the entry is corrupt)
+        """
+        path = self._path(tier, key)
+        if not os.path.exists(path):
+            self.misses[tier] += 1
+            return None
+        try:
+            if load:
+                value = load(path)
+            else:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+            # bump its last use, for LRU eviction
+            os.utime(path, None)
+        except Exception:
+            logger.warning(u'[cache] discarding unreadable {} entry {}'.format(tier, path), exc_info=True)
+            self._remove(path)
+            self.misses[tier] += 1
+            return None
+
+        self.hits[tier] += 1
+        logger.debug(u'[cache] {} hit: {}'.format(tier, key))
+        return value
+
+    def _put(self, tier, key, value, dump=None, evict=True):
+        directory = os.path.join(self.directory, tier)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            if dump:
+                dump(value, self._path(tier, key))
+            else:
+                # write to a temporary name, then rename; so a reader never sees a partial entry
+                file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix='.presswork-cache-')
+                try:
+                    with os.fdopen(file_descriptor, 'wb') as f:
+                        pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+                    os.rename(temporary_path, self._path(tier, key))
+                except:
+                    self._remove(temporary_path)
+                    raise
+        except (EnvironmentError, pickle.PicklingError, TypeError, ValueError):
+            logger.warning(u'[cache] could not write {} entry {}'.format(tier, key), exc_info=True)
+            return
+        if evict:
+            self.evict()
+
+    def entries(self):
+        """ :return: list of (last used, size in bytes, path) for every entry, oldest first
+        """
+        entries = []
+        for tier in TIERS:
+            directory = os.path.join(self.directory, tier)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name.startswith('.'):
+                    continue  # (another process's write in progress)
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # (evicted by another process meanwhile)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """ remove the least recently used entries, until the total size is within max_bytes
+        """
+        entries = self.entries()
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            logger.debug(u'[cache] evicting {}'.format(path))
+            self._remove(path)
+            total_bytes -= size
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+""" memory profiling for the text-making pipeline - which stage (and which strategy) blows the memory budget?
+
+For each strategy and each stage of the pipeline, measures:
+
+    * peak bytes allocated *while* the stage runs
+    * retained bytes - size of what the stage leaves behind (its output) after it finishes
+    * (for the trained model) count of n-gram states, and bytes per state
+
+Stages: clean (-> CleanInputString), tokenize (-> SentencesAsWordLists), train (-> the model held by the TextMaker),
+generate (-> sentences), output (join & proofread -> string).
+
+How "peak" is measured (see PEAK_BACKEND): with `tracemalloc` when it is importable (Python 3, or Python 2 with
+pytracemalloc). Otherwise, on Linux (glibc), by sampling the bytes allocated with malloc (`mallinfo`) on a background
+thread: unlike resident memory, this goes back down when memory is freed, so an allocation that re-uses memory freed
+earlier still counts. (Python's own small-object allocator keeps some freed memory to itself, so it's still a little
+coarser than tracemalloc.) Elsewhere, by sampling the resident set size (RSS) instead - that one under-reports
+allocations served from memory the process freed earlier, so the table's column says "peak RSS" then.
+
+Retained bytes are measured by walking the object graph (`deep_sizeof`), which is exact-ish & backend-independent.
+
+    >>> import logging; logging.disable(logging.CRITICAL)
+    >>> measurements = profile_pipeline(u"Foo is better than bar. Foo is better than baz.", strategy="crude", count=5)
+    >>> [m.stage for m in measurements]
+    ['clean', 'tokenize', 'train', 'generate', 'output']
+    >>> train = measurements[2]
+    >>> assert train.states > 0 and train.retained_bytes > 0 and train.bytes_per_state > 0
+
+The rows feed `capacity_plan`, which extrapolates from several corpus sizes to "how much RAM for how much corpus".
+From the command line, see `presswork memory-benchmark --help`.
+"""
+from __future__ import division
+
+import collections
+import ctypes
+import ctypes.util
+import gc
+import logging
+import resource
+import sys
+import threading
+import time
+from array import array
+
+from presswork import constants
+from presswork.text import clean
+from presswork.text import synthetic
+from presswork.text import text_makers
+
+try:
+    import tracemalloc  # Python 3.4+ (or Python 2 with the pytracemalloc patch & package)
+except ImportError:  # pragma: no cover
+    tracemalloc = None
+
+logger = logging.getLogger("presswork")
+
+STAGES = ('clean', 'tokenize', 'train', 'generate', 'output')
+
+StageMeasurement = collections.namedtuple('StageMeasurement', [
+    'strategy',
+    'stage',
+    'corpus_bytes',
+    'seconds',
+    'peak_bytes',
+    'retained_bytes',
+    'states',
+    'bytes_per_state',
+])
+
+# don't descend into these when walking the object graph; they are shared by everything & are not "data"
+_SKIP_TYPES = (type, type(sys), type(len), type(lambda: None), type(threading.Lock()))
+
+
+def deep_sizeof(obj):
+    """ approximate total size in bytes of an object, and everything it references (each object counted once).
+
+    descends into containers, __dict__ & __slots__ of instances. skips classes, modules, functions.
+
+        >>> assert deep_sizeof([]) == sys.getsizeof([])
+        >>> a_string = u"x" * 1000
+        >>> assert deep_sizeof([a_string]) == sys.getsizeof([a_string]) + sys.getsizeof(a_string)
+        >>> assert deep_sizeof([a_string, a_string]) < deep_sizeof([a_string, u"y" * 1000])  # shared counted once
+        >>> assert deep_sizeof({u"key": [1, 2, 3]}) > deep_sizeof({u"key": []})
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIP_TYPES):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+
+        if isinstance(current, (basestring, int, long, float, array)):
+            continue
+        elif isinstance(current, dict):
+            stack.extend(current.iterkeys())
+            stack.extend(current.itervalues())
+        elif isinstance(current, (list, tuple, set, frozenset, collections.deque)):
+            stack.extend(current)
+
+        if hasattr(current, '__dict__'):
+            stack.append(current.__dict__)
+        for slot in getattr(type(current), '__slots__', ()):
+            if hasattr(current, slot):
+                stack.append(getattr(current, slot))
+
+    return total
+
+
+class _MallInfo(ctypes.Structure):
+    # glibc's `struct mallinfo2` (size_t fields). its older `struct mallinfo` has the same fields, as ints
+    _fields_ = [(field, ctypes.c_size_t) for field in (
+        'arena', 'ordblks', 'smblks', 'hblks', 'hblkhd', 'usmblks', 'fsmblks', 'uordblks', 'fordblks', 'keepcost')]
+
+
+class _MallInfo32(ctypes.Structure):
+    # (read as unsigned: the counters wrap past 4G. glibc 2.33+ has mallinfo2, which doesn't)
+    _fields_ = [(field, ctypes.c_uint) for field, _ in _MallInfo._fields_]
+
+
+def _find_mallinfo():
+    """ :return: glibc's mallinfo2 (or mallinfo) function, ready to call; None where there's no such thing
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'))
+    except (OSError, TypeError):  # pragma: no cover
+        return None
+    for name, structure in (('mallinfo2', _MallInfo), ('mallinfo', _MallInfo32)):
+        function = getattr(libc, name, None)
+        if function is not None:
+            function.restype = structure
+            return function
+    return None  # pragma: no cover
+
+
+_mallinfo = _find_mallinfo()
+
+# how PeakMemoryTracker measures by default: 'tracemalloc', 'malloc' (sampling mallinfo) or 'rss' (sampling RSS)
+PEAK_BACKEND = 'tracemalloc' if tracemalloc is not None else ('malloc' if _mallinfo is not None else 'rss')
+
+
+def _malloc_bytes_in_use():
+    """ bytes allocated with malloc right now: small blocks from the heap, and big ones mmap-ed on their own
+    """
+    info = _mallinfo()
+    return info.uordblks + info.hblkhd
+
+
+def _current_rss_bytes():
+    """ resident set size of this process right now. (Linux /proc; elsewhere, falls back to the high-water mark)
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError, IndexError, ValueError):  # pragma: no cover
+        # ru_maxrss is in KB on Linux, bytes on OS X. it's a high-water mark, so it only tells us about new peaks
+        multiplier = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * multiplier
+
+
+class PeakMemoryTracker(object):
+    """ context manager - `peak_bytes` is the most memory allocated at any one point within the block (vs. baseline)
+
+    without tracemalloc (i.e. on python 2) it falls back to sampling, from a thread, the bytes allocated with malloc
+    (or where that can't be read, RSS - which is coarser: allocations served from memory the process freed earlier, &
+    didn't return to the OS, don't show up). see module docstring.
+
+        >>> with PeakMemoryTracker() as tracker:
+        ...     big = [0] * 2000000
+        >>> assert tracker.peak_bytes >= 2000000 * 8 or tracker.backend == 'rss'
+        >>> tracker.backend == PEAK_BACKEND
+        True
+    """
+
+    def __init__(self, sample_interval_seconds=0.001, use_tracemalloc=None):
+        self.sample_interval_seconds = sample_interval_seconds
+        if use_tracemalloc is None:
+            use_tracemalloc = tracemalloc is not None
+        self.use_tracemalloc = use_tracemalloc
+
+        self.peak_bytes = 0
+        self._baseline = 0
+        self._stopped = threading.Event()
+        self._sampler = None
+        self._tracemalloc_was_tracing = False
+
+    @property
+    def backend(self):
+        if self.use_tracemalloc:
+            return 'tracemalloc'
+        return 'malloc' if _mallinfo is not None else 'rss'
+
+    def _bytes_now(self):
+        return _malloc_bytes_in_use() if self.backend == 'malloc' else _current_rss_bytes()
+
+    def __enter__(self):
+        gc.collect()
+        if self.use_tracemalloc:
+            self._tracemalloc_was_tracing = tracemalloc.is_tracing()
+            if self._tracemalloc_was_tracing:
+                tracemalloc.stop()
+            tracemalloc.start()
+        else:
+            self._baseline = self._bytes_now()
+            self._stopped.clear()
+            self._sampler = threading.Thread(target=self._sample, name="presswork-memory-sampler")
+            self._sampler.daemon = True
+            self._sampler.start()
+        return self
+
+    def _sample(self):
+        while not self._stopped.is_set():
+            self.peak_bytes = max(self.peak_bytes, self._bytes_now() - self._baseline)
+            time.sleep(self.sample_interval_seconds)
+
+    def __exit__(self, *exc_info):
+        if self.use_tracemalloc:
+            _, peak = tracemalloc.get_traced_memory()
+            self.peak_bytes = peak
+            tracemalloc.stop()
+            if self._tracemalloc_was_tracing:  # pragma: no cover
+                tracemalloc.start()
+        else:
+            self._stopped.set()
+            self._sampler.join()
+            # one last sample, in case the stage was shorter than one sampling interval
+            self.peak_bytes = max(self.peak_bytes, self._bytes_now() - self._baseline, 0)
+        return False
+
+
+def profile_pipeline(
+        input_text,
+        strategy=text_makers.DEFAULT_TEXT_MAKER_NICKNAME,
+        sentence_tokenizer="just_whitespace",
+        joiner="just_whitespace",
+        ngram_size=constants.DEFAULT_NGRAM_SIZE,
+        count=100,
+        use_tracemalloc=None):
+    """ run the whole pipeline once for one strategy, measuring each stage. returns a list of StageMeasurement.
+
+    arguments are the same as for `text_makers.create_text_maker` (plus `count` of sentences to generate).
+    """
+    text_maker = text_makers.create_text_maker(
+            strategy=strategy, sentence_tokenizer=sentence_tokenizer, joiner=joiner, ngram_size=ngram_size)
+    strategy_name = getattr(text_maker, 'NICKNAME', None) or text_maker.__class__.__name__
+    corpus_bytes = len(input_text)
+
+    measurements = []
+    outputs = {}
+
+    def run_stage(stage, function):
+        with PeakMemoryTracker(use_tracemalloc=use_tracemalloc) as tracker:
+            started = time.time()
+            outputs[stage] = function()
+            seconds = time.time() - started
+
+        retained = outputs[stage]
+        states = bytes_per_state = None
+        if stage == 'train':
+            retained = text_maker.model
+            states = text_maker.count_states()
+
+        retained_bytes = deep_sizeof(retained)
+        if states:
+            bytes_per_state = retained_bytes / states
+
+        measurements.append(StageMeasurement(
+                strategy=strategy_name, stage=stage, corpus_bytes=corpus_bytes, seconds=seconds,
+                peak_bytes=tracker.peak_bytes, retained_bytes=retained_bytes,
+                states=states, bytes_per_state=bytes_per_state))
+
+    run_stage('clean', lambda: clean.CleanInputString(input_text))
+    run_stage('tokenize', lambda: text_maker.sentence_tokenizer.tokenize(outputs['clean']))
+    run_stage('train', lambda: text_maker.input_sentences(outputs['tokenize']))
+    run_stage('generate', lambda: text_maker.make_sentences(count))
+    run_stage('output', lambda: text_maker.proofread(text_maker.join(outputs['generate'])))
+
+    return measurements
+
+
+def profile_corpus_sizes(sizes, strategies=None, seed=None, **pipeline_kwargs):
+    """ run `profile_pipeline` for each strategy, over synthetic corpora of each size. returns flat list of rows.
+
+    :param sizes: list of sizes - ints, or strings like "256k", "4M" (see `synthetic.parse_size`)
+    :param strategies: list of strategy nicknames; defaults to all of them.
+    """
+    strategies = strategies or sorted(text_makers.TEXT_MAKER_NICKNAMES)
+    rows = []
+    for size in sizes:
+        text = synthetic.ZipfianCorpusGenerator(seed=seed).text(size)
+        for strategy in strategies:
+            logger.info(u"memory-profiling strategy={} corpus_bytes={}".format(strategy, len(text)))
+            rows.extend(profile_pipeline(text, strategy=strategy, **pipeline_kwargs))
+    return rows
+
+
+CapacityEstimate = collections.namedtuple('CapacityEstimate', [
+    'strategy',
+    'ram_bytes_per_corpus_byte',
+    'fixed_overhead_bytes',
+    'ram_bytes_for_target',
+    'max_corpus_bytes_for_budget',
+])
+
+
+def capacity_plan(rows, target_corpus_bytes=None, ram_budget_bytes=None):
+    """ from measurements at several corpus sizes, fit RAM ~= overhead + slope * corpus_bytes per strategy.
+
+    "RAM" here is the high-water mark of the pipeline: the biggest (peak + retained-so-far) over all stages.
+    it's a linear fit - a rough guide for capacity planning, not a promise. (n-gram states grow sub-linearly
+    with corpus size on natural text, so the extrapolation tends to err on the safe side.)
+
+        >>> rows = [StageMeasurement("x", "train", corpus_bytes=cb, seconds=0, peak_bytes=cb * 10, retained_bytes=0,
+        ...                          states=None, bytes_per_state=None) for cb in (1000, 2000, 3000)]
+        >>> plan = capacity_plan(rows, target_corpus_bytes=10 ** 6, ram_budget_bytes=10 ** 8)
+        >>> round(plan[0].ram_bytes_per_corpus_byte, 3), int(plan[0].ram_bytes_for_target)
+        (10.0, 10000000)
+        >>> int(plan[0].max_corpus_bytes_for_budget)
+        10000000
+    """
+    # within a run, the outputs of earlier stages are still alive while later stages run
+    retained_and_high_water_by_run = collections.OrderedDict()
+    for row in rows:
+        key = (row.strategy, row.corpus_bytes)
+        retained_so_far, high_water = retained_and_high_water_by_run.get(key, (0, 0))
+        high_water = max(high_water, retained_so_far + row.peak_bytes, retained_so_far + row.retained_bytes)
+        retained_and_high_water_by_run[key] = (retained_so_far + row.retained_bytes, high_water)
+
+    points_by_strategy = collections.OrderedDict()
+    for (strategy, corpus_bytes), (_, high_water) in retained_and_high_water_by_run.items():
+        points_by_strategy.setdefault(strategy, []).append((corpus_bytes, high_water))
+
+    estimates = []
+    for strategy, points in points_by_strategy.items():
+        slope, intercept = _linear_fit(points)
+        estimates.append(CapacityEstimate(
+                strategy=strategy,
+                ram_bytes_per_corpus_byte=slope,
+                fixed_overhead_bytes=intercept,
+                ram_bytes_for_target=(intercept + slope * target_corpus_bytes) if target_corpus_bytes else None,
+                max_corpus_bytes_for_budget=((ram_budget_bytes - intercept) / slope
+                                             if (ram_budget_bytes and slope > 0) else None),
+        ))
+    return estimates
+
+
+def _linear_fit(points):
+    """ least-squares fit of y = intercept + slope * x. with 1 point, assumes the line goes through the origin.
+    """
+    if len(points) == 1:
+        x, y = points[0]
+        return (float(y) / x if x else 0.0), 0.0
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if not variance:
+        return (mean_y / mean_x if mean_x else 0.0), 0.0
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+    return slope, mean_y - slope * mean_x
+
+
+def format_bytes(num_bytes):
+    """
+        >>> format_bytes(None), format_bytes(512), format_bytes(2048), format_bytes(3.5 * 1024 ** 3)
+        ('-', '512B', '2.0K', '3.5G')
+    """
+    if num_bytes is None:
+        return '-'
+    for unit in ('B', 'K', 'M', 'G'):
+        if abs(num_bytes) < 1024 or unit == 'G':
+            return ('{:.0f}{}' if unit == 'B' else '{:.1f}{}').format(num_bytes, unit)
+        num_bytes /= 1024.0
+
+
+def format_stage_table(rows, peak_backend=PEAK_BACKEND):
+    """ plain-text table of StageMeasurement rows, for terminals & logs
+
+    :param peak_backend: how the peaks were measured (see PEAK_BACKEND): RSS peaks are labelled as such
+    """
+    lines = [u"{:<12} {:>10} {:<9} {:>9} {:>10} {:>10} {:>9} {:>10}".format(
+            "strategy", "corpus", "stage", "seconds", "peak RSS" if peak_backend == 'rss' else "peak", "retained",
+            "states", "B/state")]
+    for row in rows:
+        lines.append(u"{:<12} {:>10} {:<9} {:>9.3f} {:>10} {:>10} {:>9} {:>10}".format(
+                row.strategy, format_bytes(row.corpus_bytes), row.stage, row.seconds,
+                format_bytes(row.peak_bytes), format_bytes(row.retained_bytes),
+                row.states if row.states is not None else '-',
+                '{:.1f}'.format(row.bytes_per_state) if row.bytes_per_state else '-'))
+    return u"\n".join(lines)
+
+
+def format_capacity_table(estimates):
+    """ plain-text table of CapacityEstimate rows, for terminals & logs
+    """
+    lines = [u"{:<12} {:>14} {:>10} {:>14} {:>16}".format(
+            "strategy", "RAM/corpus B", "overhead", "RAM @ target", "max corpus @ RAM")]
+    for estimate in estimates:
+        lines.append(u"{:<12} {:>14.1f} {:>10} {:>14} {:>16}".format(
+                estimate.strategy, estimate.ram_bytes_per_corpus_byte, format_bytes(estimate.fixed_overhead_bytes),
+                format_bytes(estimate.ram_bytes_for_target), format_bytes(estimate.max_corpus_bytes_for_budget)))
+    return u"\n".join(lines)
+
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+""" progress reporting for long-running work (like tokenizing & training on a big corpus)
+
+one thread does the work & updates a Progress; other threads can read `snapshot()` at any time (i.e. a status endpoint).
+the loops that report progress take a `progress` argument; they get NO_PROGRESS by default, which ignores everything,
+so they don't need to check whether anyone is listening.
+
+    >>> now = [100.0]
+    >>> progress = Progress(clock=lambda: now[0])
+    >>> progress.start_stage('tokenize')
+    >>> progress.increment('sentences_tokenized', 2)
+    >>> now[0] += 1.5
+    >>> progress.start_stage('train')
+    >>> progress.increment('ngrams_counted', 10)
+    >>> now[0] += 0.5
+    >>> progress.finish()
+    >>> snapshot = progress.snapshot()
+    >>> snapshot['counts'] == {'sentences_tokenized': 2, 'ngrams_counted': 10}
+    True
+    >>> snapshot['stage'], snapshot['stage_seconds']
+    (None, [('tokenize', 1.5), ('train', 0.5)])
+"""
+import threading
+import time
+
+
+class Progress(object):
+    """ counters, plus which stage the work is in & how long each stage took
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._stage = None
+        self._stage_started_at = None
+        self._stage_seconds = []
+
+    def increment(self, counter, amount=1):
+        with self._lock:
+            self._counts[counter] = self._counts.get(counter, 0) + amount
+
+    def start_stage(self, stage):
+        """ start timing a stage (and finish timing the current one, if any)
+        """
+        with self._lock:
+            self._finish_stage()
+            self._stage = stage
+            self._stage_started_at = self.clock()
+
+    def finish(self):
+        with self._lock:
+            self._finish_stage()
+
+    def _finish_stage(self):
+        if self._stage is not None:
+            self._stage_seconds.append((self._stage, self.clock() - self._stage_started_at))
+        self._stage = self._stage_started_at = None
+
+    def snapshot(self):
+        """ :return: dict with `counts` (by counter), the current `stage` (or None), and `stage_seconds`: a list of
+            (stage, seconds) for the finished stages, plus the current stage so far.
+        """
+        with self._lock:
+            stage_seconds = list(self._stage_seconds)
+            if self._stage is not None:
+                stage_seconds.append((self._stage, self.clock() - self._stage_started_at))
+            return {'counts': dict(self._counts), 'stage': self._stage, 'stage_seconds': stage_seconds}
+
+
+class _NoProgress(object):
+    """ null object - same interface as Progress, does nothing
+    """
+
+    def increment(self, counter, amount=1):
+        pass
+
+    def start_stage(self, stage):
+        pass
+
+    def finish(self):
+        pass
+
+    def snapshot(self):
+        return {'counts': {}, 'stage': None, 'stage_seconds': []}
+
+    def __reduce__(self):
+        # (pickles as a reference to the module-level instance, so unpickling doesn't make another)
+        return 'NO_PROGRESS'
+
+
+NO_PROGRESS = _NoProgress()
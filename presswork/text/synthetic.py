@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+""" synthetic corpora for scale testing - emit text of any size, as a stream, without shipping big fixture files.
+
+The plaintext fixtures under `tests/fixtures/plaintext` are nice & real, but far too small to show scaling behavior.
+This module makes "plausible enough" text of any size, with the knobs that matter for the pipeline:
+
+    * vocabulary drawn from a Zipf distribution (like natural language: few words are very common, most are rare)
+    * sentence lengths drawn from a (clipped) normal distribution
+    * a rate of punctuation tokens
+    * a share of non-ASCII characters and of control characters (to exercise `clean`, tokenizers, etc.)
+
+Output is streamed, so cleaning, tokenizing, training & generating can be stress-tested at GB scale. Seed it for
+reproducible runs.
+
+    >>> generator = ZipfianCorpusGenerator(vocabulary_size=50, seed=1234)
+    >>> sentences = list(itertools.islice(generator.iter_sentences(), 3))
+    >>> assert len(sentences) == 3
+    >>> assert all(sentence[0].isupper() and sentence[-1] in u".?!" for sentence in sentences)
+    >>> assert sentences == list(itertools.islice(ZipfianCorpusGenerator(vocabulary_size=50, seed=1234)
+    ...                                                .iter_sentences(), 3))
+    >>> chunks = list(generator.iter_chunks(size_in_bytes=10000))
+    >>> assert 10000 <= sum(len(chunk) for chunk in chunks) < 10000 + generator.chunk_size_in_bytes * 2
+    >>> assert all(isinstance(chunk, str) for chunk in chunks)
+
+Also available from the CLI: `presswork synthetic-corpus --size 1G > big.txt` (see `presswork.cli`).
+"""
+import bisect
+import itertools
+import random
+import re
+
+# frequent words should be short, rare words long - roughly like natural language. so pseudo-words are built up
+# from syllables, where the rank of the word (in the Zipf distribution) is "spelled" in base-len(SYLLABLES).
+SYLLABLES = (
+    u"a", u"e", u"i", u"o", u"u", u"ba", u"be", u"ca", u"co", u"da", u"de", u"di", u"fa", u"fo", u"ga", u"go",
+    u"ha", u"he", u"ka", u"ki", u"la", u"le", u"li", u"lo", u"ma", u"me", u"mi", u"mo", u"na", u"ne", u"ni", u"no",
+    u"pa", u"pe", u"po", u"ra", u"re", u"ri", u"ro", u"sa", u"se", u"si", u"so", u"ta", u"te", u"ti", u"to", u"va",
+    u"ve", u"wa", u"we", u"ya", u"yo", u"za", u"ze", u"th", u"st", u"nd", u"ng", u"rk", u"sh", u"ch", u"tr", u"pl",
+)
+
+MID_SENTENCE_PUNCTUATION = (u",", u",", u",", u";", u":", u"--")
+END_OF_SENTENCE_PUNCTUATION = (u".", u".", u".", u".", u"?", u"!")
+
+NON_ASCII_CHARACTERS = u"éèêëüöäßøåçñíóúœæžšłğıЖжДдЯяλπΩ日本語中文한국"
+CONTROL_CHARACTERS = u"".join(map(unichr, [0, 1, 7, 8, 11, 12, 27, 127, 133, 150]))
+
+_re_size = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*$', flags=re.IGNORECASE)
+_size_multipliers = {u"": 1, u"k": 1024, u"m": 1024 ** 2, u"g": 1024 ** 3, u"t": 1024 ** 4}
+
+
+def parse_size(size):
+    """ parse a human-friendly size into a number of bytes.
+
+        >>> parse_size("1024")
+        1024
+        >>> parse_size("10k"), parse_size("1.5M"), parse_size("1GB"), parse_size("2 GiB")
+        (10240, 1572864, 1073741824, 2147483648)
+        >>> import pytest
+        >>> with pytest.raises(ValueError): parse_size("a lot")
+    """
+    if isinstance(size, (int, long)):
+        return size
+    match = _re_size.match(size)
+    if not match:
+        raise ValueError(u"could not parse size {!r}; expected something like 500, 64k, 10M, 1G".format(size))
+    number, unit = match.groups()
+    return int(float(number) * _size_multipliers[unit.lower()])
+
+
+def pseudo_word(rank):
+    """ deterministic pseudo-word for a given (zero-based) rank. lower ranks get shorter words.
+
+        >>> [pseudo_word(rank) for rank in (0, 1, 63, 64, 65, 5000)]
+        [u'a', u'e', u'pl', u'aa', u'ae', u'afoco']
+    """
+    syllables = []
+    rank += 1
+    while rank > 0:
+        rank, remainder = divmod(rank - 1, len(SYLLABLES))
+        syllables.append(SYLLABLES[remainder])
+    return u"".join(reversed(syllables))
+
+
+class ZipfianCorpusGenerator(object):
+    """ generates an endless stream of pseudo-sentences with Zipf-distributed vocabulary.
+
+    (how "Zipfian"? the word of rank r is drawn with probability proportional to 1 / r**zipf_exponent.
+    natural language is usually said to be around exponent 1.0.)
+    """
+
+    chunk_size_in_bytes = 64 * 1024
+
+    def __init__(self,
+                 vocabulary_size=10000,
+                 zipf_exponent=1.07,
+                 mean_sentence_length=18,
+                 sentence_length_stddev=8,
+                 punctuation_rate=0.06,
+                 non_ascii_rate=0.0,
+                 control_character_rate=0.0,
+                 sentences_per_line=1,
+                 seed=None):
+        """
+        :param vocabulary_size: how many distinct words can appear (not counting punctuation)
+        :param zipf_exponent: the 's' of the Zipf distribution. higher is more skewed towards the most common words
+        :param mean_sentence_length: mean count of words per sentence
+        :param sentence_length_stddev: standard deviation of words per sentence (lengths are clipped to 1+)
+        :param punctuation_rate: chance (0-1.0) of mid-sentence punctuation after each word. sentences always end
+            with punctuation regardless.
+        :param non_ascii_rate: chance (0-1.0) per word, that one of its characters is swapped for a non-ASCII one
+        :param control_character_rate: chance (0-1.0) per word, that a control character is inserted into it
+        :param sentences_per_line: 1 (the default) means one sentence per line, which suits every tokenizer,
+            including 'just_whitespace'. higher values make paragraphs instead.
+        :param seed: seed for the pseudorandom generator, for reproducible corpora
+        """
+        if vocabulary_size < 1:
+            raise ValueError("vocabulary_size must be 1 or more")
+        for name, rate in (("punctuation_rate", punctuation_rate),
+                           ("non_ascii_rate", non_ascii_rate),
+                           ("control_character_rate", control_character_rate)):
+            if not 0.0 <= rate <= 1.0:
+                raise ValueError("{} must be between 0 and 1.0".format(name))
+
+        self.vocabulary_size = vocabulary_size
+        self.zipf_exponent = zipf_exponent
+        self.mean_sentence_length = mean_sentence_length
+        self.sentence_length_stddev = sentence_length_stddev
+        self.punctuation_rate = punctuation_rate
+        self.non_ascii_rate = non_ascii_rate
+        self.control_character_rate = control_character_rate
+        self.sentences_per_line = max(1, int(sentences_per_line))
+
+        self.random = random.Random(seed)
+
+        self._vocabulary = [pseudo_word(rank) for rank in xrange(vocabulary_size)]
+        self._cumulative_weights = list(_accumulate(1.0 / (rank ** zipf_exponent)
+                                                    for rank in xrange(1, vocabulary_size + 1)))
+
+    def _random_word(self):
+        r = self.random.random() * self._cumulative_weights[-1]
+        index = min(bisect.bisect(self._cumulative_weights, r), self.vocabulary_size - 1)
+        return self._vocabulary[index]
+
+    def _add_noise(self, word):
+        if self.non_ascii_rate and self.random.random() < self.non_ascii_rate:
+            i = self.random.randrange(len(word))
+            word = word[:i] + self.random.choice(NON_ASCII_CHARACTERS) + word[i + 1:]
+        if self.control_character_rate and self.random.random() < self.control_character_rate:
+            i = self.random.randrange(len(word) + 1)
+            word = word[:i] + self.random.choice(CONTROL_CHARACTERS) + word[i:]
+        return word
+
+    def _random_sentence_length(self):
+        return max(1, int(round(self.random.gauss(self.mean_sentence_length, self.sentence_length_stddev))))
+
+    def iter_sentences(self):
+        """ endless generator of sentence strings (unicode). use itertools.islice() etc. to take as many as you need.
+        """
+        while True:
+            words = []
+            for i in xrange(self._random_sentence_length()):
+                word = self._add_noise(self._random_word())
+                if i == 0:
+                    word = word[0].upper() + word[1:]
+                words.append(word)
+                if self.punctuation_rate and self.random.random() < self.punctuation_rate:
+                    words[-1] += self.random.choice(MID_SENTENCE_PUNCTUATION)
+            words[-1] = words[-1].rstrip(u",;:-") + self.random.choice(END_OF_SENTENCE_PUNCTUATION)
+            yield u" ".join(words)
+
+    def iter_lines(self):
+        """ endless generator of lines (unicode, each ending with newline), grouping `sentences_per_line` per line
+        """
+        sentences = self.iter_sentences()
+        while True:
+            yield u" ".join(itertools.islice(sentences, self.sentences_per_line)) + u"\n"
+
+    def iter_chunks(self, size_in_bytes, encoding='utf-8'):
+        """ generate at least `size_in_bytes` of encoded text, in chunks of about `chunk_size_in_bytes` each.
+
+        stops at the first line boundary after reaching the size, so no line (or multi-byte character) gets cut off.
+
+        :param size_in_bytes: int, or a string such as "500M" or "1G" (see `parse_size`)
+        :rtype: generator of str (bytes)
+        """
+        size_in_bytes = parse_size(size_in_bytes)
+        bytes_so_far = 0
+        buffered, buffered_size = [], 0
+
+        for line in self.iter_lines():
+            if bytes_so_far + buffered_size >= size_in_bytes:
+                break
+            encoded = line.encode(encoding)
+            buffered.append(encoded)
+            buffered_size += len(encoded)
+            if buffered_size >= self.chunk_size_in_bytes:
+                yield b"".join(buffered)
+                bytes_so_far += buffered_size
+                buffered, buffered_size = [], 0
+
+        if buffered:
+            yield b"".join(buffered)
+
+    def text(self, size_in_bytes):
+        """ convenience for smaller sizes: return (at least) this many bytes of text, decoded as one unicode string
+        """
+        return b"".join(self.iter_chunks(size_in_bytes)).decode('utf-8')
+
+
+def _accumulate(iterable):
+    total = 0
+    for element in iterable:
+        total += element
+        yield total
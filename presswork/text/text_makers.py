@@ -55,18 +55,32 @@ design notes -- TextMaker and its collaborators
     * What about the collaborators? See `grammar` package, starting with grammar.__init__
 
 """
+import copy
 import logging
+import random
 
 from presswork import constants
 from presswork.text import clean
+from presswork.text import dedup as deduplication
+from presswork.text import model_files
 from presswork.text.grammar import joiners, tokenizers
 from presswork.text.grammar.containers import SentencesAsWordLists
 from presswork.text.markov import _crude_markov
+from presswork.text.markov import _ngram_trie
+from presswork.text.markov import _sketch_markov
+from presswork.text.markov import _sqlite_markov
+from presswork.text.markov import _suffix_array_markov
+from presswork.text.markov.thirdparty._markovify import END as MARKOVIFY_END
 from presswork.text.markov.thirdparty._markovify import MarkovifyLite
 from presswork.text.markov.thirdparty._pymarkovchain import PyMarkovChainForked
+from presswork.text.markov.thirdparty._pymarkovchain import SPECIAL_TOKEN
+from presswork.text.progress import NO_PROGRESS
 
 logger = logging.getLogger("presswork")
 
+# what next_word() returns when the sentence ends (a sentinel: it can't be confused with any word)
+END_OF_SENTENCE = object()
+
 
 class BaseTextMaker(object):
     """ common-denominator interface for making text from a generative model - so far, from markov chain models
@@ -83,7 +97,9 @@ class BaseTextMaker(object):
     See also: overall design notes at the header of the module, which covers TextMakers as well as collaborators.
     """
 
-    def __init__(self, ngram_size=constants.DEFAULT_NGRAM_SIZE, sentence_tokenizer=None, joiner=None):
+    def __init__(self, ngram_size=constants.DEFAULT_NGRAM_SIZE, sentence_tokenizer=None, joiner=None,
+                 keep_training_data=False, progress=None, prune_min_count=None, prune_top_k=None, dedup=None,
+                 dedup_keep_weights=False):
         """
         :param ngram_size: N-gram size aka state size - see general Markov Chain info for explanation -
             this needs to be known both at the generate/load of the model (i.e. markov chain),
@@ -98,8 +114,37 @@ class BaseTextMaker(object):
 
         :param joiner: if not given, uses a default. this can be one of the joiners from the `grammar` package.
             or anything that implements `.join()` for a list of word-lists (same structure as sentence_tokenizer)
+
+        :param keep_training_data: by default, upon locking, training-only data is dropped or compacted ("frozen"),
+            since only the model is needed for making sentences. pass True to opt out - then the tokenized input is
+            kept at `self.training_sentences`, and the strategy keeps its mutable training structures.
+
+        :param progress: (optional) a `presswork.text.progress.Progress`. input_text() reports its stages to it
+            ('clean', 'tokenize', 'train') and counts 'sentences_tokenized' & 'ngrams_counted' as it goes. (for watching
+            big inputs train, i.e. from another thread.)
+
+        :param prune_min_count: (optional) after training, prune the model: drop transitions seen fewer times than this
+        :param prune_top_k: (optional) after training, prune the model: keep only the most common K next words per
+            state. (either way, pruning leaves no new dead ends - see `presswork.text.markov.pruning`. what it saved is
+            in `self.prune_report`.)
+
+        :param dedup: (optional) 'exact' or 'near': input_text() only word-tokenizes sentences it hasn't seen yet (or
+            nearly the same, for 'near'). see `presswork.text.dedup`. what it saved is in `self.dedup_report`.
+        :param dedup_keep_weights: with dedup, keep the duplicates - as the first one's tokenized sentence - so they
+            still count as many times in the model, but are only tokenized once
         """
         self._ngram_size = ngram_size
+        self.keep_training_data = keep_training_data
+        self.training_sentences = None
+        self.progress = progress or NO_PROGRESS
+        self.prune_min_count = prune_min_count
+        self.prune_top_k = prune_top_k
+        self.prune_report = None
+        if dedup is not None and dedup not in deduplication.DEDUP_MODES:
+            raise ValueError("dedup must be one of {}, not {!r}".format(deduplication.DEDUP_MODES, dedup))
+        self.dedup = dedup
+        self.dedup_keep_weights = dedup_keep_weights
+        self.dedup_report = None
 
         if not sentence_tokenizer:
             logger.debug("no sentence_tokenizer argument given, defaulting to cheapest tokenizers")
@@ -109,6 +154,9 @@ class BaseTextMaker(object):
             self.sentence_tokenizer = sentence_tokenizer
         else:
             raise ValueError("sentence_tokenizer must implement a tokenize() method")
+        if dedup and not isinstance(self.sentence_tokenizer, tokenizers.BaseSentenceTokenizer):
+            raise ValueError("dedup needs one of the tokenizers from `grammar` (it goes between its sentence & word "
+                             "tokenizing)")
 
         if not joiner:
             logger.debug("no joiner argument given, defaulting to cheapest joiner")
@@ -144,27 +192,111 @@ class BaseTextMaker(object):
         main effect is to change the state of the instance. the instance stores the strategy, the strategy
          stores the markov chain model it learns from the input text.
 
-        :return: (optional) also returns the tokenized input text; this is mainly relevant for testing purposes
+        :return: (optional) also returns the tokenized input text; this is mainly relevant for testing purposes.
+            (the TextMaker itself doesn't hold onto it unless keep_training_data=True, so for big inputs, callers
+            that don't need it shouldn't hold onto it either.)
         """
         if self.is_locked:
             raise TextMakerIsLockedException("locked! has input_text() already been called? (can only be called once)")
 
+        self.progress.start_stage('clean')
         input_text = clean.CleanInputString(input_text)
-        sentences_as_word_lists = self.sentence_tokenizer.tokenize(input_text)
 
+        self.progress.start_stage('tokenize')
+        if self.dedup:
+            deduplicator = deduplication.create_deduplicator(self.dedup, keep_weights=self.dedup_keep_weights)
+            sentences_as_word_lists = self.sentence_tokenizer.tokenize(
+                    input_text, progress=self.progress, deduplicator=deduplicator)
+            self.dedup_report = deduplicator.report
+            logger.info(u'dedup: {} of {} sentences were duplicates ({:.1%})'.format(
+                    self.dedup_report.sentences - self.dedup_report.unique_sentences, self.dedup_report.sentences,
+                    self.dedup_report.reduction_ratio))
+        elif isinstance(self.sentence_tokenizer, tokenizers.BaseSentenceTokenizer):
+            sentences_as_word_lists = self.sentence_tokenizer.tokenize(input_text, progress=self.progress)
+            memo = self.sentence_tokenizer.memo
+            if memo is not None:
+                logger.info(u'word tokenization memo: {:.1%} hit rate ({} hits, {} misses)'.format(
+                        memo.hit_rate, memo.hits, memo.misses))
+        else:
+            # (tokenizers that just quack like ours only have to implement tokenize(text))
+            sentences_as_word_lists = self.sentence_tokenizer.tokenize(input_text)
+
+        return self.input_sentences(sentences_as_word_lists)
+
+    def input_sentences(self, sentences_as_word_lists):
+        """ build a fresh model from already-tokenized text. (input_text() is clean + tokenize + this.)
+
+        useful when the tokenizing is done elsewhere, or was done before (such as when profiling, or caching).
+        same lock rules as input_text(): can only be called once. (dedup doesn't apply: it's part of tokenizing.)
+
+        :param sentences_as_word_lists: list of lists. SentencesAsWordLists, or anything that quacks like that.
+        :return: (optional) the same sentences_as_word_lists; mainly relevant for testing purposes
+        """
+        if self.is_locked:
+            raise TextMakerIsLockedException("locked! has input_text() already been called? (can only be called once)")
+
+        self.progress.start_stage('train')
         self._input_text(sentences_as_word_lists)
+        if self.prune_min_count or self.prune_top_k:
+            self.progress.start_stage('prune')
+            self.prune_report = self._prune_model()
+        if self.keep_training_data:
+            self.training_sentences = sentences_as_word_lists
         self._lock()
+        self.progress.finish()
 
         return sentences_as_word_lists
 
+    def next_word(self, previous_words):
+        """ one step of generation: a random next word after the sentence so far, from the trained model.
+        (make_sentences() doesn't go through this - strategies generate whole sentences their own way - but it's the
+        same distribution. it's what `TextMakerMixture` samples from.)
+
+        :param previous_words: the words of the sentence so far (a list; empty at the start of a sentence)
+        :return: the next word; END_OF_SENTENCE if the sentence ends there; or None if the model doesn't know
+            the context (i.e. the last words are an n-gram it never saw)
+        """
+        raise NotImplementedError()
+
     def _input_text(self, sentences_as_word_lists):
         """ build a fresh model from this input text. (private; should contain the impl or adapter.)
 
         :param sentences_as_word_lists: list of lists. SentencesAsWordLists, or anything that quacks like that.
             typically passed in from self.sentence_tokenizer.tokenize()
+
+        implementations should count 'ngrams_counted' on `self.progress` as they go.
         """
         raise NotImplementedError()
 
+    def _prune_model(self):
+        """ prune the freshly trained model, per prune_min_count & prune_top_k. :return: a `pruning.PruneReport`
+        """
+        from presswork.text import profiling  # (imports this module)
+        # (only the model changes, so only the model is measured)
+        model = self._model_in_memory()
+        bytes_before = profiling.deep_sizeof(model) if model is not None else None
+        report = self._prune(min_count=self.prune_min_count or 1, top_k=self.prune_top_k)
+        if report.bytes_saved is None and bytes_before is not None:
+            report = report._replace(bytes_saved=bytes_before - profiling.deep_sizeof(self._model_in_memory()))
+        logger.info(u'pruned {} of {} states, {} of {} transitions, {} bytes'.format(
+                report.states_removed, report.states_before, report.transitions_removed, report.transitions_before,
+                report.bytes_saved))
+        return report
+
+    def _prune(self, min_count, top_k):
+        """ prune the trained model (before it's locked). (private; each subclass adapts its strategy's pruning.)
+
+        :return: a `pruning.PruneReport`. (bytes_saved can be left None: then it's measured in memory, by the caller)
+        """
+        raise NotImplementedError("{} models can't be pruned".format(self.__class__.__name__))
+
+    def _model_in_memory(self):
+        """ the trained model, locked or not yet - for measuring it in memory. None if it isn't in memory.
+
+        (private; default: `self.model`)
+        """
+        return self.model
+
     def join(self, sentences_as_word_lists):
         """ join back together to a string. convenience method, that simply forwards to `self.joiner.join()`
 
@@ -185,6 +317,19 @@ class BaseTextMaker(object):
         """
         return self.proofreader.proofread(text)
 
+    @property
+    def model(self):
+        """ the trained model, in whatever structure the strategy uses. (for inspection, profiling, reporting.)
+
+        None until input_text() has been called.
+        """
+        raise NotImplementedError()
+
+    def count_states(self):
+        """ how many states (n-grams that have successors) the trained model holds. 0 until input_text() is called.
+        """
+        return len(self.model or ())
+
     @property
     def ngram_size(self):
         return self._ngram_size
@@ -199,23 +344,66 @@ class BaseTextMaker(object):
                     "to avoid unintended mixing of ngram_size values")
         self._ngram_size = value
 
+    def view(self, ngram_size):
+        """ :return: a text maker for another ngram_size, sharing this one's trained model (& tokenizer, joiner)
+
+        only for strategies whose ngram_size can change after locking ('suffix', 'trie'); with the others, setting
+        ngram_size raises TextMakerIsLockedException.
+        """
+        if not self.is_locked:
+            raise ValueError("nothing to share yet: call input_text() first")
+        text_maker = copy.copy(self)
+        text_maker.ngram_size = ngram_size
+        return text_maker
+
     def _lock(self):
         """ lock upon first input_text call, to avoid changing things after loading input text for the first time
 
         (this is private, subclasses or callers should not need to call it or think about it.)
         """
         self._locked = True
+        if not self.keep_training_data:
+            self._freeze()
+            # (the tokenizer's memo of word tokenizations is only for tokenizing training input)
+            if getattr(self.sentence_tokenizer, 'memo', None) is not None:
+                self.sentence_tokenizer.memo.clear()
+            # (and its vocabulary's table of word IDs, only for a model of word IDs. the interned words are kept)
+            if not self._uses_word_ids() and getattr(self.sentence_tokenizer, 'vocabulary', None) is not None:
+                self.sentence_tokenizer.vocabulary = None
+
+    def _freeze(self):
+        """ after locking, only the model is needed to make sentences. drop or compact training-only structures.
+
+        (private; each subclass knows what its strategy holds onto. default: nothing to do.)
+        """
+
+    def _uses_word_ids(self):
+        """ whether the model stores words as IDs in the sentence tokenizer's vocabulary, so it needs to keep it.
+
+        (private; default: no.)
+        """
+        return False
 
     @property
     def is_locked(self):
         return self._locked
 
+    def __getstate__(self):
+        """ for pickling (i.e. see `model_files`). progress is only for watching training, so it isn't kept.
+        """
+        state = self.__dict__.copy()
+        state['progress'] = NO_PROGRESS
+        return state
+
     def clone(self):
         """ create a new instance with the same constructor arguments. (helps with a test, if nothing else)
         """
         if self.is_locked:
             raise TextMakerIsLockedException('instance is locked! copying might be unsafe, aborting for max safety')
-        return self.__class__(ngram_size=self.ngram_size, sentence_tokenizer=self.sentence_tokenizer)
+        return self.__class__(ngram_size=self.ngram_size, sentence_tokenizer=self.sentence_tokenizer,
+                              keep_training_data=self.keep_training_data, prune_min_count=self.prune_min_count,
+                              prune_top_k=self.prune_top_k, dedup=self.dedup,
+                              dedup_keep_weights=self.dedup_keep_weights)
 
 
 class TextMakerPyMarkovChain(BaseTextMaker):
@@ -230,12 +418,30 @@ class TextMakerPyMarkovChain(BaseTextMaker):
                 db_file_path=None)
 
     def _input_text(self, sentences_as_word_lists):
-        self.strategy.markov_chain(sentences_as_word_lists)
+        self.strategy.markov_chain(sentences_as_word_lists, progress=self.progress,
+                                   keep_state_totals=bool(self.prune_min_count or self.prune_top_k))
+
+    def _prune(self, min_count, top_k):
+        return self.strategy.prune(min_count=min_count, top_k=top_k)
+
+    def _model_in_memory(self):
+        return self.strategy.db
+
+    def _freeze(self):
+        self.strategy.freeze()
+
+    def next_word(self, previous_words):
+        word = self.strategy.next_word(previous_words)
+        return END_OF_SENTENCE if word == SPECIAL_TOKEN else word
 
     def make_sentences(self, count):
         result = self.strategy.make_sentences_list(number=count)
         return SentencesAsWordLists(result)
 
+    @property
+    def model(self):
+        return self.strategy.db if self.is_locked else None
+
 
 class TextMakerCrude(BaseTextMaker):
     """ text maker using homegrown 'crude' implementation
@@ -245,18 +451,69 @@ class TextMakerCrude(BaseTextMaker):
     NICKNAME = 'crude'
 
     def __init__(self, *args, **kwargs):
+        """
+        :param hashed_keys: (optional) key the model by 64-bit rolling hashes of the n-grams, rather than by n-gram
+            tuples: a smaller model, same text. (see _crude_markov.HashedKeysModel)
+        """
+        self.hashed_keys = kwargs.pop('hashed_keys', False)
         super(TextMakerCrude, self).__init__(*args, **kwargs)
         self.strategy = _crude_markov
         self._model = {}
 
     def _input_text(self, sentences_as_word_lists):
-        self._model = self.strategy.crude_markov_chain(sentences_as_word_lists, ngram_size=self.ngram_size)
+        self._model = self.strategy.crude_markov_chain(
+                sentences_as_word_lists, ngram_size=self.ngram_size, progress=self.progress,
+                hashed_keys=self.hashed_keys)
+
+    def _prune(self, min_count, top_k):
+        self._model, report = self.strategy.prune_model(
+                self._model, ngram_size=self.ngram_size, min_count=min_count, top_k=top_k)
+        return report
+
+    def _model_in_memory(self):
+        return self._model
+
+    def _freeze(self):
+        self._model = self.strategy.freeze_model(self._model)
+
+    def _uses_word_ids(self):
+        return self.hashed_keys
+
+    def _lock(self):
+        super(TextMakerCrude, self)._lock()
+        # (frozen or not, what a hashed keys model keeps to detect collisions while training isn't needed any more)
+        if isinstance(self._model, self.strategy.HashedKeysModel):
+            self._model.forget_ngrams()
+
+    def __getstate__(self):
+        # the strategy is a module, which can't be pickled; it's always the same module anyway
+        state = super(TextMakerCrude, self).__getstate__()
+        del state['strategy']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.strategy = _crude_markov
 
     def make_sentences(self, count):
         iter_sentences_of_words = self.strategy.iter_make_sentences(
                 crude_markov_model=self._model, ngram_size=self.ngram_size, count=count)
         return SentencesAsWordLists(iter_sentences_of_words)
 
+    def clone(self):
+        text_maker = super(TextMakerCrude, self).clone()
+        text_maker.hashed_keys = self.hashed_keys
+        return text_maker
+
+    def next_word(self, previous_words):
+        ngram = (self.strategy.ngram_for_sentence_start(self.ngram_size) + tuple(previous_words))[-self.ngram_size:]
+        word = self.strategy.next_word(self._model, ngram)
+        return END_OF_SENTENCE if word == self.strategy.END_SYMBOL else word
+
+    @property
+    def model(self):
+        return self._model if self.is_locked else None
+
 
 class TextMakerMarkovify(BaseTextMaker):
     """ text maker using `markovify` lib (behind an adapter). this is the first strategy to reach for!
@@ -288,7 +545,15 @@ class TextMakerMarkovify(BaseTextMaker):
 
         self.strategy = MarkovifyLite(
                 state_size=constants.DEFAULT_NGRAM_SIZE,
-                parsed_sentences=sentences_as_word_lists)
+                parsed_sentences=sentences_as_word_lists,
+                progress=self.progress)
+
+    def _prune(self, min_count, top_k):
+        return self.strategy.prune(min_count=min_count, top_k=top_k)
+
+    def _freeze(self):
+        # markovify only needs the chain to make sentences. (parsed_sentences is for its novelty test, disabled here)
+        self.strategy.parsed_sentences = None
 
     def make_sentences(self, count):
         sentences = []
@@ -296,10 +561,325 @@ class TextMakerMarkovify(BaseTextMaker):
             sentences.append(self.strategy.make_sentence())
         return SentencesAsWordLists(sentences)
 
+    def next_word(self, previous_words):
+        word = self.strategy.next_word(previous_words)
+        return END_OF_SENTENCE if word == MARKOVIFY_END else word
+
+    @property
+    def model(self):
+        return self.strategy.chain.model if self.strategy else None
+
+
+class TextMakerSQLite(BaseTextMaker):
+    """ text maker whose model lives in a SQLite database on disk - for corpora whose models don't fit in memory
+
+    same essential algorithm as 'crude'. slower for small inputs, but memory use doesn't grow with the corpus.
+    (see _sqlite_markov module header.)
+    """
+    NICKNAME = 'sqlite'
+
+    def __init__(self, *args, **kwargs):
+        """
+        :param db_file_path: (optional) keep the model in this file; by default a temporary database is used.
+            (a clone() gets the same path: training both adds both corpora's counts to the one database.)
+        :param cache_size: (optional) how many hot states to keep in memory, in front of the database
+        """
+        db_file_path = kwargs.pop('db_file_path', None)
+        cache_size = kwargs.pop('cache_size', _sqlite_markov.DEFAULT_CACHE_SIZE)
+        super(TextMakerSQLite, self).__init__(*args, **kwargs)
+        self.db_file_path = db_file_path
+        self.cache_size = cache_size
+        # like markovify, lazy until _input_text() is called: ngram_size can still change until then
+        self.strategy = None
+
+    def _input_text(self, sentences_as_word_lists):
+        self.strategy = _sqlite_markov.SQLiteMarkovChain(
+                db_file_path=self.db_file_path, ngram_size=self.ngram_size, cache_size=self.cache_size)
+        self.strategy.train(sentences_as_word_lists, progress=self.progress)
+
+    def _prune(self, min_count, top_k):
+        # (the model is on disk: the report has the bytes saved there)
+        return self.strategy.prune(min_count=min_count, top_k=top_k)
+
+    def _model_in_memory(self):
+        return None
+
+    def make_sentences(self, count):
+        return SentencesAsWordLists(self.strategy.iter_make_sentences(count=count))
+
+    def next_word(self, previous_words):
+        ngram = ((_sqlite_markov.START_SYMBOL,) * self.ngram_size + tuple(previous_words))[-self.ngram_size:]
+        word = self.strategy.next_word(ngram)
+        return END_OF_SENTENCE if word == _sqlite_markov.END_SYMBOL else word
+
+    def clone(self):
+        text_maker = super(TextMakerSQLite, self).clone()
+        text_maker.db_file_path = self.db_file_path
+        text_maker.cache_size = self.cache_size
+        return text_maker
+
+    @property
+    def model(self):
+        return self.strategy
+
+
+class TextMakerSuffixArray(BaseTextMaker):
+    """ text maker that keeps its corpus in a suffix array, so ngram_size can be chosen when generating
+
+    every other strategy has to be retrained when ngram_size changes; this one is trained once, and ngram_size can be
+    changed even after locking (from 1 up to `max_context_size`), and view() makes a text maker for another size that
+    shares the same trained model. (see _suffix_array_markov module header.)
+    """
+    NICKNAME = 'suffix'
+
+    def __init__(self, *args, **kwargs):
+        """
+        :param max_context_size: (optional) the largest ngram_size that can be used after training
+        """
+        self.max_context_size = kwargs.pop('max_context_size', _suffix_array_markov.DEFAULT_MAX_CONTEXT_SIZE)
+        super(TextMakerSuffixArray, self).__init__(*args, **kwargs)
+        if self.prune_min_count or self.prune_top_k:
+            raise ValueError("suffix array models keep the whole corpus, rather than transitions; they can't be pruned")
+        self.strategy = None
+
+    @property
+    def ngram_size(self):
+        return self._ngram_size
+
+    @ngram_size.setter
+    def ngram_size(self, value):
+        """ unlike other text makers, ngram_size can change after locking: it's only used when making sentences
+        """
+        if not 1 <= value <= self.max_context_size:
+            raise ValueError("ngram_size must be from 1 to {}".format(self.max_context_size))
+        self._ngram_size = value
+
+    def _input_text(self, sentences_as_word_lists):
+        self.strategy = _suffix_array_markov.SuffixArrayModel(
+                sentences_as_word_lists, max_context_size=self.max_context_size, progress=self.progress)
+
+    def make_sentences(self, count):
+        return SentencesAsWordLists(self.strategy.iter_make_sentences(count=count, ngram_size=self.ngram_size))
+
+    def next_word(self, previous_words):
+        word = self.strategy.next_word(previous_words, ngram_size=self.ngram_size)
+        return END_OF_SENTENCE if word == _suffix_array_markov.END_SYMBOL else word
+
+    def clone(self):
+        text_maker = super(TextMakerSuffixArray, self).clone()
+        text_maker.max_context_size = self.max_context_size
+        return text_maker
+
+    @property
+    def model(self):
+        return self.strategy
+
+
+class TextMakerSketch(BaseTextMaker):
+    """ text maker whose model fits in fixed memory - approximate counts, in a count-min sketch & heavy hitters table
+
+    for training on streams that never end: memory doesn't grow with vocabulary x context. after locking, the model
+    can still be trained further (`text_maker.model.train(more_sentences)`). (see _sketch_markov module header.)
+    """
+    NICKNAME = 'sketch'
+
+    def __init__(self, *args, **kwargs):
+        """
+        :param width: (optional) counters per row of the sketch
+        :param depth: (optional) rows of the sketch
+        :param max_contexts: (optional) most n-grams to keep next words for
+        :param successors_per_context: (optional) most next words to keep per n-gram
+        """
+        self.sketch_kwargs = {name: kwargs.pop(name) for name in
+                              ('width', 'depth', 'max_contexts', 'successors_per_context') if name in kwargs}
+        super(TextMakerSketch, self).__init__(*args, **kwargs)
+        # like sqlite, lazy until _input_text() is called: ngram_size can still change until then
+        self.strategy = None
+
+    def _input_text(self, sentences_as_word_lists):
+        self.strategy = _sketch_markov.SketchMarkovChain(ngram_size=self.ngram_size, **self.sketch_kwargs)
+        self.strategy.train(sentences_as_word_lists, progress=self.progress)
+
+    def _prune(self, min_count, top_k):
+        return self.strategy.prune(min_count=min_count, top_k=top_k)
+
+    def make_sentences(self, count):
+        return SentencesAsWordLists(self.strategy.iter_make_sentences(count=count))
+
+    def next_word(self, previous_words):
+        ngram = ((_sketch_markov.START_SYMBOL,) * self.ngram_size + tuple(previous_words))[-self.ngram_size:]
+        word = self.strategy.next_word(ngram)
+        return END_OF_SENTENCE if word == _sketch_markov.END_SYMBOL else word
+
+    def clone(self):
+        text_maker = super(TextMakerSketch, self).clone()
+        text_maker.sketch_kwargs = dict(self.sketch_kwargs)
+        return text_maker
+
+    @property
+    def model(self):
+        return self.strategy
+
+
+class TextMakerNgramTrie(BaseTextMaker):
+    """ text maker that counts every n-gram size from 1 to `max_ngram_size` in one pass, in one trie - so trying
+    several sizes on the same corpus takes one training
+
+    ngram_size can be changed after locking (from 1 up to max_ngram_size), and view() makes a text maker for another
+    size that shares the same trained model. (see _ngram_trie module header.)
+    """
+    NICKNAME = 'trie'
+
+    def __init__(self, *args, **kwargs):
+        """
+        :param max_ngram_size: (optional) the largest ngram_size to train for. if not given, only ngram_size & the
+            sizes below it are counted.
+        """
+        self.max_ngram_size = kwargs.pop('max_ngram_size', None)
+        super(TextMakerNgramTrie, self).__init__(*args, **kwargs)
+        if self.prune_min_count or self.prune_top_k:
+            raise ValueError("n-gram trie models share states between sizes; they can't be pruned")
+        # like sqlite, lazy until _input_text() is called: ngram_size can still change until then
+        self.strategy = None
+
+    @property
+    def ngram_size(self):
+        return self._ngram_size
+
+    @ngram_size.setter
+    def ngram_size(self, value):
+        """ unlike most text makers, ngram_size can change after locking: every size up to max_ngram_size is trained
+        """
+        if self.is_locked and not 1 <= value <= self.strategy.max_ngram_size:
+            raise ValueError("ngram_size must be from 1 to {}".format(self.strategy.max_ngram_size))
+        self._ngram_size = value
+
+    def _input_text(self, sentences_as_word_lists):
+        self.strategy = _ngram_trie.NgramTrie(max_ngram_size=max(self.max_ngram_size or 0, self.ngram_size))
+        self.strategy.train(sentences_as_word_lists, progress=self.progress)
+
+    def _freeze(self):
+        self.strategy.freeze()
+
+    def make_sentences(self, count):
+        return SentencesAsWordLists(self.strategy.iter_make_sentences(count=count, ngram_size=self.ngram_size))
+
+    def next_word(self, previous_words):
+        word = self.strategy.next_word(previous_words, ngram_size=self.ngram_size)
+        return END_OF_SENTENCE if word == _ngram_trie.END_SYMBOL else word
+
+    def count_states(self):
+        return self.strategy.count_states(self.ngram_size) if self.strategy else 0
+
+    @property
+    def model(self):
+        return self.strategy
+
+    def clone(self):
+        text_maker = super(TextMakerNgramTrie, self).clone()
+        text_maker.max_ngram_size = self.max_ngram_size
+        return text_maker
+
+
+class TextMakerMixture(BaseTextMaker):
+    """ text maker that blends already-trained text makers, by weight - i.e. a 70/30 mix of two corpora' models,
+    without retraining on the two corpora together
+
+    at each step, it picks one of the text makers that know the current context (by weight), and takes its next word.
+    that's sampling from the weighted mixture of their next-word distributions - and it only uses each text maker's
+    model as it is. so changing `weights` is instant.
+
+    it's locked from the start (there is nothing to train), and has no nickname: it can't be created from input text.
+
+        >>> reviews = create_text_maker(input_text="The food was great.", strategy="crude")
+        >>> legal = create_text_maker(input_text="The party of the first part.", strategy="markovify")
+        >>> mixture = TextMakerMixture([reviews, legal], weights=[0.7, 0.3])
+        >>> mixture.weights = [0, 1]
+        >>> print mixture.join(mixture.make_sentences(1))
+        The party of the first part.
+    """
+    NICKNAME = None
+
+    # (a mix of models can wander in a loop that none of them would on its own)
+    MAX_WORDS_PER_SENTENCE = 100
+
+    def __init__(self, text_makers, weights=None, **kwargs):
+        """
+        :param text_makers: the text makers to blend - locked (trained) ones, or paths of model files to load (see
+            `model_files`). each one uses its own ngram_size & model. (the mixture's own ngram_size is unused.)
+        :param weights: (optional) one weight per text maker. any non-negative numbers: they are normalized. if not
+            given, each gets the same weight.
+        :param kwargs: sentence_tokenizer & joiner default to the first text maker's. (see BaseTextMaker)
+        """
+        self.text_makers = [model_files.load_text_maker(text_maker) if isinstance(text_maker, basestring)
+                            else text_maker for text_maker in text_makers]
+        if not self.text_makers:
+            raise ValueError("a mixture needs at least one text maker")
+        if not all(text_maker.is_locked for text_maker in self.text_makers):
+            raise ValueError("text makers must be trained (locked) before they can be mixed")
+
+        kwargs.setdefault('sentence_tokenizer', self.text_makers[0].sentence_tokenizer)
+        kwargs.setdefault('joiner', self.text_makers[0].joiner)
+        super(TextMakerMixture, self).__init__(**kwargs)
+        self.weights = weights or [1] * len(self.text_makers)
+        self._locked = True
+
+    @property
+    def weights(self):
+        """ the text makers' weights, normalized to sum to 1. can be changed at any time (i.e. `mixture.weights = ...`)
+        """
+        return list(self._weights)
+
+    @weights.setter
+    def weights(self, weights):
+        weights = [float(weight) for weight in weights]
+        if len(weights) != len(self.text_makers):
+            raise ValueError("{} weights given, for {} text makers".format(len(weights), len(self.text_makers)))
+        if any(weight < 0 for weight in weights) or not sum(weights):
+            raise ValueError("weights must not be negative, and at least one must be more than 0")
+        self._weights = [weight / sum(weights) for weight in weights]
+
+    def next_word(self, previous_words):
+        candidates = [(weight, text_maker) for weight, text_maker in zip(self._weights, self.text_makers) if weight]
+        while candidates:
+            sample = random.random() * sum(weight for weight, _ in candidates)
+            for i, (weight, text_maker) in enumerate(candidates):
+                sample -= weight
+                if sample < 0:
+                    break
+            word = text_maker.next_word(previous_words)
+            if word is not None:
+                return word
+            # (this one doesn't know the context; pick again among the others, which keeps their relative weights)
+            del candidates[i]
+        return None
+
+    def make_sentences(self, count):
+        sentences = []
+        for _ in xrange(count):
+            sentence = []
+            while len(sentence) < self.MAX_WORDS_PER_SENTENCE:
+                word = self.next_word(sentence)
+                if word is None or word is END_OF_SENTENCE:
+                    break
+                sentence.append(word)
+            sentences.append(sentence)
+        return SentencesAsWordLists(sentences)
+
+    def count_states(self):
+        return sum(text_maker.count_states() for text_maker in self.text_makers)
+
+    @property
+    def model(self):
+        """ the text makers' models, in order
+        """
+        return [text_maker.model for text_maker in self.text_makers]
+
 
 # ====================================================================================================
 
-_classes_by_nickname = {klass.NICKNAME: klass for klass in BaseTextMaker.__subclasses__()}
+# (the mixture has no nickname: it's made from other text makers, not from input text)
+_classes_by_nickname = {klass.NICKNAME: klass for klass in BaseTextMaker.__subclasses__() if klass.NICKNAME}
 TEXT_MAKER_NICKNAMES = _classes_by_nickname.keys()
 DEFAULT_TEXT_MAKER_NICKNAME = "markovify"
 
@@ -320,6 +900,7 @@ def create_text_maker(
         joiner=None,
         input_text=None,
         ngram_size=constants.DEFAULT_NGRAM_SIZE,
+        **kwargs
 ):
     """ Convenience factory to just "gimme a text maker" without knowing exact module layout. nicknames supported.
 
@@ -333,8 +914,11 @@ def create_text_maker(
     :param joiner: (optional) an instance of joiner - or a nickname such as 'just_whitespace', 'moses'
     :param input_text: (optional) the input text to load into the TextMaker class.
         (if not given, can be loaded later load it later.)
+    :param kwargs: (optional) any other keyword arguments are passed through to the TextMaker class,
+        i.e. keep_training_data=True; or prune_min_count=2 and/or prune_top_k=10, to prune the model after training;
+        or dedup='exact', to skip tokenizing repeated sentences
     """
-    text_maker_kwargs = {}
+    text_maker_kwargs = dict(kwargs)
 
     ngram_size = int(ngram_size)
 
@@ -1,4 +1,8 @@
 import collections
+import contextlib
+import gc
+import random
+import threading
 
 
 def iter_flatten(lst):
@@ -20,3 +24,119 @@ def iter_flatten(lst):
                 yield sub
         else:
             yield element
+
+
+class LRUCache(object):
+    """ a dict-like cache of at most `maxsize` items, evicting the least recently used. keeps hit/miss counts.
+    it can be shared between threads: each operation holds the cache's own lock.
+
+    >>> cache = LRUCache(maxsize=2)
+    >>> cache["a"] = 1; cache["b"] = 2
+    >>> cache["a"]
+    1
+    >>> cache["c"] = 3  # evicts "b", the least recently used
+    >>> sorted(cache.keys())
+    ['a', 'c']
+    >>> import pytest
+    >>> with pytest.raises(KeyError): cache["b"]
+    >>> sorted(cache.stats.items())
+    [('hits', 1), ('maxsize', 2), ('misses', 1), ('size', 2)]
+    """
+
+    def __init__(self, maxsize=1024):
+        if maxsize < 1:
+            raise ValueError("maxsize must be 1 or more")
+        self.maxsize = maxsize
+        self._items = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # (OrderedDict is pure python on py2: a hit's pop & re-insert, racing another thread's, corrupts its links)
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                self.misses += 1
+                raise
+            self._items[key] = value
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def keys(self):
+        with self._lock:
+            return self._items.keys()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._items), 'maxsize': self.maxsize}
+
+
+_seeded_random_lock = threading.RLock()
+
+
+@contextlib.contextmanager
+def seeded_random(seed=None):
+    """ within the block, the `random` module is seeded with `seed`, then its state is restored.
+    (no-op if seed is None.)
+
+    the strategies & joiners use the module-level `random` functions, so this is how to get reproducible output.
+    holds a lock for the duration, so that concurrent seeded blocks (i.e. in web requests) can't interleave.
+
+    >>> with seeded_random(42):
+    ...     first = [random.random() for _ in range(3)]
+    >>> with seeded_random(42):
+    ...     second = [random.random() for _ in range(3)]
+    >>> assert first == second
+    """
+    if seed is None:
+        yield
+        return
+
+    with _seeded_random_lock:
+        state = random.getstate()
+        random.seed(seed)
+        try:
+            yield
+        finally:
+            random.setstate(state)
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """ within the block, the cyclic garbage collector doesn't run. (then it's re-enabled, if it was enabled before.)
+
+    for building big structures of many small containers (that don't reference each other in cycles): the collector
+    is triggered by the count of allocations, and each time, it walks all the containers allocated so far - so while
+    building millions of them, it is most of the time spent. reference counting still frees everything as usual.
+
+    >>> with gc_paused():
+    ...     assert not gc.isenabled()
+    >>> assert gc.isenabled()
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
@@ -92,11 +92,16 @@ setup(
     packages=find_packages(include=['presswork']),
     entry_points={
         'console_scripts': [
-            'presswork=presswork.cli:main'
+            'presswork=presswork.cli:main',
+            'presswork-client=presswork.client:main',
         ]
     },
     include_package_data=True,
     install_requires=requirements,
+    extras_require={
+        # reading .xz input (Python 2 has no lzma module)
+        'xz': ['backports.lzma'],
+    },
     license="GNU General Public License v3",
     zip_safe=False,
     keywords='presswork',
@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_directory(tmpdir, monkeypatch):
+    """ CLI runs use the pipeline cache by default; keep each test's cache to itself (& out of the real ~/.cache)
+    """
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.join('xdg-cache')))
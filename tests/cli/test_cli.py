@@ -166,3 +166,165 @@ def test_cli_help(runner):
     help_result = runner.invoke(cli.main, ['--help'], catch_exceptions=False)
     assert help_result.exit_code == 0
     assert '--help' in help_result.output
+
+
+def test_cli_synthetic_corpus(runner):
+    result = runner.invoke(cli.main, ['synthetic-corpus', '--size', '20k', '--seed', '5'], catch_exceptions=False)
+    assert result.exit_code == 0
+    assert len(result.output) >= 20 * 1024
+    assert result.output == runner.invoke(cli.main, ['synthetic-corpus', '--size', '20k', '--seed', '5']).output
+
+    # and the synthetic corpus can be piped right back in
+    generated = runner.invoke(cli.main, input=result.output, args=['-c', '5', '-s', 'crude', '-t', 'just_whitespace'])
+    assert generated.exit_code == 0
+    assert generated.output.strip()
+
+
+def test_cli_synthetic_corpus_invalid_size(runner):
+    result = runner.invoke(cli.main, ['synthetic-corpus', '--size', 'a lot'])
+    assert result.exit_code == 2
+
+
+def test_cli_memory_benchmark(runner):
+    result = runner.invoke(cli.main, catch_exceptions=False, args=[
+        'memory-benchmark', '--sizes', '8k,16k', '-s', 'crude', '-s', 'pymc', '-c', '5'])
+    assert result.exit_code == 0
+    for expected in ('crude', 'pymc', 'tokenize', 'train', 'B/state', 'capacity planning'):
+        assert expected in result.output
+
+
+def test_cli_save_model_then_load_model(runner, tmpdir):
+    model_file_path = str(tmpdir.join('model.pwm'))
+    result = runner.invoke(cli.main, catch_exceptions=False, input="Foo is better than bar.\nFoo is better than baz.",
+                           args=['-s', 'pymc', '-t', 'just_whitespace', '-j', 'random_indent', '-c', '3',
+                                 '--save-model', model_file_path])
+    assert result.exit_code == 0
+
+    # no input at all; strategy & tokenizer come from the model file
+    with patch(target="presswork.text.text_makers.BaseTextMaker.input_text") as mock:
+        result = runner.invoke(cli.main, catch_exceptions=False, args=[
+            '--load-model', model_file_path, '-c', '4', '-j', 'just_whitespace'])
+        assert not mock.called
+    assert result.exit_code == 0
+    lines = result.output.strip().splitlines()
+    assert len(lines) == 4
+    assert all('is better than' in line for line in lines)
+
+    not_a_model = tmpdir.join('not-a-model.pwm')
+    not_a_model.write('nope')
+    result = runner.invoke(cli.main, args=['--load-model', str(not_a_model)])
+    assert result.exit_code == 2
+
+
+def test_cli_blend_models(runner, tmpdir):
+    model_file_paths = []
+    for name, stdin in [('cats', "Cats purr softly."), ('dogs', "Dogs bark loudly.")]:
+        model_file_paths.append(str(tmpdir.join(name + '.pwm')))
+        result = runner.invoke(cli.main, catch_exceptions=False, input=stdin, args=[
+            '-s', 'crude', '-t', 'just_whitespace', '-c', '1', '--save-model', model_file_paths[-1]])
+        assert result.exit_code == 0
+
+    load_both = ['--load-model', model_file_paths[0], '--load-model', model_file_paths[1], '-j', 'just_whitespace']
+    result = runner.invoke(cli.main, catch_exceptions=False, args=load_both + ['-c', '20'])
+    assert result.exit_code == 0
+    assert set(result.output.split()) == {"Cats", "purr", "softly.", "Dogs", "bark", "loudly."}
+
+    result = runner.invoke(cli.main, catch_exceptions=False, args=load_both + ['-c', '20', '--mix-weights', '0,1'])
+    assert result.exit_code == 0
+    assert set(result.output.split()) == {"Dogs", "bark", "loudly."}
+
+    for bad_weights in ('1', '1,-1', 'a,b'):
+        result = runner.invoke(cli.main, args=load_both + ['--mix-weights', bad_weights])
+        assert result.exit_code == 2
+    result = runner.invoke(cli.main, args=['--load-model', model_file_paths[0], '--mix-weights', '1'])
+    assert result.exit_code == 2
+
+
+def test_cli_reruns_use_the_cache(runner, tmpdir):
+    stdin = "Foo is better than bar.\nFoo is better than baz."
+    args = ['-s', 'pymc', '-t', 'just_whitespace', '-c', '3']
+    result = runner.invoke(cli.main, catch_exceptions=False, input=stdin, args=args)
+    assert result.exit_code == 0
+    assert tmpdir.join('xdg-cache', 'presswork', 'model').listdir()
+
+    # only --count & --join changed: the cached model is used
+    with patch(target="presswork.text.text_makers.BaseTextMaker.input_sentences") as mock:
+        result = runner.invoke(cli.main, catch_exceptions=False, input=stdin, args=args + ['-c', '4', '-j', 'nltk'])
+        assert not mock.called
+    assert result.exit_code == 0
+    assert result.output.count('is better than') == 4
+
+    # ... unless told not to
+    with patch(target="presswork.text.text_makers.BaseTextMaker.input_text") as mock:
+        runner.invoke(cli.main, catch_exceptions=False, input=stdin, args=args + ['--no-cache'])
+        assert mock.called
+
+    result = runner.invoke(cli.main, input=stdin, args=args + ['--cache-size', 'a lot'])
+    assert result.exit_code == 2
+
+
+@pytest.mark.parametrize('no_cache', [[], ['--no-cache']])
+def test_cli_input_dir(runner, tmpdir, no_cache):
+    corpus = tmpdir.mkdir('corpus')
+    corpus.join('a.txt').write("Foo is better than bar.\n")
+    corpus.join('b.txt').write("Foo is better than baz.\n")
+    args = ['--input-dir', str(corpus), '-s', 'crude', '-t', 'just_whitespace', '-j', 'just_whitespace', '-c', '20']
+    result = runner.invoke(cli.main, catch_exceptions=False, args=args + no_cache)
+    assert result.exit_code == 0
+    assert set(result.output.split()) == {'Foo', 'is', 'better', 'than', 'bar.', 'baz.'}
+
+    result = runner.invoke(cli.main, args=args + ['-i', str(corpus.join('a.txt'))])
+    assert result.exit_code == 2
+
+
+@pytest.mark.parametrize('no_cache', [[], ['--no-cache']])
+def test_cli_compressed_input(runner, tmpdir, no_cache):
+    import gzip
+    input_file_path = str(tmpdir.join('input.txt.gz'))
+    with gzip.open(input_file_path, 'wb') as f:
+        f.write(u"Foo is better than bär.\n\nFoo is better than baz.\n".encode('utf-8'))
+
+    args = ['-i', input_file_path, '-s', 'crude', '-t', 'just_whitespace', '-j', 'just_whitespace', '-c', '20']
+    for _ in range(2):
+        result = runner.invoke(cli.main, catch_exceptions=False, args=args + no_cache)
+        assert result.exit_code == 0
+        assert set(result.output.split()) == {u'Foo', u'is', u'better', u'than', u'bär.', u'baz.'}
+
+
+@pytest.mark.parametrize('no_cache', [[], ['--no-cache']])
+def test_cli_prune(tmpdir, no_cache):
+    runner = CliRunner(mix_stderr=False)
+    stdin = "\n".join(["Foo is better than bar."] * 3 + ["Foo is better than baz."])
+    args = ['-s', 'crude', '-t', 'just_whitespace', '-j', 'just_whitespace', '-c', '20'] + no_cache
+    for _ in range(2):
+        result = runner.invoke(cli.main, catch_exceptions=False, input=stdin, args=args + ['--prune-min-count', '2'])
+        assert result.exit_code == 0
+        assert set(result.output.split()) == {'Foo', 'is', 'better', 'than', 'bar.'}
+        assert result.stderr.startswith("pruned 1 of 7 states (2 of 8 transitions), saving ")
+
+    # (the pruned model is cached separately from the unpruned one)
+    result = runner.invoke(cli.main, catch_exceptions=False, input=stdin, args=args)
+    assert set(result.output.split()) == {'Foo', 'is', 'better', 'than', 'bar.', 'baz.'}
+    assert not result.stderr
+
+    result = runner.invoke(cli.main, input=stdin, args=['-s', 'suffix', '--prune-top-k', '1'])
+    assert result.exit_code == 2
+    result = runner.invoke(cli.main, input=stdin, args=['--prune-min-count', '0'])
+    assert result.exit_code == 2
+
+
+@pytest.mark.parametrize('no_cache', [[], ['--no-cache']])
+def test_cli_dedup(tmpdir, no_cache):
+    runner = CliRunner(mix_stderr=False)
+    stdin = "\n".join(["Foo is better than bar."] * 3 + ["Foo  is better than baz."] * 2)
+    args = ['-s', 'crude', '-t', 'just_whitespace', '-j', 'just_whitespace', '-c', '20'] + no_cache
+    for _ in range(2):
+        result = runner.invoke(cli.main, catch_exceptions=False, input=stdin, args=args + ['--dedup', 'exact'])
+        assert result.exit_code == 0
+        assert set(result.output.split()) == {'Foo', 'is', 'better', 'than', 'bar.', 'baz.'}
+        assert result.stderr.startswith("dedup: 3 of 5 sentences were duplicates (3 exact, 0 near): 60.0% fewer")
+
+    result = runner.invoke(cli.main, input=stdin, args=['--dedup-keep-weights'])
+    assert result.exit_code == 2
+    result = runner.invoke(cli.main, input=stdin, args=['--dedup', 'fuzzy'])
+    assert result.exit_code == 2
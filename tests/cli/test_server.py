@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+""" tests for `presswork serve` (keeps models hot, on a Unix socket) and its thin client
+"""
+import os
+import socket
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+from presswork import cli
+from presswork import client
+from presswork import server
+
+INPUT_TEXT = u"Simple is better than complex.\nComplex is better than complicated.\n"
+
+
+@pytest.fixture()
+def running_server(tmpdir):
+    text_maker_server = server.TextMakerServer(str(tmpdir.join('presswork.sock')))
+    thread = threading.Thread(target=text_maker_server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield text_maker_server
+    text_maker_server.shutdown()
+    text_maker_server.server_close()
+
+
+def test_models_stay_resident_between_requests(running_server, tmpdir):
+    input_file = tmpdir.join('input.txt')
+    input_file.write(INPUT_TEXT)
+    request = dict(input_filename=str(input_file), strategy='crude', tokenize='just_whitespace',
+                   join='just_whitespace', count=3)
+
+    for _ in range(3):
+        lines = client.generate(running_server.socket_path, **request).splitlines()
+        assert len(lines) == 3
+        assert all("is better than" in line for line in lines)
+    assert running_server.models.stats['models'] == 1
+
+    # when the file changes, the next request retrains
+    input_file.write(u"Flat is better than nested.\n")
+    os.utime(str(input_file), (0, 0))
+    assert client.generate(running_server.socket_path, **request).splitlines() == [u"Flat is better than nested."] * 3
+    assert running_server.models.stats['models'] == 2
+
+    assert "is better than" in client.generate(running_server.socket_path, input_text=INPUT_TEXT, count=1)
+
+
+def test_errors_are_reported_and_the_server_keeps_serving(running_server, tmpdir):
+    with pytest.raises(client.ServerError) as excinfo:
+        client.generate(running_server.socket_path, input_text=INPUT_TEXT, strategy='no-such-strategy')
+    assert 'no-such-strategy' in unicode(excinfo.value)
+
+    with pytest.raises(client.ServerError):
+        client.generate(running_server.socket_path, input_filename=str(tmpdir.join('does-not-exist.txt')))
+
+    assert client.generate(running_server.socket_path, input_text=INPUT_TEXT, count=1)
+
+
+def test_cli_socket_option_and_client_command(running_server, tmpdir):
+    input_file = tmpdir.join('input.txt')
+    input_file.write(INPUT_TEXT)
+    args = ['--socket', running_server.socket_path, '-s', 'pymc', '-t', 'just_whitespace', '-j', 'just_whitespace',
+            '-c', '4']
+
+    result = CliRunner().invoke(cli.main, args + ['-i', str(input_file)], catch_exceptions=False)
+    assert result.exit_code == 0
+    assert len(result.output.strip().splitlines()) == 4
+
+    result = CliRunner().invoke(client.main, args, input=INPUT_TEXT, catch_exceptions=False)
+    assert result.exit_code == 0
+    assert len(result.output.strip().splitlines()) == 4
+    assert running_server.models.stats['models'] == 2
+
+    result = CliRunner().invoke(client.main, ['--socket', str(tmpdir.join('nobody-listening.sock'))], input=u"")
+    assert result.exit_code != 0
+
+
+def test_cli_socket_option_refuses_options_it_would_ignore(running_server, tmpdir):
+    model_file = tmpdir.join('model.pwm')
+    model_file.write('')
+    for extra_args in (['--load-model', str(model_file)], ['--save-model', str(tmpdir.join('saved.pwm'))],
+                       ['--mix-weights', '70,30'], ['--no-cache']):
+        result = CliRunner().invoke(cli.main, ['--socket', running_server.socket_path] + extra_args, input=INPUT_TEXT)
+        assert result.exit_code == 2 and "--socket" in result.output
+
+
+def test_stale_socket_is_replaced_but_a_live_one_is_not(running_server, tmpdir):
+    with pytest.raises(server.SocketInUseError):
+        server.TextMakerServer(running_server.socket_path)
+    assert client.generate(running_server.socket_path, input_text=INPUT_TEXT, count=1)
+
+    result = CliRunner().invoke(cli.main, ['serve', '--socket', running_server.socket_path])
+    assert result.exit_code == 2 and "already listening" in result.output
+
+    # (a socket file nobody listens on, as a server that was killed leaves behind)
+    stale_path = str(tmpdir.join('stale.sock'))
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(stale_path)
+    stale.close()
+    text_maker_server = server.TextMakerServer(stale_path)
+    text_maker_server.server_close()
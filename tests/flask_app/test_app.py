@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
 """ minimal Flask app (for now) calls for a minimal test suite (for now)
 """
+import json
+import os
+import subprocess
+import sys
+import time
+
 import bs4
 import pytest
 
+from presswork.flask_app import jobs
+from presswork.flask_app import model_store
+from presswork.flask_app import training
 from presswork.text import text_makers
 from presswork.text.grammar import joiners
 from presswork.text.grammar import tokenizers
@@ -26,6 +35,14 @@ def testapp(request):
     return client
 
 
+def test_importing_the_app_starts_no_workers():
+    # (they're started by `python app.py`, or the first job - not when importing, i.e. to collect doctests)
+    subprocess.check_call([sys.executable, '-c', 'import multiprocessing; import presswork.flask_app.app as app; '
+                                                 'assert app.job_executor._pool is None; '
+                                                 'assert not multiprocessing.active_children()'],
+                          env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+
+
 def test_index_initial_200(testapp):
     """ Tests if the index page loads """
 
@@ -179,3 +196,336 @@ def test_invalid_strategies_chosen(testapp):
     ))
 
     assert "warning" in response.data
+
+
+def _post_json(testapp, url, payload=None):
+    response = testapp.post(url, data=json.dumps(payload or {}), content_type='application/json')
+    return response, json.loads(response.data or 'null')
+
+
+API_MODEL_PARAMETERS = dict(
+        input_text="Simple is better than complex.\nComplex is better than complicated.",
+        text_maker_strategy="crude",
+        tokenizer_strategy="just_whitespace",
+        ngram_size=2)
+
+
+@pytest.fixture()
+def empty_model_store():
+    from presswork.flask_app import app as app_module
+    app_module.model_store = model_store.ModelStore()
+    yield app_module.model_store
+
+
+def test_api_train_once_generate_many(testapp, empty_model_store):
+    response, body = _post_json(testapp, '/api/models', API_MODEL_PARAMETERS)
+    assert response.status_code == 201
+    model_id = body['model_id']
+    assert body['expires_in_seconds'] > 0
+    assert len(empty_model_store) == 1
+
+    # same corpus & parameters => same handle, no retraining
+    response, body = _post_json(testapp, '/api/models', API_MODEL_PARAMETERS)
+    assert response.status_code == 200
+    assert body['model_id'] == model_id
+
+    for count in (1, 5):
+        response, body = _post_json(testapp, '/api/models/{}/sentences'.format(model_id), dict(
+                count_of_sentences_to_make=count, joiner_strategy='just_whitespace'))
+        assert response.status_code == 200
+        lines = body['text'].strip().splitlines()
+        assert len(lines) == count
+        assert all("is better than" in line for line in lines)
+
+    # all parameters are optional
+    response, body = _post_json(testapp, '/api/models/{}/sentences'.format(model_id))
+    assert response.status_code == 200
+    assert "is better than" in body['text']
+
+
+@pytest.mark.parametrize('text_maker_strategy', ['suffix', 'trie'])
+def test_api_any_ngram_size_strategies_share_one_model(testapp, empty_model_store, text_maker_strategy):
+    parameters = dict(API_MODEL_PARAMETERS, text_maker_strategy=text_maker_strategy)
+    response, body = _post_json(testapp, '/api/models', dict(parameters, ngram_size=2))
+    assert response.status_code == 201
+    model_id = body['model_id']
+
+    # another ngram_size => the same handle, no retraining
+    response, body = _post_json(testapp, '/api/models', dict(parameters, ngram_size=4))
+    assert response.status_code == 200
+    assert body['model_id'] == model_id
+    assert len(empty_model_store) == 1
+
+    for ngram_size in (1, 3, 6):
+        response, body = _post_json(testapp, '/api/models/{}/sentences'.format(model_id), dict(
+                ngram_size=ngram_size, joiner_strategy='just_whitespace'))
+        assert response.status_code == 200
+        assert "is better than" in body['text']
+        response = testapp.post('/api/models/{}/sentences/stream'.format(model_id), data=json.dumps(dict(
+                ngram_size=ngram_size, count_of_sentences_to_make=3)), content_type='application/json')
+        assert response.status_code == 200
+    # (the stored model itself keeps its size; each request gets a view)
+    assert empty_model_store.get(model_id).ngram_size == 2
+
+
+def test_api_other_strategies_keep_their_ngram_size(testapp, empty_model_store):
+    _, body = _post_json(testapp, '/api/models', API_MODEL_PARAMETERS)
+    url = '/api/models/{}/sentences'.format(body['model_id'])
+    assert _post_json(testapp, url, dict(ngram_size=2))[0].status_code == 200
+    response, body = _post_json(testapp, url, dict(ngram_size=3))
+    assert response.status_code == 400
+    assert 'ngram_size' in body['errors']
+
+    _, body = _post_json(testapp, '/api/models', dict(API_MODEL_PARAMETERS, ngram_size=3))
+    assert len(empty_model_store) == 2
+
+
+def test_api_seed_makes_output_reproducible(testapp, empty_model_store):
+    _, body = _post_json(testapp, '/api/models', dict(API_MODEL_PARAMETERS, text_maker_strategy="pymc"))
+    url = '/api/models/{}/sentences'.format(body['model_id'])
+
+    outputs = [_post_json(testapp, url, dict(seed=seed, joiner_strategy='random_enjamb'))[1]['text']
+               for seed in (1, 1, 2)]
+    assert outputs[0] == outputs[1]
+    assert outputs[0] != outputs[2]
+
+
+def test_api_models_expire_and_can_be_deleted(testapp, empty_model_store):
+    now = [1000.0]
+    empty_model_store.clock = lambda: now[0]
+
+    _, body = _post_json(testapp, '/api/models', API_MODEL_PARAMETERS)
+    url = '/api/models/{}/sentences'.format(body['model_id'])
+    assert _post_json(testapp, url)[0].status_code == 200
+
+    now[0] += empty_model_store.ttl_seconds + 1
+    response, body = _post_json(testapp, url)
+    assert response.status_code == 404
+    assert 'model_id' in body['errors']
+
+    _, body = _post_json(testapp, '/api/models', API_MODEL_PARAMETERS)
+    assert testapp.delete('/api/models/{}'.format(body['model_id'])).status_code == 204
+    assert testapp.delete('/api/models/{}'.format(body['model_id'])).status_code == 404
+    assert len(empty_model_store) == 0
+
+
+def test_api_invalid_parameters(testapp, empty_model_store):
+    response, body = _post_json(testapp, '/api/models', dict(API_MODEL_PARAMETERS, text_maker_strategy="invalid"))
+    assert response.status_code == 400
+    assert 'text_maker_strategy' in body['errors']
+
+    response, body = _post_json(testapp, '/api/models', dict(API_MODEL_PARAMETERS, input_text=""))
+    assert response.status_code == 400
+    assert 'input_text' in body['errors']
+
+    _, body = _post_json(testapp, '/api/models', API_MODEL_PARAMETERS)
+    response, body = _post_json(testapp, '/api/models/{}/sentences'.format(body['model_id']), dict(
+            joiner_strategy="invalid", count_of_sentences_to_make=0))
+    assert response.status_code == 400
+    assert sorted(body['errors']) == ['count_of_sentences_to_make', 'joiner_strategy']
+
+
+def test_api_does_not_need_csrf_token(testapp, empty_model_store):
+    from presswork.flask_app.app import app
+    app.config['WTF_CSRF_ENABLED'] = True
+    try:
+        response, _ = _post_json(testapp, '/api/models', API_MODEL_PARAMETERS)
+        assert response.status_code == 201
+        assert testapp.post('/', data=dict(API_MODEL_PARAMETERS)).status_code == 400
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = False
+
+
+def test_api_stream_sentences(testapp, empty_model_store, monkeypatch):
+    from presswork.flask_app import app as app_module
+    monkeypatch.setattr(app_module, 'STREAM_BATCH_SIZE', 7)
+
+    _, body = _post_json(testapp, '/api/models', API_MODEL_PARAMETERS)
+    url = '/api/models/{}/sentences/stream'.format(body['model_id'])
+
+    batch_counts = []
+    text_maker = empty_model_store.get(body['model_id'])
+    make_sentences = text_maker.make_sentences
+
+    def spy(count):
+        batch_counts.append(count)
+        return make_sentences(count)
+
+    monkeypatch.setattr(text_maker, 'make_sentences', spy)
+
+    count = 5000  # above the HTML form's max
+    response = testapp.post(url, content_type='application/json', data=json.dumps(dict(
+            count_of_sentences_to_make=count, joiner_strategy='just_whitespace')))
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'text/plain'
+
+    lines = response.data.decode('utf-8').splitlines()
+    assert len(lines) == count
+    assert all("is better than" in line for line in lines)
+    # generated in batches, never all at once
+    assert max(batch_counts) == 7
+    assert sum(batch_counts) == count
+
+
+def test_api_stream_sentences_seed_and_errors(testapp, empty_model_store):
+    _, body = _post_json(testapp, '/api/models', dict(API_MODEL_PARAMETERS, text_maker_strategy="pymc"))
+    url = '/api/models/{}/sentences/stream'.format(body['model_id'])
+
+    def stream(**payload):
+        return testapp.post(url, data=json.dumps(payload), content_type='application/json')
+
+    outputs = [stream(seed=seed, count_of_sentences_to_make=300, joiner_strategy='random_indent').data
+               for seed in (1, 1, 2)]
+    assert outputs[0] == outputs[1]
+    assert outputs[0] != outputs[2]
+
+    assert stream(count_of_sentences_to_make=0).status_code == 400
+    assert testapp.post('/api/models/not-a-model/sentences/stream').status_code == 404
+
+
+@pytest.fixture()
+def small_job_executor(monkeypatch):
+    from presswork.flask_app import app as app_module
+    executor = jobs.JobExecutor(processes=1, max_queue=0, timeout_seconds=5)
+    monkeypatch.setattr(app_module, 'job_executor', executor)
+    yield executor
+    executor.shutdown()
+
+
+def test_api_jobs_submit_and_poll(testapp, small_job_executor):
+    response, body = _post_json(testapp, '/api/jobs', dict(
+            API_MODEL_PARAMETERS, joiner_strategy='just_whitespace', count_of_sentences_to_make=3))
+    assert response.status_code == 202
+    job_id = body['job_id']
+
+    small_job_executor.get_job(job_id).get(timeout=10)
+    response = testapp.get('/api/jobs/{}'.format(job_id))
+    body = json.loads(response.data)
+    assert body['state'] == 'done'
+    assert len(body['text'].splitlines()) == 3
+    assert "is better than" in body['title']
+
+    assert testapp.get('/api/jobs/not-a-job').status_code == 404
+    assert json.loads(testapp.get('/api/jobs').data)['completed'] == 1
+
+
+def test_saturated_job_executor_rejects(testapp, small_job_executor):
+    from presswork.flask_app import app as app_module
+    blocker = small_job_executor.submit(time.sleep, 1)
+
+    response, body = _post_json(testapp, '/api/jobs', dict(
+            API_MODEL_PARAMETERS, joiner_strategy='just_whitespace', count_of_sentences_to_make=3))
+    assert response.status_code == 503
+    assert body['stats']['rejected'] == 1
+
+    response = testapp.post('/', data=dict(
+            API_MODEL_PARAMETERS, joiner_strategy='just_whitespace', count_of_sentences_to_make=3))
+    assert response.status_code == 503
+    assert "Too busy" in response.data
+    assert small_job_executor.stats['rejected'] == 2
+
+    blocker.get(timeout=10)
+    response = testapp.post('/', data=dict(
+            API_MODEL_PARAMETERS, joiner_strategy='just_whitespace', count_of_sentences_to_make=3))
+    assert response.status_code == 200
+    assert app_module.job_executor.stats['completed'] == 2
+
+
+@pytest.fixture()
+def small_background_trainer(monkeypatch):
+    from presswork.flask_app import app as app_module
+    trainer = training.BackgroundTrainer(threads=1, max_queue=0)
+    monkeypatch.setattr(app_module, 'background_trainer', trainer)
+    yield trainer
+
+
+def test_api_training_jobs_report_progress_then_model_is_ready(testapp, empty_model_store, small_background_trainer):
+    response, body = _post_json(testapp, '/api/training-jobs', API_MODEL_PARAMETERS)
+    assert response.status_code == 202
+    job_id, model_id = body['job_id'], body['model_id']
+
+    small_background_trainer.get_job(job_id).wait(timeout=10)
+    body = json.loads(testapp.get('/api/training-jobs/{}'.format(job_id)).data)
+    assert body['state'] == 'done'
+    assert body['model_id'] == model_id
+    assert body['progress']['counts']['sentences_tokenized'] == 2
+    assert body['progress']['counts']['ngrams_counted'] > 0
+    assert [stage for stage, _ in body['progress']['stage_seconds']] == ['clean', 'tokenize', 'train']
+
+    # same handle as the synchronous endpoint would give
+    response, body = _post_json(testapp, '/api/models', API_MODEL_PARAMETERS)
+    assert (response.status_code, body['model_id']) == (200, model_id)
+    response, body = _post_json(testapp, '/api/models/{}/sentences'.format(model_id), dict(
+            joiner_strategy='just_whitespace', count_of_sentences_to_make=2))
+    assert len(body['text'].splitlines()) == 2
+
+    assert testapp.get('/api/training-jobs/not-a-job').status_code == 404
+    response, body = _post_json(testapp, '/api/training-jobs', dict(API_MODEL_PARAMETERS, ngram_size=0))
+    assert response.status_code == 400
+
+
+def _metric_samples(testapp):
+    response = testapp.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    samples = {}
+    for line in response.data.decode('utf-8').splitlines():
+        if line and not line.startswith('#'):
+            name_and_labels, value = line.rsplit(' ', 1)
+            samples[name_and_labels] = float(value)
+    return samples
+
+
+def test_metrics(testapp, empty_model_store):
+    # (metrics are process-wide, so other tests' requests are in there too. compare before & after)
+    before = _metric_samples(testapp)
+
+    _, body = _post_json(testapp, '/api/models', API_MODEL_PARAMETERS)
+    url = '/api/models/{}/sentences'.format(body['model_id'])
+    for _ in range(2):
+        _post_json(testapp, url, dict(joiner_strategy='just_whitespace', count_of_sentences_to_make=3))
+    assert testapp.post('/api/models/not-a-model/sentences').status_code == 404
+
+    after = _metric_samples(testapp)
+
+    def increase(sample):
+        return after[sample] - before.get(sample, 0)
+
+    pipeline_labels = ('text_maker_strategy="crude",tokenizer_strategy="just_whitespace",'
+                       'joiner_strategy="just_whitespace"')
+    assert increase('presswork_requests_total{endpoint="/api/models/<model_id>/sentences",status="200",' +
+                    pipeline_labels + '}') == 2
+    assert increase('presswork_request_seconds_count{endpoint="/api/models/<model_id>/sentences",' +
+                    pipeline_labels + '}') == 2
+    assert increase('presswork_requests_total{endpoint="/api/models/<model_id>/sentences",status="404",'
+                    'text_maker_strategy="",tokenizer_strategy="",joiner_strategy=""}') == 1
+
+    for stage in ('clean', 'tokenize', 'train', 'generate', 'join', 'proofread'):
+        assert increase('presswork_stage_seconds_count{{stage="{}",text_maker_strategy="crude"}}'.format(stage)) >= 1
+    assert increase('presswork_generated_tokens_total{text_maker_strategy="crude"}') >= 6 * 4
+    assert after['presswork_generation_tokens_per_second{text_maker_strategy="crude"}'] > 0
+
+    # (the model store is fresh, from the fixture)
+    assert after['presswork_model_store_lookups_total{result="hit"}'] == 2
+    assert after['presswork_model_store_lookups_total{result="miss"}'] == 2
+    assert after['presswork_model_store_models'] == 1
+    assert after['presswork_model_store_resident_bytes'] > 0
+    assert 'presswork_jobs_queue_depth' in after
+
+
+def test_metrics_of_the_html_form(testapp, small_job_executor):
+    # (the form's pipeline runs in a worker process; its timings come back with the text, to be recorded here)
+    before = _metric_samples(testapp)
+    response = testapp.post('/', data=dict(
+            API_MODEL_PARAMETERS, joiner_strategy='just_whitespace', count_of_sentences_to_make=3))
+    assert response.status_code == 200
+    after = _metric_samples(testapp)
+
+    def increase(sample):
+        return after[sample] - before.get(sample, 0)
+
+    for stage in ('clean', 'tokenize', 'train', 'generate', 'join', 'proofread'):
+        assert increase('presswork_stage_seconds_count{{stage="{}",text_maker_strategy="crude"}}'.format(stage)) == 1
+    assert increase('presswork_generated_tokens_total{text_maker_strategy="crude"}') >= 1 + 3
+    assert increase('presswork_generation_seconds_total{text_maker_strategy="crude"}') > 0
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+""" tests for the job executor that the Flask app runs its training & generating in
+"""
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from presswork.flask_app import jobs
+
+
+def _sleep_then_return(seconds, value):
+    time.sleep(seconds)
+    return value
+
+
+def _fail():
+    raise ValueError("this job fails")
+
+
+def _die():
+    # (like the OOM killer would)
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+@pytest.fixture()
+def executor():
+    executor = jobs.JobExecutor(processes=1, max_queue=1, timeout_seconds=1)
+    yield executor
+    executor.shutdown()
+
+
+def test_results_and_failures(executor):
+    assert executor.submit(_sleep_then_return, 0, u"result").get(timeout=10) == u"result"
+
+    job = executor.submit(_fail)
+    with pytest.raises(ValueError):
+        job.get(timeout=10)
+    assert job.state == 'failed'
+
+    stats = executor.stats
+    assert (stats['submitted'], stats['completed'], stats['failed']) == (2, 1, 1)
+
+
+def test_timeout_is_enforced_in_the_worker(executor):
+    job = executor.submit(_sleep_then_return, 30, u"too late")
+    with pytest.raises(jobs.JobTimeoutError):
+        job.get(timeout=10)
+    assert job.state == 'timed out'
+    assert executor.stats['timed_out'] == 1
+
+    # the worker was freed up, so the next job runs
+    assert executor.submit(_sleep_then_return, 0, u"next").get(timeout=10) == u"next"
+
+
+def test_bounded_queue_rejects_when_saturated(executor):
+    running = executor.submit(_sleep_then_return, 0.5, 1)
+    queued = executor.submit(_sleep_then_return, 0, 2)
+    with pytest.raises(jobs.QueueFullError):
+        executor.submit(_sleep_then_return, 0, 3)
+
+    stats = executor.stats
+    assert stats['rejected'] == 1
+    assert stats['running'] == 1
+    assert stats['queue_depth'] == 1
+
+    # waiting for a job can time out on the caller's side too, without failing the job
+    with pytest.raises(jobs.JobTimeoutError):
+        queued.get(timeout=0.01)
+    assert queued.state == 'pending'
+
+    assert (running.get(timeout=10), queued.get(timeout=10)) == (1, 2)
+    assert executor.stats['queue_depth'] == 0
+    assert executor.submit(_sleep_then_return, 0, 3).get(timeout=10) == 3
+
+
+def test_finished_jobs_are_forgotten_after_ttl():
+    now = [0]
+    executor = jobs.JobExecutor(processes=1, result_ttl_seconds=60, clock=lambda: now[0])
+    try:
+        job = executor.submit(_sleep_then_return, 0, 1)
+        job.get(timeout=10)
+        time.sleep(0.1)  # (the completion callback runs in another thread)
+        assert executor.get_job(job.job_id) is job
+        now[0] += 61
+        with pytest.raises(KeyError):
+            executor.get_job(job.job_id)
+    finally:
+        executor.shutdown()
+
+
+def test_jobs_whose_worker_died_fail_after_their_deadline(monkeypatch):
+    # (pools are only started by the supervisor thread - not here, where jobs are submitted & checked on)
+    started_from = []
+
+    def recording_pool(*args, **kwargs):
+        started_from.append(threading.current_thread().name)
+        return pool(*args, **kwargs)
+
+    pool = multiprocessing.Pool
+    monkeypatch.setattr(multiprocessing, 'Pool', recording_pool)
+
+    now = [0]
+    executor = jobs.JobExecutor(processes=1, max_queue=0, timeout_seconds=1, clock=lambda: now[0])
+    try:
+        job = executor.submit(_die)
+        with pytest.raises(jobs.JobTimeoutError):
+            job.get(timeout=1)
+        assert job.state == 'pending'
+        with pytest.raises(jobs.QueueFullError):
+            executor.submit(_sleep_then_return, 0, 1)
+
+        now[0] = job.deadline + 1
+        assert job.state == 'pending'
+        assert executor.get_job(job.job_id).state == 'failed'
+        with pytest.raises(jobs.WorkerLostError):
+            job.get(timeout=1)
+        assert executor.stats['failed'] == 1
+
+        # the job no longer counts against the queue, and the replacement pool runs jobs
+        assert executor.submit(_sleep_then_return, 0, u"after").get(timeout=10) == u"after"
+        assert started_from == ["presswork-job-supervisor"] * 2
+    finally:
+        executor.shutdown()
+    assert not executor._supervisor
+
+
+def test_shutdown_then_start_again(executor):
+    executor.start()
+    workers = list(executor._pool._pool)
+    assert len(workers) == 1 and workers[0].is_alive()
+    executor.shutdown()
+    assert not any(worker.is_alive() for worker in workers)
+    assert executor.submit(_sleep_then_return, 0, 1).get(timeout=10) == 1
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+""" tests for the metrics registry behind the Flask app's /metrics endpoint
+"""
+import pytest
+
+from presswork.flask_app import metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = metrics.Registry()
+    latency = registry.histogram('latency_seconds', 'Latency.', ['endpoint'], buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.5, 5.0):
+        latency.observe(seconds, endpoint='/')
+
+    assert registry.render().splitlines()[2:] == [
+        u'latency_seconds_bucket{endpoint="/",le="0.1"} 1',
+        u'latency_seconds_bucket{endpoint="/",le="1"} 3',
+        u'latency_seconds_bucket{endpoint="/",le="+Inf"} 4',
+        u'latency_seconds_sum{endpoint="/"} 6.05',
+        u'latency_seconds_count{endpoint="/"} 4',
+    ]
+
+
+def test_function_metrics_and_label_escaping():
+    registry = metrics.Registry()
+    registry.function('models', 'Models held.', lambda: 3)
+    registry.function('jobs', 'Jobs by state.', lambda: {('say "hi"',): 1}, ['state'], metric_type='counter')
+
+    assert registry.render().splitlines() == [
+        u'# HELP models Models held.',
+        u'# TYPE models gauge',
+        u'models 3',
+        u'# HELP jobs Jobs by state.',
+        u'# TYPE jobs counter',
+        u'jobs{state="say \\"hi\\""} 1',
+    ]
+
+
+def test_labels_must_match_and_names_must_be_unique():
+    registry = metrics.Registry()
+    counter = registry.counter('requests_total', 'Requests.', ['endpoint'])
+    with pytest.raises(ValueError):
+        counter.inc(status=200)
+    with pytest.raises(ValueError):
+        registry.counter('requests_total', 'Requests, again.')
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+""" tests for the background trainer that the Flask app trains big corpora in
+"""
+import threading
+
+import pytest
+
+from presswork.flask_app import jobs
+from presswork.flask_app import training
+
+
+def test_failures_are_reported():
+    trainer = training.BackgroundTrainer(threads=1)
+
+    def fail(progress):
+        progress.start_stage('tokenize')
+        raise ValueError("this job fails")
+
+    job = trainer.submit('model', fail)
+    assert job.wait(timeout=10)
+    assert job.state == 'failed'
+    assert "this job fails" in unicode(job.error)
+    assert job.progress.snapshot()['stage'] is None
+    assert trainer.get_job(job.job_id) is job
+
+
+def test_queue_is_bounded_and_finished_jobs_are_forgotten():
+    now = [0]
+    trainer = training.BackgroundTrainer(threads=1, max_queue=1, result_ttl_seconds=60, clock=lambda: now[0])
+    release = threading.Event()
+
+    running = trainer.submit('model', lambda progress: release.wait(10))
+    queued = trainer.submit('model', lambda progress: None)
+    with pytest.raises(jobs.QueueFullError):
+        trainer.submit('model', lambda progress: None)
+
+    release.set()
+    assert running.wait(timeout=10) and queued.wait(timeout=10)
+    assert queued.state == 'done'
+    trainer.submit('model', lambda progress: None).wait(timeout=10)
+
+    now[0] += 61
+    with pytest.raises(KeyError):
+        trainer.get_job(running.job_id)
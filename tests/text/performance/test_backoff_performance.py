@@ -0,0 +1,50 @@
+""" PyMarkovChainForked generation, on a corpus with long sentences: indexed backoff vs. the original backoff
+
+disabled by default, same as the other performance tests. pass "--runslow" to py.test to run these.
+
+the original backoff converted the whole sentence-so-far to a tuple, then trimmed it one word at a time until it found
+a state - so each sentence cost time quadratic in its length. the indexed version looks at a sliding window of the
+last `window` words, with memoized backoff. long sentences (as in senate-bills.txt) are where the difference shows.
+"""
+import os
+
+import pytest
+
+from presswork.text import clean
+from presswork.text.grammar import tokenizers
+from presswork.text.markov.thirdparty._pymarkovchain import PyMarkovChainForked
+from tests import fixtures
+from tests.text.thirdparty.test_pymarkovchain_fork import _next_word_as_originally_written
+
+SENATE_BILLS = [filename for filename in fixtures.FILENAMES_NEWLINES
+                if os.path.basename(filename) == "senate-bills.txt"][0]
+
+
+@pytest.fixture(scope="module")
+def senate_bills_sentences():
+    with open(SENATE_BILLS, 'r') as f:
+        text = clean.CleanInputString(f.read())
+    return tokenizers.SentenceTokenizerWhitespace().tokenize(text)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('indexed', [True, False], ids=['indexed', 'original'])
+@pytest.mark.parametrize('window', [2, 4])
+def test_pymc_generate_long_sentences(senate_bills_sentences, window, indexed, benchmark):
+    pymc = PyMarkovChainForked(window=window)
+    pymc.markov_chain(senate_bills_sentences)
+    pymc.freeze()
+
+    if not indexed:
+        pymc._generate_sentence_as_list = lambda seed: _generate_sentence_as_originally_written(pymc, seed)
+
+    benchmark.pedantic(pymc.make_sentences_list, args=(100,), iterations=1, rounds=10)
+
+
+def _generate_sentence_as_originally_written(pymc, seed):
+    sentence = list(seed)
+    next_word = _next_word_as_originally_written(pymc, sentence)
+    while next_word:
+        sentence.append(next_word)
+        next_word = _next_word_as_originally_written(pymc, sentence)
+    return sentence
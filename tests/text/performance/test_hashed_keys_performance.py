@@ -0,0 +1,82 @@
+""" the crude strategy, with hashed keys vs. tuple keys: training & generation throughput, and model memory
+
+disabled by default, same as the other performance tests. pass "--runslow" to py.test to run these. (and "-s" to
+see the model sizes, peak memory while training & frozen.)
+
+with hashed keys, each n-gram's key is rolled from the last one, instead of a tuple being sliced out per position -
+but in pure Python, the arithmetic (and checking each key for collisions while training) costs about as much as the
+slicing saved. what it does save is memory: an int per n-gram, instead of a tuple - while training too, as collisions
+are checked against the training sentences' word IDs (see HashedKeysModel).
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from presswork.text import profiling
+from presswork.text import synthetic
+from presswork.text.grammar import tokenizers
+from presswork.text.markov import _crude_markov
+
+
+@pytest.fixture(scope="module")
+def synthetic_sentences():
+    text = synthetic.ZipfianCorpusGenerator(seed=42).text("1M")
+    return tokenizers.SentenceTokenizerWhitespace().tokenize(text)
+
+
+# (peak RSS of a fresh interpreter, training the same corpus: in this process, memory freed by the other tests would be
+# reused, & not show up. and sampling malloc, as PeakMemoryTracker does on python 2, misses small objects, in pymalloc's
+# arenas - which is most of what the tuple keys are. Linux only: resetting the high-water mark needs /proc)
+_PEAK_TRAINING_RSS_SCRIPT = """
+import sys
+from presswork.text import synthetic
+from presswork.text.grammar import tokenizers
+from presswork.text.markov import _crude_markov
+
+def status(field):
+    with open('/proc/self/status') as f:
+        return int(next(line for line in f if line.startswith(field)).split()[1]) * 1024
+
+sentences = tokenizers.SentenceTokenizerWhitespace().tokenize(synthetic.ZipfianCorpusGenerator(seed=42).text("1M"))
+with open('/proc/self/clear_refs', 'w') as f:
+    f.write('5')
+baseline = status('VmRSS')
+model = _crude_markov.crude_markov_chain(sentences, int(sys.argv[1]), hashed_keys=sys.argv[2] == 'True')
+print status('VmHWM') - baseline
+"""
+
+
+def _peak_training_rss(ngram_size, hashed_keys):
+    if not os.path.exists('/proc/self/clear_refs'):
+        return 'n/a'
+    output = subprocess.check_output(
+            [sys.executable, '-c', _PEAK_TRAINING_RSS_SCRIPT, str(ngram_size), str(hashed_keys)],
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+    return '{:,}'.format(int(output))
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('hashed_keys', [False, True], ids=['tuple-keys', 'hashed-keys'])
+@pytest.mark.parametrize('ngram_size', [2, 3])
+def test_crude_train(synthetic_sentences, ngram_size, hashed_keys, benchmark):
+    model = benchmark.pedantic(_crude_markov.crude_markov_chain, args=(synthetic_sentences, ngram_size),
+                               kwargs=dict(hashed_keys=hashed_keys), iterations=1, rounds=3)
+    print
+    print "ngram_size={} hashed_keys={}: {} bytes peak while training, {:,} bytes (frozen)".format(
+            ngram_size, hashed_keys, _peak_training_rss(ngram_size, hashed_keys),
+            profiling.deep_sizeof(_crude_markov.freeze_model(model)))
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('hashed_keys', [False, True], ids=['tuple-keys', 'hashed-keys'])
+@pytest.mark.parametrize('ngram_size', [2, 3])
+def test_crude_generate(synthetic_sentences, ngram_size, hashed_keys, benchmark):
+    model = _crude_markov.freeze_model(
+            _crude_markov.crude_markov_chain(synthetic_sentences, ngram_size=ngram_size, hashed_keys=hashed_keys))
+
+    def generate():
+        return list(_crude_markov.iter_make_sentences(model, ngram_size=ngram_size, count=1000))
+
+    benchmark.pedantic(generate, iterations=1, rounds=5)
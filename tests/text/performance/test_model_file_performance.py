@@ -0,0 +1,43 @@
+""" loading a saved model (`--load-model`) vs. retraining from the corpus (reading, cleaning, tokenizing, training)
+
+disabled by default, same as the other performance tests. pass "--runslow" to py.test to run these.
+
+compare the 'load' & 'retrain' rows for each strategy & corpus size. loading has to unpickle the whole model, so it
+grows with the model too - but it skips cleaning & tokenizing (and for nltk, loading Punkt), so it should win by a lot
+with the slower tokenizers.
+"""
+import pytest
+
+from presswork.text import model_files
+from presswork.text import synthetic
+from presswork.text import text_makers
+
+SIZES = ["256k", "1M"]
+
+
+@pytest.fixture(scope="module", params=SIZES)
+def corpus_file(request, tmpdir_factory):
+    path = tmpdir_factory.mktemp("corpus").join("corpus.txt")
+    generator = synthetic.ZipfianCorpusGenerator(seed=2017, sentences_per_line=4)
+    path.write_binary(generator.text(request.param).encode('utf-8'))
+    return str(path)
+
+
+def _retrain(corpus_file, strategy, tokenizer):
+    with open(corpus_file, 'rb') as f:
+        input_text = f.read().decode('utf-8')
+    return text_makers.create_text_maker(input_text=input_text, strategy=strategy, sentence_tokenizer=tokenizer)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('how', ['retrain', 'load'])
+@pytest.mark.parametrize('tokenizer', ['just_whitespace', 'nltk'])
+def test_load_model_vs_retrain(corpus_file, each_text_maker, tokenizer, how, benchmark, tmpdir):
+    strategy = each_text_maker.NICKNAME
+    if how == 'retrain':
+        benchmark.pedantic(_retrain, args=(corpus_file, strategy, tokenizer), iterations=1, rounds=3)
+    else:
+        model_file_path = str(tmpdir.join('model.pwm'))
+        model_files.save_text_maker(_retrain(corpus_file, strategy, tokenizer), model_file_path)
+        text_maker = benchmark.pedantic(model_files.load_text_maker, args=(model_file_path,), iterations=1, rounds=3)
+        assert text_maker.make_sentences(1)
@@ -0,0 +1,53 @@
+""" rough scaling checks using synthetic corpora - how do cleaning, tokenizing, training & generating grow with size?
+
+disabled by default, same as the other performance tests. pass "--runslow" to py.test to run these.
+
+same caveats as in test_rank_performance: these are loose comparisons, not rigorous benchmarks. the synthetic corpus
+is generated (not shipped), so sizes can be cranked up locally, i.e. to find where things fall over. (for GB scale,
+don't parametrize here; use `presswork synthetic-corpus --size 1G | presswork ...` instead.)
+"""
+import pytest
+
+from presswork.text import clean
+from presswork.text import synthetic
+from presswork.text.grammar import tokenizers
+
+SIZES = ["64k", "256k", "1M"]
+
+
+@pytest.fixture(scope="module", params=SIZES)
+def synthetic_text(request):
+    generator = synthetic.ZipfianCorpusGenerator(seed=2017, non_ascii_rate=0.01, control_character_rate=0.001)
+    return generator.text(request.param)
+
+
+@pytest.mark.slow
+def test_scale_clean(synthetic_text, benchmark):
+    benchmark.pedantic(clean.CleanInputString, args=(synthetic_text,), iterations=1, rounds=3)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('tokenizer_nickname', tokenizers.TOKENIZER_NICKNAMES)
+def test_scale_tokenize(synthetic_text, tokenizer_nickname, benchmark):
+    tokenizer = tokenizers.create_sentence_tokenizer(tokenizer_nickname)
+    cleaned = clean.CleanInputString(synthetic_text)
+    benchmark.pedantic(tokenizer.tokenize, args=(cleaned,), iterations=1, rounds=3)
+
+
+@pytest.mark.slow
+def test_scale_train(synthetic_text, each_text_maker, benchmark):
+    cleaned = clean.CleanInputString(synthetic_text)
+
+    def setup():
+        return (each_text_maker.clone(),), {}
+
+    def train(text_maker):
+        text_maker.input_text(cleaned)
+
+    benchmark.pedantic(train, setup=setup, rounds=3)
+
+
+@pytest.mark.slow
+def test_scale_generate(synthetic_text, each_text_maker, benchmark):
+    each_text_maker.input_text(synthetic_text)
+    benchmark.pedantic(each_text_maker.make_sentences, args=(200,), iterations=1, rounds=5)
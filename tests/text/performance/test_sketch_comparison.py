@@ -0,0 +1,111 @@
+""" the approximate 'sketch' strategy vs. the exact ones: model memory, and how much of the corpus it still captures
+
+disabled by default, same as the other performance tests. pass "--runslow" to py.test to run these. (and "-s" to
+see the comparison table.)
+
+quality measures, per corpus:
+    * coverage - the share of the corpus' transitions (weighted by count) whose next word the model kept. the exact
+    strategies keep everything (1.0); the sketch drops rare next words & rare n-grams as its memory shrinks.
+    * distance - total variation distance between the exact & the kept next-word distributions, averaged over the
+    corpus' n-grams (weighted by count). 0 = same weights as an exact model.
+    * every transition generated by the sketch was seen in the corpus (it can't make up transitions, only drop some).
+"""
+import collections
+import os
+
+import pytest
+
+from presswork import constants
+from presswork.text import clean
+from presswork.text import profiling
+from presswork.text import synthetic
+from presswork.text import text_makers
+from presswork.text.grammar import tokenizers
+from presswork.text.markov import _crude_markov
+from tests import fixtures
+
+NGRAM_SIZE = constants.DEFAULT_NGRAM_SIZE
+
+EXACT_STRATEGIES = ['crude', 'pymc', 'markovify']
+
+# (label, sketch parameters) - from a small budget up to the defaults
+SKETCH_BUDGETS = [
+    ('sketch-small', dict(width=2 ** 12, max_contexts=2000, successors_per_context=4)),
+    ('sketch-medium', dict(width=2 ** 14, max_contexts=20000, successors_per_context=8)),
+    ('sketch-default', dict()),
+]
+
+
+def _corpora():
+    corpora = []
+    for filename in fixtures.FILENAMES_NEWLINES:
+        with open(filename, 'r') as f:
+            corpora.append((os.path.basename(filename), f.read()))
+    corpora.append(('synthetic-1M', synthetic.ZipfianCorpusGenerator(seed=42).text("1M")))
+    return corpora
+
+
+def _quality(sketch_chain, exact_model):
+    """ :return: (coverage, distance) of the sketch's kept next words vs. the exact model (see module docstring)
+    """
+    total = covered = distance = 0.0
+    for ngram, successors in exact_model.iteritems():
+        exact_counts = collections.Counter(successors)
+        count = len(successors)
+        kept = sketch_chain.table.get(ngram) or []
+        kept_counts = dict(zip(kept[::2], kept[1::2]))
+        kept_total = float(sum(kept_counts.values())) or 1.0
+
+        total += count
+        covered += sum(exact_counts[word] for word in kept_counts)
+        words = set(exact_counts) | set(kept_counts)
+        distance += count * 0.5 * sum(
+                abs(exact_counts[word] / float(count) - kept_counts.get(word, 0) / kept_total) for word in words)
+    return covered / total, distance / total
+
+
+def _generated_transitions_are_real(text_maker, exact_model):
+    for sentence in text_maker.make_sentences(200):
+        ngram = _crude_markov.ngram_for_sentence_start(NGRAM_SIZE)
+        for word in sentence:
+            if word not in exact_model.get(ngram, ()):
+                return False
+            ngram = ngram[1:] + (word,)
+    return True
+
+
+@pytest.mark.slow
+def test_sketch_vs_exact_strategies():
+    rows = []
+    for corpus_name, text in _corpora():
+        sentences = tokenizers.SentenceTokenizerWhitespace().tokenize(clean.CleanInputString(text))
+        exact_model = _crude_markov.crude_markov_chain(sentences, ngram_size=NGRAM_SIZE)
+
+        sizes = {}
+        for strategy in EXACT_STRATEGIES:
+            text_maker = text_makers.create_text_maker(strategy=strategy, ngram_size=NGRAM_SIZE)
+            text_maker.input_sentences(sentences)
+            sizes[strategy] = profiling.deep_sizeof(text_maker.model)
+            rows.append((corpus_name, strategy, sizes[strategy], 1.0, 0.0))
+
+        for label, sketch_kwargs in SKETCH_BUDGETS:
+            text_maker = text_makers.create_text_maker(strategy='sketch', ngram_size=NGRAM_SIZE, **sketch_kwargs)
+            text_maker.input_sentences(sentences)
+            coverage, distance = _quality(text_maker.model, exact_model)
+            sizes[label] = profiling.deep_sizeof(text_maker.model)
+            rows.append((corpus_name, label, sizes[label], coverage, distance))
+
+            assert _generated_transitions_are_real(text_maker, exact_model)
+
+        if corpus_name == 'synthetic-1M':
+            assert sizes['sketch-small'] < min(sizes[strategy] for strategy in EXACT_STRATEGIES)
+
+    print
+    print "{:<28} {:<16} {:>12} {:>9} {:>9}".format("corpus", "strategy", "model bytes", "coverage", "distance")
+    for row in rows:
+        print "{:<28} {:<16} {:>12,} {:>9.3f} {:>9.3f}".format(*row)
+
+    # degrades gracefully: more memory, more coverage
+    for corpus_name, _ in _corpora():
+        coverages = [row[3] for row in rows if row[0] == corpus_name and row[1].startswith('sketch')]
+        assert coverages == sorted(coverages)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+""" tests for reading a corpus that is a directory of files
+"""
+from presswork.text import corpus_directory
+
+
+def _write_corpus(tmpdir):
+    tmpdir.join('b.txt').write(u"Flat is better than nested.\n")
+    tmpdir.join('a.txt').write_binary(u"Simple is better than cømplex.\nNow is better than never.\n".encode('utf-8'))
+    tmpdir.join('more', 'c.txt').write(u"Sparse is better than dense.\n", ensure=True)
+    tmpdir.join('.hidden.txt').write(u"Not this one.\n")
+    tmpdir.join('.git', 'HEAD').write(u"Or this.\n", ensure=True)
+    return tmpdir
+
+
+def test_list_files_is_sorted_and_skips_hidden(tmpdir):
+    _write_corpus(tmpdir)
+    assert corpus_directory.list_files(str(tmpdir)) == [
+        str(tmpdir.join('a.txt')), str(tmpdir.join('b.txt')), str(tmpdir.join('more', 'c.txt'))]
+
+
+def test_read_files_keeps_order(tmpdir):
+    paths = []
+    for i in range(50):
+        paths.append(str(tmpdir.join('{}.txt'.format(i))))
+        tmpdir.join('{}.txt'.format(i)).write(b'x' * i)
+    assert [(path, len(input_bytes)) for path, input_bytes in corpus_directory.read_files(paths, threads=8)] == \
+        [(path, i) for i, path in enumerate(paths)]
+
+
+def test_tokenize_directory(tmpdir):
+    _write_corpus(tmpdir)
+    sentences = corpus_directory.tokenize_directory(str(tmpdir), 'utf-8', 'just_whitespace')
+    assert [u' '.join(words) for words in sentences] == [
+        u"Simple is better than cømplex.",
+        u"Now is better than never.",
+        u"Flat is better than nested.",
+        u"Sparse is better than dense.",
+    ]
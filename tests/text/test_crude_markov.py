@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+""" tests directly against the crude strategy's hashed keys (parity with the other strategies is covered in
+test_essentials)
+"""
+import random
+
+import pytest
+
+from presswork.text import model_files
+from presswork.text import synthetic
+from presswork.text import text_makers
+from presswork.text.grammar import tokenizers
+from presswork.text.markov import _crude_markov
+
+tokenize = tokenizers.SentenceTokenizerWhitespace().tokenize
+
+
+@pytest.fixture(scope="module")
+def sentences():
+    return tokenize(synthetic.ZipfianCorpusGenerator(vocabulary_size=500, seed=7).text("20k"))
+
+
+@pytest.mark.parametrize('ngram_size', [1, 2, 3, 5])
+def test_hashed_keys_match_tuple_keys(sentences, ngram_size):
+    model = _crude_markov.crude_markov_chain(sentences, ngram_size=ngram_size)
+    hashed = _crude_markov.crude_markov_chain(sentences, ngram_size=ngram_size, hashed_keys=True)
+
+    assert len(hashed) == len(model)
+    # (word IDs are in the tokenizer's vocabulary; the padding's isn't)
+    assert hashed.vocabulary is sentences.vocabulary
+    assert _crude_markov.START_SYMBOL not in sentences.vocabulary
+    for ngram, successors in model.iteritems():
+        assert hashed.decode(hashed.successor_ids(hashed.key(ngram))) == successors
+        assert hashed.ngram(hashed.key(ngram)) == ngram
+
+    # (same successor lists, so the same choices from the same seed)
+    random.seed(ngram_size)
+    expected = list(_crude_markov.iter_make_sentences(model, ngram_size=ngram_size, count=50))
+    random.seed(ngram_size)
+    assert list(_crude_markov.iter_make_sentences(
+            _crude_markov.freeze_model(hashed), ngram_size=ngram_size, count=50)) == expected
+
+
+def test_rolling_matches_from_scratch(sentences):
+    model = _crude_markov.crude_markov_chain(sentences, ngram_size=3, hashed_keys=True)
+    for sentence in sentences[:50]:
+        padded = _crude_markov.ngram_for_sentence_start(3) + tuple(sentence)
+        padded_ids = map(model.word_id, padded)
+        key = model.start_key
+        for i in xrange(len(sentence)):
+            key = model.roll(key, padded_ids[i], padded_ids[i + 3])
+            assert key == model.key(padded[i + 1:i + 4])
+            assert -2 ** 63 <= key < 2 ** 63 and isinstance(key, int)
+
+
+def test_collisions_are_detected(monkeypatch):
+    # (with every key the same, the second n-gram collides with the first)
+    monkeypatch.setattr(_crude_markov, '_signed', lambda key: 0)
+    with pytest.raises(_crude_markov.NgramKeyCollision):
+        _crude_markov.crude_markov_chain([["A", "tokenized", "sentence."]], ngram_size=2, hashed_keys=True)
+
+
+def test_text_maker_with_hashed_keys(sentences, tmpdir):
+    text_maker = text_makers.create_text_maker(strategy='crude', hashed_keys=True, prune_min_count=2)
+    text_maker.input_sentences(sentences)
+    assert isinstance(text_maker.model, _crude_markov.HashedKeysModel)
+    assert text_maker.prune_report.states_removed > 0
+    assert text_maker.model.training_word_ids is None
+    kept = text_makers.create_text_maker(strategy='crude', hashed_keys=True, keep_training_data=True)
+    kept.input_sentences(sentences)
+    assert kept.model.training_word_ids is None and kept.model.successors is None
+
+    unpruned = text_makers.create_text_maker(strategy='crude', prune_min_count=2)
+    unpruned.input_sentences(sentences)
+    assert len(text_maker.model) == len(unpruned.model)
+
+    assert text_maker.next_word([u"never", u"seen"]) is None
+    first_word = text_maker.next_word([])
+    assert first_word in unpruned.model[(u"", u"")]
+
+    path = str(tmpdir.join('hashed.pwm'))
+    model_files.save_text_maker(text_maker, path)
+    loaded = model_files.load_text_maker(path)
+    assert loaded.model == text_maker.model
+    assert list(loaded.model.vocabulary) == list(text_maker.model.vocabulary)
+    assert all(len(sentence) for sentence in loaded.make_sentences(20))
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+""" tests for the dedup stage (between splitting sentences & tokenizing words) and text makers using it
+"""
+import collections
+
+import pytest
+
+from presswork.text import dedup
+from presswork.text import pipeline_cache
+from presswork.text import synthetic
+from presswork.text import text_makers
+from presswork.text.grammar import tokenizers
+
+BOILERPLATE = u"Subscribe to our newsletter for more updates."
+
+
+@pytest.fixture(scope="module")
+def repetitive_text():
+    sentences = synthetic.ZipfianCorpusGenerator(vocabulary_size=300, seed=3).text("16k").splitlines()
+    # (every other line is the same boilerplate)
+    return u"\n".join(line for sentence in sentences for line in (sentence, BOILERPLATE))
+
+
+class CountingWordTokenizer(tokenizers.WordTokenizerWhitespace):
+    def __init__(self):
+        super(CountingWordTokenizer, self).__init__()
+        self.calls = 0
+
+    def tokenize(self, text):
+        self.calls += 1
+        return super(CountingWordTokenizer, self).tokenize(text)
+
+
+def _successor_counts(crude_model):
+    return {ngram: collections.Counter(successors) for ngram, successors in crude_model.iteritems()}
+
+
+def test_exact_with_weights_makes_the_same_model(repetitive_text):
+    plain = text_makers.create_text_maker(strategy='crude', input_text=repetitive_text)
+
+    word_tokenizer = CountingWordTokenizer()
+    deduplicated = text_makers.create_text_maker(
+            strategy='crude', sentence_tokenizer=tokenizers.SentenceTokenizerWhitespace(word_tokenizer),
+            dedup='exact', dedup_keep_weights=True, input_text=repetitive_text)
+
+    assert _successor_counts(deduplicated.model) == _successor_counts(plain.model)
+    report = deduplicated.dedup_report
+    assert word_tokenizer.calls == report.unique_sentences < report.sentences
+    assert report.reduction_ratio == pytest.approx(report.exact_duplicates / float(report.sentences))
+    assert report.reduction_ratio > 0.45
+
+
+def test_exact_without_weights_counts_each_sentence_once(repetitive_text):
+    text_maker = text_makers.create_text_maker(strategy='crude', dedup='exact', input_text=repetitive_text)
+    assert collections.Counter(text_maker.model[(u"", u"")])[u"Subscribe"] == 1
+
+
+def test_sentences_are_remembered_by_digest():
+    deduplicator = dedup.ExactDeduplicator()
+    deduplicator.tokenize([BOILERPLATE, u" " + BOILERPLATE, u"Caf\xe9 ol\xe9."], tokenizers.WordTokenizerWhitespace())
+    assert deduplicator.report.exact_duplicates == 1
+    assert sorted(len(key) for key in deduplicator._tokenized) == [dedup.DIGEST_BYTES] * 2
+
+
+def test_near_duplicates():
+    notice = u"The weekly meeting of the board is on {} at the old town hall, and all residents are welcome."
+    sentence_strings = [notice.format(day) for day in (u"Monday", u"Tuesday", u"Friday")] + [
+        notice.format(u"Monday").upper(),
+        u"Something else entirely, that is not like the notice at all.",
+        u"Hello.",
+        u"Hello.",
+    ]
+    deduplicator = dedup.MinHashDeduplicator(threshold=0.6)
+    tokenized = deduplicator.tokenize(sentence_strings, tokenizers.WordTokenizerWhitespace())
+
+    assert [u" ".join(words) for words in tokenized] == [sentence_strings[0], sentence_strings[4], u"Hello."]
+    assert deduplicator.report == dedup.DedupReport(
+            sentences=7, unique_sentences=3, exact_duplicates=1, near_duplicates=3)
+
+
+def test_distinct_sentences_are_kept():
+    sentence_strings = synthetic.ZipfianCorpusGenerator(vocabulary_size=5000, seed=1).text("32k").splitlines()
+    deduplicator = dedup.MinHashDeduplicator()
+    deduplicator.tokenize(sentence_strings, tokenizers.WordTokenizerWhitespace())
+    assert deduplicator.report.near_duplicates < 0.01 * len(sentence_strings)
+
+
+def test_state_is_kept_across_blocks():
+    deduplicator = dedup.ExactDeduplicator()
+    tokenizer = tokenizers.SentenceTokenizerWhitespace()
+    assert tokenizer.tokenize(u"A b.\nC d.", deduplicator=deduplicator) == [[u"A", u"b."], [u"C", u"d."]]
+    assert tokenizer.tokenize(u"C d.\nE f.", deduplicator=deduplicator) == [[u"E", u"f."]]
+    assert deduplicator.report.exact_duplicates == 1
+
+
+def test_invalid_dedup_settings():
+    with pytest.raises(ValueError):
+        text_makers.create_text_maker(dedup='fuzzy')
+    with pytest.raises(ValueError):
+        dedup.MinHashDeduplicator(num_perm=64, bands=10)
+
+    class QuacksLikeATokenizer(object):
+        def tokenize(self, text):
+            return [line.split() for line in text.splitlines()]
+
+    with pytest.raises(ValueError):
+        text_makers.create_text_maker(sentence_tokenizer=QuacksLikeATokenizer(), dedup='exact')
+
+
+def test_pipeline_cache_keys_deduplicated_tokens_separately(tmpdir, repetitive_text):
+    cache = pipeline_cache.PipelineCache(directory=str(tmpdir))
+    kwargs = dict(strategy='crude', sentence_tokenizer='just_whitespace', joiner='just_whitespace')
+    input_bytes = repetitive_text.encode('utf-8')
+
+    deduplicated = cache.text_maker_for(input_bytes, 'utf-8', dedup='exact', **kwargs)
+    plain = cache.text_maker_for(input_bytes, 'utf-8', **kwargs)
+    assert cache.misses['tokenized'] == 2
+    assert deduplicated.dedup_report.exact_duplicates > 0
+    assert plain.dedup_report is None
+    assert len(plain.model[(u"", u"")]) > len(deduplicated.model[(u"", u"")])
@@ -158,6 +158,12 @@ def test_cannot_change_ngram_size_after_inputting_text(each_text_maker):
     text_maker.ngram_size = 4  # this is allowed, it is not locked yet...
 
     text_maker.input_text("Foo bar blah baz. Foo bar blah quux.")
+    if isinstance(text_maker, (text_makers.TextMakerSuffixArray, text_makers.TextMakerNgramTrie)):
+        # ... the exceptions: their models serve any ngram_size (up to a max), so changing it is safe
+        text_maker.ngram_size = 3
+        assert "Foo bar blah" in text_maker.join(text_maker.make_sentences(1))
+        return
+
     with pytest.raises(text_makers.TextMakerIsLockedException):
         text_maker.ngram_size = 3
 
@@ -186,6 +192,26 @@ def test_avoid_pollution_between_instances(each_text_maker):
     assert 'Input' not in str(text_maker_1.make_sentences(10))
 
 
+@pytest.mark.parametrize('strategy, kwargs', [
+    ('crude', dict(hashed_keys=True)),
+    ('trie', dict(max_ngram_size=4)),
+    ('sqlite', dict(db_file_path='model.sqlite3', cache_size=7)),
+    ('suffix', dict(max_context_size=9)),
+    ('sketch', dict(width=64, depth=2)),
+])
+def test_clone_keeps_strategy_arguments(strategy, kwargs, tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    text_maker = text_makers.create_text_maker(strategy=strategy, ngram_size=3, **kwargs)
+    clone = text_maker.clone()
+    assert clone is not text_maker and clone.ngram_size == 3
+    for name, value in kwargs.iteritems():
+        # (the sketch's arguments are kept together, as they're passed on to the model)
+        assert getattr(clone, name, None) == value or clone.sketch_kwargs[name] == value
+
+    clone.input_text(u"Simple is better than complex.")
+    assert clone.make_sentences(1)
+
+
 def test_factory_special_cases():
     """ this already gets exercised in other tests, for the most part, but let's cover a few more cases
     """
@@ -254,3 +280,36 @@ def test_mismatched_ngram_size_for_crude():
     with pytest.raises(ValueError):
         generator = _crude_markov.iter_make_sentences(model, count=10, ngram_size=ngram_size + 1)
         generator.next()
+
+
+def test_training_data_is_released_upon_lock(each_text_maker):
+    """ once locked, only the model is needed - training-only data should be dropped or compacted (unless opted out)
+    """
+    text_maker = each_text_maker
+    text = "Foo bar baz. Foo bar quux. Foo bar baz again."
+
+    text_maker.input_text(text)
+    assert text_maker.training_sentences is None
+    assert 'Foo' in str(text_maker.make_sentences(10))
+
+    if isinstance(text_maker, text_makers.TextMakerMarkovify):
+        assert text_maker.strategy.parsed_sentences is None
+    elif isinstance(text_maker, text_makers.TextMakerPyMarkovChain):
+        assert text_maker.model.frozen
+    elif isinstance(text_maker, text_makers.TextMakerCrude):
+        assert all(isinstance(successors, tuple) for successors in text_maker.model.values())
+
+
+def test_keep_training_data_opt_out(each_text_maker):
+    text_maker = text_makers.create_text_maker(each_text_maker.__class__, keep_training_data=True)
+    text = "Foo bar baz. Foo bar quux. Foo bar baz again."
+
+    tokenized = text_maker.input_text(text)
+    assert text_maker.training_sentences == tokenized
+    with pytest.raises(text_makers.TextMakerIsLockedException):
+        text_maker.input_text(text)
+
+    if isinstance(text_maker, text_makers.TextMakerMarkovify):
+        assert text_maker.strategy.parsed_sentences == tokenized.unwrap()
+    elif isinstance(text_maker, text_makers.TextMakerPyMarkovChain):
+        assert not text_maker.strategy.frozen
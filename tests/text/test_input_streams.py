@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+""" tests for streaming compressed input (decompress, decode & tokenize a block at a time)
+"""
+import bz2
+import gzip
+import io
+
+import pytest
+
+from presswork.text import clean
+from presswork.text import input_streams
+from presswork.text import synthetic
+from presswork.text.grammar import tokenizers
+
+TEXT = u"Simple is better than cømplex.\nComplex is better than\ncomplicated.\n\nFlat is better than nested.\n" * 50
+
+
+def _compress(tmpdir, compression, data):
+    file_path = str(tmpdir.join('corpus.{}'.format(compression)))
+    if compression == 'gzip':
+        with gzip.open(file_path, 'wb') as f:
+            f.write(data)
+    elif compression == 'bz2':
+        with open(file_path, 'wb') as f:
+            f.write(bz2.compress(data))
+    elif compression == 'xz':
+        lzma = pytest.importorskip('backports.lzma')
+        with open(file_path, 'wb') as f:
+            f.write(lzma.compress(data))
+    else:
+        with open(file_path, 'wb') as f:
+            f.write(data)
+    return file_path
+
+
+@pytest.mark.parametrize('compression', ['gzip', 'bz2', 'xz', None])
+def test_detect_and_decompress(tmpdir, compression):
+    file_path = _compress(tmpdir, compression, TEXT.encode('utf-8'))
+    assert input_streams.detect_compression(file_path) == compression
+    assert input_streams.open_decompressed(file_path).read() == TEXT.encode('utf-8')
+
+
+def test_xz_without_lzma(tmpdir, monkeypatch):
+    file_path = str(tmpdir.join('corpus.xz'))
+    with open(file_path, 'wb') as f:
+        f.write(b'\xfd7zXZ\x00' + b'\x00' * 10)
+    monkeypatch.setattr(input_streams, 'lzma', None)
+    with pytest.raises(ValueError) as e:
+        input_streams.open_decompressed(file_path)
+    assert 'backports.lzma' in str(e.value)
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'utf-16', 'raw'])
+@pytest.mark.parametrize('block_size', [1, 7, 64, 100000])
+def test_text_blocks_decode_incrementally(encoding, block_size):
+    data = TEXT.encode('utf-8' if encoding == 'raw' else encoding)
+    blocks = list(input_streams.iter_text_blocks(io.BytesIO(data), encoding, block_size=block_size))
+    assert (b''.join(blocks) if encoding == 'raw' else u''.join(blocks)) == \
+        (data if encoding == 'raw' else TEXT)
+    if block_size >= 64:
+        # all but the last block end at a paragraph break; so no sentence is split between blocks
+        for block in blocks[:-1]:
+            assert block.endswith(u'\n\n' if encoding != 'raw' else b'\n\n')
+
+
+def test_text_blocks_without_paragraph_breaks_are_bounded():
+    data = u"one line after another\n".encode('utf-8') * 1000
+    blocks = list(input_streams.iter_text_blocks(io.BytesIO(data), 'utf-8', block_size=100))
+    assert u''.join(blocks) == data.decode('utf-8')
+    assert max(len(block) for block in blocks) <= 100 * (input_streams.MAX_BLOCKS_WITHOUT_PARAGRAPH_BREAK + 2)
+
+
+@pytest.mark.parametrize('tokenizer', tokenizers.TOKENIZER_NICKNAMES)
+def test_tokenize_file_matches_tokenizing_all_at_once(tmpdir, tokenizer):
+    text = synthetic.ZipfianCorpusGenerator(seed=3, sentences_per_line=4).text(64 * 1024)
+    text = text.replace(u'\n', u'\n\n')
+    file_path = _compress(tmpdir, 'gzip', text.encode('utf-8'))
+    streamed = input_streams.tokenize_file(file_path, 'utf-8', tokenizer, block_size=4096)
+    all_at_once = tokenizers.create_sentence_tokenizer(tokenizer).tokenize(clean.CleanInputString(text)).unwrap()
+    if tokenizer == 'just_whitespace':
+        assert streamed == all_at_once
+    else:
+        # (sentence tokenizers that look at context can split differently at the edges of blocks. but no words are
+        # lost or added)
+        assert [word for sentence in streamed for word in sentence] == \
+            [word for sentence in all_at_once for word in sentence]
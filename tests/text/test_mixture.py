@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+""" tests for next_word() (one step of generation) & blending text makers with TextMakerMixture
+"""
+import collections
+
+import pytest
+
+from presswork.text import model_files
+from presswork.text import text_makers
+
+REVIEWS = (u"The food was great.\n"
+           u"Service could be faster.\n"
+           u"Would eat here again.")
+# (no words in common with REVIEWS, so each generated sentence can only come from one of them)
+LEGAL = (u"Party of the first part agrees.\n"
+         u"Hereinafter referred to as lessee.")
+
+
+def _sentences(text):
+    return {tuple(line.split()) for line in text.splitlines()}
+
+
+def _make_sentences_by_next_word(text_maker, count):
+    sentences = []
+    for _ in xrange(count):
+        sentence = []
+        word = text_maker.next_word(sentence)
+        while word is not None and word is not text_makers.END_OF_SENTENCE:
+            sentence.append(word)
+            word = text_maker.next_word(sentence)
+        sentences.append(tuple(sentence))
+    return sentences
+
+
+def test_next_word_each_strategy(each_text_maker):
+    text_maker = text_makers.create_text_maker(strategy=each_text_maker.NICKNAME, input_text=REVIEWS)
+
+    # (no word appears twice in the input, so generating can only reproduce it)
+    assert set(_make_sentences_by_next_word(text_maker, 50)) == _sentences(REVIEWS)
+    assert text_maker.next_word([u"never", u"seen"]) is None
+
+
+def test_weights():
+    reviews = text_makers.create_text_maker(strategy='crude', input_text=REVIEWS)
+    legal = text_makers.create_text_maker(strategy='pymc', input_text=LEGAL)
+    mixture = text_makers.TextMakerMixture([reviews, legal], weights=[70, 30])
+    assert mixture.weights == [0.7, 0.3]
+    assert mixture.is_locked
+
+    sources = collections.Counter(
+            'reviews' if sentence in _sentences(REVIEWS) else 'legal'
+            for sentence in map(tuple, mixture.make_sentences(2000)))
+    assert set(sources) == {'reviews', 'legal'}
+    assert 0.65 < sources['reviews'] / 2000.0 < 0.75
+
+    mixture.weights = [0, 1]
+    assert set(map(tuple, mixture.make_sentences(50))) == _sentences(LEGAL)
+
+
+def test_contexts_only_one_text_maker_knows():
+    # after "The", both know the context; after "The cat", only the first one does
+    cats = text_makers.create_text_maker(strategy='markovify', input_text=u"The cat sat.")
+    dogs = text_makers.create_text_maker(strategy='sqlite', input_text=u"The dog ran.")
+    mixture = text_makers.TextMakerMixture([cats, dogs])
+
+    sentences = set(map(tuple, mixture.make_sentences(200)))
+    assert sentences == {(u"The", u"cat", u"sat."), (u"The", u"dog", u"ran.")}
+
+
+def test_mixture_of_model_files(tmpdir):
+    paths = []
+    for strategy, text in [('sketch', REVIEWS), ('suffix', LEGAL)]:
+        paths.append(str(tmpdir.join(strategy + '.pwm')))
+        model_files.save_text_maker(text_makers.create_text_maker(strategy=strategy, input_text=text), paths[-1])
+
+    mixture = text_makers.TextMakerMixture(paths, weights=[1, 0])
+    assert set(map(tuple, mixture.make_sentences(50))) == _sentences(REVIEWS)
+    assert mixture.count_states() == sum(text_maker.count_states() for text_maker in mixture.text_makers)
+
+    # (and the mixture itself can be saved)
+    model_files.save_text_maker(mixture, str(tmpdir.join('mixture.pwm')))
+    loaded = model_files.load_text_maker(str(tmpdir.join('mixture.pwm')))
+    assert loaded.weights == [1.0, 0.0]
+    assert set(map(tuple, loaded.make_sentences(50))) == _sentences(REVIEWS)
+
+
+def test_invalid_mixtures():
+    trained = text_makers.create_text_maker(strategy='crude', input_text=REVIEWS)
+    with pytest.raises(ValueError):
+        text_makers.TextMakerMixture([])
+    with pytest.raises(ValueError):
+        text_makers.TextMakerMixture([trained, text_makers.create_text_maker(strategy='crude')])
+    for weights in ([1], [1, -1], [0, 0]):
+        with pytest.raises(ValueError):
+            text_makers.TextMakerMixture([trained, trained], weights=weights)
+
+    mixture = text_makers.TextMakerMixture([trained])
+    with pytest.raises(text_makers.TextMakerIsLockedException):
+        mixture.input_text(LEGAL)
+    assert None not in text_makers.TEXT_MAKER_NICKNAMES
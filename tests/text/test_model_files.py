@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+""" tests for saving & loading trained text makers
+"""
+import pytest
+
+from presswork.text import model_files
+from presswork.text import text_makers
+from presswork.text.progress import Progress
+
+
+@pytest.mark.parametrize('tokenizer_strategy', ['just_whitespace', 'nltk'])
+@pytest.mark.parametrize('joiner_strategy', ['just_whitespace', 'random_enjamb'])
+def test_round_trip_each_strategy(each_text_maker, tokenizer_strategy, joiner_strategy, text_newlines, tmpdir):
+    text_maker = text_makers.create_text_maker(
+            strategy=each_text_maker.NICKNAME, sentence_tokenizer=tokenizer_strategy, joiner=joiner_strategy,
+            ngram_size=3, progress=Progress())
+    input_sentences = text_maker.input_text(text_newlines)
+
+    model_file_path = str(tmpdir.join('model.pwm'))
+    model_files.save_text_maker(text_maker, model_file_path)
+    assert model_files.read_model_info(model_file_path) == dict(
+            format=model_files.FORMAT, format_version=model_files.FORMAT_VERSION, strategy=each_text_maker.NICKNAME,
+            tokenizer=tokenizer_strategy, joiner=joiner_strategy, ngram_size=3)
+
+    loaded = model_files.load_text_maker(model_file_path)
+    assert type(loaded) is type(text_maker)
+    assert loaded.is_locked and loaded.ngram_size == 3
+    assert loaded.count_states() == text_maker.count_states()
+
+    input_words = set(word for sentence in input_sentences for word in sentence)
+    output_words = set(word for sentence in loaded.make_sentences(20) for word in (sentence or ()))
+    assert output_words and output_words.issubset(input_words | {u''})
+
+
+def test_unsaveable_and_invalid_files(tmpdir):
+    with pytest.raises(ValueError):
+        model_files.save_text_maker(text_makers.create_text_maker(strategy='crude'), str(tmpdir.join('untrained')))
+
+    not_a_model = tmpdir.join('not-a-model.txt')
+    not_a_model.write("just some text")
+    with pytest.raises(model_files.ModelFileError):
+        model_files.load_text_maker(str(not_a_model))
+    assert tmpdir.listdir() == [not_a_model]
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+""" tests directly against the n-gram trie model (parity with the other strategies is covered in test_essentials)
+"""
+import collections
+
+import pytest
+
+from presswork.text import profiling
+from presswork.text import synthetic
+from presswork.text import text_makers
+from presswork.text.grammar import tokenizers
+from presswork.text.markov import _crude_markov
+from presswork.text.markov._ngram_trie import NgramTrie
+
+tokenize = tokenizers.SentenceTokenizerWhitespace().tokenize
+
+TEXT = (u"Beautiful is better than ugly.\n"
+        u"Explicit is better than implicit.\n"
+        u"Simple is better than complex.\n"
+        u"Complex is better than complicated.")
+
+
+@pytest.mark.parametrize('frozen', [False, True])
+def test_each_order_matches_the_crude_model(frozen):
+    sentences = tokenize(TEXT)
+    trie = NgramTrie(max_ngram_size=4)
+    trie.train(sentences)
+    if frozen:
+        trie.freeze()
+
+    for ngram_size in (1, 2, 3, 4):
+        crude_model = _crude_markov.crude_markov_chain(sentences, ngram_size=ngram_size)
+        assert trie.count_states(ngram_size) == len(crude_model)
+        for ngram, crude_successors in crude_model.items():
+            assert trie.successors(list(ngram), ngram_size) == collections.Counter(crude_successors), ngram
+
+
+def test_orders_share_storage():
+    sentences = tokenize(synthetic.ZipfianCorpusGenerator(vocabulary_size=500, seed=5).text("32k"))
+    trie = NgramTrie(max_ngram_size=4)
+    trie.train(sentences)
+    trie.freeze()
+
+    separate_models = [_crude_markov.freeze_model(_crude_markov.crude_markov_chain(sentences, ngram_size=ngram_size))
+                       for ngram_size in (1, 2, 3, 4)]
+    assert len(trie) == sum(len(model) for model in separate_models)
+    assert profiling.deep_sizeof(trie) < sum(profiling.deep_sizeof(model) for model in separate_models)
+
+
+def test_views_share_the_model():
+    text_maker = text_makers.create_text_maker(strategy='trie', input_text=TEXT, ngram_size=1, max_ngram_size=4)
+    views = [text_maker.view(ngram_size) for ngram_size in (1, 2, 3, 4)]
+    assert all(view.model is text_maker.model for view in views)
+    assert [view.ngram_size for view in views] == [1, 2, 3, 4]
+    assert text_maker.ngram_size == 1
+
+    # with 4 words of context, every sentence is one from the input; with 1, there are new ones
+    sentences_by_ngram_size = {view.ngram_size: set(u" ".join(sentence) for sentence in view.make_sentences(200))
+                               for view in views}
+    assert sentences_by_ngram_size[4] <= set(TEXT.splitlines())
+    assert sentences_by_ngram_size[1] - set(TEXT.splitlines())
+
+    with pytest.raises(ValueError):
+        text_maker.view(5)
+    with pytest.raises(ValueError):
+        text_makers.create_text_maker(strategy='trie').view(2)
+
+
+def test_max_ngram_size_defaults_to_ngram_size():
+    text_maker = text_makers.create_text_maker(strategy='trie', input_text=TEXT, ngram_size=3)
+    assert text_maker.model.max_ngram_size == 3
+    text_maker.ngram_size = 2
+    with pytest.raises(ValueError):
+        text_maker.ngram_size = 4
+
+
+def test_empty_input():
+    trie = NgramTrie()
+    trie.train([])
+    trie.freeze()
+    assert list(trie.iter_make_sentences(count=2, ngram_size=2)) == [[], []]
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+""" tests for the CLI's on-disk pipeline cache (cleaned text, tokenized corpus, trained model)
+"""
+import os
+
+import pytest
+from mock import patch
+
+from presswork.text import clean
+from presswork.text import corpus_directory
+from presswork.text import pipeline_cache
+from presswork.text import text_makers
+from presswork.text.grammar import joiners
+
+INPUT_BYTES = u"Simple is better than complex.\nComplex is better than complicated.\nünicøde is better than ascii.\n"\
+    .encode('utf-8')
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return pipeline_cache.PipelineCache(directory=str(tmpdir.join('cache')))
+
+
+def _text_maker_for(cache, input_bytes=INPUT_BYTES, **kwargs):
+    params = dict(strategy='crude', sentence_tokenizer='just_whitespace', joiner='just_whitespace')
+    params.update(kwargs)
+    return cache.text_maker_for(input_bytes, 'utf-8', **params)
+
+
+def test_rerun_reuses_the_model(cache):
+    first = _text_maker_for(cache)
+    with patch.object(text_makers.BaseTextMaker, 'input_text') as input_text, \
+            patch.object(text_makers.BaseTextMaker, 'input_sentences') as input_sentences:
+        again = _text_maker_for(cache, joiner='random_enjamb')
+        assert not input_text.called and not input_sentences.called
+
+    assert cache.hits == {'model': 1}
+    assert isinstance(again.joiner, joiners.JoinerNLTKWithRandomEnjambment)
+    assert again.model == first.model
+
+
+def test_changing_only_the_strategy_reuses_the_tokenization(cache, each_text_maker):
+    _text_maker_for(cache)
+    with patch.object(text_makers.BaseTextMaker, 'input_text') as input_text:
+        text_maker = _text_maker_for(cache, strategy=each_text_maker.NICKNAME)
+        assert not input_text.called
+    assert cache.hits['tokenized'] == (0 if each_text_maker.NICKNAME == 'crude' else 1)
+    assert text_maker.is_locked
+    assert text_maker.make_sentences(3)
+
+
+def test_changing_the_tokenizer_reuses_the_cleaned_text(cache):
+    _text_maker_for(cache)
+    with patch('presswork.text.clean.remove_control_characters', wraps=clean.remove_control_characters) as cleaner:
+        text_maker = _text_maker_for(cache, sentence_tokenizer='nltk')
+        # (the word tokenizer does clean each sentence it's given; but the input as a whole isn't cleaned again)
+        assert INPUT_BYTES.decode('utf-8') not in [args[0] for args, _ in cleaner.call_args_list]
+    assert cache.hits == {'cleaned': 1}
+    assert text_maker.is_locked
+
+
+def test_different_input_or_encoding_is_a_miss(cache):
+    _text_maker_for(cache)
+    _text_maker_for(cache, input_bytes=INPUT_BYTES + b"One more.")
+    cache.text_maker_for(INPUT_BYTES, 'latin-1', strategy='crude', sentence_tokenizer='just_whitespace')
+    assert not cache.hits
+
+
+def test_corrupt_entries_are_misses(cache):
+    _text_maker_for(cache)
+    for _, _, path in cache.entries():
+        with open(path, 'wb') as f:
+            f.write(b"not a pickle")
+
+    text_maker = _text_maker_for(cache)
+    assert not cache.hits
+    assert text_maker.make_sentences(1)
+    # ... and are replaced
+    _text_maker_for(cache)
+    assert cache.hits == {'model': 1}
+
+
+def test_least_recently_used_entries_are_evicted(tmpdir):
+    cache = pipeline_cache.PipelineCache(directory=str(tmpdir))
+    _text_maker_for(cache)
+    one_input_bytes = sum(size for _, size, _ in cache.entries())
+
+    # room for about 2 inputs' worth of entries
+    cache.max_bytes = int(one_input_bytes * 2.5)
+    for i in range(3):
+        # (spaced out so the modification times differ, whatever the filesystem's resolution)
+        for _, _, path in cache.entries():
+            os.utime(path, (os.stat(path).st_mtime - 10, os.stat(path).st_mtime - 10))
+        _text_maker_for(cache, input_bytes=INPUT_BYTES + b"input number %d." % i)
+
+    assert sum(size for _, size, _ in cache.entries()) <= cache.max_bytes
+    _text_maker_for(cache)
+    assert not cache.hits, "the first input was least recently used, so it should have been evicted"
+    _text_maker_for(cache, input_bytes=INPUT_BYTES + b"input number 2.")
+    assert cache.hits == {'model': 1}
+
+
+def test_unwritable_cache_does_not_fail(tmpdir):
+    not_a_directory = tmpdir.join('file')
+    not_a_directory.write('')
+    cache = pipeline_cache.PipelineCache(directory=str(not_a_directory))
+    assert _text_maker_for(cache).make_sentences(1)
+
+
+def _write_directory_corpus(directory, count=5):
+    for i in range(count):
+        directory.join('{}.txt'.format(i)).write(u"File {} is better than nothing.\nNested {} is ok.\n".format(i, i))
+    return directory
+
+
+def _text_maker_for_directory(cache, directory, **kwargs):
+    params = dict(strategy='crude', sentence_tokenizer='just_whitespace', joiner='just_whitespace')
+    params.update(kwargs)
+    return cache.text_maker_for_directory(str(directory), 'utf-8', **params)
+
+
+def test_directory_only_new_or_modified_files_are_tokenized(cache, tmpdir):
+    directory = _write_directory_corpus(tmpdir.mkdir('corpus'))
+    text_maker = _text_maker_for_directory(cache, directory)
+    assert cache.misses['tokenized'] == 5
+    assert text_maker.make_sentences(3)
+
+    directory.join('3.txt').write(u"Modified is better than stale.\n")
+    directory.join('9.txt').write(u"New is better than old.\n")
+    cache.hits.clear(), cache.misses.clear()
+    with patch('presswork.text.corpus_directory._read_file', wraps=corpus_directory._read_file) as read_file:
+        text_maker = _text_maker_for_directory(cache, directory)
+        assert sorted(args[0] for args, _ in read_file.call_args_list) == [
+            str(directory.join('3.txt')), str(directory.join('9.txt'))]
+    assert cache.misses['tokenized'] == 2
+    assert cache.hits['tokenized'] == 4
+    generated_words = set(word for sentence in text_maker.make_sentences(200) for word in sentence)
+    assert {u'Modified', u'New'} <= generated_words
+
+    # nothing changed: model comes straight from the cache, nothing is read
+    cache.hits.clear(), cache.misses.clear()
+    with patch('presswork.text.corpus_directory._read_file') as read_file:
+        _text_maker_for_directory(cache, directory, joiner='nltk')
+        assert not read_file.called
+    assert cache.hits == {'index': 1, 'model': 1}
+
+
+def test_directory_changing_only_the_strategy_reuses_each_files_tokenization(cache, tmpdir):
+    directory = _write_directory_corpus(tmpdir.mkdir('corpus'))
+    _text_maker_for_directory(cache, directory)
+    cache.hits.clear(), cache.misses.clear()
+    text_maker = _text_maker_for_directory(cache, directory, strategy='pymc')
+    assert cache.hits['tokenized'] == 5
+    assert not cache.misses['tokenized']
+    assert text_maker.make_sentences(3)
+
+
+def test_directory_files_evicted_from_the_cache_are_read_again(cache, tmpdir):
+    directory = _write_directory_corpus(tmpdir.mkdir('corpus'))
+    _text_maker_for_directory(cache, directory)
+    for _, _, path in cache.entries():
+        if os.sep + 'index' + os.sep not in path:
+            os.unlink(path)
+
+    text_maker = _text_maker_for_directory(cache, directory)
+    assert text_maker.is_locked
+    generated_words = set(word for sentence in text_maker.make_sentences(200) for word in sentence)
+    assert {u'File', u'Nested'} <= generated_words
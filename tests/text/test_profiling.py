@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+""" tests for memory profiling helpers. (the numbers themselves are machine-dependent; check shape & sanity.)
+"""
+import pytest
+
+from presswork.text import profiling
+from presswork.text import synthetic
+
+
+@pytest.fixture(scope="module")
+def small_synthetic_text():
+    return synthetic.ZipfianCorpusGenerator(vocabulary_size=500, seed=99).text("32k")
+
+
+def test_profile_pipeline_each_strategy(each_text_maker, small_synthetic_text):
+    rows = profiling.profile_pipeline(small_synthetic_text, strategy=each_text_maker.__class__, count=10)
+    assert [row.stage for row in rows] == list(profiling.STAGES)
+
+    by_stage = {row.stage: row for row in rows}
+    assert by_stage['tokenize'].retained_bytes > 0
+    assert by_stage['train'].states > 0
+    assert by_stage['train'].bytes_per_state > 0
+    assert all(row.seconds >= 0 for row in rows)
+    assert by_stage['tokenize'].peak_bytes > 0
+
+
+@pytest.mark.parametrize('allocate', [
+    lambda size: bytearray(size),  # one block, mmap-ed on its own
+    lambda size: [bytearray(1000) for _ in xrange(size // 1000)],  # many small blocks, from the heap
+], ids=['one-big-block', 'small-blocks'])
+def test_peak_covers_a_known_allocation(allocate):
+    size = 50 * 1024 ** 2
+    # (first allocate & free as much, so the allocation re-uses memory the process already has)
+    del_me = allocate(size)
+    del del_me
+    with profiling.PeakMemoryTracker() as tracker:
+        allocated = allocate(size)
+    del allocated
+    if tracker.backend == 'rss':
+        pytest.skip("RSS can't see allocations re-using memory the process freed earlier")
+    assert tracker.peak_bytes >= size
+    assert tracker.backend == profiling.PEAK_BACKEND
+
+
+def test_stage_table_labels_rss_peaks():
+    assert "peak RSS" in profiling.format_stage_table([], peak_backend='rss')
+    assert "peak RSS" not in profiling.format_stage_table([], peak_backend='malloc')
+
+
+def test_deep_sizeof_grows_with_model(small_synthetic_text):
+    small, big = [
+        [row for row in profiling.profile_pipeline(text, strategy="crude", count=1) if row.stage == 'train'][0]
+        for text in (small_synthetic_text[:2000], small_synthetic_text)]
+    assert big.states > small.states
+    assert big.retained_bytes > small.retained_bytes
+
+
+def test_capacity_plan_from_profiled_sizes():
+    rows = profiling.profile_corpus_sizes(["8k", "32k"], strategies=["crude"], seed=1, count=5)
+    (estimate,) = profiling.capacity_plan(rows, target_corpus_bytes=10 ** 9, ram_budget_bytes=8 * 1024 ** 3)
+    assert estimate.strategy == "crude"
+    assert estimate.ram_bytes_per_corpus_byte > 0
+    assert estimate.ram_bytes_for_target > 0
+    assert "crude" in profiling.format_capacity_table([estimate])
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+""" tests for progress reporting while tokenizing & training
+"""
+from presswork.text import text_makers
+from presswork.text.grammar import tokenizers
+from presswork.text.progress import Progress
+
+
+def test_progress_reported_by_each_strategy(each_text_maker, text_newlines):
+    progress = Progress()
+    text_maker = text_makers.create_text_maker(strategy=each_text_maker.NICKNAME, progress=progress)
+    sentences = text_maker.input_text(text_newlines)
+
+    snapshot = progress.snapshot()
+    assert snapshot['stage'] is None
+    assert [stage for stage, _ in snapshot['stage_seconds']] == ['clean', 'tokenize', 'train']
+    assert snapshot['counts']['sentences_tokenized'] == len(sentences)
+    # every strategy counts at least one n-gram per word, plus one per sentence end (pymc counts each order too)
+    assert snapshot['counts']['ngrams_counted'] >= sum(len(sentence) + 1 for sentence in sentences if sentence)
+
+
+def test_custom_tokenizer_without_progress_argument_still_works(text_newlines):
+    class MinimalTokenizer(object):
+        def tokenize(self, text):
+            return tokenizers.create_sentence_tokenizer('just_whitespace').tokenize(text)
+
+    progress = Progress()
+    text_maker = text_makers.create_text_maker(
+            strategy='crude', sentence_tokenizer=MinimalTokenizer(), progress=progress)
+    text_maker.input_text(text_newlines)
+    assert text_maker.make_sentences(3)
+
+    counts = progress.snapshot()['counts']
+    assert 'sentences_tokenized' not in counts
+    assert counts['ngrams_counted'] > 0
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+""" tests for pruning models after training (see `presswork.text.markov.pruning`)
+"""
+import pytest
+
+from presswork.text import synthetic
+from presswork.text import text_makers
+from presswork.text.grammar import tokenizers
+from presswork.text.markov import pruning
+
+NGRAM_SIZE = 2
+
+
+@pytest.fixture(scope="module")
+def sentences():
+    text = synthetic.ZipfianCorpusGenerator(
+            vocabulary_size=300, mean_sentence_length=6, sentence_length_stddev=2, seed=7).text("32k")
+    return tokenizers.SentenceTokenizerWhitespace().tokenize(text)
+
+
+@pytest.mark.parametrize('prune_kwargs', [dict(prune_min_count=2), dict(prune_top_k=3),
+                                          dict(prune_min_count=2, prune_top_k=2)])
+def test_prune_each_strategy(each_text_maker, sentences, prune_kwargs):
+    strategy = each_text_maker.__class__
+    if strategy in (text_makers.TextMakerSuffixArray, text_makers.TextMakerNgramTrie):
+        with pytest.raises(ValueError):
+            text_makers.create_text_maker(strategy, **prune_kwargs)
+        return
+
+    unpruned = text_makers.create_text_maker(strategy, ngram_size=NGRAM_SIZE)
+    unpruned.input_sentences(sentences)
+    text_maker = text_makers.create_text_maker(strategy, ngram_size=NGRAM_SIZE, **prune_kwargs)
+    text_maker.input_sentences(sentences)
+
+    report = text_maker.prune_report
+    assert report.states_removed > 0 and report.transitions_removed > 0
+    assert report.bytes_saved > 0
+    assert text_maker.count_states() < unpruned.count_states()
+
+    # no new dead ends: every sentence made still ends the way some input sentence did. (unless it was cut off for
+    # length - some strategies cap sentence length, and pruning can leave loops that take a while to leave)
+    sentence_endings = set(_ending(sentence) for sentence in sentences)
+    made = [sentence for sentence in text_maker.make_sentences(100) if 0 < len(sentence) < 20]
+    assert made
+    assert all(_ending(sentence) in sentence_endings for sentence in made)
+
+
+def _ending(sentence):
+    # (some strategies include the start or end symbol, an empty string, in the sentences they make)
+    return tuple(word for word in sentence if word)[-NGRAM_SIZE:]
+
+
+def test_repairs_loops_that_can_no_longer_end():
+    counts = {
+        ("",): {"la": 5},
+        ("la",): {"la": 10, "end.": 1},
+        ("end.",): {"": 1},
+    }
+    # "la" -> "la" is all that's left at min_count=2: generation would go around forever
+    pruned, report = pruning.prune_counts(counts, ("",), "", next_state=pruning.next_ngram, min_count=2)
+    assert pruned == counts
+    assert report.states_removed == report.transitions_removed == 0
+
+    pruned, report = pruning.prune_counts(counts, ("",), "", top_k=1)
+    assert pruned == counts
+
+
+def test_unreachable_states_are_dropped():
+    counts = {
+        ("",): {"common": 9, "rare": 1},
+        ("common",): {"": 9},
+        ("rare",): {"only": 1},
+        ("only",): {"": 1},
+    }
+    pruned, report = pruning.prune_counts(counts, ("",), "", top_k=1)
+    assert pruned == {("",): {"common": 9}, ("common",): {"": 9}}
+    assert report == pruning.PruneReport(states_before=4, states_removed=2, transitions_before=5,
+                                         transitions_removed=3, bytes_saved=None)
+
+
+def test_clone_and_pickle_keep_pruning(sentences, tmpdir):
+    from presswork.text import model_files
+    text_maker = text_makers.create_text_maker('crude', prune_top_k=2)
+    assert text_maker.clone().prune_top_k == 2
+
+    text_maker.input_sentences(sentences)
+    model_file_path = str(tmpdir.join('model'))
+    model_files.save_text_maker(text_maker, model_file_path)
+    assert model_files.load_text_maker(model_file_path).prune_report == text_maker.prune_report
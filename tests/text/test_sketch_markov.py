@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+""" tests directly against the count-min sketch model (parity with the other strategies is covered in test_essentials)
+"""
+import collections
+import random
+
+from presswork.text import synthetic
+from presswork.text import text_makers
+from presswork.text.grammar import tokenizers
+from presswork.text.markov import _crude_markov
+from presswork.text.markov._sketch_markov import CountMinSketch
+from presswork.text.markov._sketch_markov import SketchMarkovChain
+
+tokenize = tokenizers.SentenceTokenizerWhitespace().tokenize
+
+TEXT = (u"Beautiful is better than ugly.\n"
+        u"Explicit is better than implicit.\n"
+        u"Simple is better than complex.")
+
+
+def test_sketch_never_underestimates():
+    rng = random.Random(1)
+    sketch = CountMinSketch(width=50, depth=3)
+    actual = collections.Counter(rng.randrange(500) for _ in range(5000))
+    for key, count in actual.items():
+        sketch.add(key, count)
+
+    assert all(sketch.estimate(key) >= count for key, count in actual.items())
+    # (50 counters per row for 500 keys: plenty of collisions, but the most common keys still stand out)
+    assert sketch.estimate(actual.most_common(1)[0][0]) >= max(sketch.estimate(key) for key in range(500, 600))
+
+
+def test_same_successors_as_crude_when_everything_fits():
+    sentences = tokenize(TEXT)
+    chain = SketchMarkovChain(ngram_size=2)
+    chain.train(sentences)
+
+    crude_model = _crude_markov.crude_markov_chain(sentences, ngram_size=2)
+    assert set(chain.table) == set(crude_model)
+    for ngram, successors in chain.table.items():
+        assert dict(zip(successors[::2], successors[1::2])) == collections.Counter(crude_model[ngram])
+
+
+def test_memory_is_bounded():
+    sentences = tokenize(synthetic.ZipfianCorpusGenerator(vocabulary_size=2000, seed=3).text("64k"))
+    chain = SketchMarkovChain(ngram_size=2, width=256, max_contexts=100, successors_per_context=3)
+    sketch_bytes = chain.sketch.size_bytes
+
+    chain.train(sentences)
+    chain.train(sentences)
+    assert chain.sketch.size_bytes == sketch_bytes
+    assert 0 < len(chain) <= 100
+    assert all(len(successors) <= 2 * 3 for successors in chain.table.values())
+
+    # the sentence start is the most common n-gram, so it is never evicted; generating still works
+    assert (u"", u"") in chain.table
+    assert any(sentence for sentence in chain.iter_make_sentences(count=20))
+
+
+def test_heavy_hitters_keep_the_most_common_successors():
+    chain = SketchMarkovChain(ngram_size=1, successors_per_context=2)
+    chain.train([[u"a", u"rare"]] + [[u"a", u"common"]] * 10 + [[u"a", u"also_common"]] * 5 + [[u"a", u"late"]])
+    successors = chain.table[(u"a",)]
+    assert dict(zip(successors[::2], successors[1::2])) == {u"common": 10, u"also_common": 5}
+
+
+def test_further_training_after_lock():
+    text_maker = text_makers.create_text_maker(strategy='sketch', input_text=TEXT, ngram_size=2)
+    text_maker.model.train(tokenize(u"Flat is better than nested."))
+    first_words = set(sentence[0] for sentence in text_maker.make_sentences(200))
+    assert first_words == {u"Beautiful", u"Explicit", u"Simple", u"Flat"}
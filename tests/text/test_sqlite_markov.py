@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+""" tests directly against the SQLite-backed model (parity with the other strategies is covered in test_essentials)
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+from presswork.text import text_makers
+from presswork.text.grammar import tokenizers
+from presswork.text.markov._sqlite_markov import SQLiteMarkovChain
+
+tokenize = tokenizers.SentenceTokenizerWhitespace().tokenize
+
+TEXT = (u"Beautiful is better than ugly.\n"
+        u"Explicit is better than implicit.\n"
+        u"Simple is better than complex.")
+
+
+def test_persistence_and_further_training(tmpdir):
+    db_file_path = os.path.join(str(tmpdir), "model.sqlite3")
+    chain = SQLiteMarkovChain(db_file_path=db_file_path, ngram_size=2)
+    chain.train(tokenize(TEXT))
+    states = len(chain)
+    chain.close()
+
+    reopened = SQLiteMarkovChain(db_file_path=db_file_path, ngram_size=2)
+    assert len(reopened) == states
+    assert all(u"better than" in u" ".join(sentence) for sentence in reopened.iter_make_sentences(count=20))
+
+    # training again adds to the counts that are there
+    reopened.train(tokenize(u"Flat is better than nested."))
+    words, cumulative_counts = reopened.successors((u"", u""))
+    assert sorted(words) == [u"Beautiful", u"Explicit", u"Flat", u"Simple"]
+    assert cumulative_counts[-1] == 4
+    words, cumulative_counts = reopened.successors((u"is", u"better"))
+    assert words == (u"than",) and cumulative_counts == (4,)
+
+    with pytest.raises(ValueError):
+        SQLiteMarkovChain(db_file_path=db_file_path, ngram_size=3)
+
+
+def test_successors_are_weighted_by_count():
+    chain = SQLiteMarkovChain(ngram_size=1)
+    chain.train([[u"a", u"x"]] * 9 + [[u"a", u"y"]])
+    words, cumulative_counts = chain.successors((u"a",))
+    assert dict(zip(words, cumulative_counts))[words[-1]] == 10
+
+    counts = {u"x": 0, u"y": 0}
+    for _ in range(2000):
+        counts[chain.next_word((u"a",))] += 1
+    assert counts[u"x"] > counts[u"y"] * 4
+    assert chain.next_word((u"not in model",)) is None
+
+
+def test_failed_training_leaves_no_trace():
+    def failing_sentences():
+        yield [u"never", u"counted"]
+        raise RuntimeError("input failed part way")
+
+    chain = SQLiteMarkovChain(ngram_size=2)
+    chain.train(tokenize(TEXT))
+    states = len(chain)
+    with pytest.raises(RuntimeError):
+        chain.train(failing_sentences())
+    assert len(chain) == states
+
+    # (and the chain can still be trained)
+    chain.train(tokenize(u"Flat is better than nested."))
+    assert len(chain) > states
+    assert chain.successors((u"never", u"counted")) == ((), ())
+
+
+@pytest.mark.parametrize('cache_size', [2, 100])
+def test_hot_states_are_cached(cache_size):
+    chain = SQLiteMarkovChain(ngram_size=2, cache_size=cache_size)
+    chain.train(tokenize(TEXT))
+    list(chain.iter_make_sentences(count=50))
+    stats = chain.cache_stats
+    assert stats['size'] == min(cache_size, len(chain))
+    if cache_size >= len(chain):
+        assert stats['misses'] == len(chain)
+        assert stats['hits'] > 0
+
+
+def test_generating_from_several_threads():
+    """ one chain, shared between threads (as the web app does): the cache in front of the database must hold up
+    """
+    chain = SQLiteMarkovChain(ngram_size=1, cache_size=4)
+    chain.train(tokenize(TEXT))
+    states = [(word,) for word in set(TEXT.split())]
+    expected = {state: chain.successors(state) for state in states}
+    lookups_before = sum(chain.cache_stats[name] for name in ('hits', 'misses'))
+    failures = []
+
+    def generate():
+        try:
+            for _ in range(200):
+                for state in states:
+                    if chain.successors(state) != expected[state]:
+                        failures.append(state)
+                list(chain.iter_make_sentences(count=2))
+        except Exception as e:  # pragma: no cover
+            failures.append(e)
+
+    threads = [threading.Thread(target=generate) for _ in range(8)]
+    check_interval = sys.getcheckinterval()
+    sys.setcheckinterval(1)  # (switch threads as often as possible)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setcheckinterval(check_interval)
+
+    assert failures == []
+    stats = chain.cache_stats
+    assert stats['size'] == 4
+    assert stats['hits'] + stats['misses'] - lookups_before >= 8 * 200 * len(states)
+
+
+def test_text_maker_with_db_file_path(tmpdir):
+    db_file_path = os.path.join(str(tmpdir), "model.sqlite3")
+    text_maker = text_makers.create_text_maker(strategy="sqlite", db_file_path=db_file_path, ngram_size=2)
+    text_maker.input_text(TEXT)
+    assert text_maker.count_states() == len(text_maker.model) > 0
+    assert os.path.getsize(db_file_path) > 0
+    assert u"better than" in text_maker.join(text_maker.make_sentences(5))
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+""" tests directly against the suffix array model (parity with the other strategies is covered in test_essentials)
+"""
+import collections
+import random
+
+import pytest
+
+from presswork.text import text_makers
+from presswork.text.grammar import tokenizers
+from presswork.text.markov import _crude_markov
+from presswork.text.markov._suffix_array_markov import SuffixArrayModel
+from presswork.text.markov._suffix_array_markov import _build_suffix_array
+
+tokenize = tokenizers.SentenceTokenizerWhitespace().tokenize
+
+TEXT = (u"Beautiful is better than ugly.\n"
+        u"Explicit is better than implicit.\n"
+        u"Simple is better than complex.\n"
+        u"Complex is better than complicated.")
+
+
+@pytest.mark.parametrize('max_length', [1, 2, 3, 100])
+def test_suffix_array_matches_sorting_suffixes(max_length):
+    rng = random.Random(max_length)
+    stream = [rng.choice([0, 1, 2, 3]) for _ in range(300)]
+    suffix_array = list(_build_suffix_array(stream, alphabet_size=4, max_length=max_length))
+
+    assert sorted(suffix_array) == range(len(stream))
+    prefixes = [stream[position:position + max_length] for position in suffix_array]
+    assert prefixes == sorted(stream[position:position + max_length] for position in range(len(stream)))
+
+
+def test_successors_match_the_crude_model():
+    sentences = tokenize(TEXT)
+    model = SuffixArrayModel(sentences)
+    for ngram_size in (1, 2, 3):
+        crude_model = _crude_markov.crude_markov_chain(sentences, ngram_size=ngram_size)
+        for ngram, crude_successors in crude_model.items():
+            words = [word for word in ngram if word != _crude_markov.START_SYMBOL]
+            if len(words) < len(ngram) and words:
+                # (crude pads the start of sentences; here, that's just the boundary token before the first word)
+                continue
+            ids_by_word = {word: word_id for word_id, word in enumerate(model.words)}
+            context = [ids_by_word[word] for word in words] or [0]
+            start, end = model.find(context)
+            successors = [model.words[model.stream[model.suffix_array[i] + len(context)]] or u''
+                          for i in range(start, end)]
+            assert collections.Counter(successors) == collections.Counter(crude_successors), ngram
+
+
+def test_successors_are_weighted_by_count():
+    model = SuffixArrayModel([[u"a", u"x"]] * 9 + [[u"a", u"y"]])
+    context = [model.words.index(u"a")]
+    counts = collections.Counter(model.words[model.next_token(context)] for _ in range(2000))
+    assert counts[u"x"] > counts[u"y"] * 4
+    assert model.next_token([model.words.index(u"x"), model.words.index(u"a")]) is None
+
+
+def test_ngram_size_can_change_without_retraining():
+    text_maker = text_makers.create_text_maker(strategy='suffix', input_text=TEXT, ngram_size=1)
+    model = text_maker.model
+    unique_to_ngram_size_1 = set()
+    for _ in range(20):
+        unique_to_ngram_size_1.update(u" ".join(sentence) for sentence in text_maker.make_sentences(20))
+
+    text_maker.ngram_size = 4
+    assert text_maker.model is model
+    sentences = set(u" ".join(sentence) for sentence in text_maker.make_sentences(100))
+    # with 4 words of context, every sentence is one from the input
+    assert sentences <= set(TEXT.splitlines())
+    assert unique_to_ngram_size_1 - set(TEXT.splitlines()), "with 1 word of context, there should be new sentences"
+
+    with pytest.raises(ValueError):
+        text_maker.ngram_size = text_maker.max_context_size + 1
+
+    view = text_maker.view(2)
+    assert view.model is model and (view.ngram_size, text_maker.ngram_size) == (2, 4)
+    # (strategies whose ngram_size is fixed once trained don't have views)
+    with pytest.raises(text_makers.TextMakerIsLockedException):
+        text_makers.create_text_maker(strategy='crude', input_text=TEXT).view(3)
+
+
+def test_empty_input():
+    model = SuffixArrayModel([])
+    assert list(model.iter_make_sentences(count=2, ngram_size=2)) == [[], []]
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+""" tests for the synthetic (Zipfian) corpus generator, which the scale/benchmark tests lean on
+"""
+import collections
+import itertools
+
+import pytest
+
+from presswork.text import clean
+from presswork.text import synthetic
+
+
+def test_reproducible_with_seed():
+    chunks_a = list(synthetic.ZipfianCorpusGenerator(seed=42).iter_chunks("100k"))
+    chunks_b = list(synthetic.ZipfianCorpusGenerator(seed=42).iter_chunks("100k"))
+    chunks_c = list(synthetic.ZipfianCorpusGenerator(seed=43).iter_chunks("100k"))
+    assert chunks_a == chunks_b
+    assert chunks_a != chunks_c
+
+
+@pytest.mark.parametrize('size', [1, 100, 64 * 1024, 200 * 1024 + 7])
+def test_size_is_respected(size):
+    generator = synthetic.ZipfianCorpusGenerator(seed=1)
+    text = b"".join(generator.iter_chunks(size_in_bytes=size))
+    assert size <= len(text) < size + generator.chunk_size_in_bytes
+    assert text.endswith(b"\n")
+
+
+def test_word_frequencies_are_zipfian():
+    generator = synthetic.ZipfianCorpusGenerator(vocabulary_size=1000, punctuation_rate=0, seed=7)
+    counts = collections.Counter(
+            word.rstrip(u".?!").lower()
+            for sentence in itertools.islice(generator.iter_sentences(), 5000)
+            for word in sentence.split())
+    most_common = [word for word, _ in counts.most_common(3)]
+
+    # the top ranks in the distribution should be the top words in the output, in order
+    assert most_common == [synthetic.pseudo_word(rank) for rank in range(3)]
+
+    # rank 1 should be about twice as common as rank 2 (for exponent close to 1.0) - allow generous slack
+    ratio = float(counts[most_common[0]]) / counts[most_common[1]]
+    assert 1.5 < ratio < 2.7
+
+
+def test_noise_is_added_and_cleaned_away():
+    generator = synthetic.ZipfianCorpusGenerator(non_ascii_rate=0.5, control_character_rate=0.5, seed=3)
+    text = generator.text(20000)
+    assert any(char in text for char in synthetic.NON_ASCII_CHARACTERS)
+    assert any(char in text for char in synthetic.CONTROL_CHARACTERS)
+
+    cleaned = clean.CleanInputString(text).unwrap()
+    assert not any(char in cleaned for char in synthetic.CONTROL_CHARACTERS)
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        synthetic.ZipfianCorpusGenerator(vocabulary_size=0)
+    with pytest.raises(ValueError):
+        synthetic.ZipfianCorpusGenerator(punctuation_rate=1.5)
+    with pytest.raises(ValueError):
+        synthetic.ZipfianCorpusGenerator(control_character_rate=-0.1)
+
+
+def test_synthetic_corpus_trains_each_text_maker(each_text_maker):
+    text = synthetic.ZipfianCorpusGenerator(vocabulary_size=200, seed=11).text("20k")
+    each_text_maker.input_text(text)
+    sentences = each_text_maker.make_sentences(20)
+    assert len(sentences) == 20
+    assert any(sentences)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+""" tests for the sentence tokenizers' memo of word tokenizations (WordTokenizationMemo)
+"""
+import pickle
+
+from presswork.text import text_makers
+from presswork.text.grammar import tokenizers
+
+TEXT = u"\n".join([u"Hello there.", u"Nice weather.", u"Hello there.", u"Hello there.", u"Bye now."])
+
+
+class CountingWordTokenizer(tokenizers.WordTokenizerWhitespace):
+    def __init__(self):
+        super(CountingWordTokenizer, self).__init__()
+        self.calls = 0
+
+    def tokenize(self, text):
+        self.calls += 1
+        return super(CountingWordTokenizer, self).tokenize(text)
+
+
+def test_repeated_sentences_are_tokenized_once():
+    word_tokenizer = CountingWordTokenizer()
+    sentence_tokenizer = tokenizers.SentenceTokenizerWhitespace(word_tokenizer=word_tokenizer)
+    sentences = sentence_tokenizer.tokenize(TEXT)
+
+    assert sentences == [[u"Hello", u"there."], [u"Nice", u"weather."], [u"Hello", u"there."],
+                         [u"Hello", u"there."], [u"Bye", u"now."]]
+    assert word_tokenizer.calls == 3
+    assert (sentence_tokenizer.memo.hits, sentence_tokenizer.memo.misses) == (2, 3)
+
+    # (with the memo off, every sentence is tokenized; same result)
+    word_tokenizer = CountingWordTokenizer()
+    sentence_tokenizer = tokenizers.SentenceTokenizerWhitespace(word_tokenizer=word_tokenizer)
+    sentence_tokenizer.memo = None
+    assert sentence_tokenizer.tokenize(TEXT) == sentences
+    assert word_tokenizer.calls == 5
+
+
+def test_tokens_are_interned():
+    sentence_tokenizer = tokenizers.SentenceTokenizerWhitespace()
+    first, second = sentence_tokenizer.tokenize(u"the cat sat.\nthe dog sat.")
+    assert first[0] is second[0]
+    assert first[2] is second[2]
+
+
+def test_memo_is_bounded():
+    memo = tokenizers.WordTokenizationMemo(max_size=10)
+    word_tokenizer = tokenizers.WordTokenizerWhitespace()
+    for i in xrange(100):
+        memo.tokenize(u"sentence number {}".format(i), word_tokenizer)
+        assert len(memo) <= 10
+
+    # recent sentences are still remembered; the first ones aren't
+    memo.tokenize(u"sentence number 99", word_tokenizer)
+    memo.tokenize(u"sentence number 0", word_tokenizer)
+    assert (memo.hits, memo.misses) == (1, 101)
+
+
+def test_memo_is_cleared():
+    sentence_tokenizer = tokenizers.SentenceTokenizerWhitespace()
+    sentence_tokenizer.tokenize(TEXT)
+    assert len(sentence_tokenizer.memo) == 3
+
+    # (a different word tokenizer would tokenize differently)
+    sentence_tokenizer.word_tokenizer = tokenizers.WordTokenizerNLTK()
+    assert len(sentence_tokenizer.memo) == 0
+
+    # not kept in pickles (of text makers, i.e. model files)
+    sentence_tokenizer.tokenize(TEXT)
+    assert len(pickle.loads(pickle.dumps(sentence_tokenizer)).memo) == 0
+    assert len(sentence_tokenizer.memo) == 3
+
+
+def test_text_maker_clears_memo_when_locked():
+    text_maker = text_makers.create_text_maker(strategy='crude', input_text=TEXT)
+    assert len(text_maker.sentence_tokenizer.memo) == 0
+    assert text_maker.sentence_tokenizer.memo.hits == 2
+
+    text_maker = text_makers.create_text_maker(strategy='crude', input_text=TEXT, keep_training_data=True)
+    assert len(text_maker.sentence_tokenizer.memo) == 3
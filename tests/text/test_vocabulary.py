@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+""" tests for the Vocabulary shared by a sentence tokenizer, its tokenized sentences, models and joiners
+"""
+import pickle
+
+import pytest
+
+from presswork.text import dedup
+from presswork.text import model_files
+from presswork.text import text_makers
+from presswork.text.grammar import tokenizers
+from presswork.text.markov import _crude_markov
+from presswork.text.grammar.vocabulary import Vocabulary
+
+TEXT = u"The cat sat on the mat.\nThe dog sat on the cat.\nThe mat sat still."
+WORDS = [line.split() for line in TEXT.splitlines()]
+
+
+def test_ids_are_stable():
+    vocabulary = Vocabulary([u"a", u"b"])
+    assert vocabulary.encode([u"b", u"c", u"a"]).tolist() == [1, 2, 0]
+    assert vocabulary.token(2) == u"c"
+    assert u"c" in vocabulary and u"d" not in vocabulary
+
+    loaded = pickle.loads(pickle.dumps(vocabulary, protocol=pickle.HIGHEST_PROTOCOL))
+    assert list(loaded) == [u"a", u"b", u"c"]
+    assert loaded.id(u"d") == 3 and loaded.get_id(u"a") == 0
+    assert len(pickle.loads(pickle.dumps(Vocabulary()))) == 0
+
+
+@pytest.mark.parametrize('memo', [True, False], ids=['memo', 'no-memo'])
+def test_tokenizer_interns_tokens(memo):
+    sentence_tokenizer = tokenizers.SentenceTokenizerWhitespace()
+    if not memo:
+        sentence_tokenizer.memo = None
+    sentences = sentence_tokenizer.tokenize(TEXT)
+    more_sentences = sentence_tokenizer.tokenize(u"The end.")
+
+    assert sentences.vocabulary is sentence_tokenizer.vocabulary
+    assert sentences[0][0] is sentences[1][0] is more_sentences[0][0]
+    assert sentences[0][4] is sentences[1][4] is not sentences[0][0]
+    assert set(sentence_tokenizer.vocabulary) == {word for words in WORDS for word in words} | {u"end."}
+
+
+def test_tokenizer_interns_deduplicated_sentences():
+    sentence_tokenizer = tokenizers.SentenceTokenizerWhitespace()
+    sentences = sentence_tokenizer.tokenize(TEXT, deduplicator=dedup.ExactDeduplicator())
+    assert sentences[0][0] is sentences[1][0]
+    assert len(sentence_tokenizer.vocabulary) == 10
+
+
+def test_tokenizer_without_vocabulary():
+    sentence_tokenizer = tokenizers.SentenceTokenizerWhitespace()
+    sentence_tokenizer.vocabulary = None
+    assert sentence_tokenizer.memo.vocabulary is None
+    sentences = sentence_tokenizer.tokenize(TEXT)
+    assert sentences == WORDS and sentences.vocabulary is None
+
+
+@pytest.mark.parametrize('hashed_keys', [True, False], ids=['hashed-keys', 'ngram-keys'])
+def test_only_models_of_word_ids_keep_the_vocabulary(hashed_keys):
+    text_maker = text_makers.create_text_maker(strategy='crude', hashed_keys=hashed_keys, input_text=TEXT)
+    assert (text_maker.sentence_tokenizer.vocabulary is not None) == hashed_keys
+    assert (pickle.loads(pickle.dumps(text_maker)).sentence_tokenizer.vocabulary is not None) == hashed_keys
+
+    # (still training: kept)
+    text_maker = text_makers.create_text_maker(strategy='markovify', input_text=TEXT, keep_training_data=True)
+    assert len(text_maker.sentence_tokenizer.vocabulary) == 10
+
+
+def test_hashed_keys_model_shares_the_vocabulary(tmpdir):
+    text_maker = text_makers.create_text_maker(strategy='crude', hashed_keys=True, input_text=TEXT)
+    vocabulary = text_maker.sentence_tokenizer.vocabulary
+    assert text_maker.model.vocabulary is vocabulary
+    # (the start & end padding is the model's own, not a word)
+    assert u"" not in vocabulary and len(vocabulary) == 10
+    # (frozen: the successors are word IDs, all in one array)
+    # (a count per state, & an ID per transition: one per word, plus the end of each sentence)
+    assert len(text_maker.model.successors) == len(text_maker.model) + sum(len(words) + 1 for words in WORDS)
+
+    path = str(tmpdir.join('hashed.pwm'))
+    model_files.save_text_maker(text_maker, path)
+    loaded = model_files.load_text_maker(path)
+    assert loaded.model.vocabulary is loaded.sentence_tokenizer.vocabulary
+    assert list(loaded.model.vocabulary) == list(vocabulary)
+    for sentence in loaded.make_sentences(20):
+        assert sentence and all(word in vocabulary for word in sentence if word != _crude_markov.END_SYMBOL)
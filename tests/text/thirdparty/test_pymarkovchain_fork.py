@@ -5,11 +5,13 @@ just a couple cases because of forking the lib. want to give it smoketests on it
 tests related to TextMaker variants. (if something went wrong, it would help pinpoint.)
 """
 import os
+import random
 import warnings
 from collections import namedtuple
 
 import pytest
 
+from presswork.text import clean
 from presswork.text.grammar import joiners
 from presswork.text.grammar import tokenizers
 from presswork.text.markov.thirdparty._pymarkovchain import PyMarkovChainForked
@@ -93,3 +95,141 @@ def test_database_persistence(pymc, test_case):
         pymc.db_clear()
         # even though we just deleted the db file, db is still in memory...
         assert test_case.phrase_in_each_sentence in rejoin(pymc.make_sentences_list(1))
+
+
+def test_freeze():
+    pymc = PyMarkovChainForked()
+    pymc.markov_chain(tokenize(TEST_CASE_ZEN_OF_PYTHON.text))
+    pymc.freeze()
+
+    assert pymc.frozen
+    assert TEST_CASE_ZEN_OF_PYTHON.phrase_in_each_sentence in rejoin(pymc.make_sentences_list(1))
+
+    # lookups of missing keys must not insert anything anymore (as the defaultdicts would have)
+    states_before = len(pymc.db)
+    with pytest.raises(KeyError):
+        pymc.db[("not", "in", "the", "model")]
+    assert len(pymc.db) == states_before
+
+    from presswork.text.markov.thirdparty._pymarkovchain import FrozenChainException
+    with pytest.raises(FrozenChainException):
+        pymc.markov_chain(tokenize(TEST_CASE_ZEN_OF_PYTHON.text))
+
+
+def _next_word_as_originally_written(pymc, last_words):
+    """ the original (quadratic) backoff & sampling, kept here to check the indexed version against it
+    """
+    last_words = tuple(last_words)
+    if last_words != pymc._special_ngram:
+        while last_words not in pymc.db:
+            last_words = last_words[1:]
+            if not last_words:
+                return u''
+    probmap = pymc.db[last_words]
+    sample = random.random()
+    maxprob = 0.0
+    maxprobword = u''
+    for candidate in probmap:
+        if probmap[candidate] > maxprob:
+            maxprob = probmap[candidate]
+            maxprobword = candidate
+        if sample > probmap[candidate]:
+            sample -= probmap[candidate]
+        else:
+            return candidate
+    return maxprobword
+
+
+@pytest.mark.parametrize('window', [1, 2, 3, 5])
+def test_backoff_index_matches_original_backoff(window, text_newlines):
+    pymc = PyMarkovChainForked(window=window)
+    pymc.markov_chain(tokenize(clean.CleanInputString(text_newlines)))
+
+    random.seed(window)
+    expected = []
+    for _ in range(20):
+        sentence = [u'']
+        next_word = _next_word_as_originally_written(pymc, sentence)
+        while next_word:
+            sentence.append(next_word)
+            next_word = _next_word_as_originally_written(pymc, sentence)
+        expected.append(sentence)
+
+    random.seed(window)
+    assert pymc.make_sentences_list(20) == expected
+
+    # retraining must invalidate the indexes
+    pymc.markov_chain(tokenize(u"Nothing like the fixtures at all."))
+    assert u"Nothing" in rejoin(pymc.make_sentences_list(20))
+
+
+def _flat_db_as_originally_written(window, sentences_as_word_lists):
+    """ the original db: a flat dict of every order's states (before normalizing, i.e. weights)
+    """
+    db = {(u'',): {u'': 0.0}}
+    for word_seq in sentences_as_word_lists:
+        db[(u'',)][word_seq[0]] = db[(u'',)].get(word_seq[0], 1.0) + 1
+        for order in range(1, window + 1):
+            for i in range(len(word_seq) - 1):
+                if i + order < len(word_seq):
+                    successors = db.setdefault(tuple(word_seq[i:i + order]), {})
+                    successors[word_seq[i + order]] = successors.get(word_seq[i + order], 1.0) + 1
+            successors = db.setdefault(tuple(word_seq[len(word_seq) - order:]), {})
+            successors[u''] = successors.get(u'', 1.0) + 1
+    return db
+
+
+@pytest.mark.parametrize('window', [1, 2, 3])
+def test_trie_db_matches_flat_db(window, text_newlines):
+    sentences = tokenize(clean.CleanInputString(text_newlines))
+    flat_db = _flat_db_as_originally_written(window, sentences)
+    pymc = PyMarkovChainForked(window=window)
+    pymc.markov_chain(sentences, keep_state_totals=True)
+
+    assert len(pymc.db) == len(flat_db)
+    assert set(pymc.db.keys()) == set(flat_db)
+    for state, weights in flat_db.iteritems():
+        assert pymc.state_totals[state] == sum(weights.values())
+        assert pymc.db[state] == pytest.approx({word: weight / pymc.state_totals[state]
+                                                for word, weight in weights.iteritems()})
+
+    # frozen, the states are compiled for sampling: same probabilities, & the same sentences from the same seed
+    random.seed(window)
+    expected = pymc.make_sentences_list(20)
+    pymc.freeze()
+    assert set(pymc.db.keys()) == set(flat_db)
+    for state in flat_db:
+        assert pymc.db[state] == pytest.approx({word: weight / sum(flat_db[state].values())
+                                                for word, weight in flat_db[state].iteritems()})
+    random.seed(window)
+    assert pymc.make_sentences_list(20) == expected
+
+
+def test_state_totals_only_kept_for_pruning():
+    pymc = PyMarkovChainForked()
+    pymc.markov_chain(tokenize(TEST_CASE_ZEN_OF_PYTHON.text))
+    assert pymc.state_totals == {}
+    with pytest.raises(ValueError):
+        pymc.prune(min_count=2)
+
+    pymc = PyMarkovChainForked()
+    pymc.markov_chain(tokenize(TEST_CASE_ZEN_OF_PYTHON.text), keep_state_totals=True)
+    assert pymc.prune(min_count=2).states_removed > 0
+
+
+@pytest.mark.parametrize('frozen', [False, True])
+def test_load_pickle_with_flat_db(frozen):
+    """ models pickled before the db was a trie had a flat dict db; they're converted when loaded
+    """
+    from presswork.text.markov.thirdparty import _pymarkovchain
+    pymc = PyMarkovChainForked()
+    pymc.markov_chain(tokenize(TEST_CASE_ZEN_OF_PYTHON.text))
+    legacy = PyMarkovChainForked()
+    legacy.__dict__.update(pymc.__dict__, frozen=frozen, _backoff_index={},
+                           db={state: dict(probabilities) for state, probabilities in pymc.db.iteritems()})
+
+    loaded = _pymarkovchain.pickle.loads(_pymarkovchain.pickle.dumps(legacy))
+    assert isinstance(loaded.db, _pymarkovchain.TrieDB)
+    assert loaded.db.frozen == frozen
+    assert set(loaded.db.keys()) == set(pymc.db.keys())
+    assert TEST_CASE_ZEN_OF_PYTHON.phrase_in_each_sentence in rejoin(loaded.make_sentences_list(1))